@@ -0,0 +1,128 @@
+from dotenv import load_dotenv
+from pathlib import Path
+from typing import Dict, List
+import importlib.util
+import threading
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Python module each wire compressor needs; zlib ships with Python
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+def available_compressors(requested: str) -> List[str]:
+    """Requested compressors, in preference order, whose libraries are installed"""
+    compressors = []
+    for name in (c.strip() for c in requested.split(',')):
+        module = COMPRESSOR_MODULES.get(name)
+        if not module:
+            if name:
+                logger.warning(f"Unknown MongoDB compressor {name}")
+            continue
+        if importlib.util.find_spec(module) is None:
+            logger.info(f"MongoDB compressor {name} skipped, {module} is not installed")
+            continue
+        compressors.append(name)
+    return compressors
+
+# Connection settings, all overridable per deployment
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 10000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 60000))
+MONGO_COMPRESSORS = available_compressors(os.environ.get('MONGO_COMPRESSORS', 'zstd,snappy,zlib'))
+# Read preference for the channel and category listing endpoints only. Opt in to
+# e.g. secondaryPreferred to spread them across secondaries, which may lag writes
+MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', -1))
+
+DB_NAME = os.environ.get('DB_NAME', 'iptv_db')
+
+# The driver is imported and the client created on first use, so importing this
+# module (and every route that does) costs no driver import, DNS lookup or threads
+_lock = threading.Lock()
+_client = None
+_pool_stats = None
+
+def get_client():
+    """The shared Motor client, created on first call"""
+    global _client, _pool_stats
+    with _lock:
+        if _client is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            from services.pool_stats import PoolStatsListener
+
+            _pool_stats = PoolStatsListener()
+            client_options = dict(
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+                event_listeners=[_pool_stats],
+            )
+            if MONGO_COMPRESSORS:
+                client_options["compressors"] = MONGO_COMPRESSORS
+            _client = AsyncIOMotorClient(os.environ['MONGO_URL'], **client_options)
+        return _client
+
+def close_client():
+    """Close the client if one was ever created"""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+class LazyDatabase:
+    """Stands in for a Motor database and creates it on first attribute access"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._database = None
+
+    def _resolve(self):
+        if self._database is None:
+            self._database = self._factory()
+        return self._database
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name):
+        return self._resolve()[name]
+
+def _read_database():
+    from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+    return get_client().get_database(DB_NAME, read_preference=make_read_preference(
+        read_pref_mode_from_name(MONGO_READ_PREFERENCE), None,
+        max_staleness=MONGO_MAX_STALENESS_SECONDS
+    ))
+
+# Writes, and reads that must see them immediately
+db = LazyDatabase(lambda: get_client()[DB_NAME])
+
+# Channel and category listings, on secondaries when MONGO_READ_PREFERENCE allows
+read_db = LazyDatabase(_read_database)
+
+def pool_stats() -> Dict[str, dict]:
+    """Connection pool usage per server, empty until the client exists"""
+    return _pool_stats.stats() if _pool_stats is not None else {}
+
+def pool_settings() -> dict:
+    return {
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        "wait_queue_timeout_ms": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "compressors": MONGO_COMPRESSORS,
+        "read_preference": MONGO_READ_PREFERENCE,
+    }
@@ -0,0 +1,103 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from services.stream_probe import STREAM_PROBE_TTL
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every index the API relies on, by collection
+INDEXES: Dict[str, List[IndexModel]] = {
+    # Per-user collections lead with owner_id, so every query is a single index range
+    "playlists": [
+        IndexModel([("owner_id", ASCENDING), ("id", ASCENDING)], unique=True),
+        IndexModel([("owner_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("owner_id", ASCENDING), ("channels.id", ASCENDING)]),
+        IndexModel([("owner_id", ASCENDING), ("channels.category", ASCENDING)]),
+        # Guide matching reads each library's tvg-ids
+        IndexModel([("owner_id", ASCENDING), ("channels.tvg_id", ASCENDING)]),
+    ],
+    "channel_clusters": [
+        IndexModel([("owner_id", ASCENDING), ("id", ASCENDING)], unique=True),
+        IndexModel([("owner_id", ASCENDING), ("keys", ASCENDING)]),
+        IndexModel([("owner_id", ASCENDING), ("streams.playlist_id", ASCENDING)]),
+    ],
+    "library_revisions": [
+        IndexModel([("owner_id", ASCENDING)], unique=True),
+    ],
+    "channel_changes": [
+        IndexModel([("owner_id", ASCENDING), ("revision", ASCENDING)], unique=True),
+        # Workers polling for changes made elsewhere, when change streams are unavailable
+        IndexModel([("created_at", ASCENDING)]),
+    ],
+    "stream_probes": [
+        IndexModel([("url_hash", ASCENDING)], unique=True),
+        IndexModel([("checked_at", ASCENDING)], expireAfterSeconds=STREAM_PROBE_TTL),
+    ],
+    "logo_sources": [
+        IndexModel([("hash", ASCENDING)], unique=True),
+    ],
+    # Guides belong to the library that imported them; now/next seeks one channel
+    # of one import, and replacing an import drops the others of its source
+    "epg_programmes": [
+        IndexModel([("owner_id", ASCENDING), ("source", ASCENDING), ("import_id", ASCENDING),
+                    ("tvg_id", ASCENDING), ("stop", ASCENDING)]),
+    ],
+    "epg_channels": [
+        IndexModel([("owner_id", ASCENDING), ("source", ASCENDING), ("tvg_id", ASCENDING)]),
+    ],
+    "epg_channel_map": [
+        IndexModel([("owner_id", ASCENDING), ("tvg_id", ASCENDING)], unique=True),
+    ],
+}
+
+# Shard keys for per-user collections: queries always carry owner_id, so they
+# target one shard, and id spreads a single large library across chunks
+SHARD_KEYS: Dict[str, Dict[str, int]] = {
+    "playlists": {"owner_id": 1, "id": 1},
+    "channel_clusters": {"owner_id": 1, "id": 1},
+    "channel_changes": {"owner_id": 1, "revision": 1},
+}
+
+# Build progress reported by /api/health
+index_state = {
+    "status": "pending",
+    "started_at": None,
+    "finished_at": None,
+    "collections": {},
+}
+
+async def ensure_indexes(db, collections: Optional[Iterable[str]] = None) -> dict:
+    """Create declared indexes, recording per-collection results.
+
+    A failing collection (e.g. duplicates blocking a unique index) is logged
+    and reported without stopping the others.
+    """
+    names = list(collections) if collections is not None else list(INDEXES)
+    if collections is None:
+        index_state.update(status="building", started_at=datetime.utcnow(), finished_at=None)
+
+    for name in names:
+        try:
+            created = await db[name].create_indexes(INDEXES[name])
+            index_state["collections"][name] = {"status": "ready", "indexes": created}
+        except Exception as e:
+            logger.error(f"Error creating indexes for {name}: {e}")
+            index_state["collections"][name] = {"status": "failed", "error": str(e)}
+
+    if collections is None:
+        failed = any(c["status"] == "failed" for c in index_state["collections"].values())
+        index_state.update(status="failed" if failed else "ready", finished_at=datetime.utcnow())
+        logger.info(f"Index bootstrap finished: {index_state['status']}")
+
+    return index_state
+
+async def shard_collections(client, db_name: str):
+    """Shard per-user collections on a sharded cluster (requires a mongos)"""
+    await client.admin.command("enableSharding", db_name)
+    for name, key in SHARD_KEYS.items():
+        try:
+            await client.admin.command("shardCollection", f"{db_name}.{name}", key=key)
+            logger.info(f"Sharded {db_name}.{name} on {key}")
+        except Exception as e:
+            logger.error(f"Error sharding {db_name}.{name}: {e}")
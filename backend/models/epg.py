@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class Programme(BaseModel):
+    tvg_id: str
+    channel: str
+    title: str
+    start: datetime
+    stop: datetime
+    description: Optional[str] = None
+    category: Optional[str] = None
+
+class EPGImportRequest(BaseModel):
+    url: str
+
+class EPGImportResponse(BaseModel):
+    source: str
+    channel_count: int
+    programme_count: int
+    matched_channels: int
+    imported_at: datetime
+
+class ProgrammeResponse(BaseModel):
+    title: str
+    start: datetime
+    stop: datetime
+    description: Optional[str] = None
+    category: Optional[str] = None
+
+class NowNextResponse(BaseModel):
+    tvg_id: str
+    now: Optional[ProgrammeResponse] = None
+    next: Optional[ProgrammeResponse] = None
@@ -1,8 +1,11 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 import uuid
 
+# Owner of libraries created without a user, and before libraries were partitioned
+DEFAULT_OWNER_ID = "default"
+
 class Channel(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -24,11 +27,28 @@ class ChannelCreate(BaseModel):
     tvg_id: Optional[str] = None
     tvg_name: Optional[str] = None
 
+class IngestRule(BaseModel):
+    """Keep, drop or rewrite the channels of a playlist whose ``field`` matches ``pattern``.
+
+    Patterns match case-insensitively: globs the whole value, regexes any
+    part of it. With include rules, only channels matching one of them are
+    kept; exclude rules drop channels. ``rename`` and ``categorize`` set the
+    name or category to ``value``, in which regex rules may refer to their
+    groups (``\\1``, ``\\g<name>``).
+    """
+    action: Literal["include", "exclude", "rename", "categorize"]
+    field: Literal["name", "group_title", "url_host", "tvg_id"] = "name"
+    pattern: str
+    syntax: Literal["glob", "regex"] = "glob"
+    value: Optional[str] = None
+
 class Playlist(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    owner_id: str = DEFAULT_OWNER_ID
     name: str
     url: Optional[str] = None
     file_path: Optional[str] = None
+    ingest_rules: List[IngestRule] = []
     channel_count: int = 0
     channels: List[Channel] = []
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -37,15 +57,36 @@ class Playlist(BaseModel):
 class PlaylistCreate(BaseModel):
     name: str
     url: Optional[str] = None
+    ingest_rules: List[IngestRule] = []
 
 class PlaylistResponse(BaseModel):
     id: str
     name: str
     url: Optional[str] = None
+    ingest_rules: List[IngestRule] = []
     channel_count: int
     created_at: datetime
     last_updated: datetime
 
+class PlaylistBatchCreate(BaseModel):
+    playlists: List[PlaylistCreate]
+
+class PlaylistImportResult(BaseModel):
+    """Outcome of one playlist of a batch import: the playlist created, or why not"""
+    name: str
+    url: Optional[str] = None
+    status: Literal["created", "failed"]
+    playlist: Optional[PlaylistResponse] = None
+    error: Optional[str] = None
+
+class StreamVariant(BaseModel):
+    url: str
+    bandwidth: int
+    average_bandwidth: Optional[int] = None
+    resolution: Optional[str] = None
+    codecs: Optional[str] = None
+    frame_rate: Optional[float] = None
+
 class ChannelResponse(BaseModel):
     id: str
     name: str
@@ -53,4 +94,19 @@ class ChannelResponse(BaseModel):
     logo: Optional[str] = None
     category: Optional[str] = None
     is_live: bool
-    group_title: Optional[str] = None
\ No newline at end of file
+    group_title: Optional[str] = None
+    variants: Optional[List[StreamVariant]] = None
+
+class MergedChannelResponse(ChannelResponse):
+    alternate_urls: List[str] = []
+
+class ChannelChangeResponse(ChannelResponse):
+    playlist_id: str
+
+class ChannelChangesResponse(BaseModel):
+    revision: int
+    full: bool
+    deleted_playlists: List[str] = []
+    replaced_playlists: List[str] = []
+    deleted: List[str] = []
+    upserted: List[ChannelChangeResponse] = []
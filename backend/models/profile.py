@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class ProfileParseRequest(BaseModel):
+    playlist_id: Optional[str] = None
+    url: Optional[str] = None
+    # Sampling period; below 0.5ms the sampler starves the parse it measures
+    interval_ms: float = Field(2.0, ge=0.5, le=1000)
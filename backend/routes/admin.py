@@ -0,0 +1,89 @@
+from fastapi import APIRouter, HTTPException, Header, Depends
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from models.profile import ProfileParseRequest
+from services.profiler import SamplingProfiler, ProfileStore
+from routes.playlist import m3u_parser, library
+from tenancy import get_owner_id
+from typing import Optional, Tuple
+import hmac
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+if not ADMIN_TOKEN:
+    logger.warning("ADMIN_TOKEN not set, admin endpoints reject every request")
+
+# Recent per-request profiles taken through the X-Profile header
+profile_store = ProfileStore(max_profiles=int(os.environ.get('PROFILE_STORE_SIZE', 50)))
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Acceso restringido a administradores")
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+def _profile_parse(content: Optional[str], url: Optional[str], interval: float) -> Tuple[SamplingProfiler, int]:
+    """Parse in the calling worker thread while sampling that thread"""
+    with SamplingProfiler(interval=interval) as profiler:
+        if content is not None:
+            channels = m3u_parser.parse_from_file(content)
+        else:
+            channels = m3u_parser.parse_from_url(url)
+    return profiler, len(channels)
+
+@router.post("/profile/parse")
+async def profile_parse(
+    request: ProfileParseRequest,
+    format: str = "json",
+    owner_id: str = Depends(get_owner_id)
+):
+    """Run a playlist through M3UParser under the sampling profiler.
+
+    ``format=collapsed`` returns folded stacks for flamegraph.pl or speedscope.
+    """
+    try:
+        content, url = None, request.url
+        if request.playlist_id:
+            playlist = await library.get_playlist(owner_id, request.playlist_id)
+            if not playlist:
+                raise HTTPException(status_code=404, detail="Playlist no encontrada")
+            if playlist.get("file_path") and os.path.exists(playlist["file_path"]):
+                with open(playlist["file_path"], 'r', encoding='utf-8') as f:
+                    content = f.read()
+            else:
+                url = playlist.get("url")
+        if content is None and not url:
+            raise HTTPException(status_code=400, detail="Se requiere playlist_id o url")
+
+        profiler, channel_count = await run_in_threadpool(_profile_parse, content, url, request.interval_ms / 1000)
+
+        if format == "collapsed":
+            return PlainTextResponse(profiler.collapsed())
+        return dict(channel_count=channel_count, **profiler.summary())
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error profiling playlist parse: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/profiles")
+async def list_profiles():
+    """Recent per-request profiles, newest first"""
+    return profile_store.list()
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "json"):
+    """Get a per-request profile taken with the X-Profile header"""
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    if format == "collapsed":
+        return PlainTextResponse(profile["collapsed"])
+    return profile
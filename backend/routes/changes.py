@@ -0,0 +1,95 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from models.playlist import ChannelChangeResponse, ChannelChangesResponse
+from services.channel_changes import ChannelDelta
+from services.metrics import span, TimedJSONResponse
+from routes.playlist import library, attach_variants, proxy_logo, stream_json_array, STREAM_CHUNK_SIZE
+from tenancy import get_owner_id
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/channels", tags=["channels"], default_response_class=TimedJSONResponse)
+
+async def library_chunks(owner_id: str) -> AsyncIterator[Tuple[str, List[dict]]]:
+    """Every channel of the library, for a full resync"""
+    async for playlist_id, chunk in library.primary.playlist_channels(owner_id, STREAM_CHUNK_SIZE):
+        if chunk:
+            yield playlist_id, chunk
+
+async def changed_chunks(owner_id: str, playlists: Dict[str, Optional[Set[str]]]) -> AsyncIterator[Tuple[str, List[dict]]]:
+    """Current channels of replaced playlists, and of the changed ids of the others.
+
+    Read from the primary, so they are at least as recent as the revision sent.
+    """
+    for playlist_id, ids in playlists.items():
+        async for chunk in library.primary.channel_chunks(owner_id, playlist_id, None, None, STREAM_CHUNK_SIZE):
+            if ids is not None:
+                chunk = [ch for ch in chunk if ch["id"] in ids]
+            if chunk:
+                yield playlist_id, chunk
+
+async def change_response_chunks(chunks: AsyncIterator[Tuple[str, List[dict]]]) -> AsyncIterator[List[ChannelChangeResponse]]:
+    """Convert tagged channel chunks, attaching probed variants"""
+    while True:
+        with span("storage.fetch"):
+            tagged = await anext(chunks, None)
+        if tagged is None:
+            break
+        playlist_id, documents = tagged
+        with span("model.convert"):
+            responses = [
+                ChannelChangeResponse(**dict(ch, logo=proxy_logo(ch.get("logo")), playlist_id=playlist_id))
+                for ch in documents
+            ]
+        yield await attach_variants(responses)
+
+async def stream_changes(header: dict, chunks: AsyncIterator[List[ChannelChangeResponse]]) -> AsyncIterator[bytes]:
+    """The header fields, then the upserted channels streamed as they are read"""
+    yield json.dumps(header)[:-1].encode("utf-8") + b',"upserted":'
+    async for part in stream_json_array(chunks):
+        yield part
+    yield b"}"
+
+@router.get("/changes", response_model=ChannelChangesResponse)
+async def get_channel_changes(
+    since: int = Query(0, ge=0),
+    owner_id: str = Depends(get_owner_id)
+):
+    """Channels upserted and deleted since a library revision.
+
+    Clients drop the channels of deleted and replaced playlists and the
+    deleted ids, then store the upserted channels. ``full`` means the log no
+    longer reaches back to ``since``: the local catalogue is replaced by the
+    upserted channels.
+    """
+    try:
+        with span("storage.fetch"):
+            # Read before the state, so entries compacted meanwhile show up as compacted
+            entries = await library.changes_since(owner_id, since) if since else []
+            state = await library.library_revision(owner_id)
+
+        if not since or since < state["compacted_through"] or since > state["revision"]:
+            header = {"revision": state["revision"], "full": True,
+                      "deleted_playlists": [], "replaced_playlists": [], "deleted": []}
+            chunks = library_chunks(owner_id)
+        else:
+            delta = ChannelDelta.from_entries(since, entries)
+            header = {
+                "revision": delta.revision,
+                "full": False,
+                "deleted_playlists": sorted(delta.deleted_playlists),
+                "replaced_playlists": sorted(delta.replaced_playlists),
+                "deleted": list(delta.deleted),
+            }
+            chunks = changed_chunks(owner_id, delta.playlists_to_read())
+
+        return StreamingResponse(
+            stream_changes(header, change_response_chunks(chunks)), media_type="application/json"
+        )
+
+    except Exception as e:
+        logger.error(f"Error getting channel changes: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
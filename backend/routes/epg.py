@@ -0,0 +1,236 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Depends
+from starlette.concurrency import run_in_threadpool
+from models.epg import EPGImportRequest, EPGImportResponse, NowNextResponse, ProgrammeResponse
+from services.epg_parser import XMLTVParser, normalize_tvg_id
+from tenancy import get_owner_id
+from typing import Dict, Iterator, List, Tuple
+import asyncio
+import uuid
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/epg", tags=["epg"])
+
+# Get database connection; now/next lookups may be served by secondaries
+from database import db, read_db
+
+# Initialize XMLTV parser
+xmltv_parser = XMLTVParser()
+
+# Programmes are written in batches so memory stays flat on large guides
+IMPORT_BATCH_SIZE = 1000
+
+# Upper bound on channels per now/next request
+MAX_NOW_NEXT_CHANNELS = 500
+
+# Collections written by guide imports
+EPG_COLLECTIONS = ("epg_programmes", "epg_channels", "epg_channel_map")
+
+LEGACY_INDEXES = (
+    ("epg_channel_map", "tvg_id_1"),
+    ("epg_programmes", "tvg_id_1_start_1"),
+    ("epg_programmes", "tvg_id_1_stop_1"),
+    ("epg_programmes", "source_1_import_id_1"),
+    ("epg_channels", "source_1_tvg_id_1"),
+)
+
+# Programmes fetched per channel for now/next, enough to skip a repeated current slot
+NOW_NEXT_CANDIDATES = 4
+
+async def ensure_epg_indexes():
+    """Create indexes backing guide imports and now/next lookups"""
+    from indexes import ensure_indexes
+    # Indexes from before guides were partitioned by library
+    for collection, name in LEGACY_INDEXES:
+        if name in await db[collection].index_information():
+            await db[collection].drop_index(name)
+    await ensure_indexes(db, EPG_COLLECTIONS)
+
+def _next_batch(events: Iterator[Tuple[str, dict]], size: int) -> List[Tuple[str, dict]]:
+    batch = []
+    for item in events:
+        batch.append(item)
+        if len(batch) >= size:
+            break
+    return batch
+
+async def _build_channel_map(channels: Dict[str, dict], source: str, import_id: str, owner_id: str) -> int:
+    """Precompute which tvg-ids of a library's playlists resolve to which channel of an import"""
+    aliases = {}
+    for tvg_id, channel in channels.items():
+        aliases.setdefault(tvg_id, tvg_id)
+        for name in channel['display_names']:
+            aliases.setdefault(normalize_tvg_id(name), tvg_id)
+
+    playlist_ids = await db.playlists.distinct("channels.tvg_id", {"owner_id": owner_id})
+    keys = {normalize_tvg_id(tvg_id) for tvg_id in playlist_ids} - {""}
+
+    from pymongo import ReplaceOne
+    operations = [
+        ReplaceOne(
+            {"owner_id": owner_id, "tvg_id": key},
+            {"owner_id": owner_id, "tvg_id": key, "epg_tvg_id": aliases[key], "source": source,
+             "import_id": import_id},
+            upsert=True
+        )
+        for key in keys if key in aliases
+    ]
+    if operations:
+        await db.epg_channel_map.bulk_write(operations, ordered=False)
+    # Channels the new version of the guide no longer matches
+    await db.epg_channel_map.delete_many({"owner_id": owner_id, "source": source, "import_id": {"$ne": import_id}})
+
+    return len(operations)
+
+async def _import_guide(events: Iterator[Tuple[str, dict]], source: str, owner_id: str) -> EPGImportResponse:
+    """Consume parser events in batches and persist them.
+
+    Guides belong to the importing library: another library importing the
+    same source (or a file with the same name) keeps its own copy.
+    """
+    await ensure_epg_indexes()
+
+    import_id = str(uuid.uuid4())
+    scope = {"owner_id": owner_id, "source": source}
+    channels = {}
+    programme_count = 0
+
+    while True:
+        # The parser is blocking I/O + CPU, keep it off the event loop
+        batch = await run_in_threadpool(_next_batch, events, IMPORT_BATCH_SIZE)
+        if not batch:
+            break
+
+        programmes = []
+        for kind, data in batch:
+            if kind == 'channel':
+                channels[data['tvg_id']] = data
+            else:
+                data.update(scope, import_id=import_id)
+                programmes.append(data)
+
+        if programmes:
+            await db.epg_programmes.insert_many(programmes, ordered=False)
+            programme_count += len(programmes)
+
+    await db.epg_channels.delete_many(scope)
+    if channels:
+        await db.epg_channels.insert_many(
+            [dict(channel, **scope) for channel in channels.values()],
+            ordered=False
+        )
+
+    # now/next only reads the import the map points to, so the previous one is
+    # replaced once this one is complete, and a failed import is never seen
+    matched = await _build_channel_map(channels, source, import_id, owner_id)
+    await db.epg_programmes.delete_many(dict(scope, import_id={"$ne": import_id}))
+
+    logger.info(
+        f"Imported EPG {source}: {len(channels)} channels, "
+        f"{programme_count} programmes, {matched} matched channels"
+    )
+
+    return EPGImportResponse(
+        source=source,
+        channel_count=len(channels),
+        programme_count=programme_count,
+        matched_channels=matched,
+        imported_at=datetime.utcnow()
+    )
+
+@router.post("/upload", response_model=EPGImportResponse)
+async def upload_epg_file(file: UploadFile = File(...), owner_id: str = Depends(get_owner_id)):
+    """Upload and import XMLTV guide (plain or gzip)"""
+    try:
+        if not file.filename.endswith(('.xml', '.xml.gz', '.gz')):
+            raise HTTPException(
+                status_code=400,
+                detail="Solo se permiten archivos .xml y .xml.gz"
+            )
+
+        events = xmltv_parser.iter_from_file(file.file)
+        return await _import_guide(events, source=file.filename, owner_id=owner_id)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading EPG: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/url", response_model=EPGImportResponse)
+async def import_epg_from_url(request: EPGImportRequest, owner_id: str = Depends(get_owner_id)):
+    """Import XMLTV guide from URL"""
+    try:
+        if not request.url:
+            raise HTTPException(status_code=400, detail="URL es requerida")
+
+        events = xmltv_parser.iter_from_url(request.url)
+        return await _import_guide(events, source=request.url, owner_id=owner_id)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing EPG from URL: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/now-next", response_model=List[NowNextResponse])
+async def get_now_next(
+    tvg_ids: str = Query(..., description="Comma separated tvg-ids"),
+    owner_id: str = Depends(get_owner_id)
+):
+    """Get current and next programme for a set of channels"""
+    try:
+        requested = list(dict.fromkeys(
+            tvg_id.strip() for tvg_id in tvg_ids.split(',') if tvg_id.strip()
+        ))
+        if len(requested) > MAX_NOW_NEXT_CHANNELS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Máximo {MAX_NOW_NEXT_CHANNELS} canales por consulta"
+            )
+
+        keys = {tvg_id: normalize_tvg_id(tvg_id) for tvg_id in requested}
+        mapped = {
+            m["tvg_id"]: m
+            async for m in read_db.epg_channel_map.find(
+                {"owner_id": owner_id, "tvg_id": {"$in": list(set(keys.values()))}}
+            )
+        }
+
+        now = datetime.utcnow()
+
+        async def lookup(key: str) -> List[dict]:
+            # Only the guide import the library's map points to; unmapped channels have no guide
+            entry = mapped.get(key)
+            if entry is None or "import_id" not in entry:
+                return []
+            # Served by the (owner_id, source, import_id, tvg_id, stop) index: one seek per channel
+            return await read_db.epg_programmes.find(
+                {"owner_id": owner_id, "source": entry["source"], "import_id": entry["import_id"],
+                 "tvg_id": entry["epg_tvg_id"], "stop": {"$gt": now}},
+                {"_id": 0, "title": 1, "start": 1, "stop": 1, "description": 1, "category": 1}
+            ).sort("stop", 1).limit(NOW_NEXT_CANDIDATES).to_list(NOW_NEXT_CANDIDATES)
+
+        results = await asyncio.gather(*(lookup(keys[tvg_id]) for tvg_id in requested))
+
+        response = []
+        for tvg_id, programmes in zip(requested, results):
+            programmes = [ProgrammeResponse(**p) for p in programmes]
+            current = programmes[0] if programmes and programmes[0].start <= now else None
+            # Guides listing a slot twice would otherwise show it as next too
+            upcoming = [p for p in programmes[1:] if p.start >= current.stop] if current else programmes
+            response.append(NowNextResponse(
+                tvg_id=tvg_id,
+                now=current,
+                next=upcoming[0] if upcoming else None
+            ))
+
+        return response
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting now/next: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+from services.logo_cache import LogoCache, THUMBNAIL_SIZES, DEFAULT_SIZE
+import os
+import re
+import mimetypes
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/logos", tags=["logos"])
+
+# Get database connection
+from database import db
+
+# Thumbnails are keyed by URL hash, so they never change under the same path
+CACHE_CONTROL = "public, max-age=2592000, immutable"
+
+# Logos come from third parties: SVG scripts must not run on the API origin
+LOGO_SECURITY_HEADERS = {
+    "Content-Security-Policy": "default-src 'none'; style-src 'unsafe-inline'; sandbox",
+    "X-Content-Type-Options": "nosniff",
+}
+
+LOGO_CACHE_DIR = os.environ.get('LOGO_CACHE_DIR', '/app/logo_cache')
+LOGO_CACHE_MAX_BYTES = int(os.environ.get('LOGO_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Initialize logo cache
+logo_cache = LogoCache(
+    LOGO_CACHE_DIR,
+    max_bytes=LOGO_CACHE_MAX_BYTES,
+    base_url=os.environ.get('LOGO_PROXY_BASE_URL', '')
+)
+
+HASH_REGEX = re.compile(r'^[0-9a-f]{32}$')
+
+@router.get("/{logo_hash}")
+async def get_logo(logo_hash: str, request: Request, size: int = DEFAULT_SIZE):
+    """Serve a cached logo thumbnail, fetching it from the source on first use"""
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tamaño inválido, use uno de {list(THUMBNAIL_SIZES)}"
+        )
+    if not HASH_REGEX.match(logo_hash):
+        raise HTTPException(status_code=404, detail="Logo no encontrado")
+
+    etag = f'"{logo_hash}-{size}"'
+    headers = {"Cache-Control": CACHE_CONTROL, "ETag": etag, **LOGO_SECURITY_HEADERS}
+
+    path = logo_cache.cached_path(logo_hash, size)
+    if path and request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    if not path:
+        source = await db.logo_sources.find_one({"hash": logo_hash})
+        if not source:
+            raise HTTPException(status_code=404, detail="Logo no encontrado")
+
+        path = await run_in_threadpool(logo_cache.fetch, logo_hash, source["url"], size)
+        if not path:
+            raise HTTPException(status_code=404, detail="Logo no disponible")
+
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+async def ensure_logo_sources():
+    """Register logos of channels ingested before the proxy existed"""
+    try:
+        if await db.logo_sources.estimated_document_count() > 0:
+            return
+
+        logos = await db.playlists.distinct("channels.logo")
+        await logo_cache.register(db.logo_sources, logos)
+        logger.info(f"Registered {len(logos)} channel logos")
+    except Exception as e:
+        logger.error(f"Error registering channel logos: {e}")
@@ -1,34 +1,172 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
-from motor.motor_asyncio import AsyncIOMotorClient
-from models.playlist import Playlist, PlaylistCreate, PlaylistResponse, Channel, ChannelResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, BackgroundTasks, Depends, Header, Request, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from models.playlist import (Playlist, PlaylistCreate, PlaylistResponse, Channel, ChannelResponse, MergedChannelResponse,
+                             IngestRule, PlaylistBatchCreate, PlaylistImportResult)
 from services.m3u_parser import M3UParser
-from typing import List, Optional
+from services.ingest_rules import IngestRules, AllExcludedError, compile_rules
+from services.playlist_fetcher import PlaylistFetcher
+from services.channel_dedup import ChannelDeduplicator
+from services.stream_probe import StreamProbe, STREAM_PROBE_TTL, is_hls_url
+from services.metrics import span, TimedJSONResponse
+from services.wire_format import ColumnarChannels, negotiate, JSON_MEDIA_TYPE
+from services.compression import CompressedBodyCache, content_etag
+from services.fuzzy_search import FuzzySearch, FUZZY_SEARCH_LIMIT, FUZZY_SEARCH_MAX_LIMIT
+from services.channel_changes import change_entry, diff_channels, CHANGE_LOG_RETENTION, CHANGE_LOG_COMPACT_EVERY
+from storage import create_storage
+from storage.base import search_term
+from tenancy import get_owner_id
+from typing import AsyncIterator, List, Optional, Union
 import os
+import json
 import uuid
+import unicodedata
 import logging
 from datetime import datetime
+from urllib.parse import quote
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/playlists", tags=["playlists"])
+router = APIRouter(prefix="/playlists", tags=["playlists"], default_response_class=TimedJSONResponse)
 
-# Get database from server.py
-from server import db
+# Playlist library, in Mongo or an embedded database depending on STORAGE_BACKEND
+library = create_storage()
+
+# Whether stream probes and the HLS proxy may fetch private addresses, for sources
+# on the deployment's own network (e.g. a LAN tuner); off, playlists can't reach it
+STREAM_ALLOW_PRIVATE_SOURCES = os.environ.get('STREAM_ALLOW_PRIVATE_SOURCES', '').lower() in ('1', 'true', 'yes')
+
+# Logo proxy and stream probe caches live in Mongo and are skipped without it
+if library.db is not None:
+    from routes.logos import logo_cache
+    # Stream health probing and HLS variant pre-resolution
+    stream_probe = StreamProbe(ttl=STREAM_PROBE_TTL, allow_private=STREAM_ALLOW_PRIVATE_SOURCES)
+else:
+    logo_cache = None
+    stream_probe = None
+
+# Opt-in columnar listings held in memory; each worker keeps its own copy
+if os.environ.get('CHANNEL_TABLE_ENABLED', '').lower() in ('1', 'true', 'yes'):
+    from services.channel_table import ChannelTables
+    snapshots = None
+    # Shared by the workers of a host, which memory-map it instead of reading the library
+    if os.environ.get('CHANNEL_TABLE_SNAPSHOT_DIR'):
+        from services.channel_snapshot import ChannelSnapshots
+        snapshots = ChannelSnapshots(os.environ['CHANNEL_TABLE_SNAPSHOT_DIR'])
+    channel_tables = ChannelTables(
+        library, max_owners=int(os.environ.get('CHANNEL_TABLE_MAX_OWNERS', 64)), snapshots=snapshots
+    )
+else:
+    channel_tables = None
 
 # Initialize M3U parser
 m3u_parser = M3UParser()
 
+# Concurrent imports and refreshes of the same URL share one download and parse
+playlist_fetcher = PlaylistFetcher(m3u_parser)
+
+# Cross-playlist channel clustering
+deduplicator = ChannelDeduplicator()
+
+# Typo-tolerant, ranked name search over per-owner trigram indexes
+fuzzy_search = FuzzySearch(library)
+
+# Category lists, exports and uploaded files, compressed once per version (ETag)
+compressed_bodies = CompressedBodyCache()
+
+# Upper bound on streams probed in the background after each ingest
+PROBE_ON_INGEST_LIMIT = int(os.environ.get('STREAM_PROBE_ON_INGEST_LIMIT', 1000))
+
+# Most playlists added by one batch import
+PLAYLIST_BATCH_MAX = int(os.environ.get('PLAYLIST_BATCH_MAX', 100))
+
+# Channels converted, matched against probe results and serialized at a time
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 1000))
+
 # Ensure upload directory exists
 UPLOAD_DIR = "/app/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+async def update_channel_clusters(playlist_id: str, owner_id: str, channels: Optional[List[Channel]] = None):
+    """Keep the deduplicated channel view in sync with a playlist change"""
+    try:
+        await library.update_clusters(owner_id, playlist_id, channels)
+    except Exception as e:
+        # The playlist itself is stored; a stale merged view is fixed by the next rebuild
+        logger.error(f"Error updating channel clusters for {playlist_id}: {e}")
+
+def update_channel_table(owner_id: str, playlist_id: str, channels: Optional[List[Channel]] = None,
+                         last_updated: Optional[datetime] = None):
+    """Patch the in-memory listing of an added, refreshed or deleted playlist"""
+    if channel_tables is not None:
+        channel_tables.playlist_changed(owner_id, playlist_id, channels, last_updated)
+
+async def record_channel_changes(owner_id: str, playlist_id: str, change: dict):
+    """Log a playlist change for clients syncing by revision, trimming the log now and then"""
+    try:
+        revision = await library.record_change(owner_id, playlist_id, change)
+        if revision % CHANGE_LOG_COMPACT_EVERY == 0 and revision > CHANGE_LOG_RETENTION:
+            await library.compact_changes(owner_id, revision - CHANGE_LOG_RETENTION)
+    except Exception as e:
+        # Clients that miss it catch up on the next full resync
+        logger.error(f"Error logging channel changes for {playlist_id}: {e}")
+
+def channel_listings():
+    """Where listings are read from: the in-memory tables when enabled, else the library"""
+    return channel_tables if channel_tables is not None else library
+
+async def register_channel_logos(channels: List[Channel]):
+    """Make channel logos resolvable by the logo proxy"""
+    if logo_cache is None:
+        return
+    try:
+        await logo_cache.register(library.db.logo_sources, (ch.logo for ch in channels))
+    except Exception as e:
+        logger.error(f"Error registering channel logos: {e}")
+
+async def probe_channel_streams(channels: List[Channel], limit: Optional[int] = None) -> List[dict]:
+    """Probe HLS channels and cache their resolved variants"""
+    if stream_probe is None:
+        return []
+    urls = [ch.url for ch in channels if is_hls_url(ch.url)]
+    if limit is not None:
+        urls = urls[:limit]
+    try:
+        return await stream_probe.probe_urls(library.db.stream_probes, urls)
+    except Exception as e:
+        logger.error(f"Error probing streams: {e}")
+        return []
+
+async def attach_variants(responses: List[ChannelResponse]) -> List[ChannelResponse]:
+    """Expose pre-resolved master playlist variants on channel responses"""
+    if stream_probe is None:
+        return responses
+    with span("mongo.variants"):
+        variants = await stream_probe.variants_for(library.read_db.stream_probes, (r.url for r in responses))
+    if variants:
+        for response in responses:
+            response.variants = variants.get(response.url)
+    return responses
+
+def ingest_rules(rules: List[IngestRule]) -> Optional[IngestRules]:
+    """Compile a playlist's ingest rules, rejecting invalid patterns with a 400"""
+    try:
+        return compile_rules(rules)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Reglas de ingesta inválidas: {e}")
+
+def proxy_logo(url: Optional[str]) -> Optional[str]:
+    return logo_cache.proxy_url(url) if logo_cache is not None else url
+
 @router.post("/upload", response_model=PlaylistResponse)
 async def upload_playlist_file(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    name: Optional[str] = Form(None)
+    name: Optional[str] = Form(None),
+    rules: Optional[str] = Form(None),
+    owner_id: str = Depends(get_owner_id)
 ):
-    """Upload and parse M3U/M3U8 file"""
+    """Upload and parse M3U/M3U8 file, keeping the channels its ingest ``rules`` (a JSON list) keep"""
     try:
         # Validate file type
         if not file.filename.endswith(('.m3u', '.m3u8')):
@@ -37,12 +175,18 @@ async def upload_playlist_file(
                 detail="Solo se permiten archivos .m3u y .m3u8"
             )
         
+        try:
+            rule_list = TypeAdapter(List[IngestRule]).validate_json(rules) if rules else []
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=f"Reglas de ingesta inválidas: {e}")
+        compiled_rules = ingest_rules(rule_list)
+        
         # Read file content
         content = await file.read()
         file_content = content.decode('utf-8')
         
         # Parse M3U content
-        channels = m3u_parser.parse_from_file(file_content)
+        channels = m3u_parser.parse_from_file(file_content, compiled_rules)
         
         # Create playlist name
         playlist_name = name or file.filename
@@ -56,15 +200,22 @@ async def upload_playlist_file(
         
         # Create playlist object
         playlist = Playlist(
+            owner_id=owner_id,
             name=playlist_name,
             file_path=file_path,
+            ingest_rules=rule_list,
             channel_count=len(channels),
             channels=channels
         )
         
         # Save to database
-        playlist_dict = playlist.dict()
-        result = await db.playlists.insert_one(playlist_dict)
+        with span("storage.write"):
+            await library.insert_playlist(playlist)
+            await record_channel_changes(owner_id, playlist.id, change_entry(replaced=True))
+            update_channel_table(owner_id, playlist.id, channels, playlist.last_updated)
+            await update_channel_clusters(playlist.id, owner_id, channels)
+            await register_channel_logos(channels)
+        background_tasks.add_task(probe_channel_streams, channels, PROBE_ON_INGEST_LIMIT)
         
         logger.info(f"Uploaded playlist {playlist_name} with {len(channels)} channels")
         
@@ -72,36 +223,54 @@ async def upload_playlist_file(
             id=playlist.id,
             name=playlist.name,
             url=playlist.url,
+            ingest_rules=playlist.ingest_rules,
             channel_count=playlist.channel_count,
             created_at=playlist.created_at,
             last_updated=playlist.last_updated
         )
         
+    except HTTPException:
+        raise
+    except AllExcludedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error uploading playlist: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/url", response_model=PlaylistResponse)
-async def add_playlist_from_url(playlist_data: PlaylistCreate):
+async def add_playlist_from_url(
+    playlist_data: PlaylistCreate,
+    background_tasks: BackgroundTasks,
+    owner_id: str = Depends(get_owner_id)
+):
     """Add playlist from URL"""
     try:
         if not playlist_data.url:
             raise HTTPException(status_code=400, detail="URL es requerida")
         
+        compiled_rules = ingest_rules(playlist_data.ingest_rules)
+        
         # Parse M3U from URL
-        channels = m3u_parser.parse_from_url(playlist_data.url)
+        channels = await playlist_fetcher.parse_from_url(playlist_data.url, compiled_rules)
         
         # Create playlist object
         playlist = Playlist(
+            owner_id=owner_id,
             name=playlist_data.name,
             url=playlist_data.url,
+            ingest_rules=playlist_data.ingest_rules,
             channel_count=len(channels),
             channels=channels
         )
         
         # Save to database
-        playlist_dict = playlist.dict()
-        result = await db.playlists.insert_one(playlist_dict)
+        with span("storage.write"):
+            await library.insert_playlist(playlist)
+            await record_channel_changes(owner_id, playlist.id, change_entry(replaced=True))
+            update_channel_table(owner_id, playlist.id, channels, playlist.last_updated)
+            await update_channel_clusters(playlist.id, owner_id, channels)
+            await register_channel_logos(channels)
+        background_tasks.add_task(probe_channel_streams, channels, PROBE_ON_INGEST_LIMIT)
         
         logger.info(f"Added playlist {playlist_data.name} from URL with {len(channels)} channels")
         
@@ -109,73 +278,231 @@ async def add_playlist_from_url(playlist_data: PlaylistCreate):
             id=playlist.id,
             name=playlist.name,
             url=playlist.url,
+            ingest_rules=playlist.ingest_rules,
             channel_count=playlist.channel_count,
             created_at=playlist.created_at,
             last_updated=playlist.last_updated
         )
         
+    except HTTPException:
+        raise
+    except AllExcludedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error adding playlist from URL: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/batch", response_model=List[PlaylistImportResult])
+async def import_playlists(
+    batch: PlaylistBatchCreate,
+    background_tasks: BackgroundTasks,
+    owner_id: str = Depends(get_owner_id)
+):
+    """Add playlists from many URLs at once, reporting each one's outcome in request order"""
+    try:
+        if not batch.playlists:
+            raise HTTPException(status_code=400, detail="Se requiere al menos una playlist")
+        if len(batch.playlists) > PLAYLIST_BATCH_MAX:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Se pueden importar como máximo {PLAYLIST_BATCH_MAX} playlists a la vez"
+            )
+        
+        results = [PlaylistImportResult(name=item.name, url=item.url, status="failed") for item in batch.playlists]
+        pending, rules = [], []
+        for i, item in enumerate(batch.playlists):
+            if not item.url:
+                results[i].error = "URL es requerida"
+                continue
+            try:
+                rules.append(compile_rules(item.ingest_rules))
+            except ValueError as e:
+                results[i].error = f"Reglas de ingesta inválidas: {e}"
+                continue
+            pending.append(i)
+        
+        # Downloads run concurrently and parse on worker threads
+        parsed = await playlist_fetcher.parse_many([batch.playlists[i].url for i in pending], rules)
+        
+        playlists = {}
+        for i, channels in zip(pending, parsed):
+            if isinstance(channels, Exception):
+                logger.warning(f"Error importing playlist from {batch.playlists[i].url}: {channels}")
+                results[i].error = str(channels)
+                continue
+            item = batch.playlists[i]
+            playlists[i] = Playlist(
+                owner_id=owner_id,
+                name=item.name,
+                url=item.url,
+                ingest_rules=item.ingest_rules,
+                channel_count=len(channels),
+                channels=channels
+            )
+        
+        # Save to database, every playlist in one write; those that fail are reported alone
+        with span("storage.write"):
+            failed = await library.insert_playlists(list(playlists.values())) if playlists else {}
+            for position, i in enumerate(list(playlists)):
+                if position in failed:
+                    logger.warning(f"Error storing playlist from {batch.playlists[i].url}: {failed[position]}")
+                    results[i].error = f"Error al guardar la playlist: {failed[position]}"
+                    del playlists[i]
+            for playlist in playlists.values():
+                await record_channel_changes(owner_id, playlist.id, change_entry(replaced=True))
+                update_channel_table(owner_id, playlist.id, playlist.channels, playlist.last_updated)
+                await update_channel_clusters(playlist.id, owner_id, playlist.channels)
+                await register_channel_logos(playlist.channels)
+        background_tasks.add_task(
+            probe_channel_streams, [ch for p in playlists.values() for ch in p.channels], PROBE_ON_INGEST_LIMIT
+        )
+        
+        for i, playlist in playlists.items():
+            results[i].status = "created"
+            results[i].playlist = PlaylistResponse(
+                id=playlist.id,
+                name=playlist.name,
+                url=playlist.url,
+                ingest_rules=playlist.ingest_rules,
+                channel_count=playlist.channel_count,
+                created_at=playlist.created_at,
+                last_updated=playlist.last_updated
+            )
+        
+        logger.info(f"Imported {len(playlists)} of {len(results)} playlists")
+        return results
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing playlists: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/", response_model=List[PlaylistResponse])
-async def get_playlists():
+async def get_playlists(owner_id: str = Depends(get_owner_id)):
     """Get all playlists"""
     try:
-        playlists = await db.playlists.find({}, {
-            "channels": 0  # Exclude channels from list view
-        }).to_list(1000)
-        
-        return [
-            PlaylistResponse(
-                id=p["id"],
-                name=p["name"],
-                url=p.get("url"),
-                channel_count=p["channel_count"],
-                created_at=p["created_at"],
-                last_updated=p["last_updated"]
-            )
-            for p in playlists
-        ]
+        with span("storage.fetch"):
+            return [
+                PlaylistResponse(
+                    id=p["id"],
+                    name=p["name"],
+                    url=p.get("url"),
+                    ingest_rules=p.get("ingest_rules") or [],
+                    channel_count=p["channel_count"],
+                    created_at=p["created_at"],
+                    last_updated=p["last_updated"]
+                )
+                async for p in library.list_playlists(owner_id)
+            ]
         
     except Exception as e:
         logger.error(f"Error getting playlists: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def fetched_chunks(chunks: AsyncIterator[List[dict]]) -> AsyncIterator[List[dict]]:
+    """Time each chunk read from the library"""
+    while True:
+        with span("storage.fetch"):
+            chunk = await anext(chunks, None)
+        if chunk is None:
+            break
+        yield chunk
+
+async def channel_response_chunks(chunks: AsyncIterator[List[dict]]) -> AsyncIterator[List[ChannelResponse]]:
+    """Convert playlist channels chunk by chunk, attaching probed variants"""
+    async for documents in fetched_chunks(chunks):
+        with span("model.convert"):
+            responses = [
+                ChannelResponse(**dict(ch, logo=proxy_logo(ch.get("logo"))))
+                for ch in documents
+            ]
+        yield await attach_variants(responses)
+
+async def merged_response_chunks(chunks: AsyncIterator[List[dict]]) -> AsyncIterator[List[MergedChannelResponse]]:
+    """Convert channel clusters chunk by chunk, attaching probed variants"""
+    async for clusters in fetched_chunks(chunks):
+        with span("model.convert"):
+            responses = []
+            for cluster in clusters:
+                urls = deduplicator.alternate_urls(cluster)
+                responses.append(MergedChannelResponse(
+                    id=cluster["id"],
+                    name=cluster["name"],
+                    url=urls[0],
+                    logo=proxy_logo(cluster.get("logo")),
+                    category=cluster.get("category"),
+                    is_live=True,
+                    group_title=cluster.get("group_title"),
+                    alternate_urls=urls[1:]
+                ))
+        yield await attach_variants(responses)
+
+async def stream_json_array(chunks: AsyncIterator[List[BaseModel]]) -> AsyncIterator[bytes]:
+    """Serialize model chunks as one JSON array without holding it all in memory"""
+    separator = b"["
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            with span("response.render"):
+                body = b",".join(item.model_dump_json().encode("utf-8") for item in chunk)
+            yield separator + body
+            separator = b","
+    except Exception as e:
+        # Headers are already sent; truncating the array makes the failure visible to clients
+        logger.error(f"Error streaming channels: {e}")
+        raise
+    yield b"[]" if separator == b"[" else b"]"
+
+async def fuzzy_chunks(owner_id: str, playlist_id: Optional[str], category: Optional[str], search: str,
+                       limit: int) -> AsyncIterator[List[dict]]:
+    """The best fuzzy matches, best first, as one chunk"""
+    with span("search.fuzzy"):
+        channels = await fuzzy_search.search(owner_id, search, playlist_id, category, limit)
+    yield channels
+
+def streamed_channels(chunks: AsyncIterator[List[BaseModel]]) -> StreamingResponse:
+    return StreamingResponse(stream_json_array(chunks), media_type="application/json")
+
+async def channel_list_response(chunks: AsyncIterator[List[BaseModel]], accept: Optional[str]) -> Response:
+    """Channels as a streamed JSON array, or in the columnar format the client asked for"""
+    media_type = negotiate(accept)
+    if media_type == JSON_MEDIA_TYPE:
+        response = streamed_channels(chunks)
+    else:
+        columns = ColumnarChannels()
+        async for chunk in chunks:
+            with span("response.render"):
+                columns.extend(chunk)
+        with span("response.render"):
+            response = Response(columns.encode(media_type), media_type=media_type)
+    response.headers["Vary"] = "Accept"
+    return response
+
 @router.get("/{playlist_id}/channels", response_model=List[ChannelResponse])
 async def get_playlist_channels(
     playlist_id: str,
     category: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    fuzzy: bool = False,
+    limit: int = Query(FUZZY_SEARCH_LIMIT, ge=1, le=FUZZY_SEARCH_MAX_LIMIT),
+    owner_id: str = Depends(get_owner_id),
+    accept: Optional[str] = Header(None)
 ):
-    """Get channels from a playlist with optional filtering"""
+    """Get channels from a playlist with optional filtering; ``fuzzy`` ranks the ``limit`` best name matches"""
     try:
-        playlist = await db.playlists.find_one({"id": playlist_id})
+        with span("storage.fetch"):
+            playlist = await library.get_playlist(owner_id, playlist_id)
         
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist no encontrada")
         
-        channels = [Channel(**ch) for ch in playlist["channels"]]
-        
-        # Apply filters
-        if category and category != "Todos":
-            channels = m3u_parser.filter_channels_by_category(channels, category)
-        
-        if search:
-            channels = m3u_parser.search_channels(channels, search)
-        
-        return [
-            ChannelResponse(
-                id=ch.id,
-                name=ch.name,
-                url=ch.url,
-                logo=ch.logo,
-                category=ch.category,
-                is_live=ch.is_live,
-                group_title=ch.group_title
-            )
-            for ch in channels
-        ]
+        if fuzzy and search_term(search):
+            chunks = fuzzy_chunks(owner_id, playlist_id, category, search, limit)
+        else:
+            chunks = channel_listings().channel_chunks(owner_id, playlist_id, category, search, STREAM_CHUNK_SIZE)
+        return await channel_list_response(channel_response_chunks(chunks), accept)
         
     except HTTPException:
         raise
@@ -183,76 +510,142 @@ async def get_playlist_channels(
         logger.error(f"Error getting playlist channels: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/channels", response_model=List[ChannelResponse])
+@router.get("/channels", response_model=List[Union[MergedChannelResponse, ChannelResponse]])
 async def get_all_channels(
     category: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    dedup: bool = False,
+    fuzzy: bool = False,
+    limit: int = Query(FUZZY_SEARCH_LIMIT, ge=1, le=FUZZY_SEARCH_MAX_LIMIT),
+    owner_id: str = Depends(get_owner_id),
+    accept: Optional[str] = Header(None)
 ):
-    """Get all channels from all playlists with optional filtering"""
+    """Get all channels from all playlists with optional filtering.
+    
+    ``fuzzy`` ranks the ``limit`` best name matches of ``search``, tolerating typos; merged
+    (``dedup``) listings keep substring search.
+    """
     try:
-        all_channels = []
-        
-        # Get all playlists
-        playlists = await db.playlists.find({}).to_list(1000)
-        
-        # Collect all channels
-        for playlist in playlists:
-            channels = [Channel(**ch) for ch in playlist.get("channels", [])]
-            all_channels.extend(channels)
-        
-        # Apply filters
-        if category and category != "Todos":
-            all_channels = m3u_parser.filter_channels_by_category(all_channels, category)
-        
-        if search:
-            all_channels = m3u_parser.search_channels(all_channels, search)
-        
-        return [
-            ChannelResponse(
-                id=ch.id,
-                name=ch.name,
-                url=ch.url,
-                logo=ch.logo,
-                category=ch.category,
-                is_live=ch.is_live,
-                group_title=ch.group_title
-            )
-            for ch in all_channels
-        ]
+        if dedup:
+            return await get_merged_channels(owner_id, category, search, accept)
+        
+        if fuzzy and search_term(search):
+            chunks = fuzzy_chunks(owner_id, None, category, search, limit)
+        else:
+            chunks = channel_listings().channel_chunks(owner_id, None, category, search, STREAM_CHUNK_SIZE)
+        return await channel_list_response(channel_response_chunks(chunks), accept)
         
     except Exception as e:
         logger.error(f"Error getting all channels: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/categories")
-async def get_categories():
+async def get_merged_channels(
+    owner_id: str,
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    accept: Optional[str] = None
+) -> Response:
+    """Get one entry per distinct channel, other providers' streams as fallbacks"""
+    chunks = library.cluster_chunks(owner_id, category, search, STREAM_CHUNK_SIZE)
+    return await channel_list_response(merged_response_chunks(chunks), accept)
+
+@router.get("/categories", response_model=List[str])
+async def get_categories(request: Request, owner_id: str = Depends(get_owner_id)):
     """Get all unique categories from all channels"""
     try:
-        all_channels = []
-        
-        # Get all playlists
-        playlists = await db.playlists.find({}).to_list(1000)
+        # Served by a category index instead of loading every playlist
+        with span("storage.fetch"):
+            names = await channel_listings().categories(owner_id)
         
-        # Collect all channels
-        for playlist in playlists:
-            channels = [Channel(**ch) for ch in playlist.get("channels", [])]
-            all_channels.extend(channels)
-        
-        categories = m3u_parser.get_categories(all_channels)
+        categories = m3u_parser.sort_categories(names)
         categories.insert(0, "Todos")  # Add "All" option at the beginning
         
-        return categories
+        # Revalidated on every use; unchanged lists cost a 304 and are compressed once
+        body = json.dumps(categories, ensure_ascii=False).encode("utf-8")
+        return await compressed_bodies.respond(
+            request.headers, ("categories", owner_id), content_etag(body), body, JSON_MEDIA_TYPE,
+            {"Cache-Control": "no-cache"}
+        )
         
     except Exception as e:
         logger.error(f"Error getting categories: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def attachment_disposition(name: str, extension: str) -> str:
+    """Content-Disposition of a download named after a playlist.
+
+    Header values are Latin-1, so non-ASCII names go in ``filename*``
+    (RFC 5987) with a transliterated ASCII ``filename`` for older clients.
+    """
+    name = "".join(c for c in name if c.isalnum() or c in " -_").strip()
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    ascii_name = "".join(c for c in ascii_name if c.isalnum() or c in " -_").strip() or "playlist"
+    disposition = f'attachment; filename="{ascii_name}{extension}"'
+    if name and name != ascii_name:
+        disposition += f"; filename*=UTF-8''{quote(name + extension, safe='')}"
+    return disposition
+
+@router.get("/{playlist_id}/export")
+async def export_playlist(playlist_id: str, request: Request, owner_id: str = Depends(get_owner_id)):
+    """Download a playlist as an M3U file"""
+    try:
+        playlist = await library.get_playlist(owner_id, playlist_id)
+        
+        if not playlist:
+            raise HTTPException(status_code=404, detail="Playlist no encontrada")
+        
+        async def render() -> bytes:
+            lines = ["#EXTM3U\n"]
+            async for chunk in fetched_chunks(library.channel_chunks(owner_id, playlist_id, None, None, STREAM_CHUNK_SIZE)):
+                with span("response.render"):
+                    lines.extend(m3u_parser.format_channel(ch) for ch in chunk)
+            return "".join(lines).encode("utf-8")
+        
+        # A version per refresh, so repeat downloads skip rendering as well as compression
+        etag = content_etag(f"{owner_id}/{playlist_id}/{playlist['last_updated']}".encode("utf-8"))
+        return await compressed_bodies.respond(
+            request.headers, ("export", owner_id, playlist_id), etag, render, "audio/x-mpegurl",
+            {"Cache-Control": "no-cache", "Content-Disposition": attachment_disposition(playlist["name"], ".m3u")}
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error exporting playlist: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{playlist_id}/probe")
+async def probe_playlist(playlist_id: str, owner_id: str = Depends(get_owner_id)):
+    """Check every stream of a playlist and refresh cached HLS variants"""
+    try:
+        if stream_probe is None:
+            raise HTTPException(status_code=501, detail="Sondeo de streams no disponible en este servidor")
+        
+        urls = await library.channel_urls(owner_id, playlist_id)
+        
+        if urls is None:
+            raise HTTPException(status_code=404, detail="Playlist no encontrada")
+        
+        results = await stream_probe.probe_urls(library.db.stream_probes, urls)
+        
+        return {
+            "probed": len(results),
+            "online": sum(1 for r in results if r["online"]),
+            "with_variants": sum(1 for r in results if r["variants"])
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error probing playlist: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.delete("/{playlist_id}")
-async def delete_playlist(playlist_id: str):
+async def delete_playlist(playlist_id: str, owner_id: str = Depends(get_owner_id)):
     """Delete a playlist"""
     try:
         # Find playlist
-        playlist = await db.playlists.find_one({"id": playlist_id})
+        playlist = await library.get_playlist(owner_id, playlist_id)
         
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist no encontrada")
@@ -262,11 +655,13 @@ async def delete_playlist(playlist_id: str):
             os.remove(playlist["file_path"])
         
         # Delete from database
-        result = await db.playlists.delete_one({"id": playlist_id})
-        
-        if result.deleted_count == 0:
+        if not await library.delete_playlist(owner_id, playlist_id):
             raise HTTPException(status_code=404, detail="Playlist no encontrada")
         
+        await record_channel_changes(owner_id, playlist_id, change_entry(deleted=True))
+        update_channel_table(owner_id, playlist_id)
+        await update_channel_clusters(playlist_id, owner_id)
+        
         return {"message": "Playlist eliminada exitosamente"}
         
     except HTTPException:
@@ -276,11 +671,15 @@ async def delete_playlist(playlist_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/{playlist_id}/refresh", response_model=PlaylistResponse)
-async def refresh_playlist(playlist_id: str):
+async def refresh_playlist(
+    playlist_id: str,
+    background_tasks: BackgroundTasks,
+    owner_id: str = Depends(get_owner_id)
+):
     """Refresh playlist from URL (only for URL-based playlists)"""
     try:
         # Find playlist
-        playlist = await db.playlists.find_one({"id": playlist_id})
+        playlist = await library.get_playlist(owner_id, playlist_id)
         
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist no encontrada")
@@ -291,20 +690,26 @@ async def refresh_playlist(playlist_id: str):
                 detail="Solo se pueden actualizar playlists basadas en URL"
             )
         
-        # Parse updated content
-        channels = m3u_parser.parse_from_url(playlist["url"])
+        # Parse updated content, with the rules the playlist was added with
+        channels = await playlist_fetcher.parse_from_url(playlist["url"], ingest_rules(playlist.get("ingest_rules")))
+        
+        # Channels still in the playlist keep their ids, so only real changes are synced;
+        # diffed against the primary, since a lagging copy would record stale changes
+        with span("storage.fetch"):
+            stored = [ch async for chunk in library.primary.channel_chunks(owner_id, playlist_id, None, None, STREAM_CHUNK_SIZE)
+                      for ch in chunk]
+        channels, upserted, removed = diff_channels(stored, channels)
         
         # Update playlist
-        update_data = {
-            "channels": [ch.dict() for ch in channels],
-            "channel_count": len(channels),
-            "last_updated": datetime.utcnow()
-        }
+        last_updated = datetime.utcnow()
         
-        await db.playlists.update_one(
-            {"id": playlist_id},
-            {"$set": update_data}
-        )
+        with span("storage.write"):
+            await library.update_channels(owner_id, playlist_id, channels, last_updated)
+            await record_channel_changes(owner_id, playlist_id, change_entry(upserted, removed))
+            update_channel_table(owner_id, playlist_id, channels, last_updated)
+            await update_channel_clusters(playlist_id, owner_id, channels)
+            await register_channel_logos(channels)
+        background_tasks.add_task(probe_channel_streams, channels, PROBE_ON_INGEST_LIMIT)
         
         logger.info(f"Refreshed playlist {playlist['name']} with {len(channels)} channels")
         
@@ -312,13 +717,16 @@ async def refresh_playlist(playlist_id: str):
             id=playlist["id"],
             name=playlist["name"],
             url=playlist["url"],
+            ingest_rules=playlist.get("ingest_rules") or [],
             channel_count=len(channels),
             created_at=playlist["created_at"],
-            last_updated=update_data["last_updated"]
+            last_updated=last_updated
         )
         
     except HTTPException:
         raise
+    except AllExcludedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error refreshing playlist: {e}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, HTTPException, Response, Depends
+from services.hls_proxy import HLSProxy, PLAYLIST_CONTENT_TYPE
+from routes.playlist import library, STREAM_ALLOW_PRIVATE_SOURCES
+from tenancy import get_owner_id
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/stream", tags=["stream"])
+
+HLS_PROXY_SECRET = os.environ.get('HLS_PROXY_SECRET')
+if not HLS_PROXY_SECRET:
+    logger.warning("HLS_PROXY_SECRET not set, proxy URLs are only valid on this worker")
+
+# Initialize HLS proxy
+hls_proxy = HLSProxy(
+    secret=(HLS_PROXY_SECRET or os.urandom(32).hex()).encode('utf-8'),
+    segment_cache_bytes=int(os.environ.get('HLS_SEGMENT_CACHE_BYTES', 256 * 1024 * 1024)),
+    allow_private=STREAM_ALLOW_PRIVATE_SOURCES
+)
+
+async def _channel_url(channel_id: str, owner_id: str) -> str:
+    """Resolve a playlist channel id or a merged channel id to its stream URL"""
+    url = await library.channel_url(owner_id, channel_id)
+    if not url:
+        raise HTTPException(status_code=404, detail="Canal no encontrado")
+    return url
+
+async def _manifest_response(url: str) -> Response:
+    try:
+        manifest = await hls_proxy.get_manifest(url)
+    except Exception as e:
+        logger.error(f"Error proxying manifest {url}: {e}")
+        raise HTTPException(status_code=502, detail="Error al obtener el stream")
+
+    return Response(
+        content=manifest,
+        media_type=PLAYLIST_CONTENT_TYPE,
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@router.get("/{channel_id}/index.m3u8")
+async def get_channel_manifest(channel_id: str, owner_id: str = Depends(get_owner_id)):
+    """Proxied entry playlist for a channel"""
+    url = await _channel_url(channel_id, owner_id)
+    if '.m3u8' not in url.lower():
+        raise HTTPException(status_code=400, detail="El canal no es un stream HLS")
+    return await _manifest_response(url)
+
+@router.get("/m/{token}.m3u8")
+async def get_proxied_manifest(token: str):
+    """Variant or rendition playlist referenced by a proxied manifest"""
+    url = hls_proxy.unsign(token)
+    if not url:
+        raise HTTPException(status_code=403, detail="URL de stream inválida")
+    return await _manifest_response(url)
+
+@router.get("/s/{token}")
+async def get_proxied_segment(token: str):
+    """Media segment, key or init section referenced by a proxied manifest"""
+    url = hls_proxy.unsign(token)
+    if not url:
+        raise HTTPException(status_code=403, detail="URL de stream inválida")
+
+    try:
+        body, content_type = await hls_proxy.get_segment(url)
+    except Exception as e:
+        logger.error(f"Error proxying segment {url}: {e}")
+        raise HTTPException(status_code=502, detail="Error al obtener el segmento")
+
+    # Segment URIs are immutable for the lifetime of a live window
+    return Response(
+        content=body,
+        media_type=content_type,
+        headers={"Cache-Control": "public, max-age=60"}
+    )
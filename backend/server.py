@@ -1,74 +1,24 @@
 from fastapi import FastAPI, APIRouter
-from fastapi.staticfiles import StaticFiles
-from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import sys
+import asyncio
 import logging
 from pathlib import Path
 
-# Import routes
-import sys
-import os
-# Add the current directory to the path so Python can find the modules
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from routes.playlist import router as playlist_router
-
 ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'iptv_db')]
-
-# Create the main app without a prefix
-app = FastAPI(title="IPTV Player API", version="1.0.0")
-
-# Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
-
-# Basic health check
-@api_router.get("/")
-async def root():
-    return {"message": "IPTV Player API is running", "status": "ok"}
-
-@api_router.get("/health")
-async def health_check():
-    try:
-        # Test database connection
-        await db.command("ping")
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "message": "IPTV Player API is working correctly"
-        }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "database": "disconnected",
-            "error": str(e)
-        }
-
-# Include playlist routes
-api_router.include_router(playlist_router)
-
-# Include the router in the main app
-app.include_router(api_router)
-
-# Create uploads directory if it doesn't exist
-os.makedirs("/app/uploads", exist_ok=True)
-
-# Serve uploaded files
-app.mount("/uploads", StaticFiles(directory="/app/uploads"), name="uploads")
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+
+# Let the backend modules import each other when the app is loaded from elsewhere
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from storage import STORAGE_BACKEND
+from routes.playlist import router as playlist_router, library, channel_tables, compressed_bodies
+from routes.changes import router as changes_router
+from routes.metrics import router as metrics_router
+from services.metrics import MetricsMiddleware
+from services.compression import CompressionMiddleware, CompressedStaticFiles
 
 # Configure logging
 logging.basicConfig(
@@ -77,12 +27,146 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("startup")
-async def startup_db_client():
-    logger.info("Starting IPTV Player API")
-    logger.info("Connected to MongoDB")
+# Guide data and logo sources live in Mongo; embedded storage runs without them
+MONGO_ENABLED = STORAGE_BACKEND == "mongo"
+
+def _flag(name: str) -> bool:
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes')
+
+async def bootstrap_database():
+    """Ensure indexes first so the backfills below don't run on collection scans"""
+    from database import get_client, db, DB_NAME
+
+    # Importing the driver and resolving the server happen off the event loop
+    client = await run_in_threadpool(get_client)
+
+    from indexes import ensure_indexes, shard_collections
+    from routes.logos import ensure_logo_sources
+
+    await library.ensure_owner_ids()
+    if _flag('MONGO_SHARD_COLLECTIONS'):
+        await shard_collections(client, DB_NAME)
+    await ensure_indexes(db)
+    await library.ensure_channel_clusters()
+    await ensure_logo_sources()
+
+def create_app() -> FastAPI:
+    """Build the API. Optional features and the Mongo driver are only imported when
+    enabled, and no connection is opened until the startup task or first request.
+
+    ``uvicorn --factory server:create_app`` builds a fresh app per worker.
+    """
+    # Create the main app without a prefix
+    app = FastAPI(title="IPTV Player API", version="1.0.0")
+
+    # Create a router with the /api prefix
+    api_router = APIRouter(prefix="/api")
+
+    # Basic health check
+    @api_router.get("/")
+    async def root():
+        return {"message": "IPTV Player API is running", "status": "ok"}
+
+    @api_router.get("/health")
+    async def health_check():
+        try:
+            # Test database connection
+            await library.ping()
+            health = {
+                "status": "healthy",
+                "database": "connected",
+                "storage": library.name,
+                "message": "IPTV Player API is working correctly"
+            }
+            if MONGO_ENABLED:
+                from database import pool_stats, pool_settings
+                from indexes import index_state
+                health["indexes"] = index_state
+                health["pool"] = {"settings": pool_settings(), "servers": pool_stats()}
+            return health
+        except Exception as e:
+            return {
+                "status": "unhealthy",
+                "database": "disconnected",
+                "error": str(e)
+            }
+
+    # Include playlist routes
+    api_router.include_router(playlist_router)
+    api_router.include_router(changes_router)
+    if MONGO_ENABLED:
+        from routes.epg import router as epg_router
+        from routes.logos import router as logos_router
+        api_router.include_router(epg_router)
+        api_router.include_router(logos_router)
+
+    # Optional restreaming proxy, shares upstream HLS fetches between viewers
+    if _flag('HLS_PROXY_ENABLED'):
+        from routes.stream import router as stream_router
+        api_router.include_router(stream_router)
+
+    # Opt-in profiling for admins; when disabled neither the routes nor the middleware exist
+    profiling_enabled = _flag('PROFILING_ENABLED')
+    if profiling_enabled:
+        from routes.admin import router as admin_router
+        api_router.include_router(admin_router)
+
+    # Include the router in the main app
+    app.include_router(api_router)
+
+    # Prometheus scrapes the backend directly, outside the /api prefix
+    app.include_router(metrics_router)
+
+    # Create uploads directory if it doesn't exist
+    os.makedirs("/app/uploads", exist_ok=True)
+
+    # Serve uploaded files, each version compressed once
+    app.mount("/uploads", CompressedStaticFiles(directory="/app/uploads", cache=compressed_bodies), name="uploads")
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # gzip/brotli above a size threshold; cached bodies arrive already encoded and pass through
+    app.add_middleware(CompressionMiddleware)
+
+    if profiling_enabled:
+        from routes.admin import profile_store, is_admin
+        from services.profiler import ProfilingMiddleware
+        app.add_middleware(ProfilingMiddleware, store=profile_store, is_admin=is_admin)
+
+    # Outermost, so latency includes CORS handling and in-flight counts every request
+    app.add_middleware(MetricsMiddleware)
+
+    @app.on_event("startup")
+    async def startup_db_client():
+        logger.info(f"Starting IPTV Player API with {library.name} storage")
+        if MONGO_ENABLED:
+            # Serving starts right away; the driver warms up in the background
+            asyncio.create_task(bootstrap_database())
+        # In-memory channel tables follow playlist changes made by other workers and replicas
+        if channel_tables is not None:
+            from services.library_watcher import LibraryWatcher
+            app.state.library_watcher = LibraryWatcher(library)
+            app.state.library_watcher.add_listener(channel_tables.library_changed)
+            app.state.library_watcher.start()
+
+    @app.on_event("shutdown")
+    async def shutdown_db_client():
+        if getattr(app.state, "library_watcher", None) is not None:
+            await app.state.library_watcher.stop()
+        if channel_tables is not None:
+            await channel_tables.save_snapshots()
+        library.close()
+        if MONGO_ENABLED:
+            from database import close_client
+            close_client()
+        logger.info("Closed playlist storage")
+
+    return app
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
-    logger.info("Disconnected from MongoDB")
\ No newline at end of file
+app = create_app()
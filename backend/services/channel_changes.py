@@ -0,0 +1,129 @@
+"""Library revisions and the channel change log behind delta sync.
+
+Every playlist write is logged under the owner's next library revision,
+after the write itself, so a revision's channels are stored by the time the
+revision is visible. An entry names the playlist and either the channel ids
+it upserted and removed, or that the playlist was replaced wholesale
+(inserted, or refreshed with too many changes to list) or deleted.
+
+Clients replay the entries after the revision they hold. Channel contents
+are read when answering, so several changes to a channel collapse into its
+current state.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from models.playlist import Channel
+from storage.base import CHANNEL_RESPONSE_FIELDS
+
+# Revisions kept in each owner's log; older clients fall back to a full resync
+CHANGE_LOG_RETENTION = int(os.environ.get('CHANGE_LOG_RETENTION', 1000))
+
+# The log is trimmed every this many revisions
+CHANGE_LOG_COMPACT_EVERY = int(os.environ.get('CHANGE_LOG_COMPACT_EVERY', 100))
+
+# Channel ids listed per refresh before it is logged as a replacement instead
+MAX_LOGGED_IDS = int(os.environ.get('CHANGE_LOG_MAX_IDS', 10000))
+
+# A missing revision older than this was abandoned by its writer, not still being written
+CHANGE_SETTLE_SECONDS = float(os.environ.get('CHANGE_LOG_SETTLE_SECONDS', 30))
+
+def channel_identity(channel: dict) -> Tuple[str, str]:
+    """What makes a refreshed channel the same channel: its name and stream"""
+    return channel["name"], channel["url"]
+
+def diff_channels(old: List[dict], new: List[Channel]) -> Tuple[List[Channel], List[str], List[str]]:
+    """Match a refreshed playlist against its stored channels.
+
+    Channels that are still there keep their stored id, so clients only see
+    what actually changed. Returns the new channels, the ids upserted (added
+    or with changed fields) and the ids removed.
+    """
+    stored: Dict[Tuple[str, str], List[dict]] = {}
+    for channel in old:
+        stored.setdefault(channel_identity(channel), []).append(channel)
+    for matches in stored.values():
+        matches.reverse()
+
+    channels, upserted = [], []
+    for channel in new:
+        matches = stored.get((channel.name, channel.url))
+        if not matches:
+            channels.append(channel)
+            upserted.append(channel.id)
+            continue
+        previous = matches.pop()
+        channel = channel.model_copy(update={"id": previous["id"]})
+        channels.append(channel)
+        if any(getattr(channel, field) != previous.get(field) for field in CHANNEL_RESPONSE_FIELDS):
+            upserted.append(channel.id)
+
+    removed = [channel["id"] for matches in stored.values() for channel in matches]
+    return channels, upserted, removed
+
+def change_entry(upserted: Iterable[str] = (), removed: Iterable[str] = (), replaced: bool = False,
+                 deleted: bool = False) -> dict:
+    """Log fields of one playlist change; long id lists become a replacement"""
+    upserted, removed = list(upserted), list(removed)
+    if len(upserted) + len(removed) > MAX_LOGGED_IDS:
+        replaced, upserted, removed = True, [], []
+    return {"replaced": replaced, "deleted": deleted, "upserted": upserted, "removed": removed}
+
+class ChannelDelta:
+    """Log entries after a client's revision, collapsed into what it has to apply"""
+
+    def __init__(self, since: int):
+        self.revision = since
+        self.deleted_playlists: Set[str] = set()
+        self.replaced_playlists: Set[str] = set()
+        self.deleted: Dict[str, str] = {}
+        self.upserted: Dict[str, Set[str]] = {}
+
+    @classmethod
+    def from_entries(cls, since: int, entries: Iterable[dict], now: Optional[datetime] = None) -> "ChannelDelta":
+        """Replay entries in revision order, stopping at a revision that may still be written.
+
+        Writers take revisions from a counter and log them afterwards, so a
+        later revision can be logged first; the delta ends before the gap and
+        the client picks the rest up next time.
+        """
+        settled = (now or datetime.utcnow()) - timedelta(seconds=CHANGE_SETTLE_SECONDS)
+        delta = cls(since)
+        for entry in entries:
+            if entry["revision"] != delta.revision + 1 and entry["created_at"] > settled:
+                break
+            delta.apply(entry)
+        return delta
+
+    def apply(self, entry: dict):
+        self.revision = entry["revision"]
+        playlist_id = entry["playlist_id"]
+
+        if entry["deleted"] or entry["replaced"]:
+            # The playlist's channels are dropped (and re-sent if replaced) as a whole
+            self.deleted = {id: p for id, p in self.deleted.items() if p != playlist_id}
+            self.upserted.pop(playlist_id, None)
+            if entry["deleted"]:
+                self.deleted_playlists.add(playlist_id)
+                self.replaced_playlists.discard(playlist_id)
+            else:
+                self.replaced_playlists.add(playlist_id)
+            return
+
+        if playlist_id in self.replaced_playlists:
+            return
+        upserted = self.upserted.setdefault(playlist_id, set())
+        for channel_id in entry["removed"]:
+            upserted.discard(channel_id)
+            self.deleted[channel_id] = playlist_id
+        for channel_id in entry["upserted"]:
+            self.deleted.pop(channel_id, None)
+            upserted.add(channel_id)
+
+    def playlists_to_read(self) -> Dict[str, Optional[Set[str]]]:
+        """Playlists whose current channels are sent: all of them (None) or only some ids"""
+        playlists: Dict[str, Optional[Set[str]]] = {playlist_id: None for playlist_id in self.replaced_playlists}
+        for playlist_id, ids in self.upserted.items():
+            if ids and playlist_id not in self.deleted_playlists:
+                playlists[playlist_id] = ids
+        return playlists
@@ -0,0 +1,243 @@
+import re
+import uuid
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from models.playlist import Channel, DEFAULT_OWNER_ID
+from services.epg_parser import normalize_tvg_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of keys sent in a single $in lookup
+KEY_LOOKUP_CHUNK = 5000
+
+class ChannelDeduplicator:
+    """Cluster the same channel across playlists by tvg-id, name and stream URL.
+
+    Channels with different tvg-ids stay apart even when they share a name
+    or URL, so the HD and SD feeds of "BBC One" are not merged.
+
+    Clusters are stored in their own collection and maintained incrementally:
+    ingesting a playlist only loads the clusters sharing a key with its
+    channels. Removing a playlist drops its streams but never splits a
+    cluster, which a full rebuild fixes.
+    """
+
+    def __init__(self, min_name_length: int = 3):
+        self.min_name_length = min_name_length
+        self.quality_regex = re.compile(
+            r'\b(hd|fhd|uhd|sd|4k|720p|1080p|2160p|hevc|h265|backup)\b'
+        )
+        self.bracket_regex = re.compile(r'[\[\(][^\]\)]*[\]\)]')
+        self.non_alnum_regex = re.compile(r'[^a-z0-9]+')
+
+    def normalize_name(self, name: Optional[str]) -> str:
+        """Reduce a display name to its comparable core ("ESPN HD [US]" -> "espn")"""
+        if not name:
+            return ""
+        name = unicodedata.normalize('NFKD', name)
+        name = ''.join(c for c in name if not unicodedata.combining(c)).casefold()
+        name = self.bracket_regex.sub(' ', name)
+        name = self.quality_regex.sub(' ', name)
+        return self.non_alnum_regex.sub('', name)
+
+    def normalize_url(self, url: Optional[str]) -> str:
+        """Normalize stream URL (scheme/host case, default ports, trailing slash)"""
+        if not url:
+            return ""
+        try:
+            parts = urlsplit(url.strip())
+        except ValueError:
+            return url.strip()
+
+        host = (parts.hostname or '').lower()
+        default_port = {'http': 80, 'https': 443}.get(parts.scheme.lower())
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if port and port != default_port:
+            host = f"{host}:{port}"
+
+        path = parts.path.rstrip('/') or '/'
+        query = f"?{parts.query}" if parts.query else ''
+        return f"{host}{path}{query}"
+
+    def channel_keys(self, channel: Channel) -> List[str]:
+        """Keys under which two channels are considered the same"""
+        keys = []
+        tvg_id = normalize_tvg_id(channel.tvg_id)
+        if tvg_id:
+            keys.append(f"tvg:{tvg_id}")
+        name = self.normalize_name(channel.tvg_name or channel.name)
+        if len(name) >= self.min_name_length:
+            keys.append(f"name:{name}")
+        url = self.normalize_url(channel.url)
+        if url:
+            keys.append(f"url:{url}")
+        return keys
+
+    def merge(
+        self,
+        clusters: List[dict],
+        channels: List[Channel],
+        playlist_id: str
+    ) -> Tuple[List[dict], List[str]]:
+        """Merge new channels into existing clusters.
+
+        Returns the clusters to upsert and the ids of clusters absorbed into others.
+        """
+        streams = [
+            {
+                "channel_id": ch.id,
+                "playlist_id": playlist_id,
+                "url": ch.url,
+                "keys": self.channel_keys(ch),
+                "channel": ch,
+            }
+            for ch in channels
+        ]
+        nodes = [c["keys"] for c in clusters] + [s["keys"] for s in streams]
+
+        parent = list(range(len(nodes)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        # tvg-ids of each root: a shared name or URL never joins channels with different ones
+        tvg_ids = [{key for key in keys if key.startswith("tvg:")} for keys in nodes]
+
+        owner = {}
+        for i, keys in enumerate(nodes):
+            for key in keys:
+                if key not in owner:
+                    owner[key] = i
+                    continue
+                root_a, root_b = find(i), find(owner[key])
+                if root_a == root_b:
+                    continue
+                if not key.startswith("tvg:") and tvg_ids[root_a] and tvg_ids[root_b] \
+                        and not tvg_ids[root_a] & tvg_ids[root_b]:
+                    continue
+                # Keep existing clusters as roots so their ids survive
+                root, child = min(root_a, root_b), max(root_a, root_b)
+                parent[child] = root
+                tvg_ids[root] |= tvg_ids[child]
+
+        groups: Dict[int, List[int]] = defaultdict(list)
+        for i in range(len(nodes)):
+            groups[find(i)].append(i)
+
+        upserts, absorbed = [], []
+        for members in groups.values():
+            existing = [clusters[i] for i in members if i < len(clusters)]
+            new_streams = [streams[i - len(clusters)] for i in members if i >= len(clusters)]
+
+            if existing:
+                cluster = existing[0]
+                for other in existing[1:]:
+                    cluster["streams"].extend(other["streams"])
+                    absorbed.append(other["id"])
+                if not new_streams and len(existing) == 1:
+                    continue
+            else:
+                cluster = self._new_cluster(new_streams[0]["channel"])
+
+            for stream in new_streams:
+                channel = stream.pop("channel")
+                if not cluster.get("logo") and channel.logo:
+                    cluster["logo"] = channel.logo
+                cluster["streams"].append(stream)
+
+            cluster["keys"] = sorted({key for s in cluster["streams"] for key in s["keys"]})
+            upserts.append(cluster)
+
+        return upserts, absorbed
+
+    def _new_cluster(self, channel: Channel) -> dict:
+        return {
+            "id": str(uuid.uuid4()),
+            "name": channel.name,
+            "logo": channel.logo,
+            "category": channel.category,
+            "group_title": channel.group_title,
+            "tvg_id": channel.tvg_id,
+            "keys": [],
+            "streams": [],
+        }
+
+    async def add_playlist(self, collection, playlist_id: str, channels: List[Channel],
+                           owner_id: str = DEFAULT_OWNER_ID) -> int:
+        """Incrementally cluster the channels of a newly ingested playlist.
+
+        Clusters never span owners: each user's library is deduplicated on its own.
+        """
+        if not channels:
+            return 0
+
+        keys = list({key for ch in channels for key in self.channel_keys(ch)})
+        clusters = {}
+        for i in range(0, len(keys), KEY_LOOKUP_CHUNK):
+            async for cluster in collection.find(
+                {"owner_id": owner_id, "keys": {"$in": keys[i:i + KEY_LOOKUP_CHUNK]}}, {"_id": 0}
+            ):
+                clusters[cluster["id"]] = cluster
+
+        upserts, absorbed = self.merge(list(clusters.values()), channels, playlist_id)
+
+        # Imported here so the embedded storage backend, which only uses merge(), never loads the driver
+        from pymongo import ReplaceOne
+        if upserts:
+            await collection.bulk_write(
+                [
+                    ReplaceOne({"owner_id": owner_id, "id": c["id"]}, dict(c, owner_id=owner_id), upsert=True)
+                    for c in upserts
+                ],
+                ordered=False
+            )
+        if absorbed:
+            await collection.delete_many({"owner_id": owner_id, "id": {"$in": absorbed}})
+
+        logger.info(f"Clustered {len(channels)} channels of playlist {playlist_id}")
+        return len(upserts)
+
+    async def remove_playlist(self, collection, playlist_id: str, owner_id: str = DEFAULT_OWNER_ID):
+        """Drop the streams of a playlist and any cluster left empty"""
+        from pymongo import ReplaceOne
+        operations = []
+        async for cluster in collection.find(
+            {"owner_id": owner_id, "streams.playlist_id": playlist_id}, {"_id": 0}
+        ):
+            cluster["streams"] = [s for s in cluster["streams"] if s["playlist_id"] != playlist_id]
+            cluster["keys"] = sorted({key for s in cluster["streams"] for key in s["keys"]})
+            operations.append(ReplaceOne({"owner_id": owner_id, "id": cluster["id"]}, cluster))
+
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+        await collection.delete_many({"owner_id": owner_id, "streams": {"$size": 0}})
+
+    async def rebuild(self, collection, playlists) -> int:
+        """Recompute every cluster from a cursor of playlist documents"""
+        await collection.delete_many({})
+        count = 0
+        async for playlist in playlists:
+            channels = [Channel(**ch) for ch in playlist.get("channels", [])]
+            count += await self.add_playlist(
+                collection, playlist["id"], channels, playlist.get("owner_id", DEFAULT_OWNER_ID)
+            )
+        return count
+
+    def alternate_urls(self, cluster: dict) -> List[str]:
+        """Distinct stream URLs of a cluster, primary first"""
+        seen, urls = set(), []
+        for stream in cluster["streams"]:
+            key = self.normalize_url(stream["url"])
+            if key not in seen:
+                seen.add(key)
+                urls.append(stream["url"])
+        return urls
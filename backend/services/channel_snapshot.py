@@ -0,0 +1,207 @@
+"""On-disk snapshots of channel tables.
+
+A snapshot is a directory holding every table column as a ``.npy`` array or
+a raw UTF-8 buffer, plus a JSON manifest with the dictionaries, playlist
+segments and the version (``last_updated``) of each playlist's channels.
+Workers memory-map it, so a restarted worker serves listings right away and
+all workers on a host share the same pages through the page cache; only
+playlists whose version changed since the snapshot are read from the library.
+
+Each owner has a directory of versioned snapshots and a ``CURRENT`` file
+naming the newest, replaced atomically. Snapshots are only appended to
+memory once loaded, never written back in place.
+"""
+import asyncio
+import fcntl
+import json
+import mmap
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Optional
+import numpy as np
+from services.channel_table import ChannelTable, Dictionary, GrowableArray, StringColumn
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the layout changes; older snapshots are ignored and rebuilt
+FORMAT_VERSION = 1
+
+STRING_COLUMNS = ("ids", "names", "search_names", "urls", "logos")
+ARRAY_COLUMNS = ("playlist_codes", "category_codes", "group_title_codes", "is_live", "ranks")
+DICTIONARIES = ("playlists", "categories", "group_titles")
+
+# Bytes copied out of a growing buffer per write, so appends are never blocked
+WRITE_CHUNK = 16 * 1024 * 1024
+
+def capture(table: ChannelTable) -> dict:
+    """Everything a snapshot needs, taken on the event loop.
+
+    Columns are append-only, so views of the rows written so far stay valid
+    while the table keeps changing; the few fields written in place are copied.
+    """
+    state = {
+        "rows": table.live.size,
+        "live": table.live.array.copy(),
+        "ranks": table.ranks.array.copy(),
+        "strings": {},
+        "arrays": {name: getattr(table, name).array for name in ARRAY_COLUMNS if name != "ranks"},
+        "manifest": {
+            "format": FORMAT_VERSION,
+            "created_at": datetime.utcnow().isoformat(),
+            "rows": table.live.size,
+            "dead": table.dead,
+            "ordered": table.ordered,
+            "next_rank": table._next_rank,
+            "last_rank": table._last_rank,
+            "segments": [[code, first, last] for code, (first, last) in table.segments.items()],
+            "versions": dict(table.versions),
+            "dictionaries": {name: list(getattr(table, name).values) for name in DICTIONARIES},
+        },
+    }
+    for name in STRING_COLUMNS:
+        column = getattr(table, name)
+        state["strings"][name] = (
+            column.base, column.data, len(column.data), column.ends.array,
+            column.nulls.array if column.nulls is not None else None
+        )
+    return state
+
+def _map(path: str):
+    """Read-only mapping of a file, or empty bytes for an empty one"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+class ChannelSnapshots:
+    """Snapshot files of each owner's channel table under one directory"""
+
+    capture = staticmethod(capture)
+
+    def __init__(self, directory: str, keep: int = 2, lock_timeout: float = 300.0):
+        self.directory = directory
+        self.keep = keep
+        self.lock_timeout = lock_timeout
+
+    def owner_directory(self, owner_id: str) -> str:
+        # Owner ids may contain dots and colons, hex keeps them a plain file name
+        return os.path.join(self.directory, owner_id.encode("utf-8").hex())
+
+    async def lock(self, owner_id: str) -> Optional[int]:
+        """Wait for the owner's file lock, held by whichever worker is rebuilding its snapshot.
+
+        Returns the locked descriptor for ``unlock``, or None if waiting timed out.
+        """
+        directory = self.owner_directory(owner_id)
+        os.makedirs(directory, exist_ok=True)
+        fd = os.open(os.path.join(directory, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                if time.monotonic() > deadline:
+                    os.close(fd)
+                    logger.warning(f"Timed out waiting for the channel snapshot lock of {owner_id}")
+                    return None
+                await asyncio.sleep(0.1)
+
+    def unlock(self, fd: Optional[int]):
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def load(self, owner_id: str) -> Optional[ChannelTable]:
+        """The owner's newest snapshot, memory-mapped, or None if there is no usable one"""
+        directory = self.owner_directory(owner_id)
+        try:
+            with open(os.path.join(directory, "CURRENT")) as f:
+                path = os.path.join(directory, f.read().strip())
+        except FileNotFoundError:
+            return None
+
+        try:
+            with open(os.path.join(path, "manifest.json")) as f:
+                manifest = json.load(f)
+            if manifest.get("format") != FORMAT_VERSION:
+                logger.info(f"Ignoring channel snapshot {path} in format {manifest.get('format')}")
+                return None
+            return self._open(path, manifest)
+        except Exception as e:
+            logger.error(f"Error loading channel snapshot {path}: {e}")
+            return None
+
+    def _open(self, path: str, manifest: dict) -> ChannelTable:
+        dictionaries = {name: Dictionary.from_values(values) for name, values in manifest["dictionaries"].items()}
+        table = ChannelTable(dictionaries["playlists"], dictionaries["categories"], dictionaries["group_titles"])
+        rows = manifest["rows"]
+
+        for name in STRING_COLUMNS:
+            nullable = getattr(table, name).nulls is not None
+            column = StringColumn(
+                nullable,
+                base=_map(os.path.join(path, f"{name}.bin")),
+                ends=np.load(os.path.join(path, f"{name}.ends.npy"), mmap_mode="r"),
+                nulls=np.load(os.path.join(path, f"{name}.nulls.npy"), mmap_mode="r") if nullable else None,
+            )
+            if column.ends.size != rows:
+                raise ValueError(f"{name} has {column.ends.size} rows, expected {rows}")
+            setattr(table, name, column)
+        for name in ARRAY_COLUMNS:
+            # Copy on write: the few in-place updates stay private to this worker
+            array = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="c")
+            setattr(table, name, GrowableArray.wrap(array))
+        table.live = GrowableArray.wrap(np.load(os.path.join(path, "live.npy")))
+
+        table.segments = {code: (first, last) for code, first, last in manifest["segments"]}
+        table.versions = manifest["versions"]
+        table.dead = manifest["dead"]
+        table.ordered = manifest["ordered"]
+        table._next_rank = manifest["next_rank"]
+        table._last_rank = manifest["last_rank"]
+        return table
+
+    def save(self, owner_id: str, state: dict) -> str:
+        """Write a captured table as the owner's newest snapshot; runs off the event loop"""
+        directory = self.owner_directory(owner_id)
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.time_ns()}-{os.getpid()}"
+        path = os.path.join(directory, name)
+        staging = path + ".tmp"
+        os.makedirs(staging)
+
+        for column, (base, data, size, ends, nulls) in state["strings"].items():
+            with open(os.path.join(staging, f"{column}.bin"), "wb") as f:
+                f.write(base)
+                for start in range(0, size, WRITE_CHUNK):
+                    f.write(data[start:min(start + WRITE_CHUNK, size)])
+            np.save(os.path.join(staging, f"{column}.ends.npy"), ends)
+            if nulls is not None:
+                np.save(os.path.join(staging, f"{column}.nulls.npy"), nulls)
+        for column, array in state["arrays"].items():
+            np.save(os.path.join(staging, f"{column}.npy"), array)
+        np.save(os.path.join(staging, "ranks.npy"), state["ranks"])
+        np.save(os.path.join(staging, "live.npy"), state["live"])
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump(state["manifest"], f)
+
+        os.rename(staging, path)
+        pointer = os.path.join(directory, f"CURRENT.{os.getpid()}")
+        with open(pointer, "w") as f:
+            f.write(name)
+        os.replace(pointer, os.path.join(directory, "CURRENT"))
+        self._prune(directory)
+        return path
+
+    def _prune(self, directory: str):
+        """Drop all but the newest snapshots; workers still mapping old files keep them until unmapped"""
+        snapshots = sorted(
+            (entry for entry in os.listdir(directory) if entry[0].isdigit() and not entry.endswith(".tmp")),
+            key=lambda entry: int(entry.split("-")[0])
+        )
+        for entry in snapshots[:-self.keep]:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
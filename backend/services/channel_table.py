@@ -0,0 +1,616 @@
+"""Columnar in-memory channel listings.
+
+A ``ChannelTable`` holds one owner's channels column by column: strings are
+packed as UTF-8 into one buffer per column with row offsets, playlists,
+categories and group titles are dictionary encoded to integer codes, and
+listing filters become NumPy boolean masks instead of per-request loops over
+channel objects. Playlist changes append rows and tombstone the old ones;
+once tombstones outnumber live rows the table is rebuilt compacted.
+
+Tables are append-only between compactions and compaction builds a new
+table, so a listing that is still streaming keeps reading a consistent one.
+"""
+import asyncio
+import sys
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from storage.base import CHANNEL_RESPONSE_FIELDS, LibraryStorage, matches_category, search_term
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Terminates every packed string, so a search never matches across two rows
+SEPARATOR = b"\x00"
+
+# Rows appended per batch while loading or ingesting
+APPEND_BATCH = 10000
+
+# Searches matching more than one row in this many scan the buffer with NumPy
+# instead of jumping from hit to hit
+DENSE_SEARCH_RATIO = 8
+
+# Tombstoned rows tolerated before compacting, on top of one per live row
+COMPACT_MIN_ROWS = 10000
+
+class GrowableArray:
+    """NumPy array with amortized appends; rows already written never move within a buffer"""
+
+    def __init__(self, dtype, capacity: int = 1024):
+        self._buffer = np.zeros(capacity, dtype=dtype)
+        self.size = 0
+
+    @classmethod
+    def wrap(cls, array: np.ndarray) -> "GrowableArray":
+        """Use an existing (possibly memory-mapped) array; the first append copies it"""
+        growable = cls.__new__(cls)
+        growable._buffer = array
+        growable.size = len(array)
+        return growable
+
+    @property
+    def array(self) -> np.ndarray:
+        return self._buffer[:self.size]
+
+    def extend(self, values):
+        end = self.size + len(values)
+        if end > len(self._buffer):
+            buffer = np.zeros(max(end, 2 * len(self._buffer), 1024), dtype=self._buffer.dtype)
+            buffer[:self.size] = self._buffer[:self.size]
+            self._buffer = buffer
+        self._buffer[self.size:end] = values
+        self.size = end
+
+    def nbytes(self) -> int:
+        return 0 if isinstance(self._buffer, np.memmap) else self._buffer.nbytes
+
+class StringColumn:
+    """Strings packed as NUL-terminated UTF-8, with each row's end offset.
+
+    Rows are stored in ``base``, a read-only buffer such as a memory-mapped
+    snapshot, followed by ``data``, which appends grow. A row never spans both.
+    """
+
+    def __init__(self, nullable: bool = False, base=b"", ends: Optional[np.ndarray] = None,
+                 nulls: Optional[np.ndarray] = None):
+        self.base = base
+        self.data = bytearray()
+        self.ends = GrowableArray(np.int64) if ends is None else GrowableArray.wrap(ends)
+        if not nullable:
+            self.nulls = None
+        else:
+            self.nulls = GrowableArray(np.bool_) if nulls is None else GrowableArray.wrap(nulls)
+
+    @property
+    def size(self) -> int:
+        return len(self.base) + len(self.data)
+
+    def _parts(self, start: int, stop: int):
+        """Buffers overlapping bytes start..stop-1, with the offset of their first byte and local bounds"""
+        base_size = len(self.base)
+        if start < base_size:
+            yield self.base, 0, start, min(stop, base_size)
+        if stop > base_size:
+            yield self.data, base_size, max(start - base_size, 0), stop - base_size
+
+    def extend(self, values: List[Optional[str]]):
+        if not values:
+            return
+        encoded = [value.replace("\x00", " ").encode("utf-8") if value else b"" for value in values]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        offset = self.size
+        self.data += SEPARATOR.join(encoded)
+        self.data += SEPARATOR
+        self.ends.extend(offset + np.cumsum(lengths + 1) - 1)
+        if self.nulls is not None:
+            self.nulls.extend(np.fromiter((value is None for value in values), dtype=np.bool_, count=len(values)))
+
+    def extend_from(self, other: "StringColumn", first: int, last: int):
+        """Append rows first..last-1 of another column"""
+        if last <= first:
+            return
+        ends = other.ends.array
+        start = int(ends[first - 1]) + 1 if first else 0
+        stop = int(ends[last - 1]) + 1
+        offset = self.size
+        for buffer, _, lo, hi in other._parts(start, stop):
+            self.data += buffer[lo:hi]
+        self.ends.extend(ends[first:last] - start + offset)
+        if self.nulls is not None:
+            self.nulls.extend(other.nulls.array[first:last])
+
+    def values(self, rows: np.ndarray) -> List[Optional[str]]:
+        ends = self.ends.array
+        starts = np.where(rows > 0, ends[rows - 1] + 1, 0).tolist()
+        base, data, base_size = self.base, self.data, len(self.base)
+        values = [
+            (base[start:end] if start < base_size else data[start - base_size:end - base_size]).decode("utf-8")
+            for start, end in zip(starts, ends[rows].tolist())
+        ]
+        if self.nulls is not None:
+            for i in np.flatnonzero(self.nulls.array[rows]).tolist():
+                values[i] = None
+        return values
+
+    def find_rows(self, needle: bytes, first: int, last: int) -> np.ndarray:
+        """Rows first..last-1 containing ``needle``, which must not contain the separator"""
+        ends = self.ends.array
+        start = int(ends[first - 1]) + 1 if first else 0
+        stop = int(ends[last - 1]) if last > first else start
+        if stop <= start:
+            return np.zeros(0, dtype=np.int64)
+
+        # find skips to the next hit in C; after a hit, resume at the next row.
+        # Once hits turn out to be dense, one vectorized scan is cheaper.
+        limit = (last - first) // DENSE_SEARCH_RATIO
+        positions = []
+        for buffer, offset, lo, hi in self._parts(start, stop):
+            position = buffer.find(needle, lo, hi)
+            while position != -1:
+                positions.append(position + offset)
+                if len(positions) > limit:
+                    return self._scan_rows(needle, start, stop, first, last)
+                position = buffer.find(SEPARATOR, position + len(needle), hi)
+                if position == -1:
+                    break
+                position = buffer.find(needle, position + 1, hi)
+        return np.searchsorted(ends, np.array(positions, dtype=np.int64), side="right")
+
+    def _scan_rows(self, needle: bytes, start: int, stop: int, first: int, last: int) -> np.ndarray:
+        """Find every offset at once: offsets holding the first byte, narrowed byte by byte"""
+        hits = np.zeros(stop - start, dtype=np.bool_)
+        for buffer, offset, lo, hi in self._parts(start, stop):
+            window = np.frombuffer(buffer, dtype=np.uint8)[lo:hi]
+            count = len(window) - len(needle) + 1
+            if count > 0:
+                offsets = np.flatnonzero(window[:count] == needle[0])
+                for i in range(1, len(needle)):
+                    offsets = offsets[window[offsets + i] == needle[i]]
+                hits[offsets + (offset + lo - start)] = True
+            # The view pins the buffer, which could not grow while it exists
+            del window
+
+        row_starts = np.empty(last - first, dtype=np.int64)
+        row_starts[0] = 0
+        row_starts[1:] = self.ends.array[first:last - 1] + 1 - start
+        # The last rows may be empty and start at the end of the range
+        row_starts = row_starts[row_starts < len(hits)]
+        return np.flatnonzero(np.logical_or.reduceat(hits, row_starts)) + first
+
+    def nbytes(self) -> int:
+        """Bytes held in memory; a memory-mapped base is shared through the page cache"""
+        nulls = self.nulls.nbytes() if self.nulls is not None else 0
+        base = len(self.base) if isinstance(self.base, bytes) else 0
+        return base + len(self.data) + self.ends.nbytes() + nulls
+
+class Dictionary:
+    """Interned values and their integer codes; None is code -1"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    @classmethod
+    def from_values(cls, values: List[str]) -> "Dictionary":
+        dictionary = cls()
+        for value in values:
+            dictionary.code(value)
+        return dictionary
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        return code
+
+    def encode(self, values: Iterable[Optional[str]]) -> np.ndarray:
+        codes = self.codes
+        return np.array(
+            [-1 if value is None else codes[value] if value in codes else self.code(value) for value in values],
+            dtype=np.int32
+        )
+
+    def decode(self, codes: np.ndarray) -> List[Optional[str]]:
+        values = self.values
+        return [values[code] if code >= 0 else None for code in codes.tolist()]
+
+class ChannelTable:
+    """One owner's channels in library order, filtered with vectorized masks"""
+
+    def __init__(self, playlists: Optional[Dictionary] = None, categories: Optional[Dictionary] = None,
+                 group_titles: Optional[Dictionary] = None):
+        # Dictionaries only grow, so a compacted table shares them
+        self.playlists = playlists or Dictionary()
+        self.categories = categories or Dictionary()
+        self.group_titles = group_titles or Dictionary()
+
+        self.ids = StringColumn()
+        self.names = StringColumn()
+        self.search_names = StringColumn()
+        self.urls = StringColumn()
+        self.logos = StringColumn(nullable=True)
+        self.playlist_codes = GrowableArray(np.int32)
+        self.category_codes = GrowableArray(np.int32)
+        self.group_title_codes = GrowableArray(np.int32)
+        self.is_live = GrowableArray(np.bool_)
+        self.live = GrowableArray(np.bool_)
+
+        # Playlist code -> its rows [first, last) and its position in library order
+        self.segments: Dict[int, tuple] = {}
+        self.ranks = GrowableArray(np.int64)
+        # Playlist id -> version (last_updated) of the channels held, None when unknown
+        self.versions: Dict[str, Optional[str]] = {}
+        self.dead = 0
+        # Whether row order is library order; false after a playlist is replaced in place
+        self.ordered = True
+        self._next_rank = 0
+        self._last_rank = -1
+
+    def __len__(self) -> int:
+        return self.live.size - self.dead
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self.dead > max(COMPACT_MIN_ROWS, len(self))
+
+    def add_playlist(self, playlist_id: str, channels: Iterable[dict], version: Optional[str] = None):
+        """Add a playlist, or replace its channels keeping its place in the library"""
+        self.remove_playlist(playlist_id)
+        self.versions[playlist_id] = version
+        code, first = self._begin(playlist_id)
+        channels = iter(channels)
+        while True:
+            batch = list(islice(channels, APPEND_BATCH))
+            if not batch:
+                break
+            self._append(code, batch)
+        self._end(code, first)
+
+    def remove_playlist(self, playlist_id: str):
+        self.versions.pop(playlist_id, None)
+        code = self.playlists.codes.get(playlist_id)
+        if code is None or code not in self.segments:
+            return
+        first, last = self.segments.pop(code)
+        self.live.array[first:last] = False
+        self.dead += last - first
+
+    def _begin(self, playlist_id: str):
+        code = self.playlists.code(playlist_id)
+        while self.ranks.size <= code:
+            self.ranks.extend(np.array([-1], dtype=np.int64))
+        if self.ranks.array[code] < 0:
+            self.ranks.array[code] = self._next_rank
+            self._next_rank += 1
+        rank = int(self.ranks.array[code])
+        if rank < self._last_rank:
+            self.ordered = False
+        self._last_rank = max(self._last_rank, rank)
+        return code, self.live.size
+
+    def _append(self, code: int, channels: List[dict]):
+        count = len(channels)
+        names = [ch["name"] for ch in channels]
+        self.ids.extend([ch["id"] for ch in channels])
+        self.names.extend(names)
+        self.search_names.extend([name.lower() for name in names])
+        self.urls.extend([ch["url"] for ch in channels])
+        self.logos.extend([ch.get("logo") for ch in channels])
+        self.playlist_codes.extend(np.full(count, code, dtype=np.int32))
+        self.category_codes.extend(self.categories.encode(ch.get("category") for ch in channels))
+        self.group_title_codes.extend(self.group_titles.encode(ch.get("group_title") for ch in channels))
+        self.is_live.extend(np.fromiter((ch.get("is_live", True) for ch in channels), dtype=np.bool_, count=count))
+        self.live.extend(np.ones(count, dtype=np.bool_))
+
+    def _end(self, code: int, first: int):
+        self.segments[code] = (first, self.live.size)
+
+    def compacted(self) -> "ChannelTable":
+        """A copy without tombstoned rows, in library order"""
+        table = ChannelTable(self.playlists, self.categories, self.group_titles)
+        table.ranks.extend(self.ranks.array)
+        table.versions = dict(self.versions)
+        table._next_rank = self._next_rank
+        ranks = self.ranks.array
+        for code, (first, last) in sorted(self.segments.items(), key=lambda item: ranks[item[0]]):
+            _, start = table._begin(self.playlists.values[code])
+            for name in ("ids", "names", "search_names", "urls", "logos"):
+                getattr(table, name).extend_from(getattr(self, name), first, last)
+            for name in ("playlist_codes", "category_codes", "group_title_codes", "is_live", "live"):
+                getattr(table, name).extend(getattr(self, name).array[first:last])
+            table._end(code, start)
+        return table
+
+    def select(self, playlist_id: Optional[str], category: Optional[str], search: Optional[str]) -> np.ndarray:
+        """Rows matching the listing filters, in library order"""
+        empty = np.zeros(0, dtype=np.int64)
+        if playlist_id is not None:
+            code = self.playlists.codes.get(playlist_id)
+            if code is None or code not in self.segments:
+                return empty
+            first, last = self.segments[code]
+        else:
+            first, last = 0, self.live.size
+
+        mask = self.live.array[first:last].copy()
+        if matches_category(category):
+            code = self.categories.codes.get(category)
+            if code is None:
+                return empty
+            mask &= self.category_codes.array[first:last] == code
+
+        term = search_term(search)
+        if term:
+            needle = term.lower().encode("utf-8")
+            if SEPARATOR in needle:
+                return empty
+            hits = np.zeros(last - first, dtype=np.bool_)
+            hits[self.search_names.find_rows(needle, first, last) - first] = True
+            mask &= hits
+
+        rows = np.flatnonzero(mask) + first
+        if not self.ordered and playlist_id is None:
+            rows = rows[np.argsort(self.ranks.array[self.playlist_codes.array[rows]], kind="stable")]
+        return rows
+
+    def records(self, rows: np.ndarray) -> List[dict]:
+        """Rows as dicts holding CHANNEL_RESPONSE_FIELDS"""
+        columns = (
+            self.ids.values(rows),
+            self.names.values(rows),
+            self.urls.values(rows),
+            self.logos.values(rows),
+            self.categories.decode(self.category_codes.array[rows]),
+            self.is_live.array[rows].tolist(),
+            self.group_titles.decode(self.group_title_codes.array[rows]),
+        )
+        return [dict(zip(CHANNEL_RESPONSE_FIELDS, values)) for values in zip(*columns)]
+
+    def category_names(self) -> List[str]:
+        codes = np.unique(self.category_codes.array[self.live.array])
+        return self.categories.decode(codes[codes >= 0])
+
+    def nbytes(self) -> int:
+        """Approximate resident size of the columns"""
+        columns = (self.ids, self.names, self.search_names, self.urls, self.logos, self.playlist_codes,
+                   self.category_codes, self.group_title_codes, self.is_live, self.live, self.ranks)
+        return sum(column.nbytes() for column in columns)
+
+def playlist_version(last_updated: Optional[datetime]) -> Optional[str]:
+    """Version of a playlist's channels; Mongo keeps datetimes to the millisecond"""
+    return last_updated.isoformat(timespec="milliseconds") if last_updated else None
+
+def channel_records(channels) -> Iterable[dict]:
+    """Channel models as the dicts a table stores"""
+    return ({field: getattr(ch, field) for field in CHANNEL_RESPONSE_FIELDS} for ch in channels)
+
+class ChannelTables:
+    """Channel tables of the most recently used owners, loaded on first use.
+
+    With ``snapshots``, a table is memory-mapped from the owner's last
+    snapshot and caught up with the playlists changed since; otherwise, and
+    when there is none yet, it is read from the library. Each worker keeps its
+    own tables: changes made through it are applied right away, changes made
+    by other workers through ``sync_playlist`` once the library watcher
+    reports them.
+    """
+
+    def __init__(self, library: LibraryStorage, max_owners: int = 64, load_chunk_size: int = 5000,
+                 snapshots=None):
+        self.library = library
+        self.max_owners = max_owners
+        self.load_chunk_size = load_chunk_size
+        self.snapshots = snapshots
+        self._tables: "OrderedDict[str, ChannelTable]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        # Changes that arrive while a table loads, replayed once it is ready
+        self._pending: Dict[str, list] = {}
+        # Owners whose table changed since its snapshot was written
+        self._unsaved = set()
+
+    async def get(self, owner_id: str) -> ChannelTable:
+        table = self._tables.get(owner_id)
+        if table is not None:
+            self._tables.move_to_end(owner_id)
+            return table
+
+        loading = self._loading.get(owner_id)
+        while loading is not None:
+            try:
+                return await asyncio.shield(loading)
+            except asyncio.CancelledError:
+                # The request loading the table went away: load it here instead
+                if not loading.cancelled():
+                    raise
+            table = self._tables.get(owner_id)
+            if table is not None:
+                return table
+            loading = self._loading.get(owner_id)
+
+        loading = self._loading[owner_id] = asyncio.get_running_loop().create_future()
+        self._pending[owner_id] = []
+        try:
+            table = await self._load(owner_id)
+            for playlist_id, channels, version in self._pending[owner_id]:
+                table = self._apply(owner_id, table, playlist_id, channels, version)
+            self._tables[owner_id] = table
+            while len(self._tables) > self.max_owners:
+                evicted, _ = self._tables.popitem(last=False)
+                self._unsaved.discard(evicted)
+            loading.set_result(table)
+            return table
+        except Exception as e:
+            loading.set_exception(e)
+            # Retrieved here so an unawaited failure is not reported twice
+            loading.exception()
+            raise
+        finally:
+            del self._loading[owner_id]
+            del self._pending[owner_id]
+            if not loading.done():
+                loading.cancel()
+
+    async def _load(self, owner_id: str) -> ChannelTable:
+        if self.snapshots is None:
+            return await self._load_library(owner_id)
+
+        # Workers starting together wait for the one rebuilding the snapshot
+        # instead of all reading the whole library
+        lock = await self.snapshots.lock(owner_id)
+        try:
+            table = await run_in_threadpool(self.snapshots.load, owner_id)
+            if table is None:
+                table = await self._load_library(owner_id)
+            elif not await self._catch_up(owner_id, table):
+                return table
+            await self._save(owner_id, table)
+            return table
+        finally:
+            self.snapshots.unlock(lock)
+
+    async def _load_library(self, owner_id: str) -> ChannelTable:
+        table = ChannelTable()
+        # Versions are read first: a playlist changing meanwhile is reloaded on the next catch-up.
+        # Channels come from the primary too, never older than the versions they are stored under
+        library = self.library.primary
+        versions = {p["id"]: playlist_version(p.get("last_updated")) async for p in library.list_playlists(owner_id)}
+        current = None
+        async for playlist_id, chunk in library.playlist_channels(owner_id, self.load_chunk_size):
+            if playlist_id != current:
+                if current is not None:
+                    table._end(code, first)
+                code, first = table._begin(playlist_id)
+                table.versions[playlist_id] = versions.get(playlist_id)
+                current = playlist_id
+            table._append(code, chunk)
+        if current is not None:
+            table._end(code, first)
+        logger.info(f"Loaded channel table of {owner_id}: {len(table)} channels")
+        return table
+
+    async def _catch_up(self, owner_id: str, table: ChannelTable) -> bool:
+        """Reload the playlists added or changed since the snapshot and drop deleted ones"""
+        library = self.library.primary
+        versions = {p["id"]: playlist_version(p.get("last_updated")) async for p in library.list_playlists(owner_id)}
+        changed = [playlist_id for playlist_id, version in versions.items()
+                   if playlist_id not in table.versions or table.versions[playlist_id] != version]
+        deleted = [playlist_id for playlist_id in table.versions if playlist_id not in versions]
+
+        for playlist_id in deleted:
+            table.remove_playlist(playlist_id)
+        for playlist_id in changed:
+            table.remove_playlist(playlist_id)
+            table.versions[playlist_id] = versions[playlist_id]
+            code, first = table._begin(playlist_id)
+            async for chunk in library.channel_chunks(owner_id, playlist_id, None, None, self.load_chunk_size):
+                table._append(code, chunk)
+            table._end(code, first)
+
+        if changed or deleted:
+            logger.info(f"Caught up channel snapshot of {owner_id}: {len(changed)} changed, {len(deleted)} deleted playlists")
+        return bool(changed or deleted)
+
+    async def _save(self, owner_id: str, table: ChannelTable):
+        if table.needs_compaction:
+            table = table.compacted()
+        try:
+            await run_in_threadpool(self.snapshots.save, owner_id, self.snapshots.capture(table))
+            self._unsaved.discard(owner_id)
+        except Exception as e:
+            logger.error(f"Error saving channel snapshot of {owner_id}: {e}")
+
+    async def save_snapshots(self):
+        """Write the tables changed since their snapshot, e.g. on shutdown"""
+        if self.snapshots is None:
+            return
+        for owner_id in list(self._unsaved):
+            table = self._tables.get(owner_id)
+            if table is not None:
+                await self._save(owner_id, table)
+
+    def playlist_changed(self, owner_id: str, playlist_id: str, channels=None,
+                         last_updated: Optional[datetime] = None):
+        """Apply an added, refreshed (channel models) or deleted (None) playlist"""
+        records = list(channel_records(channels)) if channels is not None else None
+        version = playlist_version(last_updated)
+        if owner_id in self._pending:
+            self._pending[owner_id].append((playlist_id, records, version))
+            return
+
+        table = self._tables.get(owner_id)
+        if table is not None:
+            self._tables[owner_id] = self._apply(owner_id, table, playlist_id, records, version)
+
+    async def sync_playlist(self, owner_id: str, playlist_id: str) -> bool:
+        """Re-read a playlist changed by another worker, if its owner's table is held here.
+
+        Changes this worker made itself are already applied and skipped by
+        version. Returns whether the table changed.
+        """
+        if owner_id not in self._tables and owner_id not in self._loading:
+            return False
+        table = await self.get(owner_id)
+        held = table.versions.get(playlist_id, False)
+
+        # Version and channels from the same primary, so the version matches what is stored
+        library = self.library.primary
+        playlist = await library.get_playlist(owner_id, playlist_id)
+        if playlist is None:
+            if held is False:
+                return False
+            records, version = None, None
+        else:
+            version = playlist_version(playlist.get("last_updated"))
+            if held == version:
+                return False
+            records = [ch async for chunk in library.channel_chunks(
+                owner_id, playlist_id, None, None, self.load_chunk_size
+            ) for ch in chunk]
+
+        table = self._tables.get(owner_id)
+        if table is None or table.versions.get(playlist_id, False) != held:
+            # Evicted, or changed again meanwhile by a newer write that wins
+            return False
+        self._tables[owner_id] = self._apply(owner_id, table, playlist_id, records, version)
+        return True
+
+    async def library_changed(self, entry: dict):
+        """Library watcher listener"""
+        await self.sync_playlist(entry["owner_id"], entry["playlist_id"])
+
+    def _apply(self, owner_id: str, table: ChannelTable, playlist_id: str, records, version) -> ChannelTable:
+        """Change a table; returns the table to keep, a compacted copy after heavy churn"""
+        if records is None:
+            table.remove_playlist(playlist_id)
+        else:
+            table.add_playlist(playlist_id, records, version)
+        self._unsaved.add(owner_id)
+        return table.compacted() if table.needs_compaction else table
+
+    async def channel_chunks(
+        self,
+        owner_id: str,
+        playlist_id: Optional[str],
+        category: Optional[str],
+        search: Optional[str],
+        chunk_size: int
+    ) -> AsyncIterator[List[dict]]:
+        """Same contract as LibraryStorage.channel_chunks"""
+        table = await self.get(owner_id)
+        rows = table.select(playlist_id, category, search)
+        for start in range(0, len(rows), chunk_size):
+            yield table.records(rows[start:start + chunk_size])
+
+    async def categories(self, owner_id: str) -> List[str]:
+        return (await self.get(owner_id)).category_names()
+
+    def stats(self) -> dict:
+        return {
+            "owners": len(self._tables),
+            "channels": sum(len(table) for table in self._tables.values()),
+            "bytes": sum(table.nbytes() for table in self._tables.values()),
+        }
@@ -0,0 +1,270 @@
+"""Response compression: per response, or once per ETag for cacheable bodies.
+
+``CompressionMiddleware`` gzips (or brotli-compresses, when the optional
+``brotli`` package is installed) compressible responses above a size
+threshold, streamed ones chunk by chunk. Responses that arrive already
+encoded are passed through untouched.
+
+``CompressedBodyCache`` keeps the bodies of cacheable responses (category
+lists, playlist exports, stored uploads) under their ETag together with
+their compressed forms, so each version is compressed once at a higher
+level and conditional requests are answered with 304.
+"""
+import hashlib
+import os
+import zlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Union
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+# Smaller bodies are sent as they are; compression would barely pay for its framing
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+
+# Levels for responses compressed per request, and for cached bodies compressed once
+GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+CACHED_GZIP_LEVEL = 9
+CACHED_BROTLI_QUALITY = 9
+
+# Bytes of bodies (all encodings) kept by the cache of each process
+COMPRESSED_CACHE_BYTES = int(os.environ.get('COMPRESSED_CACHE_BYTES', 64 * 1024 * 1024))
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml", "application/msgpack",
+    "application/vnd.iptv.columns+json", "application/x-mpegurl", "application/vnd.apple.mpegurl",
+    "audio/x-mpegurl", "audio/mpegurl",
+)
+
+def _brotli():
+    """The brotli module, or None where the optional package is not installed"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+def accepted_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """``br`` or ``gzip`` when the client accepts it (brotli preferred), else None"""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        if any(p.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000") for p in params):
+            continue
+        accepted.add(coding.lower())
+    if "br" in accepted and _brotli() is not None:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+class Compressor:
+    """Incremental gzip or brotli stream"""
+
+    def __init__(self, encoding: str, level: int):
+        if encoding == "br":
+            self._brotli = _brotli().Compressor(quality=level)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        """Compressed bytes so far, flushed so the client can decode what was streamed"""
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return _brotli().compress(body, quality=level)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses for clients that accept it"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor: Optional[Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                headers = Headers(raw=message["headers"])
+                passthrough = "content-encoding" in headers or not is_compressible(headers.get("content-type"))
+                if passthrough:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    body = compress(body, encoding, GZIP_LEVEL if encoding == "gzip" else BROTLI_QUALITY)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                del headers["Content-Length"]
+                compressor = Compressor(encoding, GZIP_LEVEL if encoding == "gzip" else BROTLI_QUALITY)
+                await send(start)
+
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag of a body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def weak_etag(etag: str) -> str:
+    return etag if etag.startswith("W/") else "W/" + etag
+
+def etag_matches(request_headers: Headers, etag: str) -> bool:
+    """If-None-Match, compared weakly as RFC 9110 asks for it"""
+    if_none_match = request_headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return weak_etag(etag) in [weak_etag(tag.strip()) for tag in if_none_match.split(",")]
+
+class CompressedBodyCache:
+    """Bodies of cacheable responses and their compressed forms, by key and ETag, least recently used evicted"""
+
+    def __init__(self, max_bytes: int = COMPRESSED_CACHE_BYTES, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.max_bytes = max_bytes
+        self.minimum_size = minimum_size
+        self._entries: "OrderedDict[Hashable, dict]" = OrderedDict()
+        self._bytes = 0
+        self.compressions = 0
+
+    def _entry(self, key: Hashable, etag: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None or entry["etag"] != etag:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: Hashable, entry: dict, encoding: Optional[str], body: bytes):
+        if self._entries.get(key) is not entry:
+            self._drop(key)
+            self._entries[key] = entry
+        entry["bodies"][encoding] = body
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= sum(len(body) for body in entry["bodies"].values())
+
+    async def respond(
+        self,
+        request_headers: Headers,
+        key: Hashable,
+        etag: str,
+        body: Union[bytes, Callable[[], Awaitable[bytes]]],
+        media_type: str,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        """The cached response for a body version: 304, compressed or plain.
+
+        ``body`` is the bytes, or a coroutine function producing them that
+        only runs when this version is not cached yet. The ETag is sent
+        weak, as the plain and compressed bodies of a version share it.
+        """
+        headers = dict(headers or {}, ETag=weak_etag(etag), Vary="Accept-Encoding")
+        if etag_matches(request_headers, etag):
+            return Response(status_code=304, headers=headers)
+
+        entry = self._entry(key, etag)
+        if entry is None:
+            entry = {"etag": etag, "bodies": {}}
+            self._store(key, entry, None, body if isinstance(body, bytes) else await body())
+        plain = entry["bodies"][None]
+
+        encoding = accepted_encoding(request_headers.get("accept-encoding"))
+        if encoding is None or len(plain) < self.minimum_size or not is_compressible(media_type):
+            return Response(plain, media_type=media_type, headers=headers)
+
+        compressed = entry["bodies"].get(encoding)
+        if compressed is None:
+            level = CACHED_GZIP_LEVEL if encoding == "gzip" else CACHED_BROTLI_QUALITY
+            compressed = await run_in_threadpool(compress, plain, encoding, level)
+            self.compressions += 1
+            self._store(key, entry, encoding, compressed)
+        headers["Content-Encoding"] = encoding
+        return Response(compressed, media_type=media_type, headers=headers)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+class CompressedStaticFiles(StaticFiles):
+    """StaticFiles whose files are compressed once per version (their ETag) instead of per request"""
+
+    def __init__(self, *args, cache: CompressedBodyCache, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        request_headers = Headers(scope=scope)
+        if (scope["method"] != "GET" or response.status_code != 200 or not hasattr(response, "path")
+                or accepted_encoding(request_headers.get("accept-encoding")) is None
+                or not is_compressible(response.media_type)):
+            return response
+
+        def read() -> bytes:
+            with open(response.path, "rb") as f:
+                return f.read()
+
+        async def load() -> bytes:
+            return await run_in_threadpool(read)
+
+        headers = {name: value for name, value in response.headers.items()
+                   if name in ("last-modified", "content-disposition")}
+        return await self.cache.respond(
+            request_headers, ("file", response.path), response.headers["etag"], load, response.media_type, headers
+        )
@@ -0,0 +1,180 @@
+import re
+import gzip
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterator, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+def normalize_tvg_id(value: Optional[str]) -> str:
+    """Normalize a tvg-id/display-name so EPG and playlist ids can be matched"""
+    if not value:
+        return ""
+    # iptv-org style ids carry a feed suffix ("ESPN.us@HD") that the guide omits
+    value = value.split('@', 1)[0]
+    return re.sub(r'\s+', ' ', value).strip().casefold()
+
+class _PrefixedStream:
+    """Readable stream that replays bytes already consumed for sniffing"""
+
+    def __init__(self, prefix: bytes, stream: BinaryIO):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        if not self.prefix:
+            return self.stream.read(size)
+        if size is None or size < 0:
+            data, self.prefix = self.prefix + self.stream.read(), b''
+            return data
+        data, self.prefix = self.prefix[:size], self.prefix[size:]
+        if len(data) < size:
+            data += self.stream.read(size - len(data))
+        return data
+
+class XMLTVParser:
+    def __init__(self):
+        self.time_regex = re.compile(
+            r'^(\d{4})(\d{2})(\d{2})(\d{2})?(\d{2})?(\d{2})?\s*([+-]\d{2}:?\d{2})?'
+        )
+
+    def iter_from_url(self, url: str) -> Iterator[Tuple[str, dict]]:
+        """Stream XMLTV guide entries from URL"""
+        import requests
+        try:
+            response = requests.get(
+                url,
+                headers={'User-Agent': 'Mozilla/5.0', 'Accept-Encoding': 'gzip, deflate'},
+                timeout=60,
+                stream=True,
+                allow_redirects=True
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error(f"Error downloading EPG from URL {url}: {e}")
+            raise Exception(f"Error al descargar la guía: {str(e)}")
+
+        try:
+            # Let urllib3 undo Content-Encoding; .xml.gz payloads are sniffed below
+            response.raw.decode_content = True
+            yield from self.iter_events(response.raw)
+        finally:
+            response.close()
+
+    def iter_from_file(self, fileobj: BinaryIO) -> Iterator[Tuple[str, dict]]:
+        """Stream XMLTV guide entries from a binary file object"""
+        yield from self.iter_events(fileobj)
+
+    def iter_events(self, stream: BinaryIO) -> Iterator[Tuple[str, dict]]:
+        """Yield ("channel", data) and ("programme", data) tuples in document order.
+
+        Elements are cleared as soon as they are consumed so memory use stays
+        bounded regardless of the guide size.
+        """
+        stream = self._open_stream(stream)
+        root = None
+
+        try:
+            for event, elem in ET.iterparse(stream, events=('start', 'end')):
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                    continue
+
+                if elem.tag == 'channel':
+                    channel = self._parse_channel(elem)
+                    if channel:
+                        yield 'channel', channel
+                    root.clear()
+                elif elem.tag == 'programme':
+                    programme = self._parse_programme(elem)
+                    if programme:
+                        yield 'programme', programme
+                    root.clear()
+        except ET.ParseError as e:
+            logger.error(f"Error parsing XMLTV content: {e}")
+            raise Exception(f"Guía XMLTV inválida: {str(e)}")
+
+    def _open_stream(self, stream: BinaryIO) -> BinaryIO:
+        """Transparently decompress gzip content"""
+        magic = stream.read(2)
+        stream = _PrefixedStream(magic, stream)
+        if magic == GZIP_MAGIC:
+            return gzip.GzipFile(fileobj=stream, mode='rb')
+        return stream
+
+    def _parse_channel(self, elem: ET.Element) -> Optional[dict]:
+        """Parse <channel> element"""
+        channel_id = (elem.get('id') or '').strip()
+        if not channel_id:
+            return None
+
+        display_names = [
+            name.text.strip() for name in elem.findall('display-name')
+            if name.text and name.text.strip()
+        ]
+        icon = elem.find('icon')
+
+        return {
+            'id': channel_id,
+            'tvg_id': normalize_tvg_id(channel_id),
+            'display_names': display_names,
+            'icon': icon.get('src') if icon is not None else None,
+        }
+
+    def _parse_programme(self, elem: ET.Element) -> Optional[dict]:
+        """Parse <programme> element"""
+        channel_id = (elem.get('channel') or '').strip()
+        start = self.parse_time(elem.get('start'))
+        stop = self.parse_time(elem.get('stop'))
+
+        if not channel_id or not start:
+            return None
+        if not stop or stop <= start:
+            # Guides without stop times are rare; assume a short slot rather than drop it
+            stop = start + timedelta(minutes=30)
+
+        return {
+            'tvg_id': normalize_tvg_id(channel_id),
+            'channel': channel_id,
+            'title': self._text(elem, 'title') or 'Sin título',
+            'start': start,
+            'stop': stop,
+            'description': self._text(elem, 'desc'),
+            'category': self._text(elem, 'category'),
+        }
+
+    def _text(self, elem: ET.Element, tag: str) -> Optional[str]:
+        child = elem.find(tag)
+        if child is None or not child.text:
+            return None
+        return child.text.strip() or None
+
+    def parse_time(self, value: Optional[str]) -> Optional[datetime]:
+        """Parse XMLTV timestamp ("20240101120000 +0100") into naive UTC"""
+        if not value:
+            return None
+
+        match = self.time_regex.match(value.strip())
+        if not match:
+            return None
+
+        year, month, day, hour, minute, second, offset = match.groups()
+        try:
+            parsed = datetime(
+                int(year), int(month), int(day),
+                int(hour or 0), int(minute or 0), int(second or 0)
+            )
+        except ValueError:
+            return None
+
+        if offset:
+            offset = offset.replace(':', '')
+            sign = -1 if offset[0] == '-' else 1
+            delta = timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5]))
+            parsed -= sign * delta
+
+        return parsed
@@ -0,0 +1,312 @@
+"""Typo-tolerant channel search ranked by trigram similarity.
+
+Names are folded (case, accents, punctuation) and split into trigrams, each
+word padded like PostgreSQL's pg_trgm does. A ``TrigramIndex`` keeps, per
+trigram, the rows holding it (CSR arrays), so a query only touches the rows
+sharing one of its trigrams. Rows score by the share of the query found in
+the name, blended with the overall similarity of the two; ``tvg_name`` hits
+add to the score, and exact and prefix matches are boosted when the best
+candidates are re-ranked.
+
+Trigrams are looked up rarest first and lookups stop once the latency
+budget is spent, so very common trigrams of a long query are the ones a
+busy large library leaves out. ``FuzzySearch`` keeps one index per owner,
+rebuilt when the owner's library revision moves.
+"""
+import asyncio
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from services.channel_table import Dictionary
+from services.metrics import registry
+from storage.base import LibraryStorage, matches_category
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Time spent looking up a query's trigrams before answering with what was found
+FUZZY_SEARCH_BUDGET_MS = float(os.environ.get('FUZZY_SEARCH_BUDGET_MS', 50))
+
+# Share of the query's trigrams a name must hold to be a result
+FUZZY_MIN_SIMILARITY = float(os.environ.get('FUZZY_MIN_SIMILARITY', 0.5))
+
+# Results of a fuzzy search unless the request asks for fewer or more, and the most it may ask
+FUZZY_SEARCH_LIMIT = int(os.environ.get('FUZZY_SEARCH_LIMIT', 50))
+FUZZY_SEARCH_MAX_LIMIT = 500
+
+# Owners whose indexes are kept in memory, least recently searched dropped first
+FUZZY_INDEX_MAX_OWNERS = int(os.environ.get('FUZZY_INDEX_MAX_OWNERS', 16))
+
+# Longer queries are cut, which bounds the trigrams looked up
+MAX_QUERY_LENGTH = 64
+
+# Weight of the query coverage against the symmetric (Jaccard) similarity
+COVERAGE_WEIGHT = 0.75
+TVG_NAME_WEIGHT = 0.25
+EXACT_BOOST = 1.0
+PREFIX_BOOST = 0.5
+WORD_PREFIX_BOOST = 0.25
+
+# Candidates re-ranked with the boosts, per result asked for
+RERANK_FACTOR = 4
+
+TRUNCATED_SEARCHES = registry.counter(
+    "iptv_fuzzy_searches_truncated_total",
+    "Fuzzy searches answered before every query trigram was looked up, to stay within the latency budget"
+)
+
+COMBINING_MARKS = re.compile("[\u0300-\u036f]")
+# Runs of punctuation and spaces, newlines (which separate texts) excepted
+NON_WORD = re.compile(r"(?:[^\w\n]|_)+")
+
+# Key of three spaces, the only trigram of an empty text
+BLANK = (32 << 42) | (32 << 21) | 32
+
+def normalize_all(texts: List[Optional[str]]) -> List[str]:
+    """Lowercase words without accents or punctuation: "Canal Español+" -> "canal espanol".
+
+    The texts are folded as one string, which is much faster than one at a time.
+    """
+    joined = "\n".join(text.replace("\n", " ") if text else "" for text in texts)
+    joined = COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", joined.lower()))
+    return [text.strip() for text in NON_WORD.sub(" ", joined).split("\n")]
+
+def normalize(text: Optional[str]) -> str:
+    return normalize_all([text])[0]
+
+def trigram_keys(normalized: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Trigrams of normalized texts as (key, text index) pairs, repeats included.
+
+    Words are padded with two spaces before and one after, much like pg_trgm; a
+    key packs the trigram's three code points (21 bits each) in an integer.
+    """
+    padded = "  " + "\n".join(normalized).replace(" ", "  ").replace("\n", " \n  ") + " "
+    points = np.frombuffer(padded.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    newlines = points == 10
+    keys = (points[:-2] << np.uint64(42)) | (points[1:-1] << np.uint64(21)) | points[2:]
+    valid = ~(newlines[:-2] | newlines[1:-1] | newlines[2:]) & (keys != BLANK)
+    rows = np.cumsum(newlines, dtype=np.int32)[:-2]
+    return keys[valid], rows[valid]
+
+def distinct(values: np.ndarray) -> np.ndarray:
+    """Sorted distinct values; sorting beats np.unique's hashing on these sizes"""
+    values = np.sort(values)
+    if len(values) == 0:
+        return values
+    keep = np.empty(len(values), dtype=np.bool_)
+    keep[0] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+class Postings:
+    """Rows holding each trigram code, as CSR arrays"""
+
+    def __init__(self, codes: np.ndarray, rows: np.ndarray, vocabulary_size: int, row_count: int):
+        # Distinct (code, row) pairs, ordered by code then row
+        pairs = distinct(codes.astype(np.int64) * row_count + rows)
+        self.rows = (pairs % row_count).astype(np.int32)
+        self.offsets = np.searchsorted(pairs // row_count, np.arange(vocabulary_size + 1)).astype(np.int64)
+        # Distinct trigrams per row
+        self.counts = np.bincount(self.rows, minlength=row_count).astype(np.int32)
+
+    def length(self, code: int) -> int:
+        return int(self.offsets[code + 1] - self.offsets[code])
+
+    def rows_of(self, code: int) -> np.ndarray:
+        return self.rows[self.offsets[code]:self.offsets[code + 1]]
+
+class TrigramIndex:
+    """Names and tvg names of one library, searchable by trigram similarity"""
+
+    def __init__(self, entries: List[dict]):
+        count = len(entries)
+        self.ids = [entry["id"] for entry in entries]
+        self.playlists = Dictionary()
+        self.categories = Dictionary()
+        self.playlist_codes = self.playlists.encode(entry["playlist_id"] for entry in entries)
+        self.category_codes = self.categories.encode(entry.get("category") for entry in entries)
+        self.names = normalize_all([entry["name"] for entry in entries])
+        tvg_names = normalize_all([entry.get("tvg_name") if entry.get("tvg_name") != entry["name"] else None
+                                   for entry in entries])
+        # The parser fills tvg_name with the name when the playlist has none; only
+        # rows where it differs get tvg postings, the others reuse the name's
+        self.tvg_rows = np.array([row for row, (tvg, name) in enumerate(zip(tvg_names, self.names))
+                                  if tvg and tvg != name], dtype=np.int64)
+        self.tvg_names = list(self.names)
+        for row in self.tvg_rows.tolist():
+            self.tvg_names[row] = tvg_names[row]
+
+        name_keys, name_rows = trigram_keys(self.names)
+        tvg_keys, tvg_rows = trigram_keys([tvg_names[row] for row in self.tvg_rows.tolist()])
+        # Sorted distinct keys; a trigram's code is its position
+        self.vocabulary = distinct(np.concatenate([name_keys, tvg_keys]))
+        self.name_postings = Postings(np.searchsorted(self.vocabulary, name_keys), name_rows,
+                                      len(self.vocabulary), count)
+        self.tvg_postings = Postings(np.searchsorted(self.vocabulary, tvg_keys), self.tvg_rows[tvg_rows],
+                                     len(self.vocabulary), count)
+        self.tvg_counts = self.name_postings.counts.copy()
+        self.tvg_counts[self.tvg_rows] = self.tvg_postings.counts[self.tvg_rows]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _codes(self, normalized_query: str) -> Tuple[List[int], int]:
+        """Codes of the query's indexed trigrams, rarest first, and its distinct trigram count"""
+        keys = distinct(trigram_keys([normalized_query])[0])
+        positions = np.minimum(np.searchsorted(self.vocabulary, keys), max(len(self.vocabulary) - 1, 0))
+        found = self.vocabulary[positions] == keys if len(self.vocabulary) else np.zeros(len(keys), dtype=bool)
+        codes = sorted(positions[found].tolist(), key=self.name_postings.length)
+        return codes, len(keys)
+
+    def search(
+        self,
+        query: str,
+        playlist_id: Optional[str] = None,
+        category: Optional[str] = None,
+        limit: int = 50,
+        budget_ms: float = FUZZY_SEARCH_BUDGET_MS,
+        min_similarity: float = FUZZY_MIN_SIMILARITY
+    ) -> List[Tuple[str, float]]:
+        """Best (channel id, score) pairs, best first"""
+        query = normalize(query[:MAX_QUERY_LENGTH])
+        if not query or not self.ids:
+            return []
+        deadline = time.perf_counter() + budget_ms / 1000
+        # Unknown trigrams match no row but still count against the similarity
+        codes, query_count = self._codes(query)
+
+        name_shared = np.zeros(len(self.ids), dtype=np.int16)
+        tvg_shared = np.zeros(len(self.ids), dtype=np.int16)
+        for i, code in enumerate(codes):
+            if i and time.perf_counter() > deadline:
+                TRUNCATED_SEARCHES.inc()
+                break
+            # A trigram lists each row once, so the increments don't collide
+            name_shared[self.name_postings.rows_of(code)] += 1
+            tvg_shared[self.tvg_postings.rows_of(code)] += 1
+        tvg_matches = tvg_shared[self.tvg_rows]
+        tvg_shared[:] = name_shared
+        tvg_shared[self.tvg_rows] = tvg_matches
+
+        # Rows holding too few of the query's trigrams can't reach the similarity asked for
+        needed = max(int(np.ceil(min_similarity * query_count)), 1)
+        rows = np.flatnonzero(np.maximum(name_shared, tvg_shared) >= needed)
+        if playlist_id is not None:
+            rows = rows[self.playlist_codes[rows] == self.playlists.codes.get(playlist_id, -2)]
+        if matches_category(category):
+            rows = rows[self.category_codes[rows] == self.categories.codes.get(category, -2)]
+
+        name_score, name_coverage = self._similarity(name_shared[rows], self.name_postings.counts[rows], query_count)
+        tvg_score, tvg_coverage = self._similarity(tvg_shared[rows], self.tvg_counts[rows], query_count)
+        keep = np.maximum(name_coverage, tvg_coverage) >= min_similarity
+        rows = rows[keep]
+        scores = name_score[keep] + TVG_NAME_WEIGHT * tvg_score[keep]
+
+        # Boosts only reorder the best candidates, which exact and prefix matches always are
+        if len(rows) > limit * RERANK_FACTOR:
+            best = np.argpartition(-scores, limit * RERANK_FACTOR)[:limit * RERANK_FACTOR]
+            rows, scores = rows[best], scores[best]
+        ranked = []
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            ranked.append((score + self._boost(query, self.names[row], self.tvg_names[row]), row))
+        # Best score first, library order between ties
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        return [(self.ids[row], round(score, 4)) for score, row in ranked[:limit]]
+
+    @staticmethod
+    def _similarity(shared: np.ndarray, counts: np.ndarray, query_count: int) -> Tuple[np.ndarray, np.ndarray]:
+        shared = shared.astype(np.float32)
+        coverage = shared / query_count
+        jaccard = shared / np.maximum(query_count + counts - shared, 1)
+        return COVERAGE_WEIGHT * coverage + (1 - COVERAGE_WEIGHT) * jaccard, coverage
+
+    @staticmethod
+    def _boost(query: str, name: str, tvg_name: str) -> float:
+        if query == name or query == tvg_name:
+            return EXACT_BOOST
+        if name.startswith(query) or tvg_name.startswith(query):
+            return PREFIX_BOOST
+        if f" {query}" in f" {name}":
+            return WORD_PREFIX_BOOST
+        return 0.0
+
+    def nbytes(self) -> int:
+        arrays = (self.playlist_codes, self.category_codes, self.vocabulary, self.tvg_rows, self.tvg_counts,
+                  self.name_postings.rows, self.name_postings.offsets, self.name_postings.counts,
+                  self.tvg_postings.rows, self.tvg_postings.offsets, self.tvg_postings.counts)
+        return sum(array.nbytes for array in arrays)
+
+class FuzzySearch:
+    """Per-owner trigram indexes over a library, rebuilt when its revision moves"""
+
+    def __init__(self, library: LibraryStorage, max_owners: int = FUZZY_INDEX_MAX_OWNERS, chunk_size: int = 10000):
+        self.library = library
+        self.max_owners = max_owners
+        self.chunk_size = chunk_size
+        # Owner -> (library revision, index)
+        self._indexes: "OrderedDict[str, Tuple[int, TrigramIndex]]" = OrderedDict()
+        self._building: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    async def index(self, owner_id: str) -> TrigramIndex:
+        revision = (await self.library.library_revision(owner_id))["revision"]
+        cached = self._indexes.get(owner_id)
+        if cached is not None and cached[0] == revision:
+            self._indexes.move_to_end(owner_id)
+            return cached[1]
+
+        # Concurrent searches after a change share one rebuild
+        key = (owner_id, revision)
+        future = self._building.get(key)
+        while future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The search building the index went away: build it here instead
+                if not future.cancelled():
+                    raise
+            future = self._building.get(key)
+        future = asyncio.get_running_loop().create_future()
+        self._building[key] = future
+        try:
+            # From the primary, so the index holds at least what the revision says
+            entries = [entry async for chunk in self.library.primary.search_entries(owner_id, self.chunk_size)
+                       for entry in chunk]
+            index = await run_in_threadpool(TrigramIndex, entries)
+            self._indexes[owner_id] = (revision, index)
+            self._indexes.move_to_end(owner_id)
+            while len(self._indexes) > self.max_owners:
+                self._indexes.popitem(last=False)
+            future.set_result(index)
+            return index
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            self._building.pop(key, None)
+            if not future.done():
+                future.cancel()
+
+    async def search(
+        self,
+        owner_id: str,
+        query: str,
+        playlist_id: Optional[str] = None,
+        category: Optional[str] = None,
+        limit: int = 50
+    ) -> List[dict]:
+        """The best matching channels, best first, as dicts holding CHANNEL_RESPONSE_FIELDS"""
+        index = await self.index(owner_id)
+        ranked = index.search(query, playlist_id, category, limit)
+        if not ranked:
+            return []
+        channels = {ch["id"]: ch for ch in await self.library.channels_by_id(owner_id, [i for i, _ in ranked])}
+        # Channels removed since the index was built are skipped
+        return [channels[channel_id] for channel_id, _ in ranked if channel_id in channels]
+
@@ -0,0 +1,84 @@
+import re
+from typing import Callable, List, Optional
+from urllib.parse import urljoin
+
+URI_ATTRIBUTE_REGEX = re.compile(r'URI="([^"]*)"')
+ATTRIBUTE_LIST_REGEX = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+def is_master_playlist(content: str) -> bool:
+    """Master playlists list variants instead of media segments"""
+    return '#EXT-X-STREAM-INF' in content
+
+def target_duration(content: str) -> Optional[float]:
+    """Read #EXT-X-TARGETDURATION from a media playlist"""
+    match = re.search(r'#EXT-X-TARGETDURATION:\s*([\d.]+)', content)
+    return float(match.group(1)) if match else None
+
+def rewrite_manifest(content: str, base_url: str, make_url: Callable[[str, bool], str]) -> str:
+    """Rewrite every URI in an HLS playlist.
+
+    ``make_url(absolute_url, is_playlist)`` returns the replacement; relative
+    URIs are resolved against ``base_url`` first.
+    """
+    lines = []
+    next_is_playlist = False
+
+    for line in content.splitlines():
+        stripped = line.strip()
+
+        if not stripped:
+            lines.append(line)
+        elif stripped.startswith('#'):
+            if stripped.startswith('#EXT-X-STREAM-INF'):
+                next_is_playlist = True
+            # EXT-X-MEDIA and I-frame entries reference playlists; KEY/MAP reference files
+            is_playlist = stripped.startswith(('#EXT-X-MEDIA', '#EXT-X-I-FRAME-STREAM-INF'))
+            lines.append(URI_ATTRIBUTE_REGEX.sub(
+                lambda m: f'URI="{make_url(urljoin(base_url, m.group(1)), is_playlist)}"',
+                line
+            ))
+        else:
+            absolute = urljoin(base_url, stripped)
+            is_playlist = next_is_playlist or absolute.split('?', 1)[0].endswith(('.m3u8', '.m3u'))
+            lines.append(make_url(absolute, is_playlist))
+            next_is_playlist = False
+
+    return '\n'.join(lines) + '\n'
+
+def parse_attributes(value: str) -> dict:
+    """Parse an HLS attribute list (BANDWIDTH=1,CODECS="a,b")"""
+    return {
+        key: raw.strip('"')
+        for key, raw in ATTRIBUTE_LIST_REGEX.findall(value)
+    }
+
+def parse_master_playlist(content: str, base_url: str) -> List[dict]:
+    """Extract variants from a master playlist, lowest bandwidth first"""
+    variants = []
+    pending = None
+
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            attrs = parse_attributes(line[len('#EXT-X-STREAM-INF:'):])
+            try:
+                bandwidth = int(attrs.get('BANDWIDTH', 0))
+                average = int(attrs['AVERAGE-BANDWIDTH']) if 'AVERAGE-BANDWIDTH' in attrs else None
+                frame_rate = float(attrs['FRAME-RATE']) if 'FRAME-RATE' in attrs else None
+            except ValueError:
+                pending = None
+                continue
+            pending = {
+                'bandwidth': bandwidth,
+                'average_bandwidth': average,
+                'resolution': attrs.get('RESOLUTION'),
+                'codecs': attrs.get('CODECS'),
+                'frame_rate': frame_rate,
+            }
+        elif line and not line.startswith('#') and pending is not None:
+            pending['url'] = urljoin(base_url, line)
+            variants.append(pending)
+            pending = None
+
+    variants.sort(key=lambda v: v['bandwidth'])
+    return variants
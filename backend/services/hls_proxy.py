@@ -0,0 +1,188 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import time
+import requests
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from services.public_url import check_public_url, open_public
+from services.hls_manifest import is_master_playlist, rewrite_manifest, target_duration
+import logging
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_CONTENT_TYPE = 'application/vnd.apple.mpegurl'
+
+class SegmentCache:
+    """Byte-bounded ring buffer of recently fetched segments.
+
+    Live segments are requested roughly in publication order, so evicting the
+    oldest insertion keeps the live edge hot for every viewer.
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self._items: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, url: str) -> Optional[Tuple[bytes, str]]:
+        return self._items.get(url)
+
+    def put(self, url: str, body: bytes, content_type: str):
+        if len(body) > self.max_item_bytes or url in self._items:
+            return
+        self._items[url] = (body, content_type)
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes and self._items:
+            _, (old_body, _) = self._items.popitem(last=False)
+            self._bytes -= len(old_body)
+
+    def stats(self) -> dict:
+        return {"segments": len(self._items), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+class HLSProxy:
+    """Shared upstream fetching for live HLS channels.
+
+    Each manifest is fetched at most once per refresh interval (half the
+    target duration for media playlists) and every URI in it is rewritten to
+    a signed proxy URL, so segments are also fetched once and served to all
+    viewers from the segment cache. Concurrent misses for the same URL share a
+    single upstream request.
+
+    Proxy URLs are signed with ``secret``; workers behind the same load
+    balancer must share it.
+    """
+
+    def __init__(
+        self,
+        secret: bytes,
+        route_prefix: str = "/api/stream",
+        segment_cache_bytes: int = 256 * 1024 * 1024,
+        max_segment_bytes: int = 16 * 1024 * 1024,
+        master_ttl: float = 30.0,
+        min_manifest_ttl: float = 1.0,
+        allow_private: bool = False
+    ):
+        self.secret = secret
+        self.route_prefix = route_prefix.rstrip('/')
+        self.master_ttl = master_ttl
+        self.min_manifest_ttl = min_manifest_ttl
+        self.max_segment_bytes = max_segment_bytes
+        # Only for tests and deployments streaming from sources on their own network
+        self.allow_private = allow_private
+        self.segments = SegmentCache(segment_cache_bytes, max_segment_bytes)
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'Mozilla/5.0'
+
+        self._manifests: Dict[str, Tuple[float, str]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.upstream_requests = 0
+
+    def sign(self, url: str) -> str:
+        payload = base64.urlsafe_b64encode(url.encode('utf-8')).decode('ascii').rstrip('=')
+        signature = hmac.new(self.secret, payload.encode('ascii'), hashlib.sha256).hexdigest()[:24]
+        return f"{payload}.{signature}"
+
+    def unsign(self, token: str) -> Optional[str]:
+        payload, _, signature = token.partition('.')
+        try:
+            expected = hmac.new(self.secret, payload.encode('ascii'), hashlib.sha256).hexdigest()[:24]
+            if not hmac.compare_digest(signature, expected):
+                return None
+            return base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)).decode('utf-8')
+        except (ValueError, TypeError):
+            return None
+
+    def proxy_url(self, url: str, is_playlist: bool) -> str:
+        if is_playlist:
+            return f"{self.route_prefix}/m/{self.sign(url)}.m3u8"
+        return f"{self.route_prefix}/s/{self.sign(url)}"
+
+    async def _single_flight(self, key: str, fn: Callable[[], Awaitable]):
+        """Run fn once for all concurrent callers using the same key"""
+        future = self._inflight.get(key)
+        while future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The caller running fn went away (a player disconnected): start over
+                if not future.cancelled():
+                    raise
+            future = self._inflight.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.cancel()
+
+    def _fetch(self, url: str) -> Tuple[bytes, str, str]:
+        self.upstream_requests += 1
+        # Streamed, so an endless live TS URL can't grow the body without bound. URIs come
+        # from upstream manifests, so every hop must be public: the body goes back to the client
+        check = None if self.allow_private else check_public_url
+        with open_public(self.session, url, check, timeout=15) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', 'application/octet-stream')
+            body = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                body += chunk
+                if len(body) > self.max_segment_bytes:
+                    raise Exception("Respuesta HLS demasiado grande")
+            return bytes(body), content_type, response.url
+
+    async def get_manifest(self, url: str) -> str:
+        """Return the rewritten playlist for url, refreshing it when stale"""
+        cached = self._manifests.get(url)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        async def refresh() -> str:
+            body, _, final_url = await run_in_threadpool(self._fetch, url)
+            content = body.decode('utf-8', errors='ignore')
+            if not content.lstrip('\ufeff').startswith('#EXTM3U'):
+                raise Exception("Manifest HLS inválido")
+
+            rewritten = rewrite_manifest(content, final_url, self.proxy_url)
+            if is_master_playlist(content):
+                ttl = self.master_ttl
+            else:
+                ttl = max(self.min_manifest_ttl, (target_duration(content) or 2.0) / 2)
+            self._manifests[url] = (time.monotonic() + ttl, rewritten)
+            if len(self._manifests) > 1000:
+                self.prune()
+            return rewritten
+
+        return await self._single_flight(f"m:{url}", refresh)
+
+    async def get_segment(self, url: str) -> Tuple[bytes, str]:
+        """Return segment bytes from cache or a single shared upstream fetch"""
+        cached = self.segments.get(url)
+        if cached:
+            return cached
+
+        async def fetch() -> Tuple[bytes, str]:
+            body, content_type, _ = await run_in_threadpool(self._fetch, url)
+            self.segments.put(url, body, content_type)
+            return body, content_type
+
+        return await self._single_flight(f"s:{url}", fetch)
+
+    def prune(self):
+        """Drop expired manifests of channels nobody watches anymore"""
+        now = time.monotonic()
+        for url in [u for u, (expires, _) in self._manifests.items() if expires < now - 60]:
+            self._manifests.pop(url, None)
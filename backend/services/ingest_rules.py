@@ -0,0 +1,150 @@
+"""Per-playlist rules applied to channels as a playlist is parsed.
+
+Providers ship far more channels than a library wants. Rules compiled once
+per ingest decide, channel by channel, which ones are kept and how they are
+named and categorized, so unwanted channels are never stored. Include and
+exclude patterns on the same field are merged into a single regex, so
+filtering costs one search per field whatever the number of rules (patterns
+with groups, whose numbering a merge would shift, are searched apart).
+"""
+import fnmatch
+import json
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from models.playlist import Channel, IngestRule
+from services.metrics import registry
+
+EXCLUDED_CHANNELS = registry.counter(
+    "iptv_ingest_channels_excluded_total",
+    "Parsed channels dropped by playlist ingest rules before being stored"
+)
+
+ALL_EXCLUDED = "Las reglas de ingesta excluyeron todos los canales de la lista"
+
+class AllExcludedError(ValueError):
+    """The rules left a playlist without channels; the request's fault, not the server's"""
+
+    def __init__(self):
+        super().__init__(ALL_EXCLUDED)
+
+# Host of a stream URL, without credentials or port; urlsplit is several times slower
+URL_HOST = re.compile(r'^[a-z][a-z0-9+.-]*://(?:[^@/?#]*@)?(\[[^\]/]*\]|[^:/?#]*)', re.IGNORECASE)
+
+def _url_host(channel: Channel) -> str:
+    match = URL_HOST.match(channel.url or "")
+    return match.group(1).lower() if match else ""
+
+FIELDS: Dict[str, Callable[[Channel], str]] = {
+    "name": lambda ch: ch.name or "",
+    "group_title": lambda ch: ch.group_title or "",
+    "url_host": _url_host,
+    "tvg_id": lambda ch: ch.tvg_id or "",
+}
+
+# Channel attribute set by each rewriting action
+TARGETS = {"rename": "name", "categorize": "category"}
+
+def _pattern(rule: IngestRule) -> str:
+    if rule.syntax == "glob":
+        return r"\A" + fnmatch.translate(rule.pattern)
+    return rule.pattern
+
+def _compile(rule: IngestRule) -> re.Pattern:
+    try:
+        return re.compile(_pattern(rule), re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"patrón inválido '{rule.pattern}': {e}")
+
+class Matcher:
+    """Whether any of several patterns matches, in one search for those that combine.
+
+    Joining patterns with ``|`` renumbers their groups, which breaks
+    backreferences, so patterns with groups are searched one by one.
+    """
+
+    def __init__(self, rules: List[IngestRule]):
+        compiled = [(_compile(rule), rule) for rule in rules]
+        self.separate = [pattern for pattern, _ in compiled if pattern.groups]
+        simple = [(pattern, rule) for pattern, rule in compiled if not pattern.groups]
+        self.combined = None
+        if simple:
+            try:
+                self.combined = re.compile("|".join(f"(?:{_pattern(rule)})" for _, rule in simple), re.IGNORECASE)
+            except re.error:
+                # Global inline flags only compile at the start of a pattern
+                self.separate += [pattern for pattern, _ in simple]
+
+    def search(self, value: str) -> bool:
+        if self.combined is not None and self.combined.search(value):
+            return True
+        return any(pattern.search(value) for pattern in self.separate)
+
+class IngestRules:
+    """Compiled ingest rules of a playlist; ``apply`` keeps or drops a channel, rewritten"""
+
+    def __init__(self, rules: List[IngestRule]):
+        self.rules = rules
+        # Equal for equal rule lists, so fetches with the same rules can share their result
+        self.key = json.dumps([rule.model_dump() for rule in rules], sort_keys=True)
+        self.includes = self._matchers(rules, "include")
+        self.excludes = self._matchers(rules, "exclude")
+        self.rewrites: List[Tuple[Callable[[Channel], str], re.Pattern, IngestRule]] = []
+        for rule in rules:
+            if rule.action not in TARGETS:
+                continue
+            if rule.value is None:
+                raise ValueError(f"la regla '{rule.action}' de '{rule.pattern}' requiere un valor")
+            pattern = _compile(rule)
+            if rule.syntax == "regex":
+                try:
+                    pattern.sub(rule.value, "")
+                except (re.error, IndexError) as e:
+                    raise ValueError(f"valor inválido '{rule.value}': {e}")
+            self.rewrites.append((FIELDS[rule.field], pattern, rule))
+
+    @staticmethod
+    def _matchers(rules: List[IngestRule], action: str) -> List[Tuple[Callable[[Channel], str], Matcher]]:
+        by_field: Dict[str, List[IngestRule]] = {}
+        for rule in rules:
+            if rule.action == action:
+                by_field.setdefault(rule.field, []).append(rule)
+        return [(FIELDS[field], Matcher(field_rules)) for field, field_rules in by_field.items()]
+
+    def keeps(self, channel: Channel) -> bool:
+        if self.includes and not any(matcher.search(value(channel)) for value, matcher in self.includes):
+            return False
+        return not any(matcher.search(value(channel)) for value, matcher in self.excludes)
+
+    def apply(self, channel: Channel, copy: bool = False) -> Optional[Channel]:
+        """The channel with its rewrites, or None when the rules drop it.
+
+        Rewrites are made in place unless ``copy``, for channels shared with
+        other callers. Every rewrite matches the values as parsed.
+        """
+        if not self.keeps(channel):
+            return None
+        updates = {}
+        for value, pattern, rule in self.rewrites:
+            match = pattern.search(value(channel))
+            if match:
+                updates[TARGETS[rule.action]] = match.expand(rule.value) if rule.syntax == "regex" else rule.value
+        if not updates:
+            return channel
+        if copy:
+            return channel.model_copy(update=updates)
+        for name, new in updates.items():
+            setattr(channel, name, new)
+        return channel
+
+    def apply_all(self, channels: Iterable[Channel], copy: bool = False) -> List[Channel]:
+        channels = list(channels)
+        kept = [ch for ch in (self.apply(ch, copy) for ch in channels) if ch is not None]
+        EXCLUDED_CHANNELS.inc(len(channels) - len(kept))
+        if not kept:
+            raise AllExcludedError()
+        return kept
+
+def compile_rules(rules: Optional[Iterable]) -> Optional[IngestRules]:
+    """Compile rules (models or their dicts); None without rules. Raises ValueError for invalid ones"""
+    rules = [rule if isinstance(rule, IngestRule) else IngestRule(**rule) for rule in rules or ()]
+    return IngestRules(rules) if rules else None
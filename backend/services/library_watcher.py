@@ -0,0 +1,96 @@
+"""Tell every worker about library changes made by the others.
+
+Playlist writes land on whichever worker or replica took the request, so
+anything a worker holds in memory (its channel tables) would go stale. The
+watcher follows the channel change log: through a Mongo change stream where
+the deployment supports one (replica sets, sharded clusters), otherwise by
+polling the log, which bounds the delay at one poll interval.
+
+Listeners get every logged change, including the worker's own, and are
+expected to skip what they already applied.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from storage.base import LibraryStorage
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds between polls of the change log when there is no change stream
+LIBRARY_WATCH_INTERVAL = float(os.environ.get('LIBRARY_WATCH_INTERVAL', 2))
+
+# Polls look back this far, for entries logged late or stamped by a skewed clock
+LIBRARY_WATCH_OVERLAP = float(os.environ.get('LIBRARY_WATCH_OVERLAP', 5))
+
+Listener = Callable[[dict], Awaitable]
+
+class LibraryWatcher:
+    """Delivers change log entries to in-process listeners, in log order"""
+
+    def __init__(self, library: LibraryStorage, interval: float = LIBRARY_WATCH_INTERVAL,
+                 overlap: float = LIBRARY_WATCH_OVERLAP):
+        self.library = library
+        self.interval = interval
+        self.overlap = overlap
+        self.listeners: List[Listener] = []
+        self.mode: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add_listener(self, listener: Listener):
+        self.listeners.append(listener)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        since = datetime.utcnow()
+        try:
+            self.mode = "stream"
+            async for entry in self.library.watch_changes():
+                since = max(since, entry["created_at"])
+                await self._dispatch(entry)
+        except NotImplementedError:
+            pass
+        except Exception as e:
+            logger.warning(f"Library change stream unavailable, polling every {self.interval}s: {e}")
+        self.mode = "poll"
+        # Picks up from the last streamed change, should the stream break
+        await self._poll(since)
+
+    async def _poll(self, since: datetime):
+        seen: Dict[Tuple[str, int], datetime] = {}
+        while True:
+            await asyncio.sleep(self.interval)
+            polled_at = datetime.utcnow()
+            try:
+                entries = await self.library.recent_changes(since - timedelta(seconds=self.overlap))
+            except Exception as e:
+                logger.error(f"Error polling library changes: {e}")
+                continue
+            for entry in entries:
+                key = (entry["owner_id"], entry["revision"])
+                if key not in seen:
+                    seen[key] = entry["created_at"]
+                    await self._dispatch(entry)
+            since = polled_at
+            horizon = since - timedelta(seconds=2 * self.overlap)
+            seen = {key: created_at for key, created_at in seen.items() if created_at > horizon}
+
+    async def _dispatch(self, entry: dict):
+        for listener in self.listeners:
+            try:
+                await listener(entry)
+            except Exception as e:
+                logger.error(f"Error applying library change {entry.get('owner_id')}@{entry.get('revision')}: {e}")
@@ -0,0 +1,252 @@
+import io
+import os
+import hashlib
+import mimetypes
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+from services.public_url import check_public_url, open_public
+import logging
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = (64, 128, 256)
+DEFAULT_SIZE = 128
+
+# Failed fetches are not retried before this many seconds
+FAILURE_TTL = 300
+
+# Leading bytes of the raster formats accepted when Pillow can't verify them
+IMAGE_SIGNATURES = (b'\x89PNG\r\n\x1a\n', b'\xff\xd8\xff', b'GIF87a', b'GIF89a', b'\x00\x00\x01\x00')
+
+def _pillow():
+    """PIL.Image, imported by the first resize rather than at startup"""
+    try:
+        from PIL import Image
+    except ImportError:  # Pillow is optional, originals are served unresized without it
+        return None
+    return Image
+
+def is_svg(content: bytes) -> bool:
+    head = content[:1024].lstrip().lower()
+    return head.startswith((b'<svg', b'<?xml')) and b'<svg' in head
+
+def logo_hash(url: str) -> str:
+    """Stable identifier for a logo URL"""
+    return hashlib.sha256(url.strip().encode('utf-8')).hexdigest()[:32]
+
+class LogoCache:
+    """Fetch channel logos once, store resized thumbnails on disk.
+
+    The cache directory is bounded by ``max_bytes``; least recently served
+    files are evicted first. Hash -> source URL mappings live in Mongo so any
+    worker can resolve a logo another worker advertised.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int,
+        base_url: str = "",
+        sizes: Iterable[int] = THUMBNAIL_SIZES,
+        max_download_bytes: int = 2 * 1024 * 1024,
+        allow_private: bool = False
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.base_url = base_url.rstrip('/')
+        self.sizes = tuple(sizes)
+        self.max_download_bytes = max_download_bytes
+        # Only for tests and trusted deployments serving logos from their own network
+        self.allow_private = allow_private
+        self._session = None
+
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        self._failures = {}
+        self._entries = OrderedDict()
+        self._originals = {}
+        self._total_bytes = 0
+        self._loaded = False
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def session(self):
+        # requests is imported by the first download rather than at startup
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            self._session.headers['User-Agent'] = 'Mozilla/5.0'
+        return self._session
+
+    def _load_entries(self):
+        """Rebuild LRU order from the files already on disk (lock held).
+
+        Runs on first use instead of in __init__: a large cache directory
+        would otherwise be scanned by every worker before it can start.
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        files = []
+        for path in self.cache_dir.iterdir():
+            if path.is_file() and not path.name.endswith('.tmp'):
+                stat = path.stat()
+                files.append((stat.st_atime, path.name, stat.st_size))
+
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+            self._track_original(name)
+
+    def _track_original(self, name: str):
+        # Originals are kept only for formats Pillow can't resize (e.g. SVG)
+        if '_orig' in name:
+            self._originals[name.split('_orig', 1)[0]] = name
+
+    def proxy_url(self, url: Optional[str]) -> Optional[str]:
+        """Rewrite a third-party logo URL to the proxy endpoint"""
+        if not url or not url.startswith(('http://', 'https://')):
+            return url
+        return f"{self.base_url}/api/logos/{logo_hash(url)}"
+
+    async def register(self, collection, urls: Iterable[Optional[str]]):
+        """Record hash -> URL for logos that may be requested later"""
+        urls = {url.strip() for url in urls if url and url.startswith(('http://', 'https://'))}
+        if not urls:
+            return
+        from pymongo import UpdateOne
+        await collection.bulk_write(
+            [
+                UpdateOne(
+                    {"hash": logo_hash(url)},
+                    {"$setOnInsert": {"hash": logo_hash(url), "url": url}},
+                    upsert=True
+                )
+                for url in urls
+            ],
+            ordered=False
+        )
+
+    def cached_path(self, url_hash: str, size: int) -> Optional[Path]:
+        """Return the stored thumbnail, marking it as recently used"""
+        with self._lock:
+            self._load_entries()
+            for name in (f"{url_hash}_{size}.png", self._originals.get(url_hash)):
+                if name and name in self._entries:
+                    self._entries.move_to_end(name)
+                    return self.cache_dir / name
+        return None
+
+    def fetch(self, url_hash: str, url: str, size: int) -> Optional[Path]:
+        """Download the logo once and store every thumbnail size"""
+        with self._lock:
+            lock = self._fetch_locks.setdefault(url_hash, threading.Lock())
+
+        with lock:
+            # Another request may have fetched it while we waited
+            path = self.cached_path(url_hash, size)
+            if path:
+                return path
+
+            failed_at = self._failures.get(url_hash)
+            if failed_at and time.monotonic() - failed_at < FAILURE_TTL:
+                return None
+
+            try:
+                content, content_type = self._download(url)
+                self._store_thumbnails(url_hash, content, content_type)
+                self._failures.pop(url_hash, None)
+            except Exception as e:
+                logger.warning(f"Error fetching logo {url}: {e}")
+                self._failures[url_hash] = time.monotonic()
+                return None
+            finally:
+                with self._lock:
+                    self._fetch_locks.pop(url_hash, None)
+
+        return self.cached_path(url_hash, size)
+
+    def _download(self, url: str):
+        check = None if self.allow_private else check_public_url
+        with open_public(self.session, url, check, timeout=10) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            if not content_type.startswith('image/'):
+                raise Exception(f"Tipo de contenido no soportado: {content_type or 'ninguno'}")
+
+            data = io.BytesIO()
+            for chunk in response.iter_content(64 * 1024):
+                data.write(chunk)
+                if data.tell() > self.max_download_bytes:
+                    raise Exception("Logo demasiado grande")
+            return data.getvalue(), content_type
+
+    def _store_thumbnails(self, url_hash: str, content: bytes, content_type: str):
+        image = None
+        Image = _pillow()
+        if Image is not None:
+            try:
+                image = Image.open(io.BytesIO(content))
+                image.load()
+            except Exception:
+                image = None
+
+        if image is None:
+            # Only SVG, served sandboxed, and rasters Pillow couldn't check are kept as sent
+            if content_type == 'image/svg+xml' and is_svg(content):
+                self._write(f"{url_hash}_orig.svg", content)
+            elif Image is None and content.startswith(IMAGE_SIGNATURES):
+                extension = mimetypes.guess_extension(content_type) or '.img'
+                self._write(f"{url_hash}_orig{extension}", content)
+            else:
+                raise Exception("El contenido no es una imagen válida")
+            return
+
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        for size in self.sizes:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size))
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, format='PNG', optimize=True)
+            self._write(f"{url_hash}_{size}.png", buffer.getvalue())
+
+    def _write(self, name: str, data: bytes):
+        path = self.cache_dir / name
+        tmp_path = path.with_name(name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._load_entries()
+            self._total_bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._track_original(name)
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used files until under budget (lock held)"""
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            if '_orig' in name:
+                self._originals.pop(name.split('_orig', 1)[0], None)
+            try:
+                os.remove(self.cache_dir / name)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load_entries()
+            return {
+                "files": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
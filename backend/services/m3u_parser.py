@@ -1,7 +1,8 @@
 import re
-import requests
-from typing import List, Optional
+from typing import Iterable, List, Optional
 from models.playlist import Channel, ChannelCreate
+from services.ingest_rules import IngestRules, AllExcludedError, EXCLUDED_CHANNELS
+from services.metrics import span
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,8 +12,10 @@ class M3UParser:
         self.channel_regex = re.compile(r'#EXTINF:(-?\d+)(?:\s+.*?)?,(.+)')
         self.attribute_regex = re.compile(r'(\w+[-\w]*)="([^"]*)"')
         
-    def parse_from_url(self, url: str) -> List[Channel]:
+    def parse_from_url(self, url: str, rules: Optional[IngestRules] = None) -> List[Channel]:
         """Parse M3U/M3U8 playlist from URL"""
+        # Only URL playlists need requests, so it is not imported at startup
+        import requests
         try:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -23,41 +26,53 @@ class M3UParser:
                 'Upgrade-Insecure-Requests': '1',
             }
             
-            response = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
-            response.raise_for_status()
+            with span("m3u.download"):
+                response = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
+                response.raise_for_status()
+                raw = response.content
             
             # Try different encodings
             content = None
-            for encoding in ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']:
-                try:
-                    content = response.content.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            
-            if content is None:
-                content = response.content.decode('utf-8', errors='ignore')
+            with span("m3u.decode"):
+                for encoding in ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']:
+                    try:
+                        content = raw.decode(encoding)
+                        break
+                    except UnicodeDecodeError:
+                        continue
+                
+                if content is None:
+                    content = raw.decode('utf-8', errors='ignore')
             
-            return self.parse_content(content)
+            return self.parse_content(content, rules)
             
         except requests.RequestException as e:
             logger.error(f"Error downloading M3U from URL {url}: {e}")
             raise Exception(f"Error al descargar la lista: {str(e)}")
+        except AllExcludedError:
+            raise
         except Exception as e:
             logger.error(f"Error parsing M3U from URL {url}: {e}")
             raise Exception(f"Error al procesar la lista: {str(e)}")
     
-    def parse_from_file(self, file_content: str) -> List[Channel]:
+    def parse_from_file(self, file_content: str, rules: Optional[IngestRules] = None) -> List[Channel]:
         """Parse M3U/M3U8 playlist from file content"""
         try:
-            return self.parse_content(file_content)
+            return self.parse_content(file_content, rules)
+        except AllExcludedError:
+            raise
         except Exception as e:
             logger.error(f"Error parsing M3U file: {e}")
             raise Exception(f"Error al procesar el archivo: {str(e)}")
     
-    def parse_content(self, content: str) -> List[Channel]:
-        """Parse M3U/M3U8 content and return list of channels"""
+    def parse_content(self, content: str, rules: Optional[IngestRules] = None) -> List[Channel]:
+        """Parse M3U/M3U8 content and return list of channels, the ones kept by ``rules`` if any"""
+        with span("m3u.parse"):
+            return self._parse_content(content, rules)
+    
+    def _parse_content(self, content: str, rules: Optional[IngestRules] = None) -> List[Channel]:
         channels = []
+        excluded = 0
         lines = content.strip().split('\n')
         
         # Remove BOM if present
@@ -85,13 +100,22 @@ class M3UParser:
                 current_channel.url = line
                 
                 # Validate URL
-                if self._is_valid_stream_url(line):
+                if not self._is_valid_stream_url(line):
+                    logger.warning(f"URL de stream inválida: {line}")
+                elif rules is None:
+                    channels.append(current_channel)
+                elif rules.apply(current_channel) is not None:
                     channels.append(current_channel)
                 else:
-                    logger.warning(f"URL de stream inválida: {line}")
+                    excluded += 1
                 
                 current_channel = None
         
+        if excluded:
+            EXCLUDED_CHANNELS.inc(excluded)
+            logger.info(f"Ingest rules excluded {excluded} channels")
+        if not channels and excluded:
+            raise AllExcludedError()
         if not channels:
             raise Exception("No se encontraron canales válidos en la lista")
             
@@ -118,7 +142,7 @@ class M3UParser:
         attrs = {}
         for match in self.attribute_regex.finditer(duration_and_attrs):
             key, value = match.groups()
-            attrs[key.lower()] = value
+            attrs[key.lower()] = value.strip()
         
         # Create channel with improved attribute handling
         channel = Channel(
@@ -167,10 +191,14 @@ class M3UParser:
     
     def get_categories(self, channels: List[Channel]) -> List[str]:
         """Extract unique categories from channels"""
+        return self.sort_categories(channel.category for channel in channels)
+    
+    def sort_categories(self, names: Iterable[Optional[str]]) -> List[str]:
+        """Deduplicate and order category names for the category menu"""
         categories = set()
-        for channel in channels:
-            if channel.category and channel.category.strip():
-                categories.add(channel.category.strip())
+        for name in names:
+            if name and name.strip():
+                categories.add(name.strip())
         
         # Sort categories and ensure "General" comes after "Todos"
         sorted_categories = sorted(list(categories))
@@ -243,4 +271,15 @@ class M3UParser:
                 current_channel = None
         
         info['categories'] = len(info['categories'])
-        return info
\ No newline at end of file
+        return info
+    
+    def format_channel(self, channel: dict) -> str:
+        """#EXTINF and URL lines of a stored channel, read back by parse_content"""
+        attrs = ""
+        for key, field in (('tvg-id', 'tvg_id'), ('tvg-name', 'tvg_name'), ('tvg-logo', 'logo'),
+                           ('group-title', 'group_title')):
+            value = (channel.get(field) or '').replace('"', "'")
+            if value:
+                attrs += f' {key}="{value}"'
+        name = ' '.join((channel.get('name') or '').split())
+        return f"#EXTINF:-1{attrs},{name}\n{channel['url']}\n"
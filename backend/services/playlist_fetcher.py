@@ -0,0 +1,119 @@
+"""Download and parse URL playlists once for all concurrent identical requests.
+
+When a popular provider updates, many users import or refresh the same URL
+at once. Requests for the same normalized URL join the fetch already in
+flight instead of downloading and parsing the list again. Parsing runs on a
+worker thread, so the event loop keeps serving meanwhile, with the ingest
+rules applied to each channel as it is parsed. Callers with other rules
+filter the channels of a fetch without rules instead of downloading again.
+Batches of URLs are fetched concurrently, within a bound overall and per host.
+"""
+import asyncio
+import os
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlsplit, urlunsplit
+from starlette.concurrency import run_in_threadpool
+from models.playlist import Channel
+from services.m3u_parser import M3UParser
+from services.ingest_rules import IngestRules
+from services.metrics import registry
+
+COALESCED_FETCHES = registry.counter(
+    "iptv_playlist_fetches_coalesced_total",
+    "URL playlist imports and refreshes served by a fetch already in flight"
+)
+
+# Downloads in flight for one batch import, and for one host of the batch
+PLAYLIST_FETCH_CONCURRENCY = int(os.environ.get('PLAYLIST_FETCH_CONCURRENCY', 8))
+PLAYLIST_FETCH_PER_HOST = int(os.environ.get('PLAYLIST_FETCH_PER_HOST', 2))
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url: str) -> str:
+    """Key for URLs that fetch the same list: scheme and host case, default ports and fragments don't matter"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    if parts.username or parts.password:
+        host = f"{parts.username or ''}:{parts.password or ''}@{host}"
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+class PlaylistFetcher:
+    """Single-flight ``parse_from_url``, keyed by normalized URL and ingest rules"""
+
+    def __init__(self, parser: M3UParser):
+        self.parser = parser
+        self._inflight: Dict[Tuple[str, Optional[str]], asyncio.Future] = {}
+
+    async def _join(self, flight: Tuple[str, Optional[str]]) -> Optional[List[Channel]]:
+        """Channels of the fetch in flight under this key, None when there is none"""
+        future = self._inflight.get(flight)
+        if future is not None:
+            COALESCED_FETCHES.inc()
+        while future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The request fetching the list went away: fetch it again, or join a newer fetch
+                if not future.cancelled():
+                    raise
+            future = self._inflight.get(flight)
+        return None
+
+    async def parse_from_url(self, url: str, rules: Optional[IngestRules] = None) -> List[Channel]:
+        """Channels of a URL playlist, the rules applied to each channel as it is parsed.
+
+        Callers with the same rules share one fetch. Callers with other rules
+        filter the channels of a fetch in flight without rules, if any, and
+        otherwise fetch the list themselves.
+        """
+        key = normalize_url(url)
+        flight = (key, rules.key if rules is not None else None)
+        channels = await self._join(flight)
+        if channels is None and rules is not None:
+            channels = await self._join((key, None))
+            if channels is not None:
+                # Other callers may still be reading the shared channels, so rewrites copy them
+                channels = await run_in_threadpool(rules.apply_all, channels, True)
+        if channels is not None:
+            # Channel ids must stay unique per playlist stored, so joiners get their own
+            return [ch.model_copy(update={"id": str(uuid.uuid4())}) for ch in channels]
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight] = future
+        try:
+            channels = await run_in_threadpool(self.parser.parse_from_url, url, rules)
+            future.set_result(channels)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(flight, None)
+            if not future.done():
+                future.cancel()
+        return channels
+
+    async def parse_many(
+        self,
+        urls: Sequence[str],
+        rules: Sequence[Optional[IngestRules]],
+        concurrency: int = PLAYLIST_FETCH_CONCURRENCY,
+        per_host: int = PLAYLIST_FETCH_PER_HOST
+    ) -> List[Union[List[Channel], Exception]]:
+        """``parse_from_url`` for each URL with its rules, the failures returned in their place"""
+        pool = asyncio.Semaphore(concurrency)
+        hosts = defaultdict(lambda: asyncio.Semaphore(per_host))
+
+        async def fetch(url: str, url_rules: Optional[IngestRules]) -> List[Channel]:
+            # The host slot comes first, so URLs waiting on a busy host don't hold pool slots
+            async with hosts[urlsplit(url.strip()).hostname or ""], pool:
+                return await self.parse_from_url(url, url_rules)
+
+        return await asyncio.gather(*(fetch(url, url_rules) for url, url_rules in zip(urls, rules)),
+                                    return_exceptions=True)
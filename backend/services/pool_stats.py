@@ -0,0 +1,84 @@
+from pymongo import monitoring
+from typing import Dict
+import threading
+import time
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Tracks connection pool usage per server for /api/health"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers: Dict[str, dict] = {}
+        self._checkout_started = threading.local()
+
+    def _server(self, address) -> dict:
+        key = f"{address[0]}:{address[1]}"
+        server = self._servers.get(key)
+        if server is None:
+            server = self._servers[key] = {
+                "open": 0, "checked_out": 0, "max_checked_out": 0,
+                "checkouts": 0, "checkout_failures": 0, "cleared": 0,
+                "wait_total_ms": 0.0, "wait_max_ms": 0.0,
+            }
+        return server
+
+    def pool_created(self, event):
+        with self._lock:
+            self._server(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._server(event.address)["cleared"] += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._servers.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._server(event.address)["open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._server(event.address)["open"] -= 1
+
+    def connection_check_out_started(self, event):
+        # Check-outs run on the executor thread performing the operation
+        self._checkout_started.value = time.perf_counter()
+
+    def _waited_ms(self) -> float:
+        started = getattr(self._checkout_started, "value", None)
+        return (time.perf_counter() - started) * 1000 if started else 0.0
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._server(event.address)["checkout_failures"] += 1
+
+    def connection_checked_out(self, event):
+        waited = self._waited_ms()
+        with self._lock:
+            server = self._server(event.address)
+            server["checkouts"] += 1
+            server["checked_out"] += 1
+            server["max_checked_out"] = max(server["max_checked_out"], server["checked_out"])
+            server["wait_total_ms"] += waited
+            server["wait_max_ms"] = max(server["wait_max_ms"], waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._server(event.address)["checked_out"] -= 1
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            servers = {address: dict(server) for address, server in self._servers.items()}
+        for server in servers.values():
+            checkouts = server["checkouts"] or 1
+            server["wait_avg_ms"] = round(server.pop("wait_total_ms") / checkouts, 3)
+            server["wait_max_ms"] = round(server["wait_max_ms"], 3)
+        return servers
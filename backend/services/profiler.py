@@ -0,0 +1,162 @@
+import collections
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+class SamplingProfiler:
+    """Periodically samples one thread's Python stack into collapsed stacks.
+
+    Output is the folded format understood by flamegraph.pl and speedscope:
+    one ``frame;frame;frame count`` line per distinct stack, root first.
+    The target thread runs at full speed; only the sampler thread wakes up.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.002, max_depth: int = 64):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Dict[str, int] = collections.Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(self._frame_label(frame))
+            frame = frame.f_back
+        self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def collapsed(self) -> str:
+        """Folded stacks, heaviest first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 20) -> List[dict]:
+        """Functions by self time (samples where they were the innermost frame)"""
+        own = collections.Counter()
+        for stack, count in self.stacks.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            own[leaf.rsplit(":", 1)[0]] += count
+        total = self.samples or 1
+        return [
+            {"function": name, "samples": count, "percent": round(100 * count / total, 1)}
+            for name, count in own.most_common(limit)
+        ]
+
+    def summary(self) -> dict:
+        return {
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "duration_s": round(self.duration, 4),
+            "top_functions": self.top_functions(),
+        }
+
+class ProfileStore:
+    """Keeps the most recent request profiles in memory for later download"""
+
+    def __init__(self, max_profiles: int = 50):
+        self.max_profiles = max_profiles
+        self._profiles: "collections.OrderedDict[str, dict]" = collections.OrderedDict()
+
+    def add(self, profile_id: str, profile: dict):
+        self._profiles[profile_id] = profile
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[dict]:
+        return [
+            {k: v for k, v in profile.items() if k != "collapsed"}
+            for profile in reversed(self._profiles.values())
+        ]
+
+class ProfilingMiddleware:
+    """Samples requests that carry ``X-Profile: 1`` and a valid admin token.
+
+    The profile id is returned in ``X-Profile-Id``; the result is kept in
+    ``store``. Sampling covers the event loop thread, so concurrent requests
+    served during the profiled one show up in its stacks too.
+    Only installed when profiling is enabled, so it costs nothing otherwise.
+    """
+
+    def __init__(self, app, store: ProfileStore, is_admin, path_prefix: str = "/api/playlists",
+                 interval: float = 0.002):
+        self.app = app
+        self.store = store
+        self.is_admin = is_admin
+        self.path_prefix = path_prefix
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile", b"").lower() not in (b"1", b"true", b"yes") \
+                or not self.is_admin(headers.get(b"x-admin-token", b"").decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode("ascii"))
+                ]
+            await send(message)
+
+        profiler = SamplingProfiler(interval=self.interval).start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            self.store.add(profile_id, dict(
+                id=profile_id,
+                method=scope["method"],
+                path=scope["path"],
+                created_at=time.time(),
+                collapsed=profiler.collapsed(),
+                **profiler.summary()
+            ))
@@ -0,0 +1,42 @@
+"""Fetching URLs taken from playlists without reaching the server's own network.
+
+Logo, manifest and segment URLs come from third-party playlists. Before
+each request, redirects included, the host must resolve only to public
+addresses, so a playlist can't make the server fetch (and hand back)
+cloud metadata endpoints, loopback services or hosts on the private network.
+"""
+import ipaddress
+import socket
+from typing import Callable, Optional
+from urllib.parse import urljoin, urlsplit
+
+# Redirects followed per request, each one checked like the original URL
+MAX_REDIRECTS = 5
+
+def check_public_url(url: str):
+    """Refuse URLs that resolve to private, loopback, link-local or other non-public addresses"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f"URL no permitida: {url}")
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    for info in socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM):
+        address = ipaddress.ip_address(info[4][0].split('%', 1)[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"Dirección no permitida: {parts.hostname}")
+
+def open_public(session, url: str, check: Optional[Callable[[str], None]] = check_public_url, **kwargs):
+    """Streamed GET following redirects hop by hop, ``check`` run on every hop (None skips it).
+
+    The caller closes the response; its ``url`` is the last hop's.
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        if check is not None:
+            check(url)
+        response = session.get(url, stream=True, allow_redirects=False, **kwargs)
+        if not response.is_redirect:
+            return response
+        response.close()
+        url = urljoin(url, response.headers['Location'])
+    raise ValueError("Demasiadas redirecciones")
@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import time
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+from starlette.concurrency import run_in_threadpool
+from services.public_url import check_public_url, open_public
+from services.hls_manifest import is_master_playlist, parse_master_playlist
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Probe results expire after this many seconds
+STREAM_PROBE_TTL = int(os.environ.get('STREAM_PROBE_TTL', 3600))
+
+# Playlists larger than this are not master playlists worth parsing
+MAX_MANIFEST_BYTES = 512 * 1024
+
+# Maximum number of URL hashes sent in a single $in lookup
+HASH_LOOKUP_CHUNK = 5000
+
+def url_hash(url: str) -> str:
+    return hashlib.sha1(url.strip().encode('utf-8')).hexdigest()
+
+def is_hls_url(url: str) -> bool:
+    return '.m3u8' in (url or '').lower()
+
+class StreamProbe:
+    """Check stream availability and pre-resolve HLS master playlists.
+
+    Results are cached in Mongo for ``ttl`` seconds (a TTL index expires
+    them), so channel listings can hand clients the variant list and save
+    the master playlist round-trip when starting playback.
+    """
+
+    def __init__(self, ttl: int = 3600, timeout: float = 8.0, concurrency: int = 16, allow_private: bool = False):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.concurrency = concurrency
+        # Only for tests and deployments streaming from sources on their own network
+        self.allow_private = allow_private
+        self._session = None
+
+    @property
+    def session(self):
+        # requests is imported by the first download rather than at startup
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            self._session.headers['User-Agent'] = 'Mozilla/5.0'
+        return self._session
+
+    def probe(self, url: str) -> dict:
+        """Fetch a stream URL once and describe what is behind it"""
+        import requests
+
+        result = {
+            "url_hash": url_hash(url),
+            "url": url,
+            "online": False,
+            "latency_ms": None,
+            "variants": [],
+            "checked_at": datetime.utcnow(),
+        }
+
+        start = time.monotonic()
+        try:
+            check = None if self.allow_private else check_public_url
+            with open_public(self.session, url, check, timeout=self.timeout) as response:
+                response.raise_for_status()
+                result["online"] = True
+                result["latency_ms"] = int((time.monotonic() - start) * 1000)
+
+                if not is_hls_url(url):
+                    return result
+
+                body = b''
+                for chunk in response.iter_content(64 * 1024):
+                    body += chunk
+                    if len(body) > MAX_MANIFEST_BYTES:
+                        return result
+
+                content = body.decode('utf-8', errors='ignore')
+                if is_master_playlist(content):
+                    result["variants"] = parse_master_playlist(content, response.url)
+        except (requests.RequestException, OSError, ValueError) as e:
+            # Unreachable, unresolvable or non-public streams are reported offline
+            logger.debug(f"Probe failed for {url}: {e}")
+
+        return result
+
+    async def probe_urls(self, collection, urls: Iterable[str]) -> List[dict]:
+        """Probe URLs with bounded concurrency and store the results"""
+        urls = list(dict.fromkeys(url for url in urls if url))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(url: str) -> dict:
+            async with semaphore:
+                return await run_in_threadpool(self.probe, url)
+
+        results = await asyncio.gather(*(run(url) for url in urls))
+
+        if results:
+            from pymongo import ReplaceOne
+            await collection.bulk_write(
+                [ReplaceOne({"url_hash": r["url_hash"]}, r, upsert=True) for r in results],
+                ordered=False
+            )
+
+        online = sum(1 for r in results if r["online"])
+        logger.info(f"Probed {len(results)} streams, {online} online")
+        return results
+
+    async def variants_for(self, collection, urls: Iterable[str]) -> Dict[str, List[dict]]:
+        """Cached variant lists for the given HLS URLs, keyed by URL"""
+        hashes = list({url_hash(url) for url in urls if is_hls_url(url)})
+        fresh_after = datetime.utcnow() - timedelta(seconds=self.ttl)
+
+        variants = {}
+        for i in range(0, len(hashes), HASH_LOOKUP_CHUNK):
+            async for probe in collection.find(
+                {
+                    "url_hash": {"$in": hashes[i:i + HASH_LOOKUP_CHUNK]},
+                    "checked_at": {"$gt": fresh_after},
+                    "variants.0": {"$exists": True},
+                },
+                {"_id": 0, "url": 1, "variants": 1}
+            ):
+                variants[probe["url"]] = probe["variants"]
+
+        return variants
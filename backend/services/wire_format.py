@@ -0,0 +1,109 @@
+"""Compact encodings of channel lists, picked by the request's Accept header.
+
+A JSON array of channels repeats every key, and the same category and group
+strings, on each row. The columnar format sends one array per field instead
+("struct of arrays"), with categories and group titles replaced by indexes
+into a per-response dictionary:
+
+    {"count": 2, "fields": ["id", "name", ...],
+     "columns": {"id": ["a", "b"], "category": [0, 0], ...},
+     "dictionaries": {"category": ["Sports"], "group_title": [...]}}
+
+It is served as JSON (``application/vnd.iptv.columns+json``) or, when the
+optional ``msgpack`` package is installed, as MessagePack
+(``application/msgpack``). Plain JSON stays the default.
+"""
+import json
+from typing import Dict, Iterable, List, Optional
+from pydantic import BaseModel
+
+JSON_MEDIA_TYPE = "application/json"
+COLUMNS_MEDIA_TYPE = "application/vnd.iptv.columns+json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Other names clients send for MessagePack
+MSGPACK_ALIASES = ("application/x-msgpack", "application/vnd.msgpack")
+
+# Fields sent as indexes into a dictionary of their distinct values
+DICTIONARY_FIELDS = ("category", "group_title")
+
+def _msgpack():
+    """The msgpack module, or None where the optional package is not installed"""
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+def available_media_types() -> List[str]:
+    media_types = [JSON_MEDIA_TYPE, COLUMNS_MEDIA_TYPE]
+    if _msgpack() is not None:
+        media_types.append(MSGPACK_MEDIA_TYPE)
+    return media_types
+
+def negotiate(accept: Optional[str]) -> str:
+    """Best available media type for an Accept header; JSON when nothing else is preferred"""
+    if not accept:
+        return JSON_MEDIA_TYPE
+    available = available_media_types()
+    best, best_quality = JSON_MEDIA_TYPE, 0.0
+    for part in accept.split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        media_type = media_type.lower()
+        if media_type in MSGPACK_ALIASES:
+            media_type = MSGPACK_MEDIA_TYPE
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        # Wildcards accept the default
+        if media_type in ("*/*", "application/*"):
+            media_type = JSON_MEDIA_TYPE
+        # Strictly better only, so ties go to the type listed first
+        if media_type in available and quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+class ColumnarChannels:
+    """Channel responses gathered column by column, chunk after chunk"""
+
+    def __init__(self):
+        self.count = 0
+        self.fields: Optional[List[str]] = None
+        self.columns: Dict[str, list] = {}
+        self.dictionaries: Dict[str, Dict[str, int]] = {field: {} for field in DICTIONARY_FIELDS}
+
+    def extend(self, items: Iterable[BaseModel]):
+        items = list(items)
+        if not items:
+            return
+        if self.fields is None:
+            self.fields = list(type(items[0]).model_fields)
+            self.columns = {field: [] for field in self.fields}
+        for field in self.fields:
+            values = [getattr(item, field) for item in items]
+            codes = self.dictionaries.get(field)
+            if codes is not None:
+                values = [codes.setdefault(value, len(codes)) if value is not None else None for value in values]
+            elif any(isinstance(value, list) and value and isinstance(value[0], BaseModel) for value in values):
+                # Nested models (stream variants) as plain dicts
+                values = [[v.model_dump(mode="json") for v in value] if value else value for value in values]
+            self.columns[field].extend(values)
+        self.count += len(items)
+
+    def document(self) -> dict:
+        return {
+            "count": self.count,
+            "fields": self.fields or [],
+            "columns": self.columns,
+            "dictionaries": {field: list(codes) for field, codes in self.dictionaries.items()},
+        }
+
+    def encode(self, media_type: str) -> bytes:
+        if media_type == MSGPACK_MEDIA_TYPE:
+            return _msgpack().packb(self.document(), use_bin_type=True)
+        return json.dumps(self.document(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,19 @@
+from storage.base import LibraryStorage
+import os
+
+# "mongo" (default) or "sqlite" for single-box deployments without a Mongo server
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo').lower()
+
+# Database file of the sqlite backend
+SQLITE_PATH = os.environ.get('SQLITE_PATH', '/app/data/library.db')
+
+def create_storage(backend: str = STORAGE_BACKEND) -> LibraryStorage:
+    """Open the configured backend; only its own driver is imported"""
+    if backend == "mongo":
+        from database import db, read_db
+        from storage.mongo import MongoStorage
+        return MongoStorage(db, read_db)
+    if backend == "sqlite":
+        from storage.sqlite import SQLiteStorage
+        return SQLiteStorage(SQLITE_PATH)
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}, use 'mongo' or 'sqlite'")
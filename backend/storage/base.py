@@ -0,0 +1,149 @@
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from models.playlist import Playlist, Channel
+
+# Stored channel fields exposed by ChannelResponse
+CHANNEL_RESPONSE_FIELDS = ("id", "name", "url", "logo", "category", "is_live", "group_title")
+
+# Channel fields the fuzzy search index is built from
+SEARCH_ENTRY_FIELDS = ("id", "name", "tvg_name", "category")
+
+class LibraryStorage:
+    """Where playlists, their channels and the deduplicated channel view live.
+
+    Every method is scoped to one owner's library. Channel listings are
+    yielded in chunks of plain dicts holding ``CHANNEL_RESPONSE_FIELDS``;
+    merged listings yield channel cluster dicts.
+    """
+
+    name = "base"
+
+    # Mongo databases for the shared caches (stream probes, logo sources) that
+    # have no equivalent on embedded backends, where they stay None
+    db = None
+    read_db = None
+
+    @property
+    def primary(self) -> "LibraryStorage":
+        """This library with listings read from where writes land, for read-your-writes"""
+        return self
+
+    async def insert_playlist(self, playlist: Playlist):
+        raise NotImplementedError
+
+    async def insert_playlists(self, playlists: List[Playlist]) -> Dict[int, str]:
+        """Several playlists in one write; the others are stored when some fail.
+
+        Returns the error of each playlist not stored, by its position.
+        """
+        raise NotImplementedError
+
+    async def get_playlist(self, owner_id: str, playlist_id: str) -> Optional[dict]:
+        """Playlist fields without its channels"""
+        raise NotImplementedError
+
+    def list_playlists(self, owner_id: str) -> AsyncIterator[dict]:
+        """Playlists without their channels"""
+        raise NotImplementedError
+
+    async def channel_urls(self, owner_id: str, playlist_id: str) -> Optional[List[str]]:
+        raise NotImplementedError
+
+    async def update_channels(self, owner_id: str, playlist_id: str, channels: List[Channel],
+                              last_updated: datetime):
+        raise NotImplementedError
+
+    async def delete_playlist(self, owner_id: str, playlist_id: str) -> bool:
+        raise NotImplementedError
+
+    def channel_chunks(
+        self,
+        owner_id: str,
+        playlist_id: Optional[str],
+        category: Optional[str],
+        search: Optional[str],
+        chunk_size: int
+    ) -> AsyncIterator[List[dict]]:
+        """Matching channels of one playlist, or of the whole library, in playlist order"""
+        raise NotImplementedError
+
+    async def playlist_channels(self, owner_id: str, chunk_size: int) -> AsyncIterator[Tuple[str, List[dict]]]:
+        """Every channel of the library in order, in chunks tagged with their playlist id.
+
+        Empty playlists yield one empty chunk, so they keep their place in the order.
+        """
+        playlist_ids = [playlist["id"] async for playlist in self.list_playlists(owner_id)]
+        for playlist_id in playlist_ids:
+            empty = True
+            async for chunk in self.channel_chunks(owner_id, playlist_id, None, None, chunk_size):
+                empty = False
+                yield playlist_id, chunk
+            if empty:
+                yield playlist_id, []
+
+    async def categories(self, owner_id: str) -> List[str]:
+        """Distinct channel categories, unsorted"""
+        raise NotImplementedError
+
+    def search_entries(self, owner_id: str, chunk_size: int) -> AsyncIterator[List[dict]]:
+        """Every channel's ``SEARCH_ENTRY_FIELDS`` and ``playlist_id``, in chunks"""
+        raise NotImplementedError
+
+    async def channels_by_id(self, owner_id: str, channel_ids: List[str]) -> List[dict]:
+        """Playlist channels with these ids, in no particular order"""
+        raise NotImplementedError
+
+    async def channel_url(self, owner_id: str, channel_id: str) -> Optional[str]:
+        """Stream URL of a playlist channel or of a merged channel's primary stream"""
+        raise NotImplementedError
+
+    async def update_clusters(self, owner_id: str, playlist_id: str, channels: Optional[List[Channel]]):
+        """Replace a playlist's streams in the deduplicated view"""
+        raise NotImplementedError
+
+    def cluster_chunks(
+        self,
+        owner_id: str,
+        category: Optional[str],
+        search: Optional[str],
+        chunk_size: int
+    ) -> AsyncIterator[List[dict]]:
+        """Matching channel clusters that still have streams"""
+        raise NotImplementedError
+
+    async def record_change(self, owner_id: str, playlist_id: str, change: dict) -> int:
+        """Log a playlist change under the owner's next library revision, which is returned"""
+        raise NotImplementedError
+
+    async def library_revision(self, owner_id: str) -> dict:
+        """The owner's latest ``revision`` and the last one dropped from the log (``compacted_through``)"""
+        raise NotImplementedError
+
+    async def changes_since(self, owner_id: str, revision: int) -> List[dict]:
+        """Logged changes after a revision, in revision order"""
+        raise NotImplementedError
+
+    async def compact_changes(self, owner_id: str, through: int):
+        """Drop logged changes up to a revision"""
+        raise NotImplementedError
+
+    async def recent_changes(self, after: datetime) -> List[dict]:
+        """Changes of every owner logged after a time, oldest first"""
+        raise NotImplementedError
+
+    def watch_changes(self) -> AsyncIterator[dict]:
+        """Changes of every owner as they are logged, where the backend can push them"""
+        raise NotImplementedError
+
+    async def ping(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+def matches_category(category: Optional[str]) -> bool:
+    """Whether a category filter narrows the listing ("Todos" means all)"""
+    return bool(category) and category != "Todos"
+
+def search_term(search: Optional[str]) -> Optional[str]:
+    return search.strip() if search and search.strip() else None
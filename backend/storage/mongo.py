@@ -0,0 +1,290 @@
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from models.playlist import Playlist, Channel, DEFAULT_OWNER_ID
+from services.channel_dedup import ChannelDeduplicator
+from storage.base import LibraryStorage, CHANNEL_RESPONSE_FIELDS, SEARCH_ENTRY_FIELDS, matches_category, search_term
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Documents fetched per round trip when iterating large cursors
+CURSOR_BATCH_SIZE = int(os.environ.get('CURSOR_BATCH_SIZE', 500))
+
+def channel_filter(category: Optional[str], search: Optional[str]) -> dict:
+    """Mongo filter equivalent to filter_channels_by_category + search_channels"""
+    query = {}
+    if matches_category(category):
+        query["category"] = category
+    if search_term(search):
+        query["name"] = {"$regex": re.escape(search_term(search)), "$options": "i"}
+    return query
+
+def channels_pipeline(playlist_filter: dict, category: Optional[str], search: Optional[str]) -> List[dict]:
+    """Project each playlist to its matching channels, shaped like ChannelResponse.
+
+    Filtering happens in Mongo; the app receives one playlist's channels at a
+    time, so memory stays bounded by the largest playlist, not the library.
+    """
+    conditions = []
+    if matches_category(category):
+        conditions.append({"$eq": ["$$ch.category", category]})
+        # Skips playlists without the category, served by the channels.category index
+        playlist_filter = dict(playlist_filter, **{"channels.category": category})
+    if search_term(search):
+        conditions.append({"$regexMatch": {
+            "input": "$$ch.name", "regex": re.escape(search_term(search)), "options": "i"
+        }})
+
+    channels = "$channels"
+    if conditions:
+        channels = {"$filter": {"input": "$channels", "as": "ch", "cond": {"$and": conditions}}}
+
+    return [
+        {"$match": playlist_filter},
+        {"$project": {"_id": 0, "channels": {"$map": {
+            "input": channels,
+            "as": "ch",
+            "in": {field: f"$$ch.{field}" for field in CHANNEL_RESPONSE_FIELDS}
+        }}}},
+    ]
+
+class MongoStorage(LibraryStorage):
+    """Libraries as one document per playlist with embedded channels.
+
+    Writes and reads go to ``db``, except the channel and category listings
+    served to clients, which go to ``read_db`` and may come from a lagging
+    replica set secondary when one is configured. ``primary`` serves those
+    listings from ``db`` for callers that must see their own writes.
+    """
+
+    name = "mongo"
+
+    def __init__(self, db, read_db=None):
+        self.db = db
+        self.read_db = read_db if read_db is not None else db
+        self.deduplicator = ChannelDeduplicator()
+        self._primary = self if self.read_db is db else None
+
+    @property
+    def primary(self) -> "MongoStorage":
+        if self._primary is None:
+            self._primary = MongoStorage(self.db)
+        return self._primary
+
+    async def insert_playlist(self, playlist: Playlist):
+        await self.db.playlists.insert_one(playlist.dict())
+
+    async def insert_playlists(self, playlists: List[Playlist]) -> Dict[int, str]:
+        from pymongo.errors import BulkWriteError
+        try:
+            await self.db.playlists.insert_many([playlist.dict() for playlist in playlists], ordered=False)
+        except BulkWriteError as e:
+            return {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+        return {}
+
+    async def get_playlist(self, owner_id: str, playlist_id: str) -> Optional[dict]:
+        return await self.db.playlists.find_one({"owner_id": owner_id, "id": playlist_id}, {"channels": 0})
+
+    async def list_playlists(self, owner_id: str) -> AsyncIterator[dict]:
+        cursor = self.db.playlists.find({"owner_id": owner_id}, {
+            "channels": 0  # Exclude channels from list view
+        }).batch_size(CURSOR_BATCH_SIZE)
+        async for playlist in cursor:
+            yield playlist
+
+    async def channel_urls(self, owner_id: str, playlist_id: str) -> Optional[List[str]]:
+        playlist = await self.db.playlists.find_one({"owner_id": owner_id, "id": playlist_id}, {"channels.url": 1})
+        if not playlist:
+            return None
+        return [ch["url"] for ch in playlist.get("channels", [])]
+
+    async def update_channels(self, owner_id: str, playlist_id: str, channels: List[Channel],
+                              last_updated: datetime):
+        await self.db.playlists.update_one(
+            {"owner_id": owner_id, "id": playlist_id},
+            {"$set": {
+                "channels": [ch.dict() for ch in channels],
+                "channel_count": len(channels),
+                "last_updated": last_updated
+            }}
+        )
+
+    async def delete_playlist(self, owner_id: str, playlist_id: str) -> bool:
+        result = await self.db.playlists.delete_one({"owner_id": owner_id, "id": playlist_id})
+        return result.deleted_count > 0
+
+    async def channel_chunks(
+        self,
+        owner_id: str,
+        playlist_id: Optional[str],
+        category: Optional[str],
+        search: Optional[str],
+        chunk_size: int
+    ) -> AsyncIterator[List[dict]]:
+        playlist_filter = {"owner_id": owner_id}
+        if playlist_id is not None:
+            playlist_filter["id"] = playlist_id
+        cursor = self.read_db.playlists.aggregate(
+            channels_pipeline(playlist_filter, category, search), batchSize=CURSOR_BATCH_SIZE
+        )
+
+        pending = []
+        async for playlist in cursor:
+            pending.extend(playlist["channels"])
+            while len(pending) >= chunk_size:
+                chunk, pending = pending[:chunk_size], pending[chunk_size:]
+                yield chunk
+        if pending:
+            yield pending
+
+    async def playlist_channels(self, owner_id: str, chunk_size: int) -> AsyncIterator[Tuple[str, List[dict]]]:
+        # One cursor over the library instead of a query per playlist
+        pipeline = channels_pipeline({"owner_id": owner_id}, None, None)
+        pipeline[-1]["$project"]["id"] = 1
+        cursor = self.db.playlists.aggregate(pipeline, batchSize=CURSOR_BATCH_SIZE)
+        async for playlist in cursor:
+            channels = playlist["channels"]
+            for start in range(0, max(len(channels), 1), chunk_size):
+                yield playlist["id"], channels[start:start + chunk_size]
+
+    async def categories(self, owner_id: str) -> List[str]:
+        # Served by the channels.category index instead of loading every playlist
+        return await self.read_db.playlists.distinct("channels.category", {"owner_id": owner_id})
+
+    async def search_entries(self, owner_id: str, chunk_size: int) -> AsyncIterator[List[dict]]:
+        cursor = self.db.playlists.aggregate([
+            {"$match": {"owner_id": owner_id}},
+            {"$project": {"_id": 0, "id": 1, "channels": {"$map": {
+                "input": "$channels",
+                "as": "ch",
+                "in": {field: f"$$ch.{field}" for field in SEARCH_ENTRY_FIELDS}
+            }}}},
+        ], batchSize=CURSOR_BATCH_SIZE)
+        pending = []
+        async for playlist in cursor:
+            pending.extend(dict(ch, playlist_id=playlist["id"]) for ch in playlist["channels"])
+            while len(pending) >= chunk_size:
+                chunk, pending = pending[:chunk_size], pending[chunk_size:]
+                yield chunk
+        if pending:
+            yield pending
+
+    async def channels_by_id(self, owner_id: str, channel_ids: List[str]) -> List[dict]:
+        # The owner_id + channels.id index finds the playlists, $filter their channels
+        cursor = self.db.playlists.aggregate([
+            {"$match": {"owner_id": owner_id, "channels.id": {"$in": channel_ids}}},
+            {"$project": {"_id": 0, "channels": {"$map": {
+                "input": {"$filter": {"input": "$channels", "as": "ch", "cond": {"$in": ["$$ch.id", channel_ids]}}},
+                "as": "ch",
+                "in": {field: f"$$ch.{field}" for field in CHANNEL_RESPONSE_FIELDS}
+            }}}},
+        ])
+        return [ch async for playlist in cursor for ch in playlist["channels"]]
+
+    async def channel_url(self, owner_id: str, channel_id: str) -> Optional[str]:
+        playlist = await self.db.playlists.find_one(
+            {"owner_id": owner_id, "channels.id": channel_id},
+            {"_id": 0, "channels": {"$elemMatch": {"id": channel_id}}}
+        )
+        if playlist and playlist.get("channels"):
+            return playlist["channels"][0]["url"]
+
+        cluster = await self.db.channel_clusters.find_one(
+            {"owner_id": owner_id, "id": channel_id}, {"_id": 0, "streams": 1}
+        )
+        if cluster and cluster.get("streams"):
+            return cluster["streams"][0]["url"]
+        return None
+
+    async def update_clusters(self, owner_id: str, playlist_id: str, channels: Optional[List[Channel]]):
+        await self.deduplicator.remove_playlist(self.db.channel_clusters, playlist_id, owner_id)
+        if channels:
+            await self.deduplicator.add_playlist(self.db.channel_clusters, playlist_id, channels, owner_id)
+
+    async def cluster_chunks(
+        self,
+        owner_id: str,
+        category: Optional[str],
+        search: Optional[str],
+        chunk_size: int
+    ) -> AsyncIterator[List[dict]]:
+        query = dict(channel_filter(category, search), owner_id=owner_id, **{"streams.0": {"$exists": True}})
+        cursor = self.read_db.channel_clusters.find(query, {"_id": 0, "keys": 0}).batch_size(CURSOR_BATCH_SIZE)
+        while True:
+            clusters = await cursor.to_list(chunk_size)
+            if not clusters:
+                break
+            yield clusters
+
+    async def record_change(self, owner_id: str, playlist_id: str, change: dict) -> int:
+        state = await self.db.library_revisions.find_one_and_update(
+            {"owner_id": owner_id}, {"$inc": {"revision": 1}},
+            upsert=True, return_document=True  # ReturnDocument.AFTER
+        )
+        await self.db.channel_changes.insert_one(dict(
+            change, owner_id=owner_id, revision=state["revision"], playlist_id=playlist_id,
+            created_at=datetime.utcnow()
+        ))
+        return state["revision"]
+
+    async def library_revision(self, owner_id: str) -> dict:
+        state = await self.db.library_revisions.find_one({"owner_id": owner_id}, {"_id": 0})
+        return {
+            "revision": state["revision"] if state else 0,
+            "compacted_through": (state or {}).get("compacted_through", 0),
+        }
+
+    async def changes_since(self, owner_id: str, revision: int) -> List[dict]:
+        cursor = self.db.channel_changes.find(
+            {"owner_id": owner_id, "revision": {"$gt": revision}}, {"_id": 0, "owner_id": 0}
+        ).sort("revision", 1).batch_size(CURSOR_BATCH_SIZE)
+        return [entry async for entry in cursor]
+
+    async def compact_changes(self, owner_id: str, through: int):
+        # Mark first: readers that find entries missing then see they were compacted
+        await self.db.library_revisions.update_one(
+            {"owner_id": owner_id}, {"$max": {"compacted_through": through}}
+        )
+        await self.db.channel_changes.delete_many({"owner_id": owner_id, "revision": {"$lte": through}})
+
+    async def recent_changes(self, after: datetime) -> List[dict]:
+        cursor = self.db.channel_changes.find(
+            {"created_at": {"$gt": after}}, {"_id": 0}
+        ).sort("created_at", 1).batch_size(CURSOR_BATCH_SIZE)
+        return [entry async for entry in cursor]
+
+    async def watch_changes(self) -> AsyncIterator[dict]:
+        # Change streams need a replica set or sharded cluster; standalone servers refuse them
+        async with self.db.channel_changes.watch([{"$match": {"operationType": "insert"}}]) as stream:
+            async for event in stream:
+                yield event["fullDocument"]
+
+    async def ping(self):
+        await self.db.command("ping")
+
+    async def ensure_owner_ids(self):
+        """Assign libraries created before per-user partitioning to the default owner"""
+        try:
+            for collection in (self.db.playlists, self.db.channel_clusters):
+                result = await collection.update_many(
+                    {"owner_id": {"$exists": False}}, {"$set": {"owner_id": DEFAULT_OWNER_ID}}
+                )
+                if result.modified_count:
+                    logger.info(f"Assigned {result.modified_count} {collection.name} to the default owner")
+        except Exception as e:
+            logger.error(f"Error assigning owners: {e}")
+
+    async def ensure_channel_clusters(self):
+        """Build clusters for libraries ingested before deduplication existed"""
+        try:
+            if await self.db.channel_clusters.estimated_document_count() > 0:
+                return
+            if await self.db.playlists.estimated_document_count() == 0:
+                return
+
+            count = await self.deduplicator.rebuild(self.db.channel_clusters, self.db.playlists.find({}))
+            logger.info(f"Rebuilt {count} channel clusters")
+        except Exception as e:
+            logger.error(f"Error rebuilding channel clusters: {e}")
@@ -0,0 +1,526 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from starlette.concurrency import run_in_threadpool
+from models.playlist import Playlist, Channel
+from services.channel_dedup import ChannelDeduplicator
+from storage.base import LibraryStorage, CHANNEL_RESPONSE_FIELDS, SEARCH_ENTRY_FIELDS, matches_category, search_term
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of values bound in a single IN (...) lookup
+IN_CHUNK = 500
+
+# Shortest search the trigram index can answer; shorter ones scan the owner's rows
+MIN_INDEXED_SEARCH = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    seq INTEGER PRIMARY KEY,
+    owner_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT,
+    file_path TEXT,
+    ingest_rules TEXT,
+    channel_count INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    last_updated TEXT NOT NULL,
+    UNIQUE (owner_id, id)
+);
+CREATE TABLE IF NOT EXISTS channels (
+    seq INTEGER PRIMARY KEY,
+    owner_id TEXT NOT NULL,
+    playlist_seq INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    logo TEXT,
+    category TEXT,
+    is_live INTEGER NOT NULL,
+    group_title TEXT,
+    tvg_id TEXT,
+    tvg_name TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channels_playlist ON channels (owner_id, playlist_seq, seq);
+CREATE INDEX IF NOT EXISTS channels_category ON channels (owner_id, category, playlist_seq, seq);
+CREATE INDEX IF NOT EXISTS channels_id ON channels (owner_id, id);
+CREATE TABLE IF NOT EXISTS channel_clusters (
+    seq INTEGER PRIMARY KEY,
+    owner_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT,
+    document TEXT NOT NULL,
+    UNIQUE (owner_id, id)
+);
+CREATE INDEX IF NOT EXISTS channel_clusters_category ON channel_clusters (owner_id, category, seq);
+CREATE TABLE IF NOT EXISTS cluster_keys (
+    owner_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    cluster_id TEXT NOT NULL,
+    PRIMARY KEY (owner_id, key, cluster_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS library_revisions (
+    owner_id TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL,
+    compacted_through INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS channel_changes (
+    owner_id TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    playlist_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    change TEXT NOT NULL,
+    PRIMARY KEY (owner_id, revision)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS channel_changes_created ON channel_changes (created_at);
+CREATE TABLE IF NOT EXISTS cluster_playlists (
+    owner_id TEXT NOT NULL,
+    playlist_id TEXT NOT NULL,
+    cluster_id TEXT NOT NULL,
+    PRIMARY KEY (owner_id, playlist_id, cluster_id)
+) WITHOUT ROWID;
+"""
+
+# Trigram full-text indexes over names, kept in sync with their tables by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS channels_fts USING fts5(
+    name, content='channels', content_rowid='seq', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS channels_fts_insert AFTER INSERT ON channels BEGIN
+    INSERT INTO channels_fts (rowid, name) VALUES (new.seq, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS channels_fts_delete AFTER DELETE ON channels BEGIN
+    INSERT INTO channels_fts (channels_fts, rowid, name) VALUES ('delete', old.seq, old.name);
+END;
+CREATE VIRTUAL TABLE IF NOT EXISTS channel_clusters_fts USING fts5(
+    name, content='channel_clusters', content_rowid='seq', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS channel_clusters_fts_insert AFTER INSERT ON channel_clusters BEGIN
+    INSERT INTO channel_clusters_fts (rowid, name) VALUES (new.seq, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS channel_clusters_fts_delete AFTER DELETE ON channel_clusters BEGIN
+    INSERT INTO channel_clusters_fts (channel_clusters_fts, rowid, name) VALUES ('delete', old.seq, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS channel_clusters_fts_update AFTER UPDATE OF name ON channel_clusters BEGIN
+    INSERT INTO channel_clusters_fts (channel_clusters_fts, rowid, name) VALUES ('delete', old.seq, old.name);
+    INSERT INTO channel_clusters_fts (rowid, name) VALUES (new.seq, new.name);
+END;
+"""
+
+def _contains(name: Optional[str], term: str) -> bool:
+    return bool(name) and term in name.lower()
+
+def _playlist_row(row: sqlite3.Row) -> dict:
+    playlist = dict(row)
+    del playlist["seq"]
+    playlist["created_at"] = datetime.fromisoformat(playlist["created_at"])
+    playlist["last_updated"] = datetime.fromisoformat(playlist["last_updated"])
+    playlist["ingest_rules"] = json.loads(playlist["ingest_rules"] or "[]")
+    return playlist
+
+def _change_row(row: sqlite3.Row) -> dict:
+    return dict(json.loads(row["change"]), revision=row["revision"], playlist_id=row["playlist_id"],
+                created_at=datetime.fromisoformat(row["created_at"]))
+
+class SQLiteStorage(LibraryStorage):
+    """Libraries in one embedded SQLite file, for edge boxes without a Mongo server.
+
+    Channels are rows ordered by (playlist, position), categories and names
+    are indexed (names through an FTS5 trigram index, which matches
+    case-insensitive substrings like the Mongo regex does). Listings page
+    with keyset queries, so no statement stays open between chunks. One
+    connection is shared behind a lock and used from worker threads.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.deduplicator = ChannelDeduplicator()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.create_function("contains_text", 2, _contains, deterministic=True)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        try:
+            self._conn.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            # FTS5 or its trigram tokenizer (SQLite 3.34+) missing: searches scan instead
+            logger.warning(f"SQLite full-text search unavailable, searching by scan: {e}")
+            self.fts = False
+
+    def _migrate(self):
+        """Add the columns of newer versions to databases created before them"""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(playlists)")}
+        if "ingest_rules" not in columns:
+            self._conn.execute("ALTER TABLE playlists ADD COLUMN ingest_rules TEXT")
+
+    async def _run(self, operation: Callable, *args, write: bool = False):
+        """Run a statement batch on a worker thread, in a transaction when writing"""
+        def run():
+            with self._lock:
+                if not write:
+                    return operation(self._conn, *args)
+                with self._conn:
+                    return operation(self._conn, *args)
+        return await run_in_threadpool(run)
+
+    def _search_clause(self, table: str, alias: str, search: Optional[str], params: list) -> str:
+        term = search_term(search)
+        if not term:
+            return ""
+        if self.fts and len(term) >= MIN_INDEXED_SEARCH:
+            params.append('"' + term.replace('"', '""') + '"')
+            return f" AND {alias}.seq IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)"
+        params.append(term.lower())
+        return f" AND contains_text({alias}.name, ?)"
+
+    # --- playlists ---------------------------------------------------------
+
+    async def insert_playlist(self, playlist: Playlist):
+        await self._run(self._insert_playlist, playlist, write=True)
+
+    async def insert_playlists(self, playlists: List[Playlist]) -> Dict[int, str]:
+        def insert(conn):
+            failed = {}
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            # A savepoint per playlist undoes a failed one without the others
+            for i, playlist in enumerate(playlists):
+                conn.execute("SAVEPOINT playlist")
+                try:
+                    self._insert_playlist(conn, playlist)
+                except sqlite3.Error as e:
+                    conn.execute("ROLLBACK TO playlist")
+                    failed[i] = str(e)
+                conn.execute("RELEASE playlist")
+            return failed
+        return await self._run(insert, write=True)
+
+    def _insert_playlist(self, conn, playlist: Playlist):
+        cursor = conn.execute(
+            "INSERT INTO playlists (owner_id, id, name, url, file_path, ingest_rules, channel_count, created_at,"
+            " last_updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (playlist.owner_id, playlist.id, playlist.name, playlist.url, playlist.file_path,
+             json.dumps([rule.model_dump() for rule in playlist.ingest_rules]), len(playlist.channels),
+             playlist.created_at.isoformat(), playlist.last_updated.isoformat())
+        )
+        self._insert_channels(conn, playlist.owner_id, cursor.lastrowid, playlist.channels)
+
+    def _insert_channels(self, conn, owner_id: str, playlist_seq: int, channels: List[Channel]):
+        conn.executemany(
+            "INSERT INTO channels (owner_id, playlist_seq, id, name, url, logo, category, is_live,"
+            " group_title, tvg_id, tvg_name, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (owner_id, playlist_seq, ch.id, ch.name, ch.url, ch.logo, ch.category, int(ch.is_live),
+                 ch.group_title, ch.tvg_id, ch.tvg_name, ch.created_at.isoformat())
+                for ch in channels
+            )
+        )
+
+    def _playlist_seq(self, conn, owner_id: str, playlist_id: str) -> Optional[int]:
+        row = conn.execute(
+            "SELECT seq FROM playlists WHERE owner_id = ? AND id = ?", (owner_id, playlist_id)
+        ).fetchone()
+        return row["seq"] if row else None
+
+    async def get_playlist(self, owner_id: str, playlist_id: str) -> Optional[dict]:
+        def get(conn):
+            row = conn.execute(
+                "SELECT * FROM playlists WHERE owner_id = ? AND id = ?", (owner_id, playlist_id)
+            ).fetchone()
+            return _playlist_row(row) if row else None
+        return await self._run(get)
+
+    async def list_playlists(self, owner_id: str) -> AsyncIterator[dict]:
+        rows = await self._run(lambda conn: conn.execute(
+            "SELECT * FROM playlists WHERE owner_id = ? ORDER BY seq", (owner_id,)
+        ).fetchall())
+        for row in rows:
+            yield _playlist_row(row)
+
+    async def channel_urls(self, owner_id: str, playlist_id: str) -> Optional[List[str]]:
+        def urls(conn):
+            seq = self._playlist_seq(conn, owner_id, playlist_id)
+            if seq is None:
+                return None
+            return [row["url"] for row in conn.execute(
+                "SELECT url FROM channels WHERE owner_id = ? AND playlist_seq = ? ORDER BY seq", (owner_id, seq)
+            )]
+        return await self._run(urls)
+
+    async def update_channels(self, owner_id: str, playlist_id: str, channels: List[Channel],
+                              last_updated: datetime):
+        def update(conn):
+            seq = self._playlist_seq(conn, owner_id, playlist_id)
+            if seq is None:
+                return
+            conn.execute("DELETE FROM channels WHERE owner_id = ? AND playlist_seq = ?", (owner_id, seq))
+            self._insert_channels(conn, owner_id, seq, channels)
+            conn.execute(
+                "UPDATE playlists SET channel_count = ?, last_updated = ? WHERE seq = ?",
+                (len(channels), last_updated.isoformat(), seq)
+            )
+        await self._run(update, write=True)
+
+    async def delete_playlist(self, owner_id: str, playlist_id: str) -> bool:
+        def delete(conn):
+            seq = self._playlist_seq(conn, owner_id, playlist_id)
+            if seq is None:
+                return False
+            conn.execute("DELETE FROM channels WHERE owner_id = ? AND playlist_seq = ?", (owner_id, seq))
+            conn.execute("DELETE FROM playlists WHERE seq = ?", (seq,))
+            return True
+        return await self._run(delete, write=True)
+
+    # --- channels ----------------------------------------------------------
+
+    async def channel_chunks(
+        self,
+        owner_id: str,
+        playlist_id: Optional[str],
+        category: Optional[str],
+        search: Optional[str],
+        chunk_size: int
+    ) -> AsyncIterator[List[dict]]:
+        conditions, params = "c.owner_id = ?", [owner_id]
+        if playlist_id is not None:
+            conditions += " AND c.playlist_seq = (SELECT seq FROM playlists WHERE owner_id = ? AND id = ?)"
+            params += [owner_id, playlist_id]
+        if matches_category(category):
+            conditions += " AND c.category = ?"
+            params.append(category)
+        conditions += self._search_clause("channels", "c", search, params)
+
+        columns = ", ".join(f"c.{field}" for field in CHANNEL_RESPONSE_FIELDS)
+        query = (
+            f"SELECT c.playlist_seq, c.seq, {columns} FROM channels c WHERE {conditions}"
+            " AND (c.playlist_seq, c.seq) > (?, ?) ORDER BY c.playlist_seq, c.seq LIMIT ?"
+        )
+
+        after = (0, 0)
+        while True:
+            rows = await self._run(lambda conn: conn.execute(query, params + [*after, chunk_size]).fetchall())
+            if not rows:
+                break
+            after = (rows[-1]["playlist_seq"], rows[-1]["seq"])
+            yield [
+                {field: (bool(row[field]) if field == "is_live" else row[field]) for field in CHANNEL_RESPONSE_FIELDS}
+                for row in rows
+            ]
+            if len(rows) < chunk_size:
+                break
+
+    async def categories(self, owner_id: str) -> List[str]:
+        rows = await self._run(lambda conn: conn.execute(
+            "SELECT DISTINCT category FROM channels WHERE owner_id = ?", (owner_id,)
+        ).fetchall())
+        return [row["category"] for row in rows]
+
+    async def search_entries(self, owner_id: str, chunk_size: int) -> AsyncIterator[List[dict]]:
+        columns = ", ".join(f"c.{field}" for field in SEARCH_ENTRY_FIELDS)
+        query = (
+            f"SELECT c.seq, p.id AS playlist_id, {columns} FROM channels c"
+            " JOIN playlists p ON p.seq = c.playlist_seq"
+            " WHERE c.owner_id = ? AND c.seq > ? ORDER BY c.seq LIMIT ?"
+        )
+        after = 0
+        while True:
+            rows = await self._run(lambda conn: conn.execute(query, (owner_id, after, chunk_size)).fetchall())
+            if not rows:
+                break
+            after = rows[-1]["seq"]
+            yield [{field: row[field] for field in (*SEARCH_ENTRY_FIELDS, "playlist_id")} for row in rows]
+            if len(rows) < chunk_size:
+                break
+
+    async def channels_by_id(self, owner_id: str, channel_ids: List[str]) -> List[dict]:
+        def find(conn):
+            columns = ", ".join(CHANNEL_RESPONSE_FIELDS)
+            channels = []
+            for i in range(0, len(channel_ids), IN_CHUNK):
+                chunk = channel_ids[i:i + IN_CHUNK]
+                channels.extend(
+                    {field: (bool(row[field]) if field == "is_live" else row[field]) for field in CHANNEL_RESPONSE_FIELDS}
+                    for row in conn.execute(
+                        f"SELECT {columns} FROM channels WHERE owner_id = ? AND id IN ({','.join('?' * len(chunk))})",
+                        [owner_id, *chunk]
+                    )
+                )
+            return channels
+        return await self._run(find)
+
+    async def channel_url(self, owner_id: str, channel_id: str) -> Optional[str]:
+        def find(conn):
+            row = conn.execute(
+                "SELECT url FROM channels WHERE owner_id = ? AND id = ? ORDER BY seq LIMIT 1", (owner_id, channel_id)
+            ).fetchone()
+            if row:
+                return row["url"]
+            row = conn.execute(
+                "SELECT document FROM channel_clusters WHERE owner_id = ? AND id = ?", (owner_id, channel_id)
+            ).fetchone()
+            if row:
+                streams = json.loads(row["document"])["streams"]
+                return streams[0]["url"] if streams else None
+            return None
+        return await self._run(find)
+
+    # --- channel clusters --------------------------------------------------
+
+    def _load_clusters(self, conn, owner_id: str, cluster_ids: List[str]) -> Dict[str, dict]:
+        clusters = {}
+        for i in range(0, len(cluster_ids), IN_CHUNK):
+            chunk = cluster_ids[i:i + IN_CHUNK]
+            for row in conn.execute(
+                f"SELECT document FROM channel_clusters WHERE owner_id = ? AND id IN ({','.join('?' * len(chunk))})",
+                [owner_id, *chunk]
+            ):
+                cluster = json.loads(row["document"])
+                clusters[cluster["id"]] = cluster
+        return clusters
+
+    def _write_cluster(self, conn, owner_id: str, cluster: dict):
+        conn.execute(
+            "INSERT INTO channel_clusters (owner_id, id, name, category, document) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (owner_id, id) DO UPDATE SET"
+            " name = excluded.name, category = excluded.category, document = excluded.document",
+            (owner_id, cluster["id"], cluster["name"], cluster.get("category"), json.dumps(cluster))
+        )
+        conn.execute("DELETE FROM cluster_keys WHERE owner_id = ? AND cluster_id = ?", (owner_id, cluster["id"]))
+        conn.executemany(
+            "INSERT INTO cluster_keys (owner_id, key, cluster_id) VALUES (?, ?, ?)",
+            ((owner_id, key, cluster["id"]) for key in cluster["keys"])
+        )
+        conn.execute("DELETE FROM cluster_playlists WHERE owner_id = ? AND cluster_id = ?", (owner_id, cluster["id"]))
+        conn.executemany(
+            "INSERT INTO cluster_playlists (owner_id, playlist_id, cluster_id) VALUES (?, ?, ?)",
+            ((owner_id, playlist_id, cluster["id"]) for playlist_id in {s["playlist_id"] for s in cluster["streams"]})
+        )
+
+    def _delete_cluster(self, conn, owner_id: str, cluster_id: str):
+        conn.execute("DELETE FROM channel_clusters WHERE owner_id = ? AND id = ?", (owner_id, cluster_id))
+        conn.execute("DELETE FROM cluster_keys WHERE owner_id = ? AND cluster_id = ?", (owner_id, cluster_id))
+        conn.execute("DELETE FROM cluster_playlists WHERE owner_id = ? AND cluster_id = ?", (owner_id, cluster_id))
+
+    async def update_clusters(self, owner_id: str, playlist_id: str, channels: Optional[List[Channel]]):
+        """Same incremental clustering as ChannelDeduplicator.add/remove_playlist"""
+        def update(conn):
+            ids = [row["cluster_id"] for row in conn.execute(
+                "SELECT cluster_id FROM cluster_playlists WHERE owner_id = ? AND playlist_id = ?", (owner_id, playlist_id)
+            )]
+            for cluster in self._load_clusters(conn, owner_id, ids).values():
+                cluster["streams"] = [s for s in cluster["streams"] if s["playlist_id"] != playlist_id]
+                cluster["keys"] = sorted({key for s in cluster["streams"] for key in s["keys"]})
+                if cluster["streams"]:
+                    self._write_cluster(conn, owner_id, cluster)
+                else:
+                    self._delete_cluster(conn, owner_id, cluster["id"])
+
+            if not channels:
+                return
+            keys = list({key for ch in channels for key in self.deduplicator.channel_keys(ch)})
+            ids = set()
+            for i in range(0, len(keys), IN_CHUNK):
+                chunk = keys[i:i + IN_CHUNK]
+                ids.update(row["cluster_id"] for row in conn.execute(
+                    f"SELECT cluster_id FROM cluster_keys WHERE owner_id = ? AND key IN ({','.join('?' * len(chunk))})",
+                    [owner_id, *chunk]
+                ))
+            clusters = self._load_clusters(conn, owner_id, sorted(ids))
+
+            upserts, absorbed = self.deduplicator.merge(list(clusters.values()), channels, playlist_id)
+            for cluster in upserts:
+                self._write_cluster(conn, owner_id, cluster)
+            for cluster_id in absorbed:
+                self._delete_cluster(conn, owner_id, cluster_id)
+        await self._run(update, write=True)
+
+    async def cluster_chunks(
+        self,
+        owner_id: str,
+        category: Optional[str],
+        search: Optional[str],
+        chunk_size: int
+    ) -> AsyncIterator[List[dict]]:
+        conditions, params = "k.owner_id = ?", [owner_id]
+        if matches_category(category):
+            conditions += " AND k.category = ?"
+            params.append(category)
+        conditions += self._search_clause("channel_clusters", "k", search, params)
+        query = f"SELECT k.seq, k.document FROM channel_clusters k WHERE {conditions} AND k.seq > ? ORDER BY k.seq LIMIT ?"
+
+        after = 0
+        while True:
+            rows = await self._run(lambda conn: conn.execute(query, params + [after, chunk_size]).fetchall())
+            if not rows:
+                break
+            after = rows[-1]["seq"]
+            yield [json.loads(row["document"]) for row in rows]
+            if len(rows) < chunk_size:
+                break
+
+    # --- change log --------------------------------------------------------
+
+    async def record_change(self, owner_id: str, playlist_id: str, change: dict) -> int:
+        def record(conn):
+            revision = conn.execute(
+                "INSERT INTO library_revisions (owner_id, revision) VALUES (?, 1)"
+                " ON CONFLICT (owner_id) DO UPDATE SET revision = revision + 1 RETURNING revision",
+                (owner_id,)
+            ).fetchone()["revision"]
+            conn.execute(
+                "INSERT INTO channel_changes (owner_id, revision, playlist_id, created_at, change) VALUES (?, ?, ?, ?, ?)",
+                (owner_id, revision, playlist_id, datetime.utcnow().isoformat(timespec="microseconds"), json.dumps(change))
+            )
+            return revision
+        return await self._run(record, write=True)
+
+    async def library_revision(self, owner_id: str) -> dict:
+        row = await self._run(lambda conn: conn.execute(
+            "SELECT revision, compacted_through FROM library_revisions WHERE owner_id = ?", (owner_id,)
+        ).fetchone())
+        return dict(row) if row else {"revision": 0, "compacted_through": 0}
+
+    async def changes_since(self, owner_id: str, revision: int) -> List[dict]:
+        rows = await self._run(lambda conn: conn.execute(
+            "SELECT revision, playlist_id, created_at, change FROM channel_changes"
+            " WHERE owner_id = ? AND revision > ? ORDER BY revision", (owner_id, revision)
+        ).fetchall())
+        return [_change_row(row) for row in rows]
+
+    async def compact_changes(self, owner_id: str, through: int):
+        def compact(conn):
+            conn.execute(
+                "UPDATE library_revisions SET compacted_through = MAX(compacted_through, ?) WHERE owner_id = ?",
+                (through, owner_id)
+            )
+            conn.execute("DELETE FROM channel_changes WHERE owner_id = ? AND revision <= ?", (owner_id, through))
+        await self._run(compact, write=True)
+
+    async def recent_changes(self, after: datetime) -> List[dict]:
+        rows = await self._run(lambda conn: conn.execute(
+            "SELECT owner_id, revision, playlist_id, created_at, change FROM channel_changes"
+            " WHERE created_at > ? ORDER BY created_at", (after.isoformat(timespec="microseconds"),)
+        ).fetchall())
+        return [dict(_change_row(row), owner_id=row["owner_id"]) for row in rows]
+
+    async def ping(self):
+        await self._run(lambda conn: conn.execute("SELECT 1").fetchone())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,39 @@
+from fastapi import Header, HTTPException
+from models.playlist import DEFAULT_OWNER_ID
+from typing import Optional
+import hmac
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+OWNER_ID_REGEX = re.compile(r'^[A-Za-z0-9_.@:-]{1,128}$')
+
+# Secret the authenticating proxy in front of the API sends in X-Tenant-Secret
+# along with X-User-Id. Without it the header is taken as sent by any client:
+# libraries are partitioned, but anyone can name another user's library.
+TENANT_HEADER_SECRET = os.environ.get('TENANT_HEADER_SECRET', '')
+if not TENANT_HEADER_SECRET:
+    logger.warning("TENANT_HEADER_SECRET not set, X-User-Id is trusted from any client and is not a security boundary")
+
+def trusted(secret: Optional[str]) -> bool:
+    if not TENANT_HEADER_SECRET:
+        return True
+    return bool(secret) and hmac.compare_digest(secret.encode(), TENANT_HEADER_SECRET.encode())
+
+async def get_owner_id(x_user_id: Optional[str] = Header(None),
+                       x_tenant_secret: Optional[str] = Header(None)) -> str:
+    """Library partition of the current request, taken from the X-User-Id header.
+
+    With TENANT_HEADER_SECRET set, the header is only honored from the proxy
+    that knows the secret; otherwise it is client-supplied and only keeps
+    libraries apart, it does not authenticate anyone.
+    """
+    if not x_user_id:
+        return DEFAULT_OWNER_ID
+    if not trusted(x_tenant_secret):
+        raise HTTPException(status_code=403, detail="Identificador de usuario no autorizado")
+    if not OWNER_ID_REGEX.match(x_user_id):
+        raise HTTPException(status_code=400, detail="Identificador de usuario inválido")
+    return x_user_id
@@ -0,0 +1,150 @@
+"""Benchmark columnar channel listings against filtering channel objects.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_channel_table.py --sizes 100000,1000000 --output table.json
+    python benchmarks/bench_channel_table.py --compare table.json
+
+At each size the library is split into ``--playlists`` playlists and held
+both as a list of Channel models filtered with M3UParser (``list``) and as a
+ChannelTable (``table``). Reports the latency of each listing filter and the
+memory each representation keeps resident. The ``snapshot`` benchmarks
+time writing the table to disk and a worker start mapping it back and
+answering its first search, against ``build`` from channel records.
+"""
+import argparse
+import gc
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import time_call, make_report, write_report, load_report, compare_reports, format_bytes
+from playlist_generator import generate_playlist
+from services.m3u_parser import M3UParser
+from services.channel_table import ChannelTable, channel_records
+from services.channel_snapshot import ChannelSnapshots, capture
+
+DEFAULT_SIZES = [100000, 1000000]
+
+def retained_memory(build):
+    """Python heap (NumPy buffers included) still held by what build returns, in bytes"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = build()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return current
+
+def build_table(channels, playlists):
+    table = ChannelTable()
+    step = -(-len(channels) // playlists)
+    for i in range(0, len(channels), step):
+        table.add_playlist(f"playlist-{i // step}", channel_records(channels[i:i + step]))
+    return table
+
+def run(sizes, repeat, seed, playlists, skip_memory):
+    parser = M3UParser()
+    results = []
+
+    for size in sizes:
+        content, expected = generate_playlist(size, seed=seed, invalid_ratio=0)
+        channels = parser.parse_content(content)
+        del content
+        table = build_table(channels, playlists)
+        step = -(-len(channels) // playlists)
+        print(f"\n=== {len(channels)} channels in {playlists} playlists ===")
+
+        queries = {
+            "category": ("Sports", None),
+            "search": (None, "news"),
+            "category_search": ("Noticias", "hd"),
+            "search_common": (None, "e"),
+        }
+        benchmarks = {}
+        for name, (category, search) in queries.items():
+            benchmarks[name] = {
+                "list": lambda c=category, s=search: parser.search_channels(
+                    parser.filter_channels_by_category(channels, c), s),
+                "table": lambda c=category, s=search: table.select(None, c, s),
+            }
+        benchmarks["playlist_search"] = {
+            "list": lambda: parser.search_channels(channels[step:2 * step], "news"),
+            "table": lambda: table.select("playlist-1", None, "news"),
+        }
+        benchmarks["records_1000"] = {
+            "table": lambda: table.records(table.select(None, None, None)[:1000]),
+        }
+        benchmarks["build"] = {
+            "table": lambda: build_table(channels, playlists),
+        }
+        snapshot_dir = tempfile.mkdtemp(prefix="bench_channel_table_")
+        snapshots = ChannelSnapshots(snapshot_dir)
+        snapshots.save("bench", capture(table))
+        benchmarks["snapshot_save"] = {
+            "table": lambda: snapshots.save("bench", capture(table)),
+        }
+        benchmarks["snapshot_load"] = {
+            "table": lambda: snapshots.load("bench"),
+        }
+        benchmarks["snapshot_first_search"] = {
+            "table": lambda: snapshots.load("bench").select(None, None, "news"),
+        }
+
+        for name, variants in benchmarks.items():
+            for variant, fn in variants.items():
+                result = {"benchmark": name, "size": size, "variant": variant}
+                result.update(time_call(fn, repeat))
+                results.append(result)
+                print(f"{name:<22} {variant:<8} median {result['median_s'] * 1000:10.2f} ms")
+
+        if not skip_memory:
+            for variant, build in (("list", lambda: parser.parse_content(generate_playlist(size, seed=seed, invalid_ratio=0)[0])),
+                                   ("table", lambda: build_table(channels, playlists)),
+                                   ("snapshot", lambda: snapshots.load("bench"))):
+                resident = retained_memory(build)
+                results.append({"benchmark": "resident_memory", "size": size, "variant": variant,
+                                "resident_bytes": resident})
+                print(f"{'resident_memory':<22} {variant:<8} {format_bytes(resident):>13}")
+
+        del channels, table
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    return results
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                            help="comma separated channel counts")
+    arg_parser.add_argument("--playlists", type=int, default=10)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--skip-memory", action="store_true", help="don't run the tracemalloc pass")
+    arg_parser.add_argument("--output", help="write JSON results to this file")
+    arg_parser.add_argument("--compare", help="baseline JSON to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.15,
+                            help="relative slowdown reported as a regression")
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    config = {"sizes": sizes, "playlists": args.playlists, "repeat": args.repeat, "seed": args.seed}
+    report = make_report("channel_table", config, run(
+        sizes, args.repeat, args.seed, args.playlists, args.skip_memory
+    ))
+    write_report(report, args.output)
+
+    if args.compare:
+        print(f"\n=== Compared to {args.compare} ===")
+        regressions = compare_reports(load_report(args.compare), report, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Benchmark fuzzy channel search: ranking quality and latency.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_fuzzy_search.py --sizes 100000,1000000 --output fuzzy.json
+    python benchmarks/bench_fuzzy_search.py --compare fuzzy.json
+
+Quality is measured on a labeled query set built from the playlists bundled
+in ``uploads/``: for each distinct channel name, queries as users type them
+(``exact`` lowercase name, ``prefix`` of it, one-letter ``typo``, name
+without ``accents``), labeled with every channel of that name. Both the
+substring filter the listings use (``substring``, library order) and the
+trigram index (``fuzzy``) report the share of queries whose first result is
+relevant (hit@1), that have a relevant result in the top 10 (recall@10), and
+the mean reciprocal rank.
+
+Latency is measured at each size on the bundled channels padded with a
+generated playlist: index build time, and per-query latency percentiles
+against the search budget, with the substring scan on a sample as baseline.
+"""
+import argparse
+import glob
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import time_call, percentile, make_report, write_report, load_report, compare_reports
+from playlist_generator import generate_playlist
+from services.m3u_parser import M3UParser
+from services.fuzzy_search import TrigramIndex, FUZZY_SEARCH_BUDGET_MS, TRUNCATED_SEARCHES, normalize
+
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uploads')
+
+DEFAULT_SIZES = [100000, 1000000]
+
+# Results a client shows for a search
+TOP_K = 10
+
+# Substring scans timed per size; they take long on large libraries
+BASELINE_QUERIES = 20
+
+def bundled_entries(parser):
+    """Channels of the bundled playlists as index entries, one playlist id per file"""
+    entries = []
+    for path in sorted(glob.glob(os.path.join(UPLOADS_DIR, "*.m3u*"))):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            try:
+                channels = parser.parse_content(f.read())
+            except Exception:
+                continue
+        playlist_id = os.path.basename(path)
+        entries.extend({"id": f"{playlist_id}:{i}", "playlist_id": playlist_id, "name": ch.name,
+                        "tvg_name": ch.tvg_name, "category": ch.category} for i, ch in enumerate(channels))
+    return entries
+
+def typo(text, rng):
+    """One letter dropped, doubled, swapped with the next or replaced, in a word of 4+ letters"""
+    words = text.split(" ")
+    candidates = [i for i, word in enumerate(words) if len(word) >= 4 and word.isalpha()]
+    if not candidates:
+        return None
+    i = rng.choice(candidates)
+    word = words[i]
+    at = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(("drop", "double", "swap", "replace"))
+    if edit == "drop":
+        word = word[:at] + word[at + 1:]
+    elif edit == "double":
+        word = word[:at] + word[at] + word[at:]
+    elif edit == "swap":
+        word = word[:at] + word[at + 1] + word[at] + word[at + 2:]
+    else:
+        word = word[:at] + rng.choice("aeiourstnl") + word[at + 1:]
+    words[i] = word
+    return " ".join(words)
+
+def labeled_queries(entries, seed):
+    """(kind, query, relevant ids) for every distinct bundled channel name"""
+    rng = random.Random(seed)
+    relevant = {}
+    for entry in entries:
+        relevant.setdefault(normalize(entry["name"]), set()).add(entry["id"])
+    names = {}
+    for entry in entries:
+        names.setdefault(normalize(entry["name"]), entry["name"])
+
+    queries = []
+    for key, name in sorted(names.items()):
+        if len(key) < 3:
+            continue
+        lowered = name.lower()
+        variants = {"exact": lowered, "prefix": lowered[:max(3, int(len(lowered) * 0.6))].rstrip(),
+                    "typo": typo(lowered, rng)}
+        if key != lowered:
+            variants["accents"] = key
+        for kind, query in variants.items():
+            if query:
+                queries.append((kind, query, relevant[key]))
+    return queries
+
+def substring_search(parser, channels, query):
+    return [ch.id for ch in parser.search_channels(channels, query)]
+
+def quality(ranked_ids, relevant):
+    rank = next((i + 1 for i, channel_id in enumerate(ranked_ids[:TOP_K]) if channel_id in relevant), None)
+    return {"hit_at_1": rank == 1, "recall_at_10": rank is not None, "mrr": 1 / rank if rank else 0.0}
+
+def summarize(scores):
+    return {metric: round(sum(s[metric] for s in scores) / len(scores), 4) for metric in ("hit_at_1", "recall_at_10", "mrr")}
+
+def run_quality(parser, entries, queries):
+    index = TrigramIndex(entries)
+    # The baseline searches Channel-like rows, in library order like the listings
+    channels = [type("Row", (), {"id": e["id"], "name": e["name"]}) for e in entries]
+    methods = {
+        "substring": lambda q: substring_search(parser, channels, q),
+        "fuzzy": lambda q: [channel_id for channel_id, _ in index.search(q, limit=TOP_K)],
+    }
+    results = []
+    print(f"=== Quality: {len(queries)} queries over {len(entries)} bundled channels ===")
+    for kind in sorted({kind for kind, _, _ in queries}):
+        subset = [(query, relevant) for k, query, relevant in queries if k == kind]
+        for method, search in methods.items():
+            summary = summarize([quality(search(query), relevant) for query, relevant in subset])
+            results.append({"benchmark": "quality", "variant": method, "format": kind,
+                            "queries": len(subset), **summary})
+            print(f"{kind:<8} {method:<9} hit@1 {summary['hit_at_1']:.3f}  recall@{TOP_K} "
+                  f"{summary['recall_at_10']:.3f}  mrr {summary['mrr']:.3f}  ({len(subset)} queries)")
+    return results
+
+def run_latency(parser, bundled, queries, size, repeat, seed):
+    content, _ = generate_playlist(max(size - len(bundled), 0), seed=seed, invalid_ratio=0)
+    generated = parser.parse_content(content) if size > len(bundled) else []
+    del content
+    entries = bundled + [{"id": ch.id, "playlist_id": f"generated-{i // 50000}", "name": ch.name,
+                          "tvg_name": ch.tvg_name, "category": ch.category} for i, ch in enumerate(generated)]
+    print(f"\n=== Latency: {len(entries)} channels ===")
+    results = []
+
+    holder = {}
+    build = time_call(lambda: holder.update(index=TrigramIndex(entries)), repeat=1)
+    index = holder["index"]
+    results.append({"benchmark": "build", "size": size, **build, "index_bytes": index.nbytes()})
+    print(f"build      {build['median_s']:9.3f} s   index {index.nbytes() / 1e6:.1f} MB")
+
+    truncated = TRUNCATED_SEARCHES.value()
+    timings = []
+    for _ in range(repeat):
+        for _, query, _ in queries:
+            start = time.perf_counter()
+            index.search(query, limit=TOP_K)
+            timings.append(time.perf_counter() - start)
+    latency = {"median_s": percentile(timings, 50), "p95_s": percentile(timings, 95), "p99_s": percentile(timings, 99),
+               "max_s": max(timings), "budget_ms": FUZZY_SEARCH_BUDGET_MS,
+               "truncated": int(TRUNCATED_SEARCHES.value() - truncated), "queries": len(timings)}
+    results.append({"benchmark": "search", "size": size, "variant": "fuzzy", **latency})
+    print(f"fuzzy      p50 {latency['median_s'] * 1000:7.2f} ms  p95 {latency['p95_s'] * 1000:7.2f} ms"
+          f"  p99 {latency['p99_s'] * 1000:7.2f} ms  truncated {latency['truncated']}/{len(timings)}")
+
+    channels = [type("Row", (), {"id": e["id"], "name": e["name"]}) for e in entries]
+    sample = [query for _, query, _ in random.Random(seed).sample(queries, min(BASELINE_QUERIES, len(queries)))]
+    timings = []
+    for query in sample:
+        start = time.perf_counter()
+        substring_search(parser, channels, query)
+        timings.append(time.perf_counter() - start)
+    results.append({"benchmark": "search", "size": size, "variant": "substring",
+                    "median_s": percentile(timings, 50), "p95_s": percentile(timings, 95), "queries": len(timings)})
+    print(f"substring  p50 {percentile(timings, 50) * 1000:7.2f} ms  p95 {percentile(timings, 95) * 1000:7.2f} ms")
+    return results
+
+def run(sizes, repeat, seed):
+    parser = M3UParser()
+    bundled = bundled_entries(parser)
+    queries = labeled_queries(bundled, seed)
+    results = run_quality(parser, bundled, queries)
+    for size in sizes:
+        results.extend(run_latency(parser, bundled, queries, size, repeat, seed))
+    return results
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                            help="comma separated channel counts")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output", help="write JSON results to this file")
+    arg_parser.add_argument("--compare", help="baseline JSON to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.15,
+                            help="relative slowdown reported as a regression")
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    config = {"sizes": sizes, "repeat": args.repeat, "seed": args.seed, "top_k": TOP_K}
+    report = make_report("fuzzy_search", config, run(sizes, args.repeat, args.seed))
+    write_report(report, args.output)
+
+    if args.compare:
+        print(f"\n=== Compared to {args.compare} ===")
+        regressions = compare_reports(load_report(args.compare), report, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Benchmark playlist lookups with and without the declared Mongo indexes.
+
+Needs a real MongoDB (mongomock scans collections regardless of indexes):
+
+    python benchmarks/bench_indexes.py --mongo-url mongodb://localhost:27017 --playlists 5000
+
+Seeds a scratch database with synthetic playlists, then times the lookups
+the API runs (playlist by id, channel by id, distinct categories, newest
+first listing) on a bare collection and again with ``indexes.INDEXES`` built.
+The query plan (COLLSCAN vs IXSCAN) and documents examined are recorded
+with each timing. The scratch database is dropped afterwards.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import make_report, write_report, load_report, compare_reports, percentile
+from playlist_generator import generate_playlist
+from pymongo import MongoClient, DESCENDING
+from indexes import INDEXES
+from services.m3u_parser import M3UParser
+from models.playlist import Playlist, DEFAULT_OWNER_ID
+
+# Every seeded playlist belongs to one user, like a single library growing large
+OWNER_ID = DEFAULT_OWNER_ID
+
+def seed(collection, playlists: int, channels: int):
+    parser = M3UParser()
+    content, _ = generate_playlist(channels, seed=0, invalid_ratio=0)
+    template = parser.parse_content(content)
+
+    batch = []
+    for i in range(playlists):
+        playlist = Playlist(
+            name=f"Playlist {i}",
+            channel_count=len(template),
+            # Fresh channel ids per playlist, like separate uploads
+            channels=[ch.model_copy(update={"id": f"{i}-{n}"}) for n, ch in enumerate(template)]
+        )
+        batch.append(playlist.dict())
+        if len(batch) >= 500:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+def plan_summary(explain: dict) -> dict:
+    stats = explain.get("executionStats", {})
+    stages = []
+    stage = explain.get("queryPlanner", {}).get("winningPlan", {})
+    while stage:
+        stages.append(stage.get("stage"))
+        stage = stage.get("inputStage")
+    return {
+        "plan": ">".join(s for s in stages if s),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+    }
+
+def time_lookups(fn, args, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        arg = random.choice(args)
+        start = time.perf_counter()
+        fn(arg)
+        timings.append(time.perf_counter() - start)
+    return {
+        "median_s": statistics.median(timings),
+        "p95_s": percentile(timings, 95),
+        "runs": repeat,
+    }
+
+def run(db, playlists: int, channels: int, repeat: int) -> list:
+    collection = db.playlists
+    print(f"Seeding {playlists} playlists x {channels} channels")
+    seed(collection, playlists, channels)
+
+    ids = [d["id"] for d in collection.find({}, {"id": 1})]
+
+    def newest_first():
+        return collection.find({"owner_id": OWNER_ID}, {"channels": 0}).sort("created_at", DESCENDING)
+    channel_ids = [f"{random.randrange(playlists)}-{random.randrange(channels)}" for _ in range(100)]
+
+    lookups = {
+        "find_one_by_id": (
+            lambda pid: collection.find_one({"owner_id": OWNER_ID, "id": pid}, {"channels": 0}),
+            lambda: collection.find({"owner_id": OWNER_ID, "id": ids[0]}, {"channels": 0}).explain(),
+            ids,
+        ),
+        "find_channel_by_id": (
+            lambda cid: collection.find_one(
+                {"owner_id": OWNER_ID, "channels.id": cid}, {"_id": 0, "channels": {"$elemMatch": {"id": cid}}}),
+            lambda: collection.find(
+                {"owner_id": OWNER_ID, "channels.id": channel_ids[0]},
+                {"_id": 0, "channels": {"$elemMatch": {"id": channel_ids[0]}}}).explain(),
+            channel_ids,
+        ),
+        "list_newest_first": (
+            lambda _: list(newest_first().limit(50)),
+            lambda: newest_first().limit(50).explain(),
+            [None],
+        ),
+        "distinct_categories": (
+            lambda _: collection.distinct("channels.category", {"owner_id": OWNER_ID}),
+            None,
+            [None],
+        ),
+    }
+
+    results = []
+    for variant in ("no_index", "indexed"):
+        if variant == "indexed":
+            start = time.perf_counter()
+            collection.create_indexes(INDEXES["playlists"])
+            print(f"Index build: {time.perf_counter() - start:.2f} s")
+
+        print(f"\n=== {variant} ===")
+        for name, (fn, explain, args) in lookups.items():
+            # Slow scans get fewer repetitions
+            runs = repeat if variant == "indexed" or name == "list_newest_first" else max(5, repeat // 20)
+            result = {"benchmark": name, "variant": variant, "size": playlists}
+            result.update(time_lookups(fn, args, runs))
+            if explain:
+                result.update(plan_summary(explain()))
+            print(f"{name:<22} median {result['median_s'] * 1000:9.3f} ms  "
+                  f"p95 {result['p95_s'] * 1000:9.3f} ms  {result.get('plan', '')} "
+                  f"docs examined {result.get('docs_examined', '-')}")
+            results.append(result)
+
+    return results
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    arg_parser.add_argument("--db-name", default="iptv_index_bench")
+    arg_parser.add_argument("--playlists", type=int, default=5000)
+    arg_parser.add_argument("--channels", type=int, default=50, help="channels per playlist")
+    arg_parser.add_argument("--repeat", type=int, default=200, help="lookups per benchmark")
+    arg_parser.add_argument("--output", help="write JSON results to this file")
+    arg_parser.add_argument("--compare", help="baseline JSON to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.15)
+    args = arg_parser.parse_args()
+
+    random.seed(0)
+    client = MongoClient(args.mongo_url, serverSelectionTimeoutMS=5000)
+    client.drop_database(args.db_name)
+    try:
+        results = run(client[args.db_name], args.playlists, args.channels, args.repeat)
+    finally:
+        client.drop_database(args.db_name)
+        client.close()
+
+    config = {"playlists": args.playlists, "channels": args.channels, "repeat": args.repeat}
+    report = make_report("indexes", config, results)
+    write_report(report, args.output)
+
+    if args.compare:
+        print(f"\n=== Compared to {args.compare} ===")
+        if compare_reports(load_report(args.compare), report, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark M3UParser on synthetic playlists.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_parser.py --sizes 1000,100000 --output parser.json
+    python benchmarks/bench_parser.py --compare parser.json
+
+Times parse_content, get_playlist_info, search_channels and
+filter_channels_by_category at each size, records peak heap usage, and
+optionally fails (exit code 1) when a result regressed against a baseline.
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import (
+    time_call, peak_memory, make_report, write_report, load_report,
+    compare_reports, format_bytes
+)
+from playlist_generator import generate_playlist, encode_playlist
+from services.m3u_parser import M3UParser
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+def run(sizes, repeat, seed, invalid_ratio, encoding, skip_memory):
+    parser = M3UParser()
+    results = []
+
+    for size in sizes:
+        content, expected = generate_playlist(size, seed=seed, invalid_ratio=invalid_ratio)
+        raw = encode_playlist(content, encoding)
+        print(f"\n=== {size} entries ({format_bytes(len(raw))}, {expected} valid) ===")
+
+        channels = parser.parse_content(content)
+        assert len(channels) == expected, f"expected {expected} channels, parsed {len(channels)}"
+
+        benchmarks = {
+            "decode": lambda: raw.decode(encoding),
+            "parse_content": lambda: parser.parse_content(content),
+            "get_playlist_info": lambda: parser.get_playlist_info(content),
+            "search_channels": lambda: parser.search_channels(channels, "news"),
+            "filter_channels_by_category": lambda: parser.filter_channels_by_category(channels, "Sports"),
+        }
+
+        for name, fn in benchmarks.items():
+            result = {"benchmark": name, "size": size}
+            result.update(time_call(fn, repeat))
+            result["items_per_s"] = size / result["median_s"] if result["median_s"] else None
+            if not skip_memory:
+                result["peak_memory_bytes"] = peak_memory(fn)
+
+            memory = f", peak {format_bytes(result['peak_memory_bytes'])}" if not skip_memory else ""
+            print(f"{name:<30} median {result['median_s'] * 1000:10.2f} ms{memory}")
+            results.append(result)
+
+        del channels
+
+    return results
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                            help="comma separated entry counts")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--invalid-ratio", type=float, default=0.05)
+    arg_parser.add_argument("--encoding", default="utf-8", help="encoding the raw playlist is stored in")
+    arg_parser.add_argument("--skip-memory", action="store_true", help="don't run the tracemalloc pass")
+    arg_parser.add_argument("--keep-logging", action="store_true",
+                            help="keep parser warnings (they dominate timings on invalid lines)")
+    arg_parser.add_argument("--output", help="write JSON results to this file")
+    arg_parser.add_argument("--compare", help="baseline JSON to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.15,
+                            help="relative slowdown reported as a regression")
+    args = arg_parser.parse_args()
+
+    if not args.keep_logging:
+        logging.disable(logging.WARNING)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    config = {
+        "sizes": sizes,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "invalid_ratio": args.invalid_ratio,
+        "encoding": args.encoding,
+    }
+    report = make_report("parser", config, run(
+        sizes, args.repeat, args.seed, args.invalid_ratio, args.encoding, args.skip_memory
+    ))
+    write_report(report, args.output)
+
+    if args.compare:
+        print(f"\n=== Compared to {args.compare} ===")
+        regressions = compare_reports(load_report(args.compare), report, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Benchmark backend cold start.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_startup.py --repeat 10 --output startup.json
+    python benchmarks/bench_startup.py --compare startup.json
+    python benchmarks/bench_startup.py --backend-dir /tmp/old-tree/backend --output before.json
+
+Every run uses a fresh interpreter, like a new worker under autoscaling:
+
+- ``import``: ``import server`` (module imports plus create_app), measured
+  inside the child, with its peak RSS and number of loaded modules
+- ``process``: the same child end to end, interpreter start included
+- ``first_response``: spawning uvicorn until ``GET /api/`` answers
+
+The Mongo variant needs no server; nothing connects before the first query.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import BACKEND_DIR, make_report, write_report, load_report, compare_reports, format_bytes
+
+IMPORT_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import server
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "import_s": elapsed,
+    "modules": len(sys.modules),
+    "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+}))
+"""
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _stats(timings):
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "max_s": max(timings),
+        "runs": len(timings),
+    }
+
+def measure_import(backend_dir: str, env: dict, repeat: int):
+    imports, processes, samples = [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT], cwd=backend_dir, env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        processes.append(time.perf_counter() - start)
+        sample = json.loads(output.strip().splitlines()[-1])
+        imports.append(sample["import_s"])
+        samples.append(sample)
+    return imports, processes, samples[-1]
+
+def measure_first_response(backend_dir: str, env: dict, repeat: int, timeout: float = 60.0):
+    timings = []
+    for _ in range(repeat):
+        port = _free_port()
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+            cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while True:
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError("Server did not answer in time")
+                if process.poll() is not None:
+                    raise RuntimeError(f"Server exited with {process.returncode}")
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/", timeout=1) as response:
+                        if response.status == 200:
+                            break
+                except OSError:
+                    time.sleep(0.01)
+            timings.append(time.perf_counter() - start)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return timings
+
+def run(backend_dir: str, variants, repeat: int, skip_server: bool):
+    results = []
+    data_dir = tempfile.mkdtemp(prefix="bench_startup_")
+
+    for variant in variants:
+        env = dict(os.environ, STORAGE_BACKEND=variant, PYTHONDONTWRITEBYTECODE="")
+        if variant == "sqlite":
+            env["SQLITE_PATH"] = os.path.join(data_dir, "library.db")
+        print(f"\n=== {variant} storage ===")
+
+        imports, processes, sample = measure_import(backend_dir, env, repeat)
+        result = {"benchmark": "import", "variant": variant, **_stats(imports),
+                  "modules": sample["modules"], "max_rss_bytes": sample["max_rss_bytes"]}
+        results.append(result)
+        print(f"{'import server':<20} median {result['median_s'] * 1000:8.1f} ms, "
+              f"{sample['modules']} modules, peak RSS {format_bytes(sample['max_rss_bytes'])}")
+
+        result = {"benchmark": "process", "variant": variant, **_stats(processes)}
+        results.append(result)
+        print(f"{'process':<20} median {result['median_s'] * 1000:8.1f} ms")
+
+        if not skip_server:
+            result = {"benchmark": "first_response", "variant": variant,
+                      **_stats(measure_first_response(backend_dir, env, repeat))}
+            results.append(result)
+            print(f"{'first response':<20} median {result['median_s'] * 1000:8.1f} ms")
+
+    return results
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--variants", default="mongo,sqlite", help="comma separated storage backends")
+    arg_parser.add_argument("--backend-dir", default=BACKEND_DIR, help="backend tree to start, e.g. an older checkout")
+    arg_parser.add_argument("--skip-server", action="store_true", help="only measure imports")
+    arg_parser.add_argument("--output", help="write JSON results to this file")
+    arg_parser.add_argument("--compare", help="baseline JSON to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.15)
+    args = arg_parser.parse_args()
+
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    results = run(os.path.abspath(args.backend_dir), variants, args.repeat, args.skip_server)
+    config = {"repeat": args.repeat, "variants": variants, "backend_dir": os.path.abspath(args.backend_dir)}
+    report = make_report("startup", config, results)
+    write_report(report, args.output)
+
+    if args.compare:
+        print(f"\n=== Compared to {args.compare} ===")
+        if compare_reports(load_report(args.compare), report, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark channel list wire formats.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_wire_format.py --sizes 10000,100000 --output wire.json
+    python benchmarks/bench_wire_format.py --compare wire.json
+
+At each size, ChannelResponse models built from a generated playlist are
+encoded as today's JSON array (``json``, one ``model_dump_json`` per row as
+the streaming route does), as columnar JSON (``columns``) and, when msgpack
+is installed, as columnar MessagePack (``msgpack``). Reports encode time,
+body size raw and gzipped, and the time a client takes to decode the body.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import time_call, make_report, write_report, load_report, compare_reports, format_bytes
+from playlist_generator import generate_playlist
+from models.playlist import ChannelResponse
+from services.m3u_parser import M3UParser
+from services.channel_table import channel_records
+from services.wire_format import (ColumnarChannels, COLUMNS_MEDIA_TYPE, MSGPACK_MEDIA_TYPE,
+                                  available_media_types, _msgpack)
+
+DEFAULT_SIZES = [10000, 100000]
+
+# Rows per chunk, as the routes stream them
+CHUNK_SIZE = 1000
+
+def encode_json(chunks):
+    return b"[" + b",".join(b",".join(item.model_dump_json().encode("utf-8") for item in chunk) for chunk in chunks) + b"]"
+
+def encode_columns(chunks, media_type):
+    columns = ColumnarChannels()
+    for chunk in chunks:
+        columns.extend(chunk)
+    return columns.encode(media_type)
+
+def run(sizes, repeat, seed):
+    parser = M3UParser()
+    results = []
+    msgpack = _msgpack()
+
+    for size in sizes:
+        content, _ = generate_playlist(size, seed=seed)
+        responses = [ChannelResponse(**record) for record in channel_records(parser.parse_content(content))]
+        chunks = [responses[i:i + CHUNK_SIZE] for i in range(0, len(responses), CHUNK_SIZE)]
+        print(f"\n=== {len(responses)} channels ===")
+
+        formats = {
+            "json": (lambda: encode_json(chunks), json.loads),
+            "columns": (lambda: encode_columns(chunks, COLUMNS_MEDIA_TYPE), json.loads),
+        }
+        if MSGPACK_MEDIA_TYPE in available_media_types():
+            formats["msgpack"] = (lambda: encode_columns(chunks, MSGPACK_MEDIA_TYPE), msgpack.unpackb)
+
+        for name, (encode, decode) in formats.items():
+            body = encode()
+            compressed = len(gzip.compress(body, compresslevel=6))
+            encoded = time_call(encode, repeat)
+            decoded = time_call(lambda: decode(body), repeat)
+            results.append({"benchmark": "encode", "size": size, "format": name, **encoded,
+                            "bytes": len(body), "gzip_bytes": compressed})
+            results.append({"benchmark": "decode", "size": size, "format": name, **decoded})
+            print(f"{name:<8} encode {encoded['median_s'] * 1000:9.2f} ms  decode {decoded['median_s'] * 1000:9.2f} ms"
+                  f"  {format_bytes(len(body)):>11}  gzip {format_bytes(compressed):>11}")
+
+    return results
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                            help="comma separated channel counts")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output", help="write JSON results to this file")
+    arg_parser.add_argument("--compare", help="baseline JSON to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.15,
+                            help="relative slowdown reported as a regression")
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    config = {"sizes": sizes, "repeat": args.repeat, "seed": args.seed}
+    report = make_report("wire_format", config, run(sizes, args.repeat, args.seed))
+    write_report(report, args.output)
+
+    if args.compare:
+        print(f"\n=== Compared to {args.compare} ===")
+        regressions = compare_reports(load_report(args.compare), report, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Shared timing, memory and reporting helpers for the benchmark scripts.
+
+Every script writes the same JSON layout so runs from different commits can
+be diffed with ``compare_reports``::
+
+    {
+      "schema": 1,
+      "suite": "parser",
+      "created_at": "...", "python": "...", "platform": "...", "commit": "...",
+      "config": {...},
+      "results": [
+        {"benchmark": "parse_content", "size": 1000,
+         "median_s": 0.01, "min_s": 0.009, "peak_memory_bytes": 123456, ...}
+      ]
+    }
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+SCHEMA_VERSION = 1
+
+# Make the backend packages importable from any benchmark script
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+def time_call(fn: Callable[[], object], repeat: int = 3) -> Dict[str, float]:
+    """Run fn ``repeat`` times and return wall-clock statistics in seconds"""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "max_s": max(timings),
+        "runs": repeat,
+    }
+
+def peak_memory(fn: Callable[[], object]) -> int:
+    """Peak Python heap allocated while fn runs, in bytes.
+
+    Measured in a separate run because tracemalloc slows execution down.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def make_report(suite: str, config: dict, results: List[dict]) -> dict:
+    return {
+        "schema": SCHEMA_VERSION,
+        "suite": suite,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "commit": _git_commit(),
+        "config": config,
+        "results": results,
+    }
+
+def write_report(report: dict, path: Optional[str]):
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+        print(f"Results written to {path}")
+    else:
+        print(text)
+
+def load_report(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    if report.get("schema") != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported benchmark schema in {path}: {report.get('schema')}")
+    return report
+
+def _result_key(result: dict) -> tuple:
+    return tuple(
+        (k, result[k]) for k in sorted(result)
+        if k in ("benchmark", "size", "endpoint", "variant", "format")
+    )
+
+def compare_reports(baseline: dict, current: dict, threshold: float = 0.15,
+                    metric: str = "median_s") -> List[str]:
+    """List human readable regressions where ``metric`` grew by more than threshold"""
+    previous = {_result_key(r): r for r in baseline["results"]}
+    regressions = []
+
+    for result in current["results"]:
+        before = previous.get(_result_key(result))
+        if not before or metric not in before or metric not in result or not before[metric]:
+            continue
+        change = (result[metric] - before[metric]) / before[metric]
+        label = ", ".join(f"{k}={v}" for k, v in _result_key(result))
+        line = f"{label}: {before[metric]:.6f} -> {result[metric]:.6f} ({change:+.1%})"
+        print(("REGRESSION " if change > threshold else "           ") + line)
+        if change > threshold:
+            regressions.append(line)
+
+    return regressions
+
+def format_bytes(value: int) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(value) < 1024 or unit == "GiB":
+            return f"{value:.1f} {unit}"
+        value /= 1024
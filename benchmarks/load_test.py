@@ -0,0 +1,236 @@
+"""End-to-end API load test.
+
+Boots ``server.app`` with uvicorn in a child process against a real MongoDB
+(``--mongo-url``), the embedded SQLite storage (``--sqlite``) or an in-memory
+mongomock-motor stand-in, seeds it
+with synthetic playlists, then drives it with concurrent HTTP clients and
+reports p50/p95/p99 latency and throughput per endpoint.
+
+Usage (from the repository root, fully offline with the stand-in):
+
+    python benchmarks/load_test.py --playlists 20 --channels 500 --concurrency 200
+    python benchmarks/load_test.py --output load.json --compare baseline.json
+    python benchmarks/load_test.py --sqlite /tmp/load_test.db
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import make_report, write_report, load_report, compare_reports, percentile
+from playlist_generator import generate_playlist
+
+UPLOAD_PLAYLIST, _ = generate_playlist(50, seed=99, invalid_ratio=0)
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# --- server side -----------------------------------------------------------
+
+def _use_database(new_db):
+    """Point every module that imported ``db``, ``read_db`` or the library at the stand-in database"""
+    import database
+    import routes.playlist
+    from storage.mongo import MongoStorage
+    originals = {"db": database.db, "read_db": database.read_db, "library": routes.playlist.library}
+    replacements = {"db": new_db, "read_db": new_db, "library": MongoStorage(new_db)}
+    for module in list(sys.modules.values()):
+        for name, original in originals.items():
+            if getattr(module, name, None) is original:
+                setattr(module, name, replacements[name])
+
+async def _seed(playlists: int, channels: int):
+    from models.playlist import Playlist
+    from services.m3u_parser import M3UParser
+    import routes.playlist
+
+    parser = M3UParser()
+    for i in range(playlists):
+        content, _ = generate_playlist(channels, seed=i, invalid_ratio=0)
+        parsed = parser.parse_content(content)
+        playlist = Playlist(name=f"Load test {i}", channel_count=len(parsed), channels=parsed)
+        await routes.playlist.library.insert_playlist(playlist)
+        await routes.playlist.update_channel_clusters(playlist.id, playlist.owner_id, parsed)
+
+async def _serve(args):
+    import uvicorn
+
+    # Background stream probing would hit the network for every seeded URL
+    os.environ["STREAM_PROBE_ON_INGEST_LIMIT"] = "0"
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+        os.environ["DB_NAME"] = args.db_name
+    if args.sqlite:
+        os.environ["STORAGE_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = args.sqlite
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.sqlite + suffix):
+                os.remove(args.sqlite + suffix)
+
+    import server
+
+    if args.mongo_url:
+        import database
+        await database.db.playlists.delete_many({})
+        await database.db.channel_clusters.delete_many({})
+    elif not args.sqlite:
+        from mongomock_motor import AsyncMongoMockClient
+        _use_database(AsyncMongoMockClient()[args.db_name])
+
+    await _seed(args.playlists, args.channels)
+
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=args.port,
+                            log_level="warning", access_log=False)
+    await uvicorn.Server(config).serve()
+
+# --- client side -----------------------------------------------------------
+
+async def _wait_ready(client, base_url: str, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get(f"{base_url}/api/playlists/")
+            if response.status_code == 200 and response.json():
+                return response.json()
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("Server did not become ready")
+
+async def _drive(client, name: str, make_request, total: int, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                response = await make_request(client)
+                await response.aread()
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "benchmark": "load",
+        "endpoint": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "median_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+    }
+    print(
+        f"{name:<34} {result['requests']:>6} req {errors:>4} err "
+        f"{result['throughput_rps']:>9.1f} req/s  "
+        f"p50 {result['median_s'] * 1000:8.1f} ms  p95 {result['p95_s'] * 1000:8.1f} ms  "
+        f"p99 {result['p99_s'] * 1000:8.1f} ms"
+    )
+    return result
+
+async def _run_client(args, base_url: str) -> list:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        playlists = await _wait_ready(client, base_url)
+        playlist_id = playlists[0]["id"]
+        api = f"{base_url}/api/playlists"
+
+        scenarios = [
+            ("GET /playlists/", lambda c: c.get(f"{api}/"), args.requests),
+            ("GET /playlists/categories", lambda c: c.get(f"{api}/categories"), args.requests),
+            ("GET /playlists/{id}/channels", lambda c: c.get(f"{api}/{playlist_id}/channels"), args.requests),
+            ("GET /playlists/channels", lambda c: c.get(f"{api}/channels"), args.requests),
+            ("GET /playlists/channels?search", lambda c: c.get(f"{api}/channels", params={"search": "news"}), args.requests),
+            ("GET /playlists/channels?dedup", lambda c: c.get(f"{api}/channels", params={"dedup": "true"}), args.requests),
+            # Writes last: they grow the library the read scenarios measure
+            ("POST /playlists/upload", lambda c: c.post(
+                f"{api}/upload",
+                files={"file": ("load_test.m3u", UPLOAD_PLAYLIST.encode("utf-8"), "audio/x-mpegurl")},
+            ), max(1, args.requests // 10)),
+        ]
+
+        results = []
+        for name, make_request, total in scenarios:
+            if args.endpoints and not any(e in name for e in args.endpoints):
+                continue
+            results.append(await _drive(client, name, make_request, total, args.concurrency))
+        return results
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--playlists", type=int, default=20)
+    arg_parser.add_argument("--channels", type=int, default=500, help="channels per playlist")
+    arg_parser.add_argument("--concurrency", type=int, default=200)
+    arg_parser.add_argument("--requests", type=int, default=1000, help="requests per read endpoint")
+    arg_parser.add_argument("--endpoints", nargs="*", help="only run scenarios containing these strings")
+    arg_parser.add_argument("--timeout", type=float, default=60.0)
+    arg_parser.add_argument("--mongo-url", help="real MongoDB to use instead of the in-memory stand-in")
+    arg_parser.add_argument("--db-name", default="iptv_load_test")
+    arg_parser.add_argument("--sqlite", help="SQLite file for the embedded storage backend (recreated)")
+    arg_parser.add_argument("--output", help="write JSON results to this file")
+    arg_parser.add_argument("--compare", help="baseline JSON to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.15)
+    arg_parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    arg_parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.serve:
+        logging.disable(logging.WARNING)
+        asyncio.run(_serve(args))
+        return
+
+    port = _free_port()
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+               "--playlists", str(args.playlists), "--channels", str(args.channels),
+               "--db-name", args.db_name]
+    if args.mongo_url:
+        command += ["--mongo-url", args.mongo_url]
+    if args.sqlite:
+        command += ["--sqlite", os.path.abspath(args.sqlite)]
+    database = "sqlite" if args.sqlite else "mongodb" if args.mongo_url else "mongomock"
+
+    print(f"Seeding {args.playlists} playlists x {args.channels} channels "
+          f"({database}), concurrency {args.concurrency}")
+    server_process = subprocess.Popen(command)
+    try:
+        results = asyncio.run(_run_client(args, f"http://127.0.0.1:{port}"))
+    finally:
+        server_process.terminate()
+        server_process.wait(timeout=30)
+
+    config = {
+        "playlists": args.playlists,
+        "channels": args.channels,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "database": database,
+    }
+    report = make_report("load", config, results)
+    write_report(report, args.output)
+
+    if args.compare:
+        print(f"\n=== Compared to {args.compare} (p95) ===")
+        if compare_reports(load_report(args.compare), report, args.threshold, metric="p95_s"):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
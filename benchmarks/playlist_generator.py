@@ -0,0 +1,114 @@
+"""Deterministic synthetic M3U playlists for benchmarks.
+
+The same arguments always produce byte-identical output, so timings taken on
+different commits are comparable.
+"""
+import random
+from typing import Dict, Optional, Tuple
+
+NAME_WORDS = [
+    "News", "Sports", "Cinema", "Kids", "Music", "Docs", "Weather", "Comedy",
+    "Noticias", "Deportes", "Películas", "Niños", "Música", "Española",
+    "Télé", "Français", "Actualités", "Série", "Ñandú", "Café",
+]
+NAME_SUFFIXES = ["", "", "", " HD", " FHD", " (720p)", " (1080p)", " [Geo-blocked]", " +1"]
+CATEGORIES = [
+    "News", "Sports", "Movies", "Kids", "Music", "Documentary", "Entertainment",
+    "Noticias", "Deportes", "España", "Français", "Undefined",
+]
+COUNTRIES = ["us", "es", "fr", "mx", "ar", "uk", "de", "it"]
+URL_TEMPLATES = [
+    "https://cdn{n}.example-tv.com/live/{slug}/index.m3u8",
+    "https://edge{n}.streams.example.net/hls/{slug}/playlist.m3u8",
+    "http://iptv{n}.example.org:8080/{slug}/{id}.ts",
+    "https://vod.example.com/movies/{slug}.mp4",
+    "rtmp://live{n}.example.tv/live/{slug}",
+    "https://stitcher.example.com/stitch/hls/channel/{id}/master.m3u8?appName=web&deviceId={id}",
+]
+INVALID_URLS = [
+    "ftp://files.example.com/{slug}.m3u8",
+    "http://localhost/{slug}.m3u8",
+    "https://example.com/{slug}.html",
+    "not a url",
+]
+
+# Probability that each optional attribute is present on an #EXTINF line
+DEFAULT_ATTRIBUTE_MIX = {
+    "tvg-id": 0.8,
+    "tvg-name": 0.5,
+    "tvg-logo": 0.7,
+    "group-title": 0.9,
+    "tvg-country": 0.3,
+    "tvg-language": 0.2,
+    "catchup": 0.05,
+}
+
+def generate_playlist(
+    count: int,
+    seed: int = 0,
+    attribute_mix: Optional[Dict[str, float]] = None,
+    invalid_ratio: float = 0.05,
+    bom: bool = False,
+    line_ending: str = "\n"
+) -> Tuple[str, int]:
+    """Build an M3U playlist with ``count`` entries.
+
+    ``invalid_ratio`` of the entries are broken in one of the ways real
+    provider lists are (malformed #EXTINF, rejected URL, stray comments).
+    Returns the content and the number of channels the parser should accept.
+    """
+    rng = random.Random(seed)
+    mix = dict(DEFAULT_ATTRIBUTE_MIX, **(attribute_mix or {}))
+
+    lines = ["\ufeff#EXTM3U" if bom else "#EXTM3U"]
+    valid = 0
+
+    for i in range(count):
+        name = " ".join(rng.sample(NAME_WORDS, rng.randint(1, 3))) + f" {i}" + rng.choice(NAME_SUFFIXES)
+        slug = f"ch{i}-{rng.randrange(1 << 30):x}"
+        country = rng.choice(COUNTRIES)
+
+        attrs = []
+        if rng.random() < mix["tvg-id"]:
+            attrs.append(f'tvg-id="{slug}.{country}"')
+        if rng.random() < mix["tvg-name"]:
+            attrs.append(f'tvg-name="{name}"')
+        if rng.random() < mix["tvg-logo"]:
+            attrs.append(f'tvg-logo="https://i.example.com/logos/{slug}.png"')
+        if rng.random() < mix["group-title"]:
+            attrs.append(f'group-title="{rng.choice(CATEGORIES)}"')
+        if rng.random() < mix["tvg-country"]:
+            attrs.append(f'tvg-country="{country.upper()}"')
+        if rng.random() < mix["tvg-language"]:
+            attrs.append('tvg-language="Spanish"')
+        if rng.random() < mix["catchup"]:
+            attrs.append('catchup="default" catchup-days="7"')
+
+        template = rng.choice(URL_TEMPLATES)
+        url = template.format(n=rng.randint(1, 20), slug=slug, id=f"{rng.randrange(1 << 48):012x}")
+        extinf = f"#EXTINF:-1 {' '.join(attrs)},{name}"
+
+        if rng.random() < invalid_ratio:
+            kind = rng.randrange(3)
+            if kind == 0:
+                # Missing the comma that separates attributes from the name
+                extinf = f"#EXTINF:-1 {' '.join(attrs)}"
+            elif kind == 1:
+                url = rng.choice(INVALID_URLS).format(slug=slug)
+            else:
+                lines.append("# stray provider comment")
+                lines.append("")
+            if kind != 2:
+                lines.append(extinf)
+                lines.append(url)
+                continue
+
+        lines.append(extinf)
+        lines.append(url)
+        valid += 1
+
+    return line_ending.join(lines) + line_ending, valid
+
+def encode_playlist(content: str, encoding: str) -> bytes:
+    """Encode a generated playlist the way a provider would serve it"""
+    return content.encode(encoding, errors="replace")
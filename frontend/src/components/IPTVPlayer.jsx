@@ -35,6 +35,20 @@ import {
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// When enabled, the backend restreams HLS so viewers of a channel share upstream fetches
+const HLS_PROXY_ENABLED = process.env.REACT_APP_HLS_PROXY === 'true';
+
+// Start on a variant the backend already resolved, skipping the master playlist round-trip
+const pickVariant = (variants) => {
+  const downlink = navigator.connection?.downlink; // Mbit/s, not available everywhere
+  const budget = downlink ? downlink * 1e6 * 0.8 : 3e6;
+  const fitting = variants.filter((variant) => variant.bandwidth <= budget);
+  return (fitting.length ? fitting[fitting.length - 1] : variants[0]).url;
+};
+
+// Logos proxied by the backend come back as server-relative paths
+const logoSrc = (logo) => (logo && logo.startsWith('/') ? `${BACKEND_URL}${logo}` : logo);
+
 const IPTVPlayer = () => {
   const [channels, setChannels] = useState([]);
   const [currentChannel, setCurrentChannel] = useState(null);
@@ -56,6 +70,7 @@ const IPTVPlayer = () => {
   
   const videoRef = useRef(null);
   const hlsRef = useRef(null);
+  const streamIndexRef = useRef(0);
   const fileInputRef = useRef(null);
   const { toast } = useToast();
 
@@ -70,6 +85,7 @@ const IPTVPlayer = () => {
   // Setup HLS when channel changes
   useEffect(() => {
     if (currentChannel && videoRef.current) {
+      streamIndexRef.current = 0;
       setupVideoPlayer();
     }
     return () => {
@@ -151,6 +167,17 @@ https://rakuten-euronews-1-gb.samsung.wurl.com/manifest/playlist.m3u8`;
     }
   };
 
+  // Fail over to the same channel from another playlist, if the server merged any
+  const tryNextStream = () => {
+    const alternates = currentChannel?.alternate_urls || [];
+    if (streamIndexRef.current < alternates.length) {
+      streamIndexRef.current += 1;
+      setupVideoPlayer();
+      return true;
+    }
+    return false;
+  };
+
   const setupVideoPlayer = () => {
     if (!currentChannel || !videoRef.current) return;
 
@@ -164,7 +191,14 @@ https://rakuten-euronews-1-gb.samsung.wurl.com/manifest/playlist.m3u8`;
     }
 
     const video = videoRef.current;
-    const url = currentChannel.url;
+    let url = streamIndexRef.current === 0
+      ? currentChannel.url
+      : currentChannel.alternate_urls[streamIndexRef.current - 1];
+    if (HLS_PROXY_ENABLED && streamIndexRef.current === 0 && url.includes('.m3u8')) {
+      url = `${API}/stream/${currentChannel.id}/index.m3u8`;
+    } else if (streamIndexRef.current === 0 && currentChannel.variants?.length) {
+      url = pickVariant(currentChannel.variants);
+    }
 
     // Check if HLS is supported
     if (url.includes('.m3u8')) {
@@ -193,6 +227,7 @@ https://rakuten-euronews-1-gb.samsung.wurl.com/manifest/playlist.m3u8`;
 
         hls.on(Hls.Events.ERROR, (event, data) => {
           console.error('HLS error:', data);
+          if (data.fatal && tryNextStream()) return;
           setVideoError('Error de reproducción');
           setIsBuffering(false);
           setIsPlaying(false);
@@ -232,6 +267,7 @@ https://rakuten-euronews-1-gb.samsung.wurl.com/manifest/playlist.m3u8`;
     video.addEventListener('waiting', () => setIsBuffering(true));
     video.addEventListener('playing', () => setIsBuffering(false));
     video.addEventListener('error', () => {
+      if (tryNextStream()) return;
       setVideoError('Error al cargar el video');
       setIsBuffering(false);
       setIsPlaying(false);
@@ -256,7 +292,8 @@ https://rakuten-euronews-1-gb.samsung.wurl.com/manifest/playlist.m3u8`;
       const response = await axios.get(`${API}/playlists/channels`, {
         params: {
           category: selectedCategory !== 'Todos' ? selectedCategory : undefined,
-          search: searchTerm || undefined
+          search: searchTerm || undefined,
+          dedup: true
         }
       });
       setChannels(response.data);
@@ -615,7 +652,7 @@ https://rakuten-euronews-1-gb.samsung.wurl.com/manifest/playlist.m3u8`;
                   <div className="w-14 h-10 bg-purple-500/20 rounded-lg flex items-center justify-center flex-shrink-0 border border-purple-400/30">
                     {channel.logo ? (
                       <img
-                        src={channel.logo}
+                        src={logoSrc(channel.logo)}
                         alt={channel.name}
                         className="w-full h-full object-cover rounded-lg"
                         onError={(e) => {
@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the benchmarks and backend directories to the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from playlist_generator import generate_playlist
+from services.m3u_parser import M3UParser
+from services.channel_changes import ChannelDelta, change_entry, diff_channels, CHANGE_SETTLE_SECONDS, MAX_LOGGED_IDS
+from services.channel_table import channel_records
+
+def entry(revision, playlist_id, created_at, **change):
+    return dict(change_entry(**change), revision=revision, playlist_id=playlist_id, created_at=created_at)
+
+class ChannelChangesTest(unittest.TestCase):
+    def setUp(self):
+        content, _ = generate_playlist(30, seed=12, invalid_ratio=0)
+        self.channels = M3UParser().parse_content(content)
+
+    def test_01_diff_keeps_ids_of_unchanged_channels(self):
+        """Duplicates are matched one to one, field changes are upserts under the old id"""
+        stored = list(channel_records(self.channels[:20] + self.channels[:1]))
+        parsed = M3UParser().parse_content(generate_playlist(30, seed=12, invalid_ratio=0)[0])
+        changed = parsed[5].model_copy(update={"category": "Otros"})
+        new = parsed[:5] + [changed] + parsed[6:10] + parsed[:1] + parsed[25:]
+
+        channels, upserted, removed = diff_channels(stored, new)
+        self.assertEqual([c.id for c in channels[:10]], [c.id for c in self.channels[:10]])
+        self.assertEqual(channels[10].id, stored[20]["id"])
+        self.assertEqual(upserted, [self.channels[5].id] + [c.id for c in parsed[25:]])
+        self.assertEqual(removed, [c.id for c in self.channels[10:20]])
+
+        self.assertTrue(change_entry(upserted=map(str, range(MAX_LOGGED_IDS + 1)))["replaced"])
+
+    def test_02_delta_collapses_entries_and_waits_for_gaps(self):
+        """Later changes win, replaced and deleted playlists absorb their channel changes"""
+        now = datetime.utcnow()
+        entries = [
+            entry(4, "a", now, upserted=["x", "y"]),
+            entry(5, "a", now, removed=["x"]),
+            entry(6, "b", now, upserted=["z"]),
+            entry(7, "b", now, deleted=True),
+            entry(8, "c", now, replaced=True),
+            entry(9, "c", now, removed=["w"]),
+            # Revision 10 is still being written
+            entry(11, "a", now, removed=["y"]),
+        ]
+        delta = ChannelDelta.from_entries(3, entries, now)
+        self.assertEqual(delta.revision, 9)
+        self.assertEqual(delta.deleted, {"x": "a"})
+        self.assertEqual((delta.deleted_playlists, delta.replaced_playlists), ({"b"}, {"c"}))
+        self.assertEqual(delta.playlists_to_read(), {"c": None, "a": {"y"}})
+
+        # A gap that old was abandoned by its writer
+        later = now + timedelta(seconds=CHANGE_SETTLE_SECONDS + 1)
+        delta = ChannelDelta.from_entries(3, entries, later)
+        self.assertEqual(delta.revision, 11)
+        self.assertEqual(delta.deleted, {"x": "a", "y": "a"})
+        self.assertEqual(delta.playlists_to_read(), {"c": None})
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
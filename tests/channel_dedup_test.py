@@ -0,0 +1,92 @@
+import unittest
+import os
+import sys
+
+# Add the backend directory to the path so the services can be imported directly
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from models.playlist import Channel
+from services.channel_dedup import ChannelDeduplicator
+
+class ChannelDeduplicatorTest(unittest.TestCase):
+    def setUp(self):
+        self.dedup = ChannelDeduplicator()
+
+    def test_01_normalization(self):
+        """Names and URLs are reduced to comparable keys"""
+        self.assertEqual(self.dedup.normalize_name("ESPN HD [US]"), "espn")
+        self.assertEqual(self.dedup.normalize_name("Canal Español (1080p)"), "canalespanol")
+        self.assertEqual(
+            self.dedup.normalize_url("HTTPS://Example.com:443/live/espn.m3u8/"),
+            "example.com/live/espn.m3u8"
+        )
+        self.assertEqual(
+            self.dedup.normalize_url("http://example.com:8080/live"),
+            "example.com:8080/live"
+        )
+
+    def test_02_merge_across_playlists(self):
+        """Same tvg-id, name or URL in different playlists ends up in one cluster"""
+        first = [
+            Channel(name="ESPN HD", url="https://a.com/espn.m3u8", tvg_id="ESPN.us"),
+            Channel(name="CNN", url="https://a.com/cnn.m3u8"),
+        ]
+        second = [
+            Channel(name="Sports", url="https://b.com/espn.m3u8", tvg_id="espn.us@SD"),
+            Channel(name="CNN [US]", url="https://b.com/cnn.m3u8"),
+            Channel(name="Other", url="https://b.com/other.m3u8"),
+        ]
+
+        clusters, absorbed = self.dedup.merge([], first, "p1")
+        self.assertEqual(len(clusters), 2)
+        self.assertEqual(absorbed, [])
+
+        upserts, absorbed = self.dedup.merge(clusters, second, "p2")
+        by_name = {c["name"]: c for c in upserts}
+        self.assertEqual(len(upserts), 3)
+        self.assertEqual(
+            self.dedup.alternate_urls(by_name["ESPN HD"]),
+            ["https://a.com/espn.m3u8", "https://b.com/espn.m3u8"]
+        )
+        self.assertEqual(len(by_name["CNN"]["streams"]), 2)
+        self.assertEqual(len(by_name["Other"]["streams"]), 1)
+
+    def test_03_bridge_merges_existing_clusters(self):
+        """A channel sharing keys with two clusters joins them together"""
+        clusters, _ = self.dedup.merge([], [
+            Channel(name="Alpha", url="https://a.com/1.m3u8", tvg_id="alpha.tv"),
+            Channel(name="Beta", url="https://a.com/2.m3u8"),
+        ], "p1")
+        ids = {c["name"]: c["id"] for c in clusters}
+
+        upserts, absorbed = self.dedup.merge(clusters, [
+            Channel(name="Beta", url="https://c.com/3.m3u8", tvg_id="alpha.tv"),
+        ], "p2")
+
+        self.assertEqual(len(upserts), 1)
+        self.assertEqual(upserts[0]["id"], ids["Alpha"])
+        self.assertEqual(absorbed, [ids["Beta"]])
+        self.assertEqual(len(upserts[0]["streams"]), 3)
+
+    def test_04_different_tvg_ids_stay_apart(self):
+        """A shared name or URL doesn't merge channels whose tvg-ids differ"""
+        clusters, _ = self.dedup.merge([], [
+            Channel(name="BBC One HD", url="https://a.com/bbc1hd.m3u8", tvg_id="BBCOneHD.uk"),
+            Channel(name="BBC One", url="https://a.com/bbc1.m3u8"),
+        ], "p1")
+        self.assertEqual(len(clusters), 1)
+
+        upserts, absorbed = self.dedup.merge(clusters, [
+            Channel(name="BBC One SD", url="https://b.com/bbc1.m3u8", tvg_id="BBCOne.uk"),
+            Channel(name="BBC One [UK]", url="https://b.com/bbc1hd.m3u8", tvg_id="bbconehd.uk"),
+            Channel(name="BBC One", url="https://a.com/bbc1hd.m3u8"),
+        ], "p2")
+
+        self.assertEqual(absorbed, [])
+        by_tvg = {c["tvg_id"]: c for c in upserts}
+        self.assertEqual(set(by_tvg), {"BBCOneHD.uk", "BBCOne.uk"})
+        self.assertEqual(by_tvg["BBCOneHD.uk"]["id"], clusters[0]["id"])
+        self.assertEqual(len(by_tvg["BBCOneHD.uk"]["streams"]), 4)
+        self.assertEqual(self.dedup.alternate_urls(by_tvg["BBCOne.uk"]), ["https://b.com/bbc1.m3u8"])
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,127 @@
+import unittest
+import asyncio
+import logging
+import mmap
+import os
+import sys
+import tempfile
+
+# Add the benchmarks and backend directories to the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from mongomock_motor import AsyncMongoMockClient
+from playlist_generator import generate_playlist
+from models.playlist import Playlist
+from services.m3u_parser import M3UParser
+from services.channel_table import ChannelTable, ChannelTables, channel_records
+from services.channel_snapshot import ChannelSnapshots, capture
+from storage.mongo import MongoStorage
+import services.channel_snapshot
+
+def ids(table, playlist_id=None, category=None, search=None):
+    return [r["id"] for r in table.records(table.select(playlist_id, category, search))]
+
+class CountingStorage(MongoStorage):
+    """Records which playlists had their channels read"""
+
+    def __init__(self, db):
+        super().__init__(db)
+        self.reads = []
+
+    def channel_chunks(self, owner_id, playlist_id, category, search, chunk_size):
+        self.reads.append(playlist_id)
+        return super().channel_chunks(owner_id, playlist_id, category, search, chunk_size)
+
+class ChannelSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.snapshots = ChannelSnapshots(directory.name)
+        self.parser = M3UParser()
+        content, _ = generate_playlist(600, seed=12, invalid_ratio=0)
+        self.channels = self.parser.parse_content(content)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_01_round_trip_is_mapped_and_writable(self):
+        """A loaded snapshot answers like the original, maps its buffers and accepts changes"""
+        table = ChannelTable()
+        table.add_playlist("a", channel_records(self.channels[:300]), "v1")
+        table.add_playlist("b", channel_records(self.channels[300:500]), "v1")
+        table.add_playlist("a", channel_records(self.channels[:250]), "v2")
+        self.snapshots.save("user:1", capture(table))
+
+        loaded = self.snapshots.load("user:1")
+        self.assertIsInstance(loaded.names.base, mmap.mmap)
+        self.assertEqual(loaded.versions, {"a": "v2", "b": "v1"})
+        for category, search in ((None, None), ("Sports", None), (None, "news"), (None, "e"), ("News", "hd")):
+            self.assertEqual(ids(loaded, None, category, search), ids(table, None, category, search))
+        self.assertEqual(loaded.records(loaded.select("b", None, None)), table.records(table.select("b", None, None)))
+
+        # New rows go after the mapped ones; searches and compaction span both
+        loaded.add_playlist("c", channel_records(self.channels[500:]))
+        loaded.remove_playlist("b")
+        expected = [c.id for c in self.channels[:250] + self.channels[500:]]
+        self.assertEqual(ids(loaded), expected)
+        expected_news = [c.id for c in self.parser.search_channels(self.channels[:250] + self.channels[500:], "news")]
+        self.assertEqual(ids(loaded, search="news"), expected_news)
+        self.assertEqual(ids(loaded.compacted(), search="news"), expected_news)
+
+    def test_02_restart_catches_up_changed_playlists_only(self):
+        """A restarted worker maps the snapshot and reads just the playlists changed since"""
+        library = CountingStorage(AsyncMongoMockClient()['channel_snapshot_test'])
+        playlists = [
+            Playlist(name=f"P{i}", channel_count=100, channels=self.channels[i * 100:(i + 1) * 100])
+            for i in range(5)
+        ]
+        for playlist in playlists:
+            asyncio.run(library.insert_playlist(playlist))
+        asyncio.run(ChannelTables(library, snapshots=self.snapshots).get("default"))
+
+        # Changes made by another worker while this one was down
+        added = Playlist(name="New", channel_count=50, channels=self.channels[500:550])
+        asyncio.run(library.insert_playlist(added))
+        refreshed = self.channels[100:120]
+        asyncio.run(library.update_channels("default", playlists[1].id, refreshed,
+                                            playlists[1].last_updated.replace(year=2099)))
+        asyncio.run(library.delete_playlist("default", playlists[3].id))
+
+        library.reads.clear()
+        table = asyncio.run(ChannelTables(library, snapshots=self.snapshots).get("default"))
+        self.assertEqual(sorted(library.reads), sorted([added.id, playlists[1].id]))
+        expected = self.channels[:100] + refreshed + self.channels[200:300] + self.channels[400:550]
+        self.assertEqual(ids(table), [c.id for c in expected])
+
+        # The caught-up table was saved, so the next start reads nothing
+        library.reads.clear()
+        asyncio.run(ChannelTables(library, snapshots=self.snapshots).get("default"))
+        self.assertEqual(library.reads, [])
+
+    def test_03_unusable_snapshots_are_ignored(self):
+        table = ChannelTable()
+        table.add_playlist("a", channel_records(self.channels[:10]))
+        path = self.snapshots.save("default", capture(table))
+        self.addCleanup(setattr, services.channel_snapshot, "FORMAT_VERSION", services.channel_snapshot.FORMAT_VERSION)
+        services.channel_snapshot.FORMAT_VERSION += 1
+        self.assertIsNone(self.snapshots.load("default"))
+
+        services.channel_snapshot.FORMAT_VERSION -= 1
+        os.remove(os.path.join(path, "urls.ends.npy"))
+        self.assertIsNone(self.snapshots.load("default"))
+        self.assertIsNone(self.snapshots.load("nobody"))
+
+    def test_04_lock_is_exclusive(self):
+        self.snapshots.lock_timeout = 0.2
+
+        async def scenario():
+            held = await self.snapshots.lock("default")
+            self.assertIsNone(await self.snapshots.lock("default"))
+            self.snapshots.unlock(held)
+            self.snapshots.unlock(await self.snapshots.lock("default"))
+
+        asyncio.run(scenario())
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,161 @@
+import unittest
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime
+from unittest import mock
+
+# Add the benchmarks and backend directories to the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from mongomock_motor import AsyncMongoMockClient
+from playlist_generator import generate_playlist
+from models.playlist import Playlist
+from services.m3u_parser import M3UParser
+from services.channel_table import ChannelTable, ChannelTables, channel_records
+from storage.mongo import MongoStorage
+import services.channel_table
+
+def ids(table, playlist_id=None, category=None, search=None):
+    return [r["id"] for r in table.records(table.select(playlist_id, category, search))]
+
+class ChannelTableTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.parser = M3UParser()
+        content, _ = generate_playlist(2000, seed=11)
+        self.channels = self.parser.parse_content(content)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_01_filters_match_parser(self):
+        """Category, search and playlist filters return what the list filters return"""
+        table = ChannelTable()
+        table.add_playlist("a", channel_records(self.channels[:1500]))
+        table.add_playlist("b", channel_records(self.channels[1500:]))
+
+        for category, search in (("Sports", None), (None, "news"), ("Noticias", "café"), ("Todos", "HD"),
+                                 (None, "e"), ("Missing", None), (None, "\x00")):
+            expected = self.parser.filter_channels_by_category(self.channels, category)
+            expected = self.parser.search_channels(expected, search)
+            self.assertEqual(ids(table, None, category, search), [c.id for c in expected])
+
+            in_b = self.parser.search_channels(self.parser.filter_channels_by_category(self.channels[1500:], category), search)
+            self.assertEqual(ids(table, "b", category, search), [c.id for c in in_b])
+
+        record = table.records(table.select(None, None, None)[:1])[0]
+        self.assertEqual(record, next(channel_records(self.channels[:1])))
+        self.assertEqual(self.parser.sort_categories(table.category_names()), self.parser.get_categories(self.channels))
+
+    def test_02_refresh_keeps_library_order(self):
+        """A refreshed playlist keeps its place, removed rows disappear, compaction changes nothing visible"""
+        table = ChannelTable()
+        table.add_playlist("a", channel_records(self.channels[:10]))
+        table.add_playlist("b", channel_records(self.channels[10:20]))
+        table.add_playlist("c", channel_records(self.channels[20:30]))
+
+        table.add_playlist("a", channel_records(self.channels[30:35]))
+        table.remove_playlist("b")
+        expected = [c.id for c in self.channels[30:35] + self.channels[20:30]]
+        self.assertFalse(table.ordered)
+        self.assertEqual(len(table), 15)
+        self.assertEqual(ids(table), expected)
+
+        compacted = table.compacted()
+        self.assertTrue(compacted.ordered)
+        self.assertEqual(compacted.live.size, 15)
+        self.assertEqual(ids(compacted), expected)
+        self.assertEqual(ids(compacted, "a", search=self.channels[31].name), [self.channels[31].id])
+        # The old table still answers, as listings in flight keep using it
+        self.assertEqual(ids(table), expected)
+
+    def test_03_tables_load_once_and_follow_changes(self):
+        """Concurrent first requests share one load; changes during the load are replayed"""
+        library = MongoStorage(AsyncMongoMockClient()['channel_table_test'])
+        first = Playlist(name="First", channel_count=100, channels=self.channels[:100])
+        asyncio.run(library.insert_playlist(first))
+        tables = ChannelTables(library, load_chunk_size=30)
+        second = Playlist(name="Second", channel_count=50, channels=self.channels[100:150])
+
+        async def scenario():
+            loads = asyncio.gather(tables.get("default"), tables.get("default"))
+            await asyncio.sleep(0)
+            # Arrives mid-load, after the playlist list was read
+            await library.insert_playlist(second)
+            tables.playlist_changed("default", second.id, second.channels)
+            tables.playlist_changed("default", first.id, None)
+            return await loads
+
+        table, again = asyncio.run(scenario())
+        self.assertIs(table, again)
+        self.assertEqual(ids(table), [c.id for c in self.channels[100:150]])
+
+        tables.playlist_changed("default", first.id, self.channels[:100])
+        chunks = asyncio.run(self.collect(tables.channel_chunks("default", None, None, None, 40)))
+        self.assertEqual([len(chunk) for chunk in chunks], [40, 40, 40, 30])
+        self.assertEqual(tables.stats()["channels"], 150)
+
+    def test_04_compacts_after_churn(self):
+        """Repeated refreshes swap in a compacted table instead of growing forever"""
+        self.addCleanup(setattr, services.channel_table, "COMPACT_MIN_ROWS", services.channel_table.COMPACT_MIN_ROWS)
+        services.channel_table.COMPACT_MIN_ROWS = 0
+        tables = ChannelTables(MongoStorage(AsyncMongoMockClient()['channel_table_test']))
+        table = asyncio.run(tables.get("default"))
+        for _ in range(5):
+            tables.playlist_changed("default", "a", self.channels[:100])
+        current = asyncio.run(tables.get("default"))
+        self.assertIsNot(current, table)
+        self.assertLessEqual(current.live.size, 200)
+        self.assertEqual(ids(current), [c.id for c in self.channels[:100]])
+
+    def test_05_reads_the_primary(self):
+        """Tables load and sync from the primary, never a lagging listing replica"""
+        client = AsyncMongoMockClient()
+        library = MongoStorage(client['channel_table_primary'], client['channel_table_lagging'])
+        playlist = Playlist(name="First", channel_count=100, channels=self.channels[:100])
+        asyncio.run(library.insert_playlist(playlist))
+        tables = ChannelTables(library)
+
+        async def scenario():
+            table = await tables.get("default")
+            loaded = ids(table)
+            await library.update_channels("default", playlist.id, self.channels[100:120], datetime.utcnow())
+            return loaded, await tables.sync_playlist("default", playlist.id), ids(await tables.get("default"))
+
+        loaded, synced, current = asyncio.run(scenario())
+        self.assertEqual(loaded, [c.id for c in self.channels[:100]])
+        self.assertTrue(synced)
+        self.assertEqual(current, [c.id for c in self.channels[100:120]])
+
+    def test_06_cancelled_load_does_not_strand_waiters(self):
+        """A request cancelled while loading a table hands the load over to those waiting on it"""
+        library = MongoStorage(AsyncMongoMockClient()['channel_table_test'])
+        asyncio.run(library.insert_playlist(Playlist(name="First", channel_count=100, channels=self.channels[:100])))
+        tables = ChannelTables(library, load_chunk_size=30)
+
+        async def scenario():
+            started = asyncio.Event()
+
+            async def stalled(owner_id):
+                started.set()
+                await asyncio.sleep(10)
+
+            with mock.patch.object(tables, "_load", side_effect=stalled):
+                first = asyncio.create_task(tables.get("default"))
+                await started.wait()
+                second = asyncio.create_task(tables.get("default"))
+                await asyncio.sleep(0)
+            first.cancel()
+            return await asyncio.wait_for(second, 5)
+
+        self.assertEqual(len(asyncio.run(scenario())), 100)
+        self.assertEqual(tables._loading, {})
+
+    @staticmethod
+    async def collect(chunks):
+        return [chunk async for chunk in chunks]
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
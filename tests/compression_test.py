@@ -0,0 +1,126 @@
+import unittest
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+
+# Add the benchmarks and backend directories to the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+from playlist_generator import generate_playlist
+from services.compression import (CompressionMiddleware, CompressedBodyCache, CompressedStaticFiles,
+                                  accepted_encoding, _brotli)
+
+class CompressionTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.body = b"".join(b'{"name": "Channel %d", "category": "Sports"},' % i for i in range(500))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        content, _ = generate_playlist(300, seed=18)
+        with open(os.path.join(directory.name, "list.m3u"), "w") as f:
+            f.write(content)
+        with open(os.path.join(directory.name, "logo.png"), "wb") as f:
+            f.write(self.body)
+        self.playlist = content.encode("utf-8")
+        self.cache = CompressedBodyCache()
+
+        app = FastAPI()
+        body = self.body
+
+        @app.get("/small")
+        async def small():
+            return Response(b'{"ok": true}', media_type="application/json")
+
+        @app.get("/large")
+        async def large():
+            return Response(body, media_type="application/json")
+
+        @app.get("/image")
+        async def image():
+            return Response(body, media_type="image/png")
+
+        @app.get("/streamed")
+        async def streamed():
+            async def chunks():
+                for start in range(0, len(body), 1000):
+                    yield body[start:start + 1000]
+            return StreamingResponse(chunks(), media_type="application/json")
+
+        app.mount("/uploads", CompressedStaticFiles(directory=directory.name, cache=self.cache), name="uploads")
+        app.add_middleware(CompressionMiddleware, minimum_size=1024)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def get(self, path, encoding, **headers):
+        return self.client.get(path, headers={"Accept-Encoding": encoding, **headers})
+
+    def test_01_negotiation(self):
+        brotli = "br" if _brotli() is not None else "gzip"
+        self.assertEqual(accepted_encoding("gzip, deflate, br"), brotli)
+        self.assertEqual(accepted_encoding("br;q=0, gzip"), "gzip")
+        self.assertEqual(accepted_encoding("*"), "gzip")
+        self.assertIsNone(accepted_encoding("identity"))
+        self.assertIsNone(accepted_encoding("gzip;q=0"))
+        self.assertIsNone(accepted_encoding(None))
+
+    def test_02_threshold_and_types(self):
+        """Bodies above the threshold are compressed, small ones and images are not"""
+        response = self.get("/large", "gzip")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertEqual(response.content, self.body)
+        self.assertLess(int(response.headers["content-length"]), len(self.body) // 4)
+
+        for path in ("/small", "/image"):
+            self.assertNotIn("content-encoding", self.get(path, "gzip").headers)
+        self.assertNotIn("content-encoding", self.get("/large", "identity").headers)
+
+    def test_03_streamed_and_brotli(self):
+        """Streamed bodies are compressed chunk by chunk, brotli when installed"""
+        response = self.get("/streamed", "gzip")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertNotIn("content-length", response.headers)
+        self.assertEqual(response.content, self.body)
+
+        if _brotli() is not None:
+            for path in ("/large", "/streamed"):
+                response = self.get(path, "br, gzip")
+                self.assertEqual(response.headers["content-encoding"], "br")
+                self.assertEqual(response.content, self.body)
+
+    def test_04_uploads_compressed_once(self):
+        """Stored files are compressed once per version and revalidated by ETag"""
+        first = self.get("/uploads/list.m3u", "gzip")
+        self.assertEqual(first.headers["content-encoding"], "gzip")
+        self.assertEqual(first.content, self.playlist)
+        second = self.get("/uploads/list.m3u", "gzip")
+        self.assertEqual(second.headers["etag"], first.headers["etag"])
+        self.assertEqual(self.cache.compressions, 1)
+
+        cached = self.get("/uploads/list.m3u", "gzip", **{"If-None-Match": first.headers["etag"]})
+        self.assertEqual(cached.status_code, 304)
+        self.assertNotIn("content-encoding", self.get("/uploads/logo.png", "gzip").headers)
+        self.assertEqual(self.get("/uploads/missing.m3u", "gzip").status_code, 404)
+
+    def test_05_cache_bounded(self):
+        cache = CompressedBodyCache(max_bytes=len(self.playlist) * 3)
+
+        async def fill():
+            for i in range(5):
+                await cache.respond(Headers({"accept-encoding": "gzip"}), i, f'"{i}"', self.playlist, "text/plain")
+
+        asyncio.run(fill())
+        self.assertLessEqual(cache.stats()["bytes"], cache.max_bytes)
+        self.assertEqual(cache.compressions, 5)
+        self.assertGreater(cache.stats()["entries"], 1)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
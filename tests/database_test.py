@@ -0,0 +1,56 @@
+import unittest
+import logging
+import os
+import sys
+
+# Add the backend directory to the path so the services can be imported directly
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from pymongo import monitoring
+from database import available_compressors, read_db, db
+from services.pool_stats import PoolStatsListener
+
+ADDRESS = ("mongo-1", 27017)
+
+class DatabaseConfigTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_01_compressors_need_their_libraries(self):
+        """Unknown or uninstalled compressors are dropped, order is kept"""
+        self.assertEqual(available_compressors("zlib"), ["zlib"])
+        self.assertEqual(available_compressors("brotli, zlib,"), ["zlib"])
+        compressors = available_compressors("zstd,snappy,zlib")
+        self.assertEqual(compressors[-1], "zlib")
+        self.assertTrue(set(compressors) <= {"zstd", "snappy", "zlib"})
+
+    def test_02_read_preference(self):
+        """Listings get their own handle, reading from the primary unless configured otherwise"""
+        self.assertEqual(db.read_preference.mongos_mode, "primary")
+        self.assertEqual(read_db.name, db.name)
+        self.assertEqual(read_db.read_preference.mongos_mode, "primary")
+
+    def test_03_pool_stats(self):
+        """Connection pool events are aggregated per server"""
+        listener = PoolStatsListener()
+        listener.pool_created(monitoring.PoolCreatedEvent(ADDRESS, {}))
+        for connection_id in (1, 2):
+            listener.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, connection_id))
+            listener.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+            listener.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, connection_id))
+        listener.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 1))
+        listener.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(ADDRESS, "timeout"))
+        listener.connection_closed(monitoring.ConnectionClosedEvent(ADDRESS, 2, "idle"))
+
+        stats = listener.stats()["mongo-1:27017"]
+        self.assertEqual(stats["open"], 1)
+        self.assertEqual(stats["checked_out"], 1)
+        self.assertEqual(stats["max_checked_out"], 2)
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["checkout_failures"], 1)
+        self.assertGreaterEqual(stats["wait_max_ms"], stats["wait_avg_ms"])
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,88 @@
+import unittest
+import gzip
+import os
+import sys
+from io import BytesIO
+from datetime import datetime
+
+# Add the backend directory to the path so the services can be imported directly
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from services.epg_parser import XMLTVParser, normalize_tvg_id
+
+class XMLTVParserTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = XMLTVParser()
+        self.sample_xmltv = """<?xml version="1.0" encoding="UTF-8"?>
+<tv generator-info-name="test">
+  <channel id="ESPN.us">
+    <display-name>ESPN</display-name>
+    <icon src="https://example.com/espn.png"/>
+  </channel>
+  <channel id="Canal1.es">
+    <display-name>Canal Español</display-name>
+  </channel>
+  <programme start="20240101120000 +0000" stop="20240101130000 +0000" channel="ESPN.us">
+    <title lang="en">SportsCenter</title>
+    <desc>Daily highlights</desc>
+    <category>Sports</category>
+  </programme>
+  <programme start="20240101130000 +0100" stop="20240101140000 +0100" channel="Canal1.es">
+    <title>Noticias</title>
+  </programme>
+  <programme start="invalid" channel="ESPN.us">
+    <title>Broken</title>
+  </programme>
+</tv>
+""".encode('utf-8')
+
+    def test_01_parse_channels_and_programmes(self):
+        """Channels and programmes are emitted in document order"""
+        events = list(self.parser.iter_from_file(BytesIO(self.sample_xmltv)))
+
+        channels = [data for kind, data in events if kind == 'channel']
+        programmes = [data for kind, data in events if kind == 'programme']
+
+        self.assertEqual(len(channels), 2)
+        self.assertEqual(channels[0]['tvg_id'], 'espn.us')
+        self.assertEqual(channels[0]['display_names'], ['ESPN'])
+        self.assertEqual(channels[0]['icon'], 'https://example.com/espn.png')
+
+        # Programme without a valid start time is skipped
+        self.assertEqual(len(programmes), 2)
+        self.assertEqual(programmes[0]['title'], 'SportsCenter')
+        self.assertEqual(programmes[0]['description'], 'Daily highlights')
+        self.assertEqual(programmes[0]['category'], 'Sports')
+
+    def test_02_timezone_conversion(self):
+        """Timestamps are normalized to naive UTC"""
+        self.assertEqual(
+            self.parser.parse_time("20240101130000 +0100"),
+            datetime(2024, 1, 1, 12, 0, 0)
+        )
+        self.assertEqual(
+            self.parser.parse_time("20240101120000 -0230"),
+            datetime(2024, 1, 1, 14, 30, 0)
+        )
+        self.assertEqual(self.parser.parse_time("202401011200"), datetime(2024, 1, 1, 12, 0))
+        self.assertIsNone(self.parser.parse_time("not a date"))
+
+    def test_03_gzip_guides(self):
+        """Gzip compressed guides are detected by magic bytes"""
+        compressed = gzip.compress(self.sample_xmltv)
+        events = list(self.parser.iter_from_file(BytesIO(compressed)))
+        self.assertEqual(len(events), 4)
+
+    def test_04_normalize_tvg_id(self):
+        """Playlist and guide ids match regardless of case and feed suffix"""
+        self.assertEqual(normalize_tvg_id("ESPN.us@HD"), "espn.us")
+        self.assertEqual(normalize_tvg_id("  Canal   Español "), "canal español")
+        self.assertEqual(normalize_tvg_id(None), "")
+
+    def test_05_invalid_xml(self):
+        """Malformed guides raise a readable error"""
+        with self.assertRaises(Exception) as context:
+            list(self.parser.iter_from_file(BytesIO(b"<tv><channel id='a'>")))
+        self.assertIn("XMLTV", str(context.exception))
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
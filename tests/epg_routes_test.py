@@ -0,0 +1,128 @@
+import unittest
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the benchmarks and backend directories to the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+from models.playlist import Channel, Playlist
+import routes.epg
+
+def xmltv_time(moment):
+    return moment.strftime("%Y%m%d%H%M%S +0000")
+
+def guide(now, programmes=None):
+    """Two guide channels, one matched by id and one by display name, with programmes around now"""
+    hour = timedelta(hours=1)
+    if programmes is None:
+        programmes = [("ESPN.us", now - hour, now + hour, "SportsCenter"),
+                      ("ESPN.us", now + hour, now + 2 * hour, "NBA"),
+                      ("Canal1.es", now + hour, now + 2 * hour, "Noticias")]
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n<tv>\n'
+            '  <channel id="ESPN.us"><display-name>ESPN</display-name></channel>\n'
+            '  <channel id="Canal1.es"><display-name>Canal Uno</display-name></channel>\n'
+            + "".join(f'  <programme start="{xmltv_time(start)}" stop="{xmltv_time(stop)}" channel="{channel}">'
+                      f'<title>{title}</title></programme>\n' for channel, start, stop, title in programmes)
+            + '</tv>\n').encode("utf-8")
+
+class EPGRoutesTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.db = AsyncMongoMockClient()['epg_routes_test']
+        for name in ("db", "read_db"):
+            original = getattr(routes.epg, name)
+            setattr(routes.epg, name, self.db)
+            self.addCleanup(setattr, routes.epg, name, original)
+
+        app = FastAPI()
+        app.include_router(routes.epg.router, prefix="/api")
+        self.client = TestClient(app)
+        self.now = datetime.utcnow().replace(microsecond=0)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def insert(self, owner_id, tvg_ids):
+        channels = [Channel(name=tvg_id, url=f"http://example.com/{i}.m3u8", tvg_id=tvg_id)
+                    for i, tvg_id in enumerate(tvg_ids)]
+        playlist = Playlist(owner_id=owner_id, name="Playlist", channel_count=len(channels), channels=channels)
+        asyncio.run(self.db.playlists.insert_one(playlist.model_dump()))
+
+    def upload(self, owner_id="default", programmes=None, filename="guide.xml"):
+        return self.client.post("/api/epg/upload", files={"file": (filename, guide(self.now, programmes))},
+                                headers={"X-User-Id": owner_id})
+
+    def now_next(self, tvg_ids, owner_id="default"):
+        response = self.client.get("/api/epg/now-next", params={"tvg_ids": tvg_ids}, headers={"X-User-Id": owner_id})
+        self.assertEqual(response.status_code, 200)
+        return {item["tvg_id"]: (item["now"] and item["now"]["title"], item["next"] and item["next"]["title"])
+                for item in response.json()}
+
+    def test_01_import_and_now_next(self):
+        """Imported programmes answer now/next, playlist tvg-ids matched by guide id or display name"""
+        self.insert("default", ["espn.us", "Canal Uno"])
+        response = self.upload()
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["source"], body["channel_count"], body["programme_count"], body["matched_channels"]),
+                         ("guide.xml", 2, 3, 2))
+
+        self.assertEqual(self.now_next("espn.us,Canal Uno,unknown"), {
+            "espn.us": ("SportsCenter", "NBA"), "Canal Uno": (None, "Noticias"), "unknown": (None, None),
+        })
+
+        # Importing the same guide again replaces its programmes
+        self.assertEqual(self.upload().json()["programme_count"], 3)
+        self.assertEqual(asyncio.run(self.db.epg_programmes.count_documents({})), 3)
+
+    def test_02_channel_maps_are_per_library(self):
+        """A library only resolves its own playlists' tvg-ids through the guide"""
+        self.insert("alice", ["Canal Uno"])
+        self.insert("bob", ["Other"])
+        self.assertEqual(self.upload("alice").json()["matched_channels"], 1)
+        self.assertEqual(self.upload("bob").json()["matched_channels"], 0)
+
+        self.assertEqual(self.now_next("Canal Uno", "alice"), {"Canal Uno": (None, "Noticias")})
+        self.assertEqual(self.now_next("Canal Uno", "bob"), {"Canal Uno": (None, None)})
+
+    def test_03_invalid_requests(self):
+        response = self.client.post("/api/epg/upload", files={"file": ("guide.txt", b"x")})
+        self.assertEqual(response.status_code, 400)
+        tvg_ids = ",".join(f"c{i}" for i in range(routes.epg.MAX_NOW_NEXT_CHANNELS + 1))
+        self.assertEqual(self.client.get("/api/epg/now-next", params={"tvg_ids": tvg_ids}).status_code, 400)
+
+    def test_04_same_source_per_library(self):
+        """Libraries importing a guide under the same name keep their own programmes"""
+        hour = timedelta(hours=1)
+        self.insert("alice", ["espn.us"])
+        self.insert("bob", ["espn.us"])
+        self.upload("alice")
+        self.upload("bob", [("ESPN.us", self.now - hour, self.now + hour, "Bob's show")])
+
+        self.assertEqual(self.now_next("espn.us", "alice"), {"espn.us": ("SportsCenter", "NBA")})
+        self.assertEqual(self.now_next("espn.us", "bob"), {"espn.us": ("Bob's show", None)})
+        self.assertEqual(asyncio.run(self.db.epg_programmes.count_documents({"owner_id": "alice"})), 3)
+
+    def test_05_now_next_reads_one_complete_import(self):
+        """Other guides, leftovers of failed imports and repeated slots don't show up as next"""
+        hour = timedelta(hours=1)
+        self.insert("default", ["espn.us"])
+        self.upload(filename="other.xml", programmes=[("ESPN.us", self.now - hour, self.now + hour, "Other guide")])
+        self.upload(programmes=[("ESPN.us", self.now - hour, self.now + hour, "SportsCenter"),
+                                ("ESPN.us", self.now - hour, self.now + hour, "SportsCenter"),
+                                ("ESPN.us", self.now + hour, self.now + 2 * hour, "NBA")])
+        asyncio.run(self.db.epg_programmes.insert_one({
+            "owner_id": "default", "source": "guide.xml", "import_id": "failed", "tvg_id": "ESPN.us",
+            "channel": "ESPN.us", "title": "Leftover", "start": self.now, "stop": self.now + timedelta(minutes=30),
+        }))
+
+        self.assertEqual(self.now_next("espn.us"), {"espn.us": ("SportsCenter", "NBA")})
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,130 @@
+import unittest
+import asyncio
+import logging
+import os
+import sys
+from unittest import mock
+
+# Add the benchmarks and backend directories to the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from mongomock_motor import AsyncMongoMockClient
+from playlist_generator import generate_playlist
+from models.playlist import Channel, Playlist
+from services.m3u_parser import M3UParser
+from services.channel_changes import change_entry
+from services.fuzzy_search import FuzzySearch, TrigramIndex, normalize, TRUNCATED_SEARCHES
+from storage.mongo import MongoStorage
+
+NAMES = [
+    ("Bloomberg TV", "Bloomberg", "Business"),
+    ("Bloomberg Television", None, "Business"),
+    ("Bloomberg TV Europe (720p)", None, "Business"),
+    ("NASA TV Public", None, "Science"),
+    ("NASA", None, "Science"),
+    ("Canal Español con ñ", None, "General"),
+    ("La 1", "TVE La 1 HD", "General"),
+    ("Nature Docs", None, "Science"),
+]
+
+def entry(i, name, tvg_name, category, playlist_id="a"):
+    return {"id": str(i), "playlist_id": playlist_id, "name": name, "tvg_name": tvg_name or name,
+            "category": category}
+
+class FuzzySearchTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.index = TrigramIndex([entry(i, *row) for i, row in enumerate(NAMES)])
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def names(self, query, **kwargs):
+        return [NAMES[int(channel_id)][0] for channel_id, _ in self.index.search(query, **kwargs)]
+
+    def test_01_normalize(self):
+        self.assertEqual(normalize("  Canal Español+ (HD)_1 "), "canal espanol hd 1")
+        self.assertEqual(normalize(None), "")
+
+    def test_02_typos_and_accents(self):
+        self.assertEqual(self.names("bloomber")[:3], ["Bloomberg TV", "Bloomberg Television",
+                                                      "Bloomberg TV Europe (720p)"])
+        self.assertEqual(self.names("blomberg tv")[0], "Bloomberg TV")
+        self.assertEqual(self.names("canal espanol"), ["Canal Español con ñ"])
+        self.assertEqual(self.names("xyzzy"), [])
+
+    def test_03_exact_prefix_and_tvg_name(self):
+        """Exact names outrank longer ones, tvg names find channels listed under another name"""
+        self.assertEqual(self.names("nasa")[:2], ["NASA", "NASA TV Public"])
+        self.assertEqual(self.names("nasa tv")[0], "NASA TV Public")
+        self.assertEqual(self.names("tve la 1"), ["La 1"])
+
+    def test_04_filters_limit_and_budget(self):
+        self.assertEqual(self.names("nature", category="Science"), ["Nature Docs"])
+        self.assertEqual(self.names("nature", category="Business"), [])
+        self.assertEqual(self.names("nature", playlist_id="b"), [])
+        self.assertEqual(len(self.names("bloomberg", limit=2)), 2)
+
+        # An exhausted budget still looks up the rarest trigram
+        truncated = TRUNCATED_SEARCHES.value()
+        self.assertEqual(self.names("bloomberg tv", budget_ms=0, min_similarity=0)[0], "Bloomberg TV")
+        self.assertEqual(TRUNCATED_SEARCHES.value(), truncated + 1)
+
+    def test_05_rebuilt_on_library_changes(self):
+        """Indexes follow the library revision"""
+        content, _ = generate_playlist(200, seed=19, invalid_ratio=0)
+        channels = M3UParser().parse_content(content)
+        library = MongoStorage(AsyncMongoMockClient()['fuzzy_search_test'])
+        search = FuzzySearch(library, chunk_size=64)
+
+        async def scenario():
+            first = Playlist(name="First", channel_count=len(channels), channels=channels)
+            await library.insert_playlist(first)
+            await library.record_change("default", first.id, change_entry(replaced=True))
+            found = await search.search("default", channels[7].name[:-1])
+            index = await search.index("default")
+            self.assertIs(await search.index("default"), index)
+
+            extra = Channel(name="Bloomberg Television", url="http://example.com/bloomberg.m3u8")
+            second = Playlist(name="Second", channel_count=1, channels=[extra])
+            await library.insert_playlist(second)
+            await library.record_change("default", second.id, change_entry(replaced=True))
+            return found, await search.search("default", "blomberg", playlist_id=second.id)
+
+        found, added = asyncio.run(scenario())
+        self.assertEqual(found[0]["name"], channels[7].name)
+        self.assertEqual(set(found[0]), {"id", "name", "url", "logo", "category", "is_live", "group_title"})
+        self.assertEqual([ch["name"] for ch in added], ["Bloomberg Television"])
+
+    def test_06_cancelled_build_does_not_strand_searches(self):
+        """Searches waiting on a cancelled rebuild build the index themselves, from the primary"""
+        content, _ = generate_playlist(50, seed=20, invalid_ratio=0)
+        channels = M3UParser().parse_content(content)
+        client = AsyncMongoMockClient()
+        library = MongoStorage(client['fuzzy_search_primary'], client['fuzzy_search_lagging'])
+        search = FuzzySearch(library)
+        playlist = Playlist(name="First", channel_count=len(channels), channels=channels)
+        asyncio.run(library.insert_playlist(playlist))
+
+        async def scenario():
+            started = asyncio.Event()
+
+            async def stalled(owner_id, chunk_size):
+                started.set()
+                await asyncio.sleep(10)
+                yield []
+
+            with mock.patch.object(library.primary, "search_entries", stalled):
+                first = asyncio.create_task(search.index("default"))
+                await started.wait()
+                second = asyncio.create_task(search.index("default"))
+                await asyncio.sleep(0)
+            first.cancel()
+            return await asyncio.wait_for(second, 5)
+
+        index = asyncio.run(scenario())
+        self.assertEqual(index.search(channels[3].name)[0][0], channels[3].id)
+        self.assertEqual(search._building, {})
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,264 @@
+import unittest
+import asyncio
+import os
+import sys
+import threading
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the backend directory to the path so the services can be imported directly
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+from services.hls_manifest import rewrite_manifest, parse_master_playlist
+from services.hls_proxy import HLSProxy
+from services.stream_probe import StreamProbe
+from storage.mongo import MongoStorage
+import routes.stream
+
+MASTER_PLAYLIST = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360
+low/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2400000,RESOLUTION=1280x720
+/live/high/index.m3u8
+"""
+
+MEDIA_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:4
+#EXT-X-MEDIA-SEQUENCE:100
+#EXT-X-KEY:METHOD=AES-128,URI="key.bin"
+#EXTINF:4.0,
+seg100.ts
+#EXTINF:4.0,
+https://cdn.example.com/seg101.ts?token=abc
+"""
+
+class SyntheticHLSOrigin(BaseHTTPRequestHandler):
+    """Local HLS origin counting how often each resource is requested"""
+    hits = {}
+
+    def do_GET(self):
+        SyntheticHLSOrigin.hits[self.path] = SyntheticHLSOrigin.hits.get(self.path, 0) + 1
+        if self.path.startswith('/redirect/'):
+            self.send_response(302)
+            self.send_header('Location', 'http://169.254.169.254' + self.path[len('/redirect'):])
+            self.end_headers()
+            return
+        if self.path == '/live/master.m3u8':
+            body, content_type = MASTER_PLAYLIST.encode(), 'application/vnd.apple.mpegurl'
+        elif self.path.endswith('index.m3u8'):
+            body = MEDIA_PLAYLIST.replace('https://cdn.example.com/', '').encode()
+            content_type = 'application/vnd.apple.mpegurl'
+        elif self.path.endswith('.ts'):
+            body, content_type = b'\x47' * 188 * 10, 'video/mp2t'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class HLSProxyTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), SyntheticHLSOrigin)
+        cls.origin = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        SyntheticHLSOrigin.hits.clear()
+        self.proxy = HLSProxy(secret=b'test-secret', allow_private=True)
+
+    def test_01_rewrite_manifest(self):
+        """Segment, key and variant URIs are resolved and rewritten"""
+        rewritten = rewrite_manifest(
+            MEDIA_PLAYLIST,
+            "https://origin.example.com/live/chan/index.m3u8",
+            lambda url, is_playlist: f"[{'m' if is_playlist else 's'}]{url}"
+        )
+        self.assertIn('URI="[s]https://origin.example.com/live/chan/key.bin"', rewritten)
+        self.assertIn('[s]https://origin.example.com/live/chan/seg100.ts', rewritten)
+        self.assertIn('[s]https://cdn.example.com/seg101.ts?token=abc', rewritten)
+        self.assertIn('#EXT-X-MEDIA-SEQUENCE:100', rewritten)
+
+        rewritten = rewrite_manifest(
+            MASTER_PLAYLIST,
+            "https://origin.example.com/live/master.m3u8",
+            lambda url, is_playlist: f"[{'m' if is_playlist else 's'}]{url}"
+        )
+        self.assertIn('[m]https://origin.example.com/live/low/index.m3u8', rewritten)
+        self.assertIn('[m]https://origin.example.com/live/high/index.m3u8', rewritten)
+
+    def test_02_signed_tokens(self):
+        """Only URLs signed by the proxy can be fetched through it"""
+        token = self.proxy.sign("https://example.com/a.ts")
+        self.assertEqual(self.proxy.unsign(token), "https://example.com/a.ts")
+        self.assertIsNone(self.proxy.unsign(token[:-1] + ('0' if token[-1] != '0' else '1')))
+        self.assertIsNone(HLSProxy(secret=b'other').unsign(token))
+        self.assertIsNone(self.proxy.unsign("ñ.ñ"))
+
+    def test_03_concurrent_viewers_share_upstream(self):
+        """N concurrent viewers cost one upstream fetch per manifest and segment"""
+        url = f"{self.origin}/live/chan/index.m3u8"
+
+        async def watch():
+            manifests = await asyncio.gather(*(self.proxy.get_manifest(url) for _ in range(20)))
+            segment_url = f"{self.origin}/live/chan/seg100.ts"
+            segments = await asyncio.gather(*(self.proxy.get_segment(segment_url) for _ in range(20)))
+            return manifests, segments
+
+        manifests, segments = asyncio.run(watch())
+
+        self.assertEqual(len(set(manifests)), 1)
+        self.assertEqual(len({body for body, _ in segments}), 1)
+        self.assertEqual(SyntheticHLSOrigin.hits['/live/chan/index.m3u8'], 1)
+        self.assertEqual(SyntheticHLSOrigin.hits['/live/chan/seg100.ts'], 1)
+
+        # Served from cache until the refresh interval elapses
+        asyncio.run(self.proxy.get_manifest(url))
+        self.assertEqual(SyntheticHLSOrigin.hits['/live/chan/index.m3u8'], 1)
+
+    def test_04_segment_ring_buffer(self):
+        """The segment cache never exceeds its byte budget"""
+        proxy = HLSProxy(secret=b'test-secret', segment_cache_bytes=188 * 10 * 2, allow_private=True)
+
+        async def fetch_all():
+            for i in range(5):
+                await proxy.get_segment(f"{self.origin}/live/chan/seg{i}.ts")
+
+        asyncio.run(fetch_all())
+        self.assertEqual(proxy.segments.stats()['segments'], 2)
+        self.assertIsNone(proxy.segments.get(f"{self.origin}/live/chan/seg0.ts"))
+        self.assertIsNotNone(proxy.segments.get(f"{self.origin}/live/chan/seg4.ts"))
+
+    def test_05_endpoints(self):
+        """A channel is playable end to end through the proxy routes"""
+        db = AsyncMongoMockClient()['stream_test']
+        asyncio.run(db.playlists.insert_one({
+            "id": "p1",
+            "owner_id": "default",
+            "channels": [{"id": "c1", "name": "Live", "url": f"{self.origin}/live/master.m3u8"}]
+        }))
+        routes.stream.library = MongoStorage(db)
+        routes.stream.hls_proxy = self.proxy
+
+        app = FastAPI()
+        app.include_router(routes.stream.router, prefix="/api")
+        client = TestClient(app)
+
+        master = client.get("/api/stream/c1/index.m3u8")
+        self.assertEqual(master.status_code, 200)
+        self.assertEqual(master.headers['content-type'], 'application/vnd.apple.mpegurl')
+
+        variant_path = [l for l in master.text.splitlines() if l.startswith('/api/stream/m/')][0]
+        media = client.get(variant_path)
+        self.assertEqual(media.status_code, 200)
+
+        segment_path = [l for l in media.text.splitlines() if l.startswith('/api/stream/s/')][0]
+        for _ in range(3):
+            segment = client.get(segment_path)
+            self.assertEqual(segment.status_code, 200)
+            self.assertEqual(segment.headers['content-type'], 'video/mp2t')
+        self.assertEqual(SyntheticHLSOrigin.hits['/live/low/seg100.ts'], 1)
+
+        self.assertEqual(client.get("/api/stream/missing/index.m3u8").status_code, 404)
+        self.assertEqual(client.get("/api/stream/s/forged.token").status_code, 403)
+
+    def test_06_parse_master_playlist(self):
+        """Variants are resolved to absolute URLs, lowest bandwidth first"""
+        variants = parse_master_playlist(
+            MASTER_PLAYLIST.replace('BANDWIDTH=800000', 'BANDWIDTH=800000,CODECS="avc1.42e01e,mp4a.40.2"'),
+            "https://origin.example.com/live/master.m3u8"
+        )
+        self.assertEqual([v['bandwidth'] for v in variants], [800000, 2400000])
+        self.assertEqual(variants[0]['url'], "https://origin.example.com/live/low/index.m3u8")
+        self.assertEqual(variants[0]['codecs'], "avc1.42e01e,mp4a.40.2")
+        self.assertEqual(variants[1]['resolution'], "1280x720")
+
+    def test_07_probe_caches_variants(self):
+        """Probing stores variants that listings can attach without refetching"""
+        db = AsyncMongoMockClient()['probe_test']
+        probe = StreamProbe(ttl=60, allow_private=True)
+        master = f"{self.origin}/live/master.m3u8"
+        media = f"{self.origin}/live/chan/index.m3u8"
+        missing = f"{self.origin}/live/missing.m3u8"
+
+        async def run():
+            results = await probe.probe_urls(db.stream_probes, [master, media, missing, master])
+            return results, await probe.variants_for(db.stream_probes, [master, media, missing])
+
+        results, variants = asyncio.run(run())
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual([r['online'] for r in results], [True, True, False])
+        self.assertEqual(list(variants), [master])
+        self.assertEqual(variants[master][1]['url'], f"{self.origin}/live/high/index.m3u8")
+        self.assertEqual(SyntheticHLSOrigin.hits['/live/master.m3u8'], 1)
+
+    def test_08_cancelled_fetch_does_not_strand_viewers(self):
+        """A viewer disconnecting mid-fetch lets the others fetch again instead of hanging"""
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fast():
+            return b"data"
+
+        async def run():
+            leader = asyncio.create_task(self.proxy._single_flight("k", slow))
+            await started.wait()
+            joiner = asyncio.create_task(self.proxy._single_flight("k", fast))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await asyncio.wait_for(joiner, 2)
+
+        self.assertEqual(asyncio.run(run()), b"data")
+        self.assertEqual(self.proxy._inflight, {})
+
+    def test_09_oversized_upstream_refused(self):
+        """Bodies beyond the segment limit are abandoned while streaming"""
+        proxy = HLSProxy(secret=b'test-secret', max_segment_bytes=1000, allow_private=True)
+        with self.assertRaisesRegex(Exception, "demasiado grande"):
+            asyncio.run(proxy.get_segment(f"{self.origin}/live/chan/seg1.ts"))
+        self.assertIsNone(proxy.segments.get(f"{self.origin}/live/chan/seg1.ts"))
+
+    def test_10_private_upstreams_refused(self):
+        """Manifest and segment URIs, and every redirect hop, must resolve to public addresses"""
+        proxy = HLSProxy(secret=b'test-secret')
+        segment = f"{self.origin}/live/chan/seg1.ts"
+        with self.assertRaisesRegex(ValueError, "no permitida"):
+            asyncio.run(proxy.get_segment(segment))
+        self.assertEqual(StreamProbe(ttl=60).probe(f"{self.origin}/live/master.m3u8")['online'], False)
+        self.assertEqual(SyntheticHLSOrigin.hits, {})
+
+        # The origin itself is trusted here; its redirect to the metadata service is not
+        def check(url):
+            if not url.startswith(self.origin):
+                raise ValueError(f"Dirección no permitida: {url}")
+
+        checked = mock.Mock(side_effect=check)
+        self.enterContext(mock.patch("services.hls_proxy.check_public_url", checked))
+        self.enterContext(mock.patch("services.stream_probe.check_public_url", checked))
+        redirected = f"{self.origin}/redirect/latest/meta-data/index.m3u8"
+        with self.assertRaisesRegex(ValueError, "169.254.169.254"):
+            asyncio.run(proxy.get_manifest(redirected))
+        self.assertEqual(StreamProbe(ttl=60).probe(redirected)['online'], False)
+        self.assertEqual(checked.call_args_list[-1].args, ("http://169.254.169.254/latest/meta-data/index.m3u8",))
+        self.assertEqual(SyntheticHLSOrigin.hits, {'/redirect/latest/meta-data/index.m3u8': 2})
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,52 @@
+import unittest
+import asyncio
+import logging
+import os
+import sys
+
+# Add the backend directory to the path so the services can be imported directly
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from mongomock_motor import AsyncMongoMockClient
+from indexes import INDEXES, ensure_indexes, index_state
+
+class IndexBootstrapTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.db = AsyncMongoMockClient()['indexes_test']
+        index_state["collections"].clear()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_01_creates_declared_indexes(self):
+        """Every declared index exists after the bootstrap"""
+        state = asyncio.run(ensure_indexes(self.db))
+        self.assertEqual(state["status"], "ready")
+        self.assertEqual(set(state["collections"]), set(INDEXES))
+
+        info = asyncio.run(self.db.playlists.index_information())
+        self.assertTrue(info["owner_id_1_id_1"].get("unique"))
+        self.assertIn("owner_id_1_created_at_-1", info)
+        self.assertIn("owner_id_1_channels.id_1", info)
+
+        # Running it again is a no-op
+        self.assertEqual(asyncio.run(ensure_indexes(self.db))["status"], "ready")
+
+    def test_02_failure_is_reported_per_collection(self):
+        """Duplicates blocking a unique index fail that collection only"""
+        asyncio.run(self.db.playlists.insert_many([{"owner_id": "u", "id": "dup"}, {"owner_id": "u", "id": "dup"}]))
+
+        state = asyncio.run(ensure_indexes(self.db))
+        self.assertEqual(state["status"], "failed")
+        self.assertEqual(state["collections"]["playlists"]["status"], "failed")
+        self.assertEqual(state["collections"]["channel_clusters"]["status"], "ready")
+
+    def test_03_subset(self):
+        """Callers can ensure just the collections they write to"""
+        asyncio.run(ensure_indexes(self.db, ["epg_channel_map"]))
+        self.assertEqual(list(index_state["collections"]), ["epg_channel_map"])
+        info = asyncio.run(self.db.epg_channel_map.index_information())
+        self.assertTrue(info["owner_id_1_tvg_id_1"].get("unique"))
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
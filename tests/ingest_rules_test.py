@@ -0,0 +1,110 @@
+import unittest
+import asyncio
+import logging
+import os
+import sys
+from unittest import mock
+
+# Add the benchmarks and backend directories to the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from playlist_generator import generate_playlist
+from models.playlist import IngestRule
+from services.m3u_parser import M3UParser
+from services.playlist_fetcher import PlaylistFetcher, COALESCED_FETCHES
+from services.ingest_rules import compile_rules, AllExcludedError, EXCLUDED_CHANNELS, ALL_EXCLUDED
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 tvg-id="cnn.us" group-title="News",CNN International HD
+https://cdn1.example-tv.com/live/cnn/index.m3u8
+#EXTINF:-1 tvg-id="bbc.uk" group-title="News",BBC World News
+https://edge2.streams.example.net/hls/bbc/playlist.m3u8
+#EXTINF:-1 tvg-id="espn.us" group-title="Sports",ESPN HD
+https://cdn1.example-tv.com/live/espn/index.m3u8
+#EXTINF:-1 tvg-id="xxx.adult" group-title="Adult",Late Night
+https://cdn1.example-tv.com/live/late/index.m3u8
+#EXTINF:-1 group-title="Sports",Fútbol Libre
+http://iptv3.example.org:8080/futbol/1.ts
+"""
+
+class IngestRulesTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.parser = M3UParser()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def names(self, *rules):
+        return [ch.name for ch in self.parser.parse_content(PLAYLIST, compile_rules(rules))]
+
+    def test_01_include_and_exclude(self):
+        """Includes keep only their matches, excludes drop theirs, on every field"""
+        self.assertEqual(len(self.names()), 5)
+        self.assertEqual(self.names({"action": "include", "field": "group_title", "pattern": "news"},
+                                    {"action": "include", "field": "tvg_id", "pattern": "*.us"}),
+                         ["CNN International HD", "BBC World News", "ESPN HD"])
+        self.assertEqual(self.names({"action": "include", "field": "url_host", "pattern": "cdn1.*"},
+                                    {"action": "exclude", "field": "group_title", "pattern": "adult"}),
+                         ["CNN International HD", "ESPN HD"])
+        self.assertEqual(self.names({"action": "exclude", "pattern": r"\bhd\b|world", "syntax": "regex"}),
+                         ["Late Night", "Fútbol Libre"])
+        self.assertEqual(self.names({"action": "exclude", "field": "url_host", "pattern": "*.example.org"},
+                                    {"action": "exclude", "pattern": "late*"}),
+                         ["CNN International HD", "BBC World News", "ESPN HD"])
+        # Backreferences keep their own group numbers next to other patterns with groups
+        self.assertEqual(self.names({"action": "exclude", "pattern": "(sports)x", "syntax": "regex"},
+                                    {"action": "exclude", "pattern": r"(\w)\1", "syntax": "regex"},
+                                    {"action": "exclude", "pattern": "fút*"}),
+                         ["ESPN HD", "Late Night"])
+
+    def test_02_rename_and_categorize(self):
+        parsed = self.parser.parse_content(PLAYLIST, compile_rules([
+            IngestRule(action="rename", pattern=r"^(.*?) HD$", syntax="regex", value=r"\1"),
+            IngestRule(action="categorize", field="tvg_id", pattern="*.us", value="USA"),
+            IngestRule(action="categorize", field="group_title", pattern="sports", value="Deportes"),
+        ]))
+        self.assertEqual([(ch.name, ch.category) for ch in parsed], [
+            ("CNN International", "USA"), ("BBC World News", "News"), ("ESPN", "Deportes"),
+            ("Late Night", "Adult"), ("Fútbol Libre", "Deportes"),
+        ])
+
+    def test_03_invalid_rules(self):
+        for rule in ({"action": "exclude", "pattern": "(", "syntax": "regex"},
+                     {"action": "rename", "pattern": "*"},
+                     {"action": "rename", "pattern": "a", "syntax": "regex", "value": r"\2"}):
+            with self.assertRaises(ValueError):
+                compile_rules([rule])
+        self.assertIsNone(compile_rules([]))
+
+        excluded = EXCLUDED_CHANNELS.value()
+        with self.assertRaisesRegex(AllExcludedError, ALL_EXCLUDED):
+            self.names({"action": "exclude", "pattern": "*"})
+        self.assertEqual(EXCLUDED_CHANNELS.value(), excluded + 5)
+
+    def test_04_coalesced_fetches_apply_their_own_rules(self):
+        """Callers sharing one download filter and rewrite copies of its channels"""
+        content, _ = generate_playlist(300, seed=21, invalid_ratio=0)
+        parsed = self.parser.parse_content(content)
+        fetcher = PlaylistFetcher(self.parser)
+        news = compile_rules([{"action": "include", "field": "group_title", "pattern": "news"},
+                              {"action": "rename", "pattern": "*", "value": "Renamed"}])
+
+        async def fetch_both():
+            with mock.patch.object(self.parser, "parse_from_url", return_value=parsed):
+                leader = asyncio.create_task(fetcher.parse_from_url("http://a.example/list.m3u"))
+                joiner = asyncio.create_task(fetcher.parse_from_url("http://a.example/list.m3u", news))
+                return await leader, await joiner
+
+        coalesced = COALESCED_FETCHES.value()
+        everything, filtered = asyncio.run(fetch_both())
+        self.assertEqual(COALESCED_FETCHES.value(), coalesced + 1)
+        self.assertEqual(everything, parsed)
+        expected = [ch for ch in parsed if ch.group_title.lower() == "news"]
+        self.assertTrue(0 < len(filtered) < len(parsed))
+        self.assertEqual([ch.url for ch in filtered], [ch.url for ch in expected])
+        self.assertEqual({ch.name for ch in filtered}, {"Renamed"})
+        self.assertNotIn("Renamed", {ch.name for ch in parsed})
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,129 @@
+import unittest
+import asyncio
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add the benchmarks and backend directories to the path
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(BACKEND_DIR)
+import httpx
+from mongomock_motor import AsyncMongoMockClient
+from playlist_generator import generate_playlist
+from models.playlist import Playlist
+from services.m3u_parser import M3UParser
+from services.channel_changes import change_entry
+from services.channel_table import ChannelTables
+from services.library_watcher import LibraryWatcher
+from storage.mongo import MongoStorage
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class LibraryWatcherTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_01_workers_follow_each_other(self):
+        """A worker's table picks up playlists written by another, through the polled log"""
+        content, _ = generate_playlist(60, seed=13, invalid_ratio=0)
+        channels = M3UParser().parse_content(content)
+        db = AsyncMongoMockClient()['library_watcher_test']
+        writer, reader = MongoStorage(db), MongoStorage(db)
+        tables = ChannelTables(reader)
+        watcher = LibraryWatcher(reader, interval=0.05)
+        watcher.add_listener(tables.library_changed)
+
+        async def count():
+            return sum([len(chunk) async for chunk in tables.channel_chunks("default", None, None, None, 100)])
+
+        async def eventually(expected):
+            for _ in range(100):
+                if await count() == expected:
+                    return expected
+                await asyncio.sleep(0.02)
+            return await count()
+
+        async def scenario():
+            self.assertEqual(await count(), 0)
+            watcher.start()
+            try:
+                playlist = Playlist(name="Elsewhere", channel_count=60, channels=channels)
+                await writer.insert_playlist(playlist)
+                await writer.record_change("default", playlist.id, change_entry(replaced=True))
+                added = await eventually(60)
+
+                await writer.delete_playlist("default", playlist.id)
+                await writer.record_change("default", playlist.id, change_entry(deleted=True))
+                return added, await eventually(0)
+            finally:
+                await watcher.stop()
+
+        self.assertEqual(asyncio.run(scenario()), (60, 0))
+        self.assertEqual(watcher.mode, "poll")
+
+class TwoWorkersTest(unittest.TestCase):
+    """Two server processes on one library, as with several uvicorn workers"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        env = dict(
+            os.environ, STORAGE_BACKEND="sqlite", SQLITE_PATH=os.path.join(self.directory.name, "library.db"),
+            CHANNEL_TABLE_ENABLED="1", LIBRARY_WATCH_INTERVAL="0.1"
+        )
+        self.urls = [self.start_worker(env) for _ in range(2)]
+
+    def start_worker(self, env) -> str:
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.addCleanup(process.wait, 10)
+        self.addCleanup(process.terminate)
+        url = f"http://127.0.0.1:{port}/api"
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                httpx.get(f"{url}/", timeout=1)
+                return url
+            except httpx.TransportError:
+                time.sleep(0.05)
+        self.fail("worker did not start")
+
+    def channels_on(self, url, expected, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            count = len(httpx.get(f"{url}/playlists/channels").json())
+            if count == expected or time.monotonic() > deadline:
+                return count
+            time.sleep(0.05)
+
+    def test_01_changes_reach_the_other_worker(self):
+        first, second = self.urls
+        # Both workers hold a loaded (empty) table before anything is written
+        self.assertEqual(self.channels_on(first, 0), 0)
+        self.assertEqual(self.channels_on(second, 0), 0)
+
+        content, _ = generate_playlist(40, seed=14, invalid_ratio=0)
+        response = httpx.post(f"{first}/playlists/upload", files={"file": ("list.m3u", content)})
+        self.assertEqual(response.status_code, 200)
+        playlist_id = response.json()["id"]
+        self.assertEqual(self.channels_on(second, 40), 40)
+
+        self.assertEqual(httpx.delete(f"{second}/playlists/{playlist_id}").status_code, 200)
+        self.assertEqual(self.channels_on(first, 0), 0)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
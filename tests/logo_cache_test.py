@@ -0,0 +1,210 @@
+import unittest
+import asyncio
+import os
+import sys
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the backend directory to the path so the services can be imported directly
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from PIL import Image
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+from services.logo_cache import LogoCache, logo_hash, check_public_url
+import routes.logos
+
+def _png(width, height):
+    buffer = BytesIO()
+    Image.new('RGBA', (width, height), (255, 0, 0, 255)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+class StubImageHandler(BaseHTTPRequestHandler):
+    """Local image server standing in for imgur/wikimedia"""
+    hits = {}
+    images = {
+        '/logo.png': ('image/png', _png(400, 200)),
+        '/logo.svg': ('image/svg+xml', b'<svg xmlns="http://www.w3.org/2000/svg"/>'),
+        '/page.html': ('text/html', b'<html></html>'),
+        '/fake.png': ('image/png', b'<html><script>alert(1)</script></html>'),
+        '/untyped': (None, _png(10, 10)),
+    }
+
+    def do_GET(self):
+        StubImageHandler.hits[self.path] = StubImageHandler.hits.get(self.path, 0) + 1
+        if self.path.startswith('/redirect'):
+            self.send_response(302)
+            self.send_header('Location', self.path[len('/redirect'):] or '/redirect')
+            self.end_headers()
+            return
+        if self.path not in self.images:
+            self.send_error(404)
+            return
+        content_type, body = self.images[self.path]
+        self.send_response(200)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class LogoCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubImageHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubImageHandler.hits.clear()
+        self.cache_dir = tempfile.mkdtemp()
+        # The stub server is on loopback, which real logo URLs may not reach
+        self.cache = LogoCache(self.cache_dir, max_bytes=10 * 1024 * 1024, allow_private=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_01_fetch_once_and_resize(self):
+        """Logos are downloaded once and stored at every thumbnail size"""
+        url = f"{self.base_url}/logo.png"
+        url_hash = logo_hash(url)
+
+        path = self.cache.fetch(url_hash, url, 64)
+        self.assertIsNotNone(path)
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (64, 32))
+
+        with Image.open(self.cache.fetch(url_hash, url, 256)) as image:
+            self.assertEqual(image.size, (256, 128))
+
+        self.assertEqual(StubImageHandler.hits['/logo.png'], 1)
+
+    def test_02_concurrent_requests_share_fetch(self):
+        """Concurrent misses for the same logo trigger a single download"""
+        url = f"{self.base_url}/logo.png"
+        url_hash = logo_hash(url)
+
+        threads = [
+            threading.Thread(target=self.cache.fetch, args=(url_hash, url, 128))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(StubImageHandler.hits['/logo.png'], 1)
+
+    def test_03_unresizable_and_invalid(self):
+        """SVG is kept as original, non-images and failures are rejected"""
+        svg = f"{self.base_url}/logo.svg"
+        path = self.cache.fetch(logo_hash(svg), svg, 128)
+        self.assertTrue(path.name.endswith('.svg'))
+
+        html = f"{self.base_url}/page.html"
+        self.assertIsNone(self.cache.fetch(logo_hash(html), html, 128))
+
+        missing = f"{self.base_url}/missing.png"
+        self.assertIsNone(self.cache.fetch(logo_hash(missing), missing, 128))
+        # Failure is remembered instead of hammering the origin
+        self.assertIsNone(self.cache.fetch(logo_hash(missing), missing, 128))
+        self.assertEqual(StubImageHandler.hits['/missing.png'], 1)
+
+    def test_04_lru_budget(self):
+        """Least recently used files are evicted to respect the size budget"""
+        url = f"{self.base_url}/logo.png"
+        self.cache.fetch(logo_hash(url), url, 128)
+        per_logo = self.cache.stats()['bytes']
+
+        small = LogoCache(self.cache_dir, max_bytes=per_logo + 1, allow_private=True)
+        self.assertEqual(small.stats()['bytes'], per_logo)
+
+        svg = f"{self.base_url}/logo.svg"
+        small.fetch(logo_hash(svg), svg, 128)
+        self.assertLessEqual(small.stats()['bytes'], per_logo + 1)
+        self.assertIsNone(small.cached_path(logo_hash(url), 64))
+
+        # The state survives a restart
+        reloaded = LogoCache(self.cache_dir, max_bytes=per_logo + 1, allow_private=True)
+        self.assertEqual(reloaded.stats(), small.stats())
+
+    def test_05_endpoint(self):
+        """The endpoint resolves hashes via Mongo and sets cache headers"""
+        db = AsyncMongoMockClient()['logo_test']
+        self.enterContext(mock.patch.object(routes.logos, "db", db))
+        self.enterContext(mock.patch.object(routes.logos, "logo_cache", self.cache))
+
+        url = f"{self.base_url}/logo.png"
+        asyncio.run(self.cache.register(db.logo_sources, [url, None, "not-a-url"]))
+        proxied = self.cache.proxy_url(url)
+        self.assertEqual(proxied, f"/api/logos/{logo_hash(url)}")
+
+        app = FastAPI()
+        app.include_router(routes.logos.router, prefix="/api")
+        client = TestClient(app)
+
+        response = client.get(proxied)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['content-type'], 'image/png')
+        self.assertIn('max-age', response.headers['cache-control'])
+
+        response = client.get(proxied, headers={'If-None-Match': response.headers['etag']})
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(client.get(f"{proxied}?size=77").status_code, 400)
+        self.assertEqual(client.get(f"/api/logos/{'0' * 32}").status_code, 404)
+        self.assertEqual(StubImageHandler.hits['/logo.png'], 1)
+
+        # SVG is served as sent, but sandboxed
+        svg = f"{self.base_url}/logo.svg"
+        asyncio.run(self.cache.register(db.logo_sources, [svg]))
+        response = client.get(self.cache.proxy_url(svg))
+        self.assertEqual(response.headers['content-type'], 'image/svg+xml')
+        self.assertIn('sandbox', response.headers['content-security-policy'])
+        self.assertEqual(response.headers['x-content-type-options'], 'nosniff')
+
+    def test_06_untrusted_sources(self):
+        """Non-public addresses, redirects to them and bodies that aren't images are refused"""
+        strict = LogoCache(self.cache_dir, max_bytes=10 * 1024 * 1024)
+        url = f"{self.base_url}/logo.png"
+        self.assertIsNone(strict.fetch(logo_hash(url), url, 128))
+        self.assertNotIn('/logo.png', StubImageHandler.hits)
+
+        for address in ("127.0.0.1", "10.0.0.5", "169.254.169.254", "::1", "::ffff:192.168.1.1", "0.0.0.0"):
+            with mock.patch("socket.getaddrinfo", return_value=[(None, None, None, "", (address, 80))]):
+                with self.assertRaises(Exception):
+                    check_public_url("http://logos.example/a.png")
+        with mock.patch("socket.getaddrinfo", return_value=[(None, None, None, "", ("93.184.216.34", 80))]):
+            check_public_url("http://logos.example/a.png")
+        with self.assertRaises(Exception):
+            check_public_url("file:///etc/passwd")
+
+        # Redirects are followed hop by hop, each hop checked
+        checked = []
+        with mock.patch("services.logo_cache.check_public_url", side_effect=checked.append):
+            relaxed = LogoCache(self.cache_dir, max_bytes=10 * 1024 * 1024)
+            redirected = f"{self.base_url}/redirect/logo.png"
+            self.assertIsNotNone(relaxed.fetch(logo_hash(redirected), redirected, 64))
+            self.assertEqual(checked, [redirected, url])
+            loop = f"{self.base_url}/redirect"
+            self.assertIsNone(relaxed.fetch(logo_hash(loop), loop, 64))
+
+        for path in ("/fake.png", "/untyped"):
+            bad = f"{self.base_url}{path}"
+            self.assertIsNone(self.cache.fetch(logo_hash(bad), bad, 128))
+            self.assertFalse(any(name.startswith(logo_hash(bad)) for name in os.listdir(self.cache_dir)))
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
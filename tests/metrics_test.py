@@ -0,0 +1,93 @@
+import unittest
+import logging
+import os
+import sys
+
+# Add the backend directory to the path so the services can be imported directly
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from fastapi import FastAPI, APIRouter
+from fastapi.testclient import TestClient
+from services.metrics import MetricsRegistry, MetricsMiddleware, TimedJSONResponse, SPAN_DURATION, span
+from services.m3u_parser import M3UParser
+
+class MetricsTest(unittest.TestCase):
+    def test_01_text_format(self):
+        """Counters, gauges and histograms render in the Prometheus text format"""
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Requests", ("route",))
+        in_flight = registry.gauge("in_flight", "In flight")
+        latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1))
+
+        requests.inc(route="/a")
+        requests.inc(2, route="/a")
+        in_flight.inc()
+        in_flight.dec()
+        latency.observe(0.05, route="/a")
+        latency.observe(0.5, route="/a")
+        latency.observe(5, route="/a")
+
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE requests_total counter", lines)
+        self.assertIn('requests_total{route="/a"} 3', lines)
+        self.assertIn("in_flight 0", lines)
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{route="/a",le="1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{route="/a",le="+Inf"} 3', lines)
+        self.assertIn('latency_seconds_count{route="/a"} 3', lines)
+        self.assertIn('latency_seconds_sum{route="/a"} 5.55', lines)
+
+        # Registering the same name again returns the existing metric
+        self.assertIs(registry.counter("requests_total", "Requests", ("route",)), requests)
+        with self.assertRaises(ValueError):
+            registry.gauge("requests_total", "Requests")
+
+    def test_02_middleware_labels_route_templates(self):
+        """Requests are recorded under their path template, not the raw path"""
+        registry = MetricsRegistry()
+        router = APIRouter(prefix="/api/items", default_response_class=TimedJSONResponse)
+
+        @router.get("/{item_id}")
+        async def get_item(item_id: str):
+            return {"id": item_id, "payload": "x" * 100}
+
+        app = FastAPI()
+        app.include_router(router)
+        app.add_middleware(MetricsMiddleware, metrics_registry=registry)
+        client = TestClient(app)
+
+        before = SPAN_DURATION.count(span="response.render")
+        for item_id in ("a", "b", "c"):
+            self.assertEqual(client.get(f"/api/items/{item_id}").status_code, 200)
+        self.assertEqual(client.get("/missing").status_code, 404)
+
+        requests = registry.get("http_requests_total")
+        self.assertEqual(requests.value(method="GET", route="/api/items/{item_id}", status="200"), 3)
+        self.assertEqual(requests.value(method="GET", route="<unmatched>", status="404"), 1)
+        self.assertEqual(registry.get("http_requests_in_flight").value(), 0)
+        self.assertEqual(registry.get("http_request_duration_seconds").count(
+            method="GET", route="/api/items/{item_id}"), 3)
+        self.assertIn(
+            'http_response_size_bytes_bucket{method="GET",route="/api/items/{item_id}",le="1000"} 3',
+            registry.render()
+        )
+        self.assertEqual(SPAN_DURATION.count(span="response.render"), before + 3)
+
+    def test_03_parser_spans(self):
+        """Parsing is recorded as a span, also when it fails"""
+        logging.disable(logging.WARNING)
+        try:
+            parser = M3UParser()
+            before = SPAN_DURATION.count(span="m3u.parse")
+            parser.parse_content('#EXTM3U\n#EXTINF:-1,News\nhttps://a.example.com/news.m3u8\n')
+            with self.assertRaises(Exception):
+                parser.parse_content("not a playlist")
+            self.assertEqual(SPAN_DURATION.count(span="m3u.parse"), before + 2)
+
+            with span("custom"):
+                pass
+            self.assertEqual(SPAN_DURATION.count(span="custom"), 1)
+        finally:
+            logging.disable(logging.NOTSET)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
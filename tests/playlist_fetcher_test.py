@@ -0,0 +1,150 @@
+import unittest
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from unittest import mock
+from urllib.parse import urlsplit
+
+# Add the benchmarks and backend directories to the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from playlist_generator import generate_playlist
+from services.m3u_parser import M3UParser
+from services.playlist_fetcher import PlaylistFetcher, COALESCED_FETCHES, normalize_url
+from services.ingest_rules import compile_rules
+
+class SlowParser(M3UParser):
+    """Parses generated content as if it took a while to download"""
+
+    def __init__(self, fail=False):
+        super().__init__()
+        self.fail = fail
+        self.urls = []
+        self.lock = threading.Lock()
+        # Downloads in flight, overall and per host, and the most seen at once
+        self.active = Counter()
+        self.peak = Counter()
+
+    def parse_from_url(self, url, rules=None):
+        host = urlsplit(url).hostname
+        with self.lock:
+            self.urls.append(url)
+            self.active.update(["", host])
+            self.peak |= self.active
+        time.sleep(0.2)
+        with self.lock:
+            self.active.subtract(["", host])
+        if self.fail or "down" in url:
+            raise Exception("Error al descargar la lista: 503")
+        return self.parse_content(generate_playlist(50, seed=15, invalid_ratio=0)[0], rules)
+
+class PlaylistFetcherTest(unittest.TestCase):
+    def test_01_normalized_urls(self):
+        self.assertEqual(normalize_url(" HTTP://Example.COM:80/list.m3u#top"), "http://example.com/list.m3u")
+        self.assertEqual(normalize_url("https://example.com"), "https://example.com/")
+        self.assertNotEqual(normalize_url("http://example.com/List.m3u"), normalize_url("http://example.com/list.m3u"))
+        self.assertNotEqual(normalize_url("http://example.com:8080/a?u=1"), normalize_url("http://example.com/a?u=1"))
+
+    def test_02_concurrent_fetches_share_one_parse(self):
+        """Identical concurrent imports download once, each gets channels with its own ids"""
+        parser = SlowParser()
+        fetcher = PlaylistFetcher(parser)
+        urls = ["http://example.com/list.m3u", "HTTP://example.com:80/list.m3u", "http://example.com/list.m3u#a",
+                "http://example.com/list.m3u", "http://other.example/list.m3u"]
+        coalesced = COALESCED_FETCHES.value()
+
+        async def fetch_all():
+            return await asyncio.gather(*(fetcher.parse_from_url(url) for url in urls))
+
+        results = asyncio.run(fetch_all())
+        self.assertEqual(sorted(parser.urls), ["http://example.com/list.m3u", "http://other.example/list.m3u"])
+        self.assertEqual(COALESCED_FETCHES.value() - coalesced, 3)
+        self.assertEqual({len(channels) for channels in results}, {50})
+        self.assertEqual([c.name for c in results[1]], [c.name for c in results[0]])
+        self.assertEqual(len({c.id for channels in results for c in channels}), 250)
+
+        # Nothing is cached once the fetch completes
+        asyncio.run(fetcher.parse_from_url(urls[0]))
+        self.assertEqual(len(parser.urls), 3)
+
+    def test_03_failures_reach_every_waiter(self):
+        fetcher = PlaylistFetcher(SlowParser(fail=True))
+
+        async def fetch_all():
+            return await asyncio.gather(*(fetcher.parse_from_url("http://example.com/down.m3u") for _ in range(3)),
+                                        return_exceptions=True)
+
+        errors = asyncio.run(fetch_all())
+        self.assertEqual(len(fetcher.parser.urls), 1)
+        self.assertTrue(all("503" in str(e) for e in errors))
+        self.assertEqual(fetcher._inflight, {})
+
+    def test_04_batches_bounded_overall_and_per_host(self):
+        """Batch fetches overlap within the pool and host limits, failures stay in their place"""
+        parser = SlowParser()
+        fetcher = PlaylistFetcher(parser)
+        urls = [f"http://a.example/{i}.m3u" for i in range(6)] + [f"http://{host}.example/list.m3u" for host in "bcdef"]
+        urls[3] = "http://a.example/down.m3u"
+
+        start = time.monotonic()
+        results = asyncio.run(fetcher.parse_many(urls, [None] * len(urls), concurrency=4, per_host=2))
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(len(parser.urls), len(urls))
+        self.assertEqual((parser.peak[""], parser.peak["a.example"]), (4, 2))
+        self.assertLess(elapsed, 0.2 * len(urls) / 2)
+        self.assertIsInstance(results[3], Exception)
+        self.assertEqual([len(r) for i, r in enumerate(results) if i != 3], [50] * (len(urls) - 1))
+
+    def test_05_cancelled_fetch_does_not_strand_joiners(self):
+        """When the request fetching a list goes away, the requests joined on it fetch it again"""
+        parser = SlowParser()
+        fetcher = PlaylistFetcher(parser)
+
+        async def fetch_both():
+            leader = asyncio.create_task(fetcher.parse_from_url("http://example.com/list.m3u"))
+            await asyncio.sleep(0.05)
+            joiner = asyncio.create_task(fetcher.parse_from_url("http://example.com/list.m3u"))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await asyncio.wait_for(joiner, 5)
+
+        self.assertEqual(len(asyncio.run(fetch_both())), 50)
+        self.assertEqual(len(parser.urls), 2)
+        self.assertEqual(fetcher._inflight, {})
+
+    def test_06_rules_applied_while_parsing(self):
+        """Fetches parse with their rules, sharing only with callers those channels serve"""
+        parser = SlowParser()
+        fetcher = PlaylistFetcher(parser)
+        news = [{"action": "include", "field": "group_title", "pattern": "news"}]
+        sports = [{"action": "include", "field": "group_title", "pattern": "sports"}]
+        with mock.patch.object(parser, "parse_content", wraps=parser.parse_content) as parse:
+            async def fetch(*rule_lists):
+                return await asyncio.gather(*(fetcher.parse_from_url("http://example.com/list.m3u", compile_rules(rules))
+                                              for rules in rule_lists))
+
+            # Same rules share one parse, which kept only their channels
+            first, second = asyncio.run(fetch(news, list(news)))
+            self.assertEqual(len(parser.urls), 1)
+            self.assertIsNotNone(parse.call_args.args[1])
+            self.assertTrue(first and all(ch.group_title.lower() == "news" for ch in first))
+            self.assertEqual([ch.url for ch in second], [ch.url for ch in first])
+
+            # Any rules filter a fetch without rules
+            everything, filtered, other = asyncio.run(fetch(None, sports, news))
+            self.assertEqual(len(parser.urls), 2)
+            self.assertEqual([ch.url for ch in filtered], [ch.url for ch in everything if ch.group_title.lower() == "sports"])
+            self.assertEqual([ch.url for ch in other], [ch.url for ch in first])
+
+            # Fetches with other rules are of no use to each other
+            first, filtered = asyncio.run(fetch(news, sports))
+            self.assertEqual(len(parser.urls), 4)
+            self.assertEqual([ch.url for ch in filtered], [ch.url for ch in everything if ch.group_title.lower() == "sports"])
+        self.assertEqual(fetcher._inflight, {})
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
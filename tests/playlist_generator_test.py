@@ -0,0 +1,37 @@
+import unittest
+import logging
+import os
+import sys
+
+# Add the benchmarks and backend directories to the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from playlist_generator import generate_playlist
+from services.m3u_parser import M3UParser
+
+class PlaylistGeneratorTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_01_deterministic(self):
+        """Same arguments produce identical playlists, different seeds don't"""
+        self.assertEqual(generate_playlist(500, seed=3), generate_playlist(500, seed=3))
+        self.assertNotEqual(generate_playlist(500, seed=3)[0], generate_playlist(500, seed=4)[0])
+
+    def test_02_expected_channels_match_parser(self):
+        """The reported valid count is exactly what M3UParser accepts"""
+        for kwargs in ({}, {"invalid_ratio": 0.5}, {"bom": True, "line_ending": "\r\n"}):
+            content, expected = generate_playlist(2000, seed=7, **kwargs)
+            self.assertEqual(len(M3UParser().parse_content(content)), expected)
+
+    def test_03_attribute_mix(self):
+        """Attribute probabilities control which attributes appear"""
+        content, _ = generate_playlist(200, attribute_mix={"tvg-logo": 0.0, "tvg-id": 1.0})
+        self.assertNotIn("tvg-logo=", content)
+        self.assertEqual(content.count("tvg-id="), 200)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,528 @@
+import unittest
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import json
+import uuid
+from datetime import datetime
+from unittest import mock
+
+# Add the benchmarks and backend directories to the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+from playlist_generator import generate_playlist
+from models.playlist import Playlist
+from services.m3u_parser import M3UParser
+from services.channel_table import ChannelTables
+from storage.mongo import MongoStorage
+from storage.sqlite import SQLiteStorage
+import routes.playlist
+import routes.changes
+import tenancy
+from services.wire_format import COLUMNS_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, available_media_types
+from services.compression import CompressedBodyCache
+from services.fuzzy_search import FuzzySearch
+from services.ingest_rules import ALL_EXCLUDED
+
+def apply_changes(catalogue, body):
+    """What a syncing client does with a /channels/changes response"""
+    if body["full"]:
+        catalogue.clear()
+    dropped = set(body["deleted_playlists"]) | set(body["replaced_playlists"])
+    for channel_id in [i for i, c in catalogue.items() if c["playlist_id"] in dropped] + body["deleted"]:
+        catalogue.pop(channel_id, None)
+    catalogue.update((c["id"], c) for c in body["upserted"])
+    return body["revision"]
+
+def column_rows(document):
+    """Rows of a columnar channel list, dictionary codes resolved"""
+    rows = []
+    for i in range(document["count"]):
+        row = {field: document["columns"][field][i] for field in document["fields"]}
+        for field, values in document["dictionaries"].items():
+            if row.get(field) is not None:
+                row[field] = values[row[field]]
+        rows.append(row)
+    return rows
+
+class PlaylistRoutesTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.library = self.make_library()
+        routes.playlist.library = self.library
+        routes.changes.library = self.library
+        routes.playlist.PROBE_ON_INGEST_LIMIT = 0
+        self.patch("compressed_bodies", CompressedBodyCache())
+        self.patch("fuzzy_search", FuzzySearch(self.library))
+
+        app = FastAPI()
+        app.include_router(routes.playlist.router, prefix="/api")
+        app.include_router(routes.changes.router, prefix="/api")
+        self.client = TestClient(app)
+        self.parser = M3UParser()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def patch(self, name, value):
+        original = getattr(routes.playlist, name)
+        setattr(routes.playlist, name, value)
+        self.addCleanup(setattr, routes.playlist, name, original)
+
+    def make_library(self):
+        return MongoStorage(AsyncMongoMockClient()['playlist_routes_test'])
+
+    def insert(self, channels, name="Playlist", clusters=False, owner_id="default"):
+        playlist = Playlist(owner_id=owner_id, name=name, channel_count=len(channels), channels=channels)
+        asyncio.run(self.library.insert_playlist(playlist))
+        if clusters:
+            asyncio.run(routes.playlist.update_channel_clusters(playlist.id, owner_id, channels))
+        return playlist.id
+
+    def test_01_no_playlist_ceiling(self):
+        """More than 1000 playlists are listed and their channels all returned"""
+        content, _ = generate_playlist(1, seed=0, invalid_ratio=0)
+        channel = self.parser.parse_content(content)[0]
+        for i in range(1100):
+            self.insert([channel.model_copy(update={"id": str(i)})], f"P{i}")
+
+        self.assertEqual(len(self.client.get("/api/playlists/").json()), 1100)
+        channels = self.client.get("/api/playlists/channels").json()
+        self.assertEqual(len(channels), 1100)
+        self.assertEqual(len({c["id"] for c in channels}), 1100)
+
+    def test_02_filters_match_parser(self):
+        """Filtering in Mongo returns what the in-memory filters returned"""
+        content, _ = generate_playlist(3000, seed=5)
+        channels = self.parser.parse_content(content)
+        playlist_id = self.insert(channels)
+
+        for category, search in (("Sports", None), (None, "news"), ("Noticias", "café"), ("Todos", "HD")):
+            expected = self.parser.filter_channels_by_category(channels, category)
+            expected = self.parser.search_channels(expected, search)
+            params = {k: v for k, v in (("category", category), ("search", search)) if v}
+
+            response = self.client.get(f"/api/playlists/{playlist_id}/channels", params=params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([c["id"] for c in response.json()], [c.id for c in expected])
+
+            response = self.client.get("/api/playlists/channels", params=params)
+            self.assertEqual([c["id"] for c in response.json()], [c.id for c in expected])
+
+        first = self.client.get(f"/api/playlists/{playlist_id}/channels").json()[0]
+        self.assertEqual(set(first), {"id", "name", "url", "logo", "category", "is_live", "group_title", "variants"})
+
+    def test_03_empty_and_missing(self):
+        """Empty results are valid JSON arrays, unknown playlists are 404"""
+        self.assertEqual(self.client.get("/api/playlists/channels").json(), [])
+        self.assertEqual(self.client.get("/api/playlists/channels", params={"dedup": "true"}).json(), [])
+        self.assertEqual(self.client.get("/api/playlists/missing/channels").status_code, 404)
+        self.assertEqual(self.client.get("/api/playlists/categories").json(), ["Todos"])
+
+    def test_04_categories_and_merged_channels(self):
+        """Categories come from a distinct query, merged channels honour filters"""
+        content, _ = generate_playlist(300, seed=2)
+        channels = self.parser.parse_content(content)
+        mirrors = [ch.model_copy(update={"url": ch.url.replace("example", "mirror")}) for ch in channels[:100]]
+        self.insert(channels, "A", clusters=True)
+        self.insert(mirrors, "B", clusters=True)
+
+        self.assertEqual(
+            self.client.get("/api/playlists/categories").json(),
+            ["Todos"] + self.parser.get_categories(channels)
+        )
+
+        merged = self.client.get("/api/playlists/channels", params={"dedup": "true"}).json()
+        self.assertEqual(len(merged), len(channels))
+        self.assertEqual(sum(1 for c in merged if c["alternate_urls"]), 100)
+
+        sports = self.client.get("/api/playlists/channels", params={"dedup": "true", "category": "Sports"}).json()
+        self.assertTrue(sports)
+        self.assertTrue(all(c["category"] == "Sports" for c in sports))
+
+    def test_05_libraries_are_partitioned_by_user(self):
+        """Each X-User-Id only sees and changes its own playlists"""
+        content, _ = generate_playlist(50, seed=3, invalid_ratio=0)
+        channels = self.parser.parse_content(content)
+        mine = self.insert(channels, "Mine", clusters=True, owner_id="alice")
+        self.insert(channels[:10], "Theirs", clusters=True, owner_id="bob")
+        alice, bob = {"X-User-Id": "alice"}, {"X-User-Id": "bob"}
+
+        self.assertEqual([p["name"] for p in self.client.get("/api/playlists/", headers=alice).json()], ["Mine"])
+        self.assertEqual(self.client.get("/api/playlists/").json(), [])
+        self.assertEqual(len(self.client.get("/api/playlists/channels", headers=bob).json()), 10)
+        self.assertEqual(
+            len(self.client.get("/api/playlists/channels", params={"dedup": "true"}, headers=bob).json()), 10
+        )
+        self.assertEqual(self.client.get(f"/api/playlists/{mine}/channels", headers=bob).status_code, 404)
+        self.assertEqual(self.client.delete(f"/api/playlists/{mine}", headers=bob).status_code, 404)
+        self.assertEqual(self.client.get("/api/playlists/", headers={"X-User-Id": "bad id!"}).status_code, 400)
+
+        # Behind a proxy sharing a secret, only it can name a library
+        with mock.patch.object(tenancy, "TENANT_HEADER_SECRET", "proxy-secret"):
+            self.assertEqual(self.client.get("/api/playlists/", headers=alice).status_code, 403)
+            forged = dict(alice, **{"X-Tenant-Secret": "guess"})
+            self.assertEqual(self.client.get("/api/playlists/", headers=forged).status_code, 403)
+            proxied = dict(alice, **{"X-Tenant-Secret": "proxy-secret"})
+            self.assertEqual([p["name"] for p in self.client.get("/api/playlists/", headers=proxied).json()], ["Mine"])
+
+        self.assertEqual(self.client.delete(f"/api/playlists/{mine}", headers=alice).status_code, 200)
+        self.assertEqual(self.client.get("/api/playlists/channels", params={"dedup": "true"}, headers=alice).json(), [])
+        self.assertEqual(
+            len(self.client.get("/api/playlists/channels", params={"dedup": "true"}, headers=bob).json()), 10
+        )
+
+    def test_06_delta_sync_follows_changes(self):
+        """A catalogue kept by replaying changes matches the listing, refreshes only send what changed"""
+        content, _ = generate_playlist(80, seed=9, invalid_ratio=0)
+        channels = self.parser.parse_content(content)
+        parse = self.enterContext(mock.patch.object(routes.playlist.m3u_parser, "parse_from_url"))
+        catalogue = {}
+
+        def sync(since):
+            response = self.client.get("/api/channels/changes", params={"since": since})
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            return apply_changes(catalogue, body), body
+
+        def listed():
+            return {c["id"]: (c["name"], c["url"], c["logo"]) for c in self.client.get("/api/playlists/channels").json()}
+
+        revision, body = sync(0)
+        self.assertEqual((revision, body["full"], body["upserted"]), (0, True, []))
+
+        # Revision 0 has no log behind it, libraries from before the log included
+        parse.return_value = channels[:50]
+        first = self.client.post("/api/playlists/url", json={"name": "A", "url": "http://a.example/list.m3u"}).json()["id"]
+        revision, body = sync(revision)
+        self.assertEqual((revision, body["full"], len(catalogue)), (1, True, 50))
+
+        parse.return_value = channels[50:]
+        second = self.client.post("/api/playlists/url", json={"name": "B", "url": "http://b.example/list.m3u"}).json()["id"]
+        revision, body = sync(revision)
+        self.assertEqual((revision, body["full"], body["replaced_playlists"]), (2, False, [second]))
+        self.assertEqual(len(body["upserted"]), 30)
+        self.assertEqual(len(catalogue), 80)
+
+        # A refresh parses fresh ids; unchanged channels keep their stored ones
+        refreshed = [ch.model_copy(update={"id": str(uuid.uuid4())}) for ch in channels[:40]]
+        refreshed[0] = refreshed[0].model_copy(update={"logo": "http://logos.example/new.png"})
+        added = [ch.model_copy(update={"id": str(uuid.uuid4()), "name": f"New {i}"}) for i, ch in enumerate(channels[:3])]
+        parse.return_value = refreshed + added
+        self.assertEqual(self.client.put(f"/api/playlists/{first}/refresh").status_code, 200)
+        revision, body = sync(revision)
+        self.assertEqual(revision, 3)
+        self.assertEqual(len(body["upserted"]), 4)
+        self.assertEqual(sorted(body["deleted"]), sorted(c.id for c in channels[40:50]))
+        self.assertEqual({i: (c["name"], c["url"], c["logo"]) for i, c in catalogue.items()}, listed())
+
+        self.assertEqual(self.client.delete(f"/api/playlists/{second}").status_code, 200)
+        revision, body = sync(revision)
+        self.assertEqual((body["deleted_playlists"], body["upserted"]), ([second], []))
+        self.assertEqual({i: (c["name"], c["url"], c["logo"]) for i, c in catalogue.items()}, listed())
+
+        # Clients behind the compacted log start over
+        asyncio.run(self.library.compact_changes("default", revision - 1))
+        self.assertEqual(sync(revision - 2)[1]["full"], True)
+        self.assertEqual(sync(revision)[1]["full"], False)
+        self.assertEqual(len(catalogue), 43)
+
+    def test_07_compact_formats(self):
+        """Columnar JSON and MessagePack carry the same rows as the JSON array, chosen by Accept"""
+        content, _ = generate_playlist(300, seed=16)
+        channels = self.parser.parse_content(content)
+        self.insert(channels, "A", clusters=True)
+        self.insert([ch.model_copy(update={"url": ch.url + "?mirror"}) for ch in channels[:50]], "B", clusters=True)
+
+        for params in ({}, {"category": "Sports"}, {"dedup": "true"}):
+            rows = self.client.get("/api/playlists/channels", params=params).json()
+            response = self.client.get("/api/playlists/channels", params=params,
+                                       headers={"Accept": f"{COLUMNS_MEDIA_TYPE}, application/json;q=0.5"})
+            self.assertEqual(response.headers["content-type"], COLUMNS_MEDIA_TYPE)
+            self.assertEqual(response.headers["vary"], "Accept")
+            self.assertEqual(column_rows(response.json()), rows)
+            self.assertLess(len(response.content), len(json.dumps(rows)))
+
+            if MSGPACK_MEDIA_TYPE in available_media_types():
+                response = self.client.get("/api/playlists/channels", params=params,
+                                           headers={"Accept": "application/x-msgpack"})
+                self.assertEqual(response.headers["content-type"], MSGPACK_MEDIA_TYPE)
+                self.assertEqual(column_rows(msgpack.unpackb(response.content)), rows)
+
+        response = self.client.get("/api/playlists/channels", headers={"Accept": "text/html, */*;q=0.1"})
+        self.assertEqual(response.headers["content-type"], "application/json")
+        empty = self.client.get("/api/playlists/missing/channels", headers={"Accept": COLUMNS_MEDIA_TYPE})
+        self.assertEqual(empty.status_code, 404)
+
+    def test_08_cached_exports_and_categories(self):
+        """Exports and category lists are rendered and gzipped once per version, unchanged ones are 304"""
+        content, _ = generate_playlist(400, seed=17, invalid_ratio=0)
+        channels = self.parser.parse_content(content)
+        playlist_id = self.insert(channels)
+        cache = routes.playlist.compressed_bodies
+        gzip_only = {"Accept-Encoding": "gzip"}
+
+        response = self.client.get(f"/api/playlists/{playlist_id}/export", headers=gzip_only)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        exported = self.parser.parse_content(response.text)
+        self.assertEqual([(c.name, c.url, c.logo, c.group_title) for c in exported],
+                         [(c.name, c.url, c.logo, c.group_title) for c in channels])
+        etag = response.headers["etag"]
+        # Plain and compressed bodies share the version's ETag, so it is weak
+        self.assertTrue(etag.startswith('W/"'))
+
+        again = self.client.get(f"/api/playlists/{playlist_id}/export", headers=gzip_only)
+        self.assertEqual((again.headers["etag"], again.content), (etag, response.content))
+        self.assertEqual(cache.compressions, 1)
+        not_modified = self.client.get(f"/api/playlists/{playlist_id}/export", headers={"If-None-Match": etag})
+        self.assertEqual((not_modified.status_code, not_modified.content), (304, b""))
+        plain = self.client.get(f"/api/playlists/{playlist_id}/export", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", plain.headers)
+        self.assertEqual(plain.text, response.text)
+
+        # A refresh is a new version
+        asyncio.run(self.library.update_channels("default", playlist_id, channels[:10], datetime.utcnow()))
+        refreshed = self.client.get(f"/api/playlists/{playlist_id}/export", headers={"If-None-Match": etag})
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertEqual(len(self.parser.parse_content(refreshed.text)), 10)
+        self.assertEqual(self.client.get("/api/playlists/missing/export").status_code, 404)
+
+        # Names outside Latin-1 get an ASCII fallback next to the UTF-8 filename
+        named = self.insert(channels[:3], name="Спорт Ñandú")
+        response = self.client.get(f"/api/playlists/{named}/export")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-disposition"],
+                         "attachment; filename=\"Nandu.m3u\"; "
+                         "filename*=UTF-8''%D0%A1%D0%BF%D0%BE%D1%80%D1%82%20%C3%91and%C3%BA.m3u")
+
+        categories = self.client.get("/api/playlists/categories", headers=gzip_only)
+        self.assertEqual(categories.json()[0], "Todos")
+        self.assertEqual(categories.headers["cache-control"], "no-cache")
+        cached = self.client.get("/api/playlists/categories", headers={"If-None-Match": categories.headers["etag"]})
+        self.assertEqual(cached.status_code, 304)
+
+    def test_09_fuzzy_search(self):
+        """Misspelled searches find ranked channels; substring search stays the default"""
+        content, _ = generate_playlist(300, seed=20, invalid_ratio=0)
+        channels = self.parser.parse_content(content)
+        channels[5] = channels[5].model_copy(update={"name": "Bloomberg Television", "tvg_name": "BloombergTV"})
+        channels[9] = channels[9].model_copy(update={"name": "Bloomberg", "tvg_name": "Bloomberg", "category": "Noticias"})
+        first = self.insert(channels[:150], "First")
+        second = self.insert(channels[150:], "Second")
+
+        self.assertEqual(self.client.get("/api/playlists/channels", params={"search": "blomberg"}).json(), [])
+        ranked = self.client.get("/api/playlists/channels", params={"search": "blomberg", "fuzzy": "true"}).json()
+        self.assertEqual([c["name"] for c in ranked[:2]], ["Bloomberg", "Bloomberg Television"])
+        self.assertEqual(set(ranked[0]), {"id", "name", "url", "logo", "category", "is_live", "group_title", "variants"})
+
+        response = self.client.get("/api/playlists/channels", params={
+            "search": "bloombergtv", "fuzzy": "true", "category": "Noticias", "limit": 1
+        })
+        self.assertEqual([c["name"] for c in response.json()], ["Bloomberg"])
+        response = self.client.get(f"/api/playlists/{second}/channels", params={"search": "blomberg", "fuzzy": "true"})
+        self.assertEqual(response.json(), [])
+        response = self.client.get(f"/api/playlists/{first}/channels", params={"search": channels[40].name, "fuzzy": "true"})
+        self.assertEqual(response.json()[0]["id"], channels[40].id)
+        self.assertEqual(self.client.get("/api/playlists/channels", params={"fuzzy": "true", "limit": 0}).status_code, 422)
+
+    def test_10_ingest_rules(self):
+        """Only the channels kept by a playlist's rules are stored, on import and on refresh"""
+        self.patch("UPLOAD_DIR", self.enterContext(tempfile.TemporaryDirectory()))
+        content, _ = generate_playlist(300, seed=22, invalid_ratio=0)
+        channels = self.parser.parse_content(content)
+        sports = [ch for ch in channels if ch.group_title == "Sports"]
+        rules = [{"action": "include", "field": "group_title", "pattern": "sports"},
+                 {"action": "categorize", "pattern": "*", "value": "Deportes"}]
+
+        response = self.client.post("/api/playlists/upload", files={"file": ("list.m3u", content)},
+                                    data={"rules": json.dumps(rules)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["channel_count"], len(sports))
+        listed = self.client.get(f"/api/playlists/{response.json()['id']}/channels").json()
+        self.assertEqual([(c["url"], c["category"]) for c in listed], [(c.url, "Deportes") for c in sports])
+
+        invalid = [{"action": "exclude", "pattern": "(", "syntax": "regex"}]
+        for data in ({"rules": json.dumps(invalid)}, {"rules": "[{"}):
+            response = self.client.post("/api/playlists/upload", files={"file": ("list.m3u", content)}, data=data)
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/playlists/url", json={"name": "U", "url": "http://u.example/list.m3u",
+                                                                "ingest_rules": invalid})
+        self.assertEqual(response.status_code, 400)
+
+        # The parser applies the rules it is given, as it does while parsing
+        parse = self.enterContext(mock.patch.object(routes.playlist.m3u_parser, "parse_from_url"))
+        parse.side_effect = lambda url, rules=None: rules.apply_all(parse.return_value) if rules else parse.return_value
+        parse.return_value = channels
+        rules = [{"action": "exclude", "field": "url_host", "pattern": "*.example.com"}]
+        created = self.client.post("/api/playlists/url", json={"name": "U", "url": "http://u.example/list.m3u",
+                                                               "ingest_rules": rules}).json()
+        kept = [ch for ch in channels if ".example.com/" not in ch.url]
+        self.assertEqual(created["channel_count"], len(kept))
+
+        parse.return_value = [ch.model_copy(update={"id": str(uuid.uuid4())}) for ch in channels[:100]]
+        refreshed = self.client.put(f"/api/playlists/{created['id']}/refresh").json()
+        self.assertEqual(refreshed["channel_count"], len([ch for ch in kept if ch in channels[:100]]))
+        stored = {p["id"]: p for p in self.client.get("/api/playlists/").json()}
+        self.assertEqual(stored[created["id"]]["ingest_rules"][0]["pattern"], "*.example.com")
+
+        # Rules that drop every channel are a bad request, not a server error
+        nothing = json.dumps([{"action": "exclude", "pattern": "*"}])
+        response = self.client.post("/api/playlists/upload", files={"file": ("list.m3u", content)}, data={"rules": nothing})
+        self.assertEqual((response.status_code, response.json()["detail"]), (400, ALL_EXCLUDED))
+        response = self.client.post("/api/playlists/url", json={"name": "U", "url": "http://u.example/list.m3u",
+                                                                "ingest_rules": json.loads(nothing)})
+        self.assertEqual(response.status_code, 400)
+        parse.return_value = [ch for ch in channels if ".example.com/" in ch.url]
+        self.assertEqual(self.client.put(f"/api/playlists/{created['id']}/refresh").status_code, 400)
+
+        # Stored rules that no longer compile are a bad request on refresh too
+        stale = Playlist(name="Stale", url="http://u.example/list.m3u", ingest_rules=invalid)
+        asyncio.run(self.library.insert_playlist(stale))
+        response = self.client.put(f"/api/playlists/{stale.id}/refresh")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Reglas de ingesta inválidas", response.json()["detail"])
+
+    def test_11_batch_import(self):
+        """A batch stores every playlist that parsed and reports each item in request order"""
+        content, _ = generate_playlist(120, seed=23, invalid_ratio=0)
+        channels = self.parser.parse_content(content)
+
+        def parse(url, rules=None):
+            if "down" in url:
+                raise Exception("Error al descargar la lista: 503")
+            parsed = channels[:int(url.rsplit("/", 1)[1])]
+            return rules.apply_all(parsed) if rules else parsed
+
+        self.enterContext(mock.patch.object(routes.playlist.m3u_parser, "parse_from_url", side_effect=parse))
+        items = [
+            {"name": "A", "url": "http://a.example/40"},
+            {"name": "Down", "url": "http://b.example/down"},
+            {"name": "No URL"},
+            {"name": "Bad rules", "url": "http://a.example/10", "ingest_rules": [{"action": "rename", "pattern": "*"}]},
+            {"name": "B", "url": "http://c.example/120", "ingest_rules": [{"action": "exclude", "pattern": "*hd*"}]},
+            {"name": "A again", "url": "http://a.example/40"},
+        ]
+        response = self.client.post("/api/playlists/batch", json={"playlists": items})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([r["name"] for r in results], [item["name"] for item in items])
+        self.assertEqual([r["status"] for r in results], ["created", "failed", "failed", "failed", "created", "created"])
+        self.assertIn("503", results[1]["error"])
+        self.assertEqual(results[2]["error"], "URL es requerida")
+        self.assertTrue(results[3]["error"].startswith("Reglas de ingesta inválidas"))
+
+        without_hd = [ch for ch in channels if "hd" not in ch.name.lower()]
+        self.assertEqual([r["playlist"]["channel_count"] for r in results if r["playlist"]], [40, len(without_hd), 40])
+        listed = self.client.get(f"/api/playlists/{results[4]['playlist']['id']}/channels").json()
+        self.assertEqual([c["url"] for c in listed], [c.url for c in without_hd])
+        self.assertEqual(len(self.client.get("/api/playlists/").json()), 3)
+        self.assertEqual(len(self.client.get("/api/playlists/channels").json()), 80 + len(without_hd))
+        self.assertEqual(self.client.get("/api/channels/changes", params={"since": 0}).json()["revision"], 3)
+
+        # A playlist the storage refuses fails alone, without changes recorded for it
+        insert_playlists = self.library.insert_playlists
+
+        async def refuse_first(playlists):
+            await insert_playlists(playlists[1:])
+            return {0: "duplicate key"}
+
+        with mock.patch.object(self.library, "insert_playlists", side_effect=refuse_first):
+            response = self.client.post("/api/playlists/batch", json={"playlists": [items[0], items[5]]})
+        self.assertEqual([r["status"] for r in response.json()], ["failed", "created"])
+        self.assertEqual(response.json()[0]["error"], "Error al guardar la playlist: duplicate key")
+        self.assertEqual(len(self.client.get("/api/playlists/").json()), 4)
+        self.assertEqual(self.client.get("/api/channels/changes", params={"since": 0}).json()["revision"], 4)
+
+        self.assertEqual(self.client.post("/api/playlists/batch", json={"playlists": []}).status_code, 400)
+        self.patch("PLAYLIST_BATCH_MAX", 2)
+        response = self.client.post("/api/playlists/batch", json={"playlists": items[:3]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_12_changes_ignore_lagging_listings(self):
+        """Deltas and refresh diffs come from the primary even when listings read a lagging secondary"""
+        client = AsyncMongoMockClient()
+        library = MongoStorage(client['playlist_routes_primary'], client['playlist_routes_lagging'])
+        self.patch("library", library)
+        routes.changes.library = library
+        content, _ = generate_playlist(20, seed=25, invalid_ratio=0)
+        channels = self.parser.parse_content(content)
+        parse = self.enterContext(mock.patch.object(routes.playlist.m3u_parser, "parse_from_url"))
+
+        parse.return_value = channels
+        playlist_id = self.client.post("/api/playlists/url", json={"name": "A", "url": "http://a.example/list.m3u"}).json()["id"]
+        body = self.client.get("/api/channels/changes", params={"since": 0}).json()
+        self.assertEqual((body["revision"], len(body["upserted"])), (1, 20))
+
+        parse.return_value = [ch.model_copy(update={"id": str(uuid.uuid4())}) for ch in channels[:19]]
+        self.assertEqual(self.client.put(f"/api/playlists/{playlist_id}/refresh").status_code, 200)
+        body = self.client.get("/api/channels/changes", params={"since": 1}).json()
+        self.assertEqual((body["upserted"], body["deleted"]), ([], [channels[19].id]))
+
+class SQLitePlaylistRoutesTest(PlaylistRoutesTest):
+    """The same endpoints served by the embedded storage backend"""
+
+    def setUp(self):
+        super().setUp()
+        # Logo and probe caches need Mongo, the server leaves them off with SQLite
+        self.patch("logo_cache", None)
+        self.patch("stream_probe", None)
+
+    def make_library(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        library = SQLiteStorage(os.path.join(directory.name, "library.db"))
+        self.addCleanup(library.close)
+        return library
+
+    def test_06_short_searches_and_refresh(self):
+        """Searches shorter than a trigram scan, refreshed channels are re-indexed"""
+        content, _ = generate_playlist(200, seed=4, invalid_ratio=0)
+        channels = self.parser.parse_content(content)
+        playlist_id = self.insert(channels)
+
+        for search in ("e", "Hd", '"', "%"):
+            expected = [c.id for c in self.parser.search_channels(channels, search)]
+            response = self.client.get(f"/api/playlists/{playlist_id}/channels", params={"search": search})
+            self.assertEqual([c["id"] for c in response.json()], expected)
+
+        renamed = [ch.model_copy(update={"name": f"Renamed {i}"}) for i, ch in enumerate(channels[:5])]
+        asyncio.run(self.library.update_channels("default", playlist_id, renamed, renamed[0].created_at))
+        self.assertEqual(len(self.client.get("/api/playlists/channels", params={"search": "renamed"}).json()), 5)
+        self.assertEqual(self.client.get("/api/playlists/channels", params={"search": channels[10].name}).json(), [])
+        self.assertEqual(self.client.get("/api/playlists/").json()[0]["channel_count"], 5)
+
+class ChannelTablePlaylistRoutesTest(PlaylistRoutesTest):
+    """The same endpoints answered from in-memory channel tables"""
+
+    def setUp(self):
+        super().setUp()
+        self.patch("channel_tables", ChannelTables(self.library))
+
+    def test_06_route_changes_reach_the_table(self):
+        """Deleting through the API updates an already loaded table"""
+        content, _ = generate_playlist(100, seed=6, invalid_ratio=0)
+        channels = self.parser.parse_content(content)
+        first = self.insert(channels[:60], "First")
+        self.insert(channels[60:], "Second")
+        self.assertEqual(len(self.client.get("/api/playlists/channels").json()), 100)
+
+        self.assertEqual(self.client.delete(f"/api/playlists/{first}").status_code, 200)
+        listed = self.client.get("/api/playlists/channels").json()
+        self.assertEqual([c["id"] for c in listed], [c.id for c in channels[60:]])
+        self.assertEqual(
+            self.client.get("/api/playlists/categories").json(),
+            ["Todos"] + self.parser.get_categories(channels[60:])
+        )
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
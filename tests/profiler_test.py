@@ -0,0 +1,125 @@
+import unittest
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Add the benchmarks and backend directories to the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from fastapi import FastAPI, APIRouter
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+from playlist_generator import generate_playlist
+from services.profiler import SamplingProfiler, ProfilingMiddleware, ProfileStore
+from storage.mongo import MongoStorage
+import routes.admin
+
+TOKEN = "secret-admin-token"
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.db = AsyncMongoMockClient()['profiler_test']
+        routes.admin.library = MongoStorage(self.db)
+        routes.admin.ADMIN_TOKEN = TOKEN
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_01_collapsed_stacks(self):
+        """Samples are folded root first and attributed to the busy function"""
+        with SamplingProfiler(interval=0.001) as profiler:
+            busy_loop(0.1)
+
+        self.assertGreater(profiler.samples, 10)
+        heaviest = profiler.collapsed().splitlines()[0]
+        stack, count = heaviest.rsplit(" ", 1)
+        self.assertIn("profiler_test:busy_loop", stack)
+        self.assertLess(stack.index("test_01_collapsed_stacks"), stack.index("busy_loop"))
+        self.assertGreater(int(count), 0)
+        self.assertEqual(profiler.top_functions()[0]["function"].split(":")[0], "profiler_test")
+
+    def test_02_profile_parse_endpoint(self):
+        """Admins can profile a stored playlist; everyone else is rejected"""
+        content, expected = generate_playlist(5000, seed=1)
+        with tempfile.NamedTemporaryFile('w', suffix='.m3u', delete=False, encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        asyncio.run(self.db.playlists.insert_one({"id": "p1", "owner_id": "default", "name": "Big", "file_path": f.name}))
+
+        app = FastAPI()
+        app.include_router(routes.admin.router, prefix="/api")
+        client = TestClient(app)
+
+        response = client.post("/api/admin/profile/parse", json={"playlist_id": "p1"})
+        self.assertEqual(response.status_code, 403)
+        response = client.post("/api/admin/profile/parse", json={"playlist_id": "p1"},
+                               headers={"X-Admin-Token": "wrong"})
+        self.assertEqual(response.status_code, 403)
+
+        headers = {"X-Admin-Token": TOKEN}
+        response = client.post("/api/admin/profile/parse", json={"playlist_id": "p1"}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["channel_count"], expected)
+        self.assertTrue(response.json()["top_functions"])
+
+        response = client.post("/api/admin/profile/parse?format=collapsed",
+                               json={"playlist_id": "p1"}, headers=headers)
+        self.assertIn("m3u_parser:", response.text)
+
+        response = client.post("/api/admin/profile/parse", json={"playlist_id": "missing"}, headers=headers)
+        self.assertEqual(response.status_code, 404)
+        response = client.post("/api/admin/profile/parse", json={}, headers=headers)
+        self.assertEqual(response.status_code, 400)
+        response = client.post("/api/admin/profile/parse", json={"playlist_id": "p1", "interval_ms": 0.001},
+                               headers=headers)
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(routes.admin.is_admin("contraseña"))
+
+    def test_03_per_request_header(self):
+        """X-Profile with an admin token profiles the request and stores the result"""
+        router = APIRouter(prefix="/api/playlists")
+
+        @router.get("/slow")
+        async def slow():
+            busy_loop(0.05)
+            return {"ok": True}
+
+        app = FastAPI()
+        app.include_router(router)
+        app.include_router(routes.admin.router, prefix="/api")
+        store = routes.admin.profile_store
+        app.add_middleware(ProfilingMiddleware, store=store, is_admin=routes.admin.is_admin, interval=0.001)
+        client = TestClient(app)
+
+        self.assertNotIn("x-profile-id", client.get("/api/playlists/slow").headers)
+        self.assertNotIn("x-profile-id", client.get("/api/playlists/slow", headers={"X-Profile": "1"}).headers)
+
+        headers = {"X-Profile": "1", "X-Admin-Token": TOKEN}
+        profile_id = client.get("/api/playlists/slow", headers=headers).headers["x-profile-id"]
+
+        profile = client.get(f"/api/admin/profiles/{profile_id}", headers=headers).json()
+        self.assertEqual(profile["path"], "/api/playlists/slow")
+        self.assertIn("busy_loop", profile["collapsed"])
+        listed = client.get("/api/admin/profiles", headers=headers).json()
+        self.assertEqual(listed[0]["id"], profile_id)
+        self.assertNotIn("collapsed", listed[0])
+
+    def test_04_store_is_bounded(self):
+        """Only the most recent profiles are kept"""
+        store = ProfileStore(max_profiles=2)
+        for i in range(3):
+            store.add(str(i), {"id": str(i)})
+        self.assertIsNone(store.get("0"))
+        self.assertEqual([p["id"] for p in store.list()], ["2", "1"])
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
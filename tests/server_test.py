@@ -0,0 +1,34 @@
+import unittest
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+class ServerStartupTest(unittest.TestCase):
+    def run_script(self, script, **env):
+        result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR,
+                                env=dict(os.environ, **env), capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_01_import_defers_drivers(self):
+        """Importing the app loads no database driver, HTTP client or image library"""
+        self.run_script(
+            "import sys, server\n"
+            "heavy = {'motor', 'pymongo', 'requests', 'PIL'} & set(sys.modules)\n"
+            "assert not heavy, heavy\n",
+            STORAGE_BACKEND="mongo", MONGO_URL="mongodb://localhost:1"
+        )
+
+    def test_02_factory_builds_independent_apps(self):
+        self.run_script(
+            "import server\n"
+            "from fastapi.testclient import TestClient\n"
+            "first, second = server.create_app(), server.create_app()\n"
+            "assert first is not second and first is not server.app\n"
+            "assert TestClient(second).get('/api/').json()['status'] == 'ok'\n",
+            STORAGE_BACKEND="mongo", MONGO_URL="mongodb://localhost:1"
+        )
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,127 @@
+import unittest
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+# Add the benchmarks and backend directories to the path
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+sys.path.append(BACKEND_DIR)
+from playlist_generator import generate_playlist
+from models.playlist import Playlist
+from services.m3u_parser import M3UParser
+from storage import create_storage
+from storage.sqlite import SQLiteStorage
+from storage.mongo import MongoStorage
+from mongomock_motor import AsyncMongoMockClient
+
+async def collect(chunks):
+    return [item async for chunk in chunks for item in chunk]
+
+def assert_partial_batch(test, library):
+    channels = M3UParser().parse_content(generate_playlist(10, seed=5, invalid_ratio=0)[0])
+    stored = Playlist(name="Stored", channel_count=3, channels=channels[:3])
+    asyncio.run(library.insert_playlist(stored))
+    batch = [Playlist(name="New", channel_count=3, channels=channels[3:6]), stored,
+             Playlist(name="Also new", channel_count=4, channels=channels[6:])]
+
+    failed = asyncio.run(library.insert_playlists(batch))
+    test.assertEqual(list(failed), [1])
+    for playlist in (batch[0], batch[2]):
+        listed = asyncio.run(collect(library.channel_chunks("default", playlist.id, None, None, 50)))
+        test.assertEqual([c["id"] for c in listed], [c.id for c in playlist.channels])
+    listed = asyncio.run(collect(library.channel_chunks("default", stored.id, None, None, 50)))
+    test.assertEqual([c["id"] for c in listed], [c.id for c in stored.channels])
+
+class SQLiteStorageTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "edge", "library.db")
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_01_library_survives_restart(self):
+        """Playlists, channel order and merged channels are read back after reopening the file"""
+        content, _ = generate_playlist(120, seed=8, invalid_ratio=0)
+        channels = M3UParser().parse_content(content)
+        playlist = Playlist(name="Edge", channel_count=len(channels), channels=channels)
+
+        library = SQLiteStorage(self.path)
+        asyncio.run(library.insert_playlist(playlist))
+        asyncio.run(library.update_clusters("default", playlist.id, channels))
+        library.close()
+
+        library = SQLiteStorage(self.path)
+        self.addCleanup(library.close)
+        stored = asyncio.run(library.get_playlist("default", playlist.id))
+        self.assertEqual(stored["created_at"], playlist.created_at)
+        self.assertEqual(stored["channel_count"], 120)
+
+        listed = asyncio.run(collect(library.channel_chunks("default", None, None, None, 50)))
+        self.assertEqual([c["id"] for c in listed], [c.id for c in channels])
+        clusters = asyncio.run(collect(library.cluster_chunks("default", None, None, 50)))
+        self.assertTrue(clusters)
+        self.assertEqual(asyncio.run(library.channel_url("default", clusters[0]["id"])), clusters[0]["streams"][0]["url"])
+
+        asyncio.run(library.update_clusters("default", playlist.id, None))
+        self.assertEqual(asyncio.run(collect(library.cluster_chunks("default", None, None, 50))), [])
+
+    def test_02_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_storage("cassandra")
+
+    def test_03_server_starts_without_mongo(self):
+        """An edge box needs neither MONGO_URL nor Motor"""
+        env = dict(os.environ, STORAGE_BACKEND="sqlite", SQLITE_PATH=self.path, MONGO_URL="")
+        script = (
+            "import sys, server\n"
+            "from fastapi.testclient import TestClient\n"
+            "assert 'motor' not in sys.modules and 'database' not in sys.modules\n"
+            "with TestClient(server.app) as client:\n"
+            "    assert client.get('/api/health').json()['storage'] == 'sqlite'\n"
+            "    assert client.get('/api/playlists/categories').json() == ['Todos']\n"
+        )
+        result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, env=env,
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_04_batch_insert_keeps_the_playlists_that_fit(self):
+        """A playlist failing in a batch is reported by position, the others are stored"""
+        library = SQLiteStorage(self.path)
+        self.addCleanup(library.close)
+        assert_partial_batch(self, library)
+
+class MongoStorageTest(unittest.TestCase):
+    def test_01_only_listings_read_from_secondaries(self):
+        """With a lagging read database, everything but client listings sees the latest write"""
+        client = AsyncMongoMockClient()
+        library = MongoStorage(client['primary'], client['lagging'])
+        channels = M3UParser().parse_content(generate_playlist(10, seed=3, invalid_ratio=0)[0])
+        playlist = Playlist(name="Fresh", channel_count=len(channels), channels=channels)
+        asyncio.run(library.insert_playlist(playlist))
+
+        async def playlist_ids():
+            return [p["id"] async for p in library.list_playlists("default")]
+
+        self.assertEqual(asyncio.run(collect(library.channel_chunks("default", None, None, None, 5))), [])
+        self.assertEqual(len(asyncio.run(collect(library.primary.channel_chunks("default", None, None, None, 5)))), 10)
+        self.assertEqual(asyncio.run(playlist_ids()), [playlist.id])
+        self.assertEqual(len(asyncio.run(collect(library.search_entries("default", 5)))), 10)
+        self.assertEqual(len(asyncio.run(library.channels_by_id("default", [channels[0].id]))), 1)
+
+        single = MongoStorage(client['primary'])
+        self.assertIs(single.primary, single)
+
+    def test_02_batch_insert_keeps_the_playlists_that_fit(self):
+        db = AsyncMongoMockClient()['storage_batch_test']
+        asyncio.run(db.playlists.create_index([("owner_id", 1), ("id", 1)], unique=True))
+        assert_partial_batch(self, MongoStorage(db))
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)